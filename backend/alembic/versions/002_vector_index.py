@@ -0,0 +1,60 @@
+"""Document embeddings vector index
+
+Revision ID: 002_vector_index
+Revises: 001_initial
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_vector_index'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pgvector uniquement: en SQLite la table n'existe pas
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Table gérée par Prisma côté frontend: tout est idempotent
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS document_embeddings (
+            id SERIAL PRIMARY KEY,
+            document_type VARCHAR(50) NOT NULL,
+            document_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            content_hash VARCHAR(64),
+            embedding vector(1536),
+            metadata TEXT,
+            created_at TIMESTAMPTZ(6) NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    op.execute('ALTER TABLE document_embeddings ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)')
+    op.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS document_embeddings_document_type_document_id_key '
+        'ON document_embeddings (document_type, document_id)'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS document_embeddings_document_type_idx '
+        'ON document_embeddings (document_type)'
+    )
+    # Index ANN (reconstruction/changement de méthode: scripts/manage_vector_index.py)
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS document_embeddings_embedding_idx '
+        'ON document_embeddings USING hnsw (embedding vector_cosine_ops) '
+        'WITH (m = 16, ef_construction = 64)'
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS document_embeddings_embedding_idx')
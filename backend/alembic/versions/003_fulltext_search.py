@@ -0,0 +1,54 @@
+"""Full-text search vectors
+
+Revision ID: 003_fulltext_search
+Revises: 002_vector_index
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_fulltext_search'
+down_revision: Union[str, None] = '002_vector_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Colonnes tsvector (configuration 'french') maintenues par PostgreSQL
+SEARCH_VECTORS = {
+    'procedures': (
+        "setweight(to_tsvector('french', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('french', coalesce(tags::text, '')), 'B') || "
+        "setweight(to_tsvector('french', coalesce(description, '')), 'C')"
+    ),
+    'tips': (
+        "setweight(to_tsvector('french', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('french', coalesce(tags::text, '')), 'B') || "
+        "setweight(to_tsvector('french', coalesce(content, '')), 'C')"
+    ),
+}
+
+
+def upgrade() -> None:
+    # SQLite: tables FTS5 créées au démarrage (app.services.fulltext_search)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, expression in SEARCH_VECTORS.items():
+        op.execute(
+            f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+            f'GENERATED ALWAYS AS ({expression}) STORED'
+        )
+        op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in SEARCH_VECTORS:
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_search_vector')
+        op.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
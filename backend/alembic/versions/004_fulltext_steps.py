@@ -0,0 +1,46 @@
+"""Full-text search vector on steps
+
+Revision ID: 004_fulltext_steps
+Revises: 003_fulltext_search
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_fulltext_steps'
+down_revision: Union[str, None] = '003_fulltext_search'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('french', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('french', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('french', coalesce(instructions, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    # SQLite: table FTS5 créée au démarrage (app.services.fulltext_search)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute(
+        f'ALTER TABLE steps ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f'GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED'
+    )
+    op.execute('CREATE INDEX IF NOT EXISTS ix_steps_search_vector ON steps USING gin (search_vector)')
+    # Jointure vers la procédure parente pour le filtre is_active
+    op.execute('CREATE INDEX IF NOT EXISTS ix_steps_procedure_id ON steps (procedure_id)')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_steps_search_vector')
+    op.execute('ALTER TABLE steps DROP COLUMN IF EXISTS search_vector')
@@ -0,0 +1,36 @@
+"""Composite indexes for keyset pagination
+
+Revision ID: 005_keyset_pagination
+Revises: 004_fulltext_steps
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_keyset_pagination'
+down_revision: Union[str, None] = '004_fulltext_steps'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nom, table, colonnes): filtres des listes suivis de la clé du curseur
+KEYSET_INDEXES = [
+    ('ix_procedures_is_active_id', 'procedures', ['is_active', 'id']),
+    ('ix_procedures_category_id', 'procedures', ['category', 'id']),
+    ('ix_tips_category_id', 'tips', ['category', 'id']),
+    ('ix_executions_user_id_id', 'executions', ['user_id', 'id']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in KEYSET_INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in KEYSET_INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,47 @@
+"""Usage and latency of streamed chat messages
+
+Revision ID: 006_chat_message_usage
+Revises: 005_keyset_pagination
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_chat_message_usage'
+down_revision: Union[str, None] = '005_keyset_pagination'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CHAT_MESSAGE_COLUMNS = [
+    sa.Column('model', sa.String(100), nullable=True),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+    sa.Column('completion_tokens', sa.Integer(), nullable=True),
+    sa.Column('total_tokens', sa.Integer(), nullable=True),
+    sa.Column('time_to_first_token_ms', sa.Integer(), nullable=True),
+    sa.Column('duration_ms', sa.Integer(), nullable=True),
+    sa.Column('finish_reason', sa.String(20), nullable=True),
+]
+
+
+def _existing_columns() -> set:
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('chat_messages')}
+
+
+def upgrade() -> None:
+    existing = _existing_columns()
+    for column in CHAT_MESSAGE_COLUMNS:
+        if column.name not in existing:
+            op.add_column('chat_messages', column)
+
+
+def downgrade() -> None:
+    existing = _existing_columns()
+    for column in reversed(CHAT_MESSAGE_COLUMNS):
+        if column.name in existing:
+            op.drop_column('chat_messages', column.name)
@@ -0,0 +1,47 @@
+"""Batch step sync: client timestamps and idempotency keys
+
+Revision ID: 007_step_sync
+Revises: 006_chat_message_usage
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_step_sync'
+down_revision: Union[str, None] = '006_chat_message_usage'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'client_updated_at' not in {column['name'] for column in inspector.get_columns('step_executions')}:
+        op.add_column('step_executions', sa.Column('client_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+    if not inspector.has_table('step_sync_operations'):
+        op.create_table(
+            'step_sync_operations',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('execution_id', sa.Integer(), nullable=False),
+            sa.Column('idempotency_key', sa.String(100), nullable=False),
+            sa.Column('step_id', sa.Integer(), nullable=False),
+            sa.Column('result', sa.String(20), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.ForeignKeyConstraint(['execution_id'], ['executions.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['step_id'], ['steps.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('execution_id', 'idempotency_key', name='uq_step_sync_operations_execution_key'),
+        )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('step_sync_operations'):
+        op.drop_table('step_sync_operations')
+    if 'client_updated_at' in {column['name'] for column in inspector.get_columns('step_executions')}:
+        op.drop_column('step_executions', 'client_updated_at')
@@ -0,0 +1,91 @@
+"""Execution analytics summaries and step_executions composite indexes
+
+Revision ID: 008_execution_stats
+Revises: 007_step_sync
+Create Date: 2026-10-18 00:00:00.000000
+
+Les tables de résumés sont créées vides: les remplir depuis l'historique avec
+    python scripts/rebuild_execution_stats.py
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_execution_stats'
+down_revision: Union[str, None] = '007_step_sync'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nom, colonnes): index absents du modèle (déjà déclarés côté Prisma: @@unique / @@index)
+STEP_EXECUTION_INDEXES = [
+    ('ix_step_executions_execution_id_step_id', ['execution_id', 'step_id']),
+    ('ix_step_executions_step_id', ['step_id']),
+]
+
+
+def _covered(inspector, columns) -> bool:
+    """Index ou contrainte unique existant sur ces colonnes (créé par Prisma, par exemple)"""
+    existing = inspector.get_indexes('step_executions') + inspector.get_unique_constraints('step_executions')
+    return any(index['column_names'] == columns for index in existing)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, columns in STEP_EXECUTION_INDEXES:
+        if not _covered(inspector, columns):
+            op.create_index(name, 'step_executions', columns, unique=False)
+
+    if 'duration_seconds' not in {column['name'] for column in inspector.get_columns('step_executions')}:
+        op.add_column('step_executions', sa.Column('duration_seconds', sa.Float(), nullable=True))
+
+    if not inspector.has_table('procedure_execution_stats'):
+        op.create_table(
+            'procedure_execution_stats',
+            sa.Column('procedure_id', sa.Integer(), nullable=False),
+            sa.Column('executions_started', sa.Integer(), nullable=False),
+            sa.Column('executions_completed', sa.Integer(), nullable=False),
+            sa.Column('total_duration_seconds', sa.Float(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.ForeignKeyConstraint(['procedure_id'], ['procedures.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('procedure_id'),
+        )
+
+    if not inspector.has_table('procedure_duration_buckets'):
+        op.create_table(
+            'procedure_duration_buckets',
+            sa.Column('procedure_id', sa.Integer(), nullable=False),
+            sa.Column('bucket', sa.Integer(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['procedure_id'], ['procedures.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('procedure_id', 'bucket'),
+        )
+
+    if not inspector.has_table('step_execution_stats'):
+        op.create_table(
+            'step_execution_stats',
+            sa.Column('step_id', sa.Integer(), nullable=False),
+            sa.Column('procedure_id', sa.Integer(), nullable=False),
+            sa.Column('completed_count', sa.Integer(), nullable=False),
+            sa.Column('skipped_count', sa.Integer(), nullable=False),
+            sa.Column('timed_count', sa.Integer(), nullable=False),
+            sa.Column('total_duration_seconds', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['step_id'], ['steps.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['procedure_id'], ['procedures.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('step_id'),
+        )
+        op.create_index('ix_step_execution_stats_procedure_id', 'step_execution_stats', ['procedure_id'], unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in ('step_execution_stats', 'procedure_duration_buckets', 'procedure_execution_stats'):
+        if inspector.has_table(table):
+            op.drop_table(table)
+    if 'duration_seconds' in {column['name'] for column in inspector.get_columns('step_executions')}:
+        op.drop_column('step_executions', 'duration_seconds')
+    for name, _ in STEP_EXECUTION_INDEXES:
+        op.drop_index(name, table_name='step_executions', if_exists=True)
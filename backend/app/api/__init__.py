@@ -1,4 +1,4 @@
 # API routes
-from app.api import auth, procedures, chat, vision, tips, executions
+from app.api import auth, procedures, chat, vision, tips, executions, search, metrics, uploads, analytics, profiling
 
-__all__ = ["auth", "procedures", "chat", "vision", "tips", "executions"]
\ No newline at end of file
+__all__ = ["auth", "procedures", "chat", "vision", "tips", "executions", "search", "metrics", "uploads", "analytics", "profiling"]
\ No newline at end of file
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.core.database import get_async_db
+from app.core.dependencies import get_current_admin
+from app.models.user import User
+from app.models.execution import ProcedureDurationBucket, ProcedureExecutionStats, StepExecutionStats
+from app.models.procedure import Procedure, Step
+from app.schemas.analytics import ProcedureStats, ProcedureStatsSummary, StepStats
+from app.services.execution_stats import estimate_quantile
+
+router = APIRouter()
+
+# Étapes les plus souvent passées affichées sur le tableau de bord
+MOST_SKIPPED_LIMIT = 5
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+
+def _summary(procedure_id: int, title: str, stats: Optional[ProcedureExecutionStats]) -> dict:
+    if stats is None:
+        return {"procedure_id": procedure_id, "title": title}
+    return {
+        "procedure_id": procedure_id,
+        "title": title,
+        "executions_started": stats.executions_started,
+        "executions_completed": stats.executions_completed,
+        "completion_rate": _ratio(stats.executions_completed, stats.executions_started),
+        "average_duration_seconds": _ratio(stats.total_duration_seconds, stats.executions_completed),
+    }
+
+
+@router.get("/procedures", response_model=List[ProcedureStatsSummary])
+async def list_procedure_stats(
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Procédures les plus exécutées (table de résumés, sans parcourir les exécutions)"""
+    rows = (await db.execute(
+        select(ProcedureExecutionStats, Procedure.title)
+        .join(Procedure, Procedure.id == ProcedureExecutionStats.procedure_id)
+        .order_by(ProcedureExecutionStats.executions_started.desc(), ProcedureExecutionStats.procedure_id)
+        .limit(limit)
+    )).all()
+    return [_summary(stats.procedure_id, title, stats) for stats, title in rows]
+
+
+@router.get("/procedures/{procedure_id}", response_model=ProcedureStats)
+async def get_procedure_stats(
+    procedure_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Tableau de bord d'une procédure: taux de complétion, durée médiane,
+    temps par étape, étapes les plus passées
+
+    Trois requêtes sur les résumés (procédure, histogramme, étapes), quel que
+    soit le nombre d'exécutions.
+    """
+    row = (await db.execute(
+        select(Procedure.title, ProcedureExecutionStats)
+        .outerjoin(ProcedureExecutionStats, ProcedureExecutionStats.procedure_id == Procedure.id)
+        .where(Procedure.id == procedure_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Procedure not found")
+    title, stats = row
+    
+    buckets = dict((await db.execute(
+        select(ProcedureDurationBucket.bucket, ProcedureDurationBucket.count)
+        .where(ProcedureDurationBucket.procedure_id == procedure_id)
+    )).all())
+    
+    steps = []
+    for step_id, order, step_title, step_stats in (await db.execute(
+        select(Step.id, Step.order, Step.title, StepExecutionStats)
+        .outerjoin(StepExecutionStats, StepExecutionStats.step_id == Step.id)
+        .where(Step.procedure_id == procedure_id)
+        .order_by(Step.order)
+    )).all():
+        step = StepStats(step_id=step_id, order=order, title=step_title)
+        if step_stats is not None:
+            step.completed_count = step_stats.completed_count
+            step.skipped_count = step_stats.skipped_count
+            step.skip_rate = _ratio(step_stats.skipped_count, step_stats.completed_count + step_stats.skipped_count)
+            step.average_duration_seconds = _ratio(step_stats.total_duration_seconds, step_stats.timed_count)
+        steps.append(step)
+    
+    most_skipped = sorted(
+        (step for step in steps if step.skipped_count),
+        key=lambda step: (-step.skipped_count, -(step.skip_rate or 0), step.order)
+    )[:MOST_SKIPPED_LIMIT]
+    return ProcedureStats(
+        **_summary(procedure_id, title, stats),
+        median_duration_seconds=estimate_quantile(buckets, 0.5),
+        p90_duration_seconds=estimate_quantile(buckets, 0.9),
+        steps=steps,
+        most_skipped=most_skipped,
+    )
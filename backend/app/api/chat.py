@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import aclosing
 from typing import Optional, Dict, Any
 import json
-from app.core.database import get_db
-from app.core.dependencies import get_current_user
+from app.core.database import get_async_db
+from app.core.dependencies import get_current_user, get_current_admin
+from app.core.disconnect import ClientDisconnected, cancel_on_disconnect
 from app.models.user import User
 from app.models.chat import ChatMessage as ChatMessageModel
 from app.schemas.chat import ChatMessageCreate, ChatResponse
-from app.services.ai_service import AIService
+from app.services.ai_service import AIService, ChatStreamResult
+from app.services.chat_history import save_chat_message_later
+from app.services.response_cache import get_chat_response_cache
+from app.services.semantic_cache import get_semantic_cache
 
 router = APIRouter()
 ai_service = AIService()
@@ -17,17 +22,24 @@ ai_service = AIService()
 @router.post("/", response_model=ChatResponse)
 async def chat(
     chat_data: ChatMessageCreate,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Envoyer un message au chat IA"""
+    """
+    Envoyer un message au chat IA
+
+    Enregistrement par la session asynchrone, comme le chat streamé: un
+    commit synchrone bloquerait la boucle pendant l'attente du verrou SQLite
+    détenu par une écriture aiosqlite, qui ne pourrait plus se terminer.
+    """
     try:
-        # Obtenir la réponse de l'IA
-        response = await ai_service.get_chat_response(
+        # Obtenir la réponse de l'IA (abandonnée si le client se déconnecte)
+        response = await cancel_on_disconnect(request, ai_service.get_chat_response(
             message=chat_data.message,
             context=chat_data.context,
             user_id=current_user.id
-        )
+        ))
         
         # Sauvegarder le message
         db_message = ChatMessageModel(
@@ -37,10 +49,11 @@ async def chat(
             context=chat_data.context
         )
         db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
+        await db.commit()
         
         return ChatResponse(response=response, message_id=db_message.id)
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -48,37 +61,54 @@ async def chat(
 @router.post("/stream")
 async def chat_stream(
     chat_data: ChatMessageCreate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Chat IA avec streaming"""
+    """
+    Chat IA avec streaming
+
+    Le texte streamé est enregistré tel quel (partiel si le client se
+    déconnecte), avec l'usage et le temps au premier token, après la réponse.
+    """
+    result = ChatStreamResult(model=ai_service.model)
+    user_id = current_user.id
+
     async def generate():
         try:
-            async for chunk in ai_service.get_chat_response_stream(
-                message=chat_data.message,
-                context=chat_data.context,
-                user_id=current_user.id
-            ):
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
-            
-            # Sauvegarder le message après streaming
-            full_response = await ai_service.get_chat_response(
+            async with aclosing(ai_service.get_chat_response_stream(
                 message=chat_data.message,
                 context=chat_data.context,
-                user_id=current_user.id
-            )
-            
-            db_message = ChatMessageModel(
-                user_id=current_user.id,
-                message=chat_data.message,
-                response=full_response,
-                context=chat_data.context
-            )
-            db.add(db_message)
-            db.commit()
+                user_id=user_id,
+                result=result
+            )) as stream:
+                async for chunk in stream:
+                    yield f"data: {json.dumps({'content': chunk})}\n\n"
             
             yield "data: [DONE]\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            save_chat_message_later(user_id, chat_data.message, chat_data.context, result)
     
     return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+@router.get("/cache")
+async def chat_cache_stats(current_user: User = Depends(get_current_admin)):
+    """Statistiques du cache des réponses (hit rate, tokens et coût économisés)"""
+    cache = get_chat_response_cache()
+    semantic = get_semantic_cache()
+    return {
+        "enabled": cache is not None,
+        **(cache.stats() if cache is not None else {}),
+        "semantic": semantic.stats() if semantic is not None else None,
+    }
+
+
+@router.delete("/cache")
+async def clear_chat_cache(current_user: User = Depends(get_current_admin)):
+    """Vider les caches des réponses (exact: mémoire et disque; sémantique)"""
+    cache = get_chat_response_cache()
+    if cache is not None:
+        cache.clear()
+    semantic = get_semantic_cache()
+    if semantic is not None:
+        semantic.clear()
+    return {"cleared": cache is not None or semantic is not None}
@@ -1,25 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+from typing import List, Optional
+import json
+from app.core.database import get_async_db
 from app.core.dependencies import get_current_user
+from app.core.pagination import InvalidCursor, NEXT_CURSOR_HEADER, paginate_by_id_async
 from app.models.user import User
-from app.models.execution import Execution, StepExecution
+from app.models.execution import Execution, ExecutionStatus, StepExecution, StepSyncOperation
 from app.models.procedure import Procedure, Step
-from app.schemas.execution import Execution as ExecutionSchema, ExecutionCreate, StepExecution as StepExecutionSchema, StepExecutionCreate
+from app.schemas.execution import Execution as ExecutionSchema, ExecutionCreate, ExecutionSummary, StepExecution as StepExecutionSchema, StepExecutionCreate
+from app.schemas.execution import ExecutionSyncResponse, StepExecutionSyncRequest, StepExecutionSyncResult
+from app.services.execution_stats import ExecutionStatsDelta, load_previous_completion, seconds_between, step_duration, utc_naive
 
 router = APIRouter()
 
 
+async def load_execution(db: AsyncSession, execution_id: int):
+    """Exécution avec ses étapes (chargement explicite: pas de lazy loading en async)"""
+    return await db.scalar(
+        select(Execution)
+        .options(selectinload(Execution.step_executions))
+        .where(Execution.id == execution_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+@router.get("/", response_model=List[ExecutionSummary])
+async def get_executions(
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    procedure_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Historique des exécutions de l'utilisateur, plus récentes d'abord (pagination par curseur)"""
+    query = select(Execution).where(Execution.user_id == current_user.id)
+    
+    if status:
+        query = query.where(Execution.status == status)
+    
+    if procedure_id:
+        query = query.where(Execution.procedure_id == procedure_id)
+    
+    try:
+        executions, next_cursor = await paginate_by_id_async(db, query, Execution.id, cursor, limit, descending=True)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return executions
+
+
 @router.post("/", response_model=ExecutionSchema, status_code=status.HTTP_201_CREATED)
 async def create_execution(
     execution_data: ExecutionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Créer une nouvelle exécution de procédure"""
     # Vérifier que la procédure existe
-    procedure = db.query(Procedure).filter(Procedure.id == execution_data.procedure_id).first()
+    procedure = await db.get(Procedure, execution_data.procedure_id)
     if not procedure:
         raise HTTPException(status_code=404, detail="Procedure not found")
     
@@ -30,19 +76,21 @@ async def create_execution(
         current_step=execution_data.current_step or 0
     )
     db.add(db_execution)
-    db.commit()
-    db.refresh(db_execution)
-    return db_execution
+    stats = ExecutionStatsDelta()
+    stats.execution_started(execution_data.procedure_id)
+    await stats.flush(db)
+    await db.commit()
+    return await load_execution(db, db_execution.id)
 
 
 @router.get("/{execution_id}", response_model=ExecutionSchema)
 async def get_execution(
     execution_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir une exécution par ID"""
-    execution = db.query(Execution).filter(Execution.id == execution_id).first()
+    execution = await load_execution(db, execution_id)
     if not execution:
         raise HTTPException(status_code=404, detail="Execution not found")
     
@@ -56,34 +104,39 @@ async def get_execution(
 async def update_step_execution(
     execution_id: int,
     step_data: StepExecutionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Mettre à jour l'exécution d'une étape"""
-    execution = db.query(Execution).filter(Execution.id == execution_id).first()
+    execution = await db.get(Execution, execution_id)
     if not execution or execution.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Execution not found")
     
     # Vérifier que l'étape existe
-    step = db.query(Step).filter(Step.id == step_data.step_id).first()
+    step = await db.get(Step, step_data.step_id)
     if not step or step.procedure_id != execution.procedure_id:
         raise HTTPException(status_code=400, detail="Invalid step")
     
     # Chercher ou créer la step_execution
-    step_execution = db.query(StepExecution).filter(
+    step_execution = await db.scalar(select(StepExecution).where(
         StepExecution.execution_id == execution_id,
         StepExecution.step_id == step_data.step_id
-    ).first()
-    
-    import json
-    from datetime import datetime
+    ))
     
+    now = datetime.utcnow()
+    old_status, old_duration = (step_execution.status, step_execution.duration_seconds) if step_execution else (None, None)
+    duration = None
+    if step_data.status == "completed":
+        previous = await load_previous_completion(db, execution_id, step.id)
+        duration = step_duration(now, execution.started_at, [previous])
     if step_execution:
         step_execution.status = step_data.status
         step_execution.photos = json.dumps(step_data.photos) if step_data.photos else "[]"
         step_execution.comments = step_data.comments
+        step_execution.client_updated_at = now
+        step_execution.duration_seconds = duration
         if step_data.status == "completed":
-            step_execution.completed_at = datetime.utcnow()
+            step_execution.completed_at = now
     else:
         step_execution = StepExecution(
             execution_id=execution_id,
@@ -91,7 +144,9 @@ async def update_step_execution(
             status=step_data.status,
             photos=json.dumps(step_data.photos) if step_data.photos else "[]",
             comments=step_data.comments,
-            completed_at=datetime.utcnow() if step_data.status == "completed" else None
+            completed_at=now if step_data.status == "completed" else None,
+            client_updated_at=now,
+            duration_seconds=duration
         )
         db.add(step_execution)
     
@@ -99,27 +154,163 @@ async def update_step_execution(
     if step_data.status == "completed":
         execution.current_step = step.order + 1
     
-    db.commit()
-    db.refresh(step_execution)
+    stats = ExecutionStatsDelta()
+    stats.step_changed(execution.procedure_id, step.id, old_status, old_duration, step_data.status, duration)
+    await stats.flush(db)
+    await db.commit()
+    await db.refresh(step_execution)
     return step_execution
 
 
+@router.post("/{execution_id}/steps/sync", response_model=ExecutionSyncResponse)
+async def sync_step_executions(
+    execution_id: int,
+    sync_data: StepExecutionSyncRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Synchroniser un lot de mises à jour d'étapes faites hors ligne
+
+    Appliquées dans l'ordre du lot, en une transaction (tout ou rien). Une
+    clé d'idempotence déjà reçue n'est pas réappliquée (lot renvoyé après une
+    coupure); une mise à jour plus ancienne que la dernière appliquée à
+    l'étape (horodatages client) est ignorée. Requêtes: exécution, étapes du
+    lot, clés connues, état des étapes, puis écriture (executemany, statistiques
+    comprises) et état réconcilié, quelle que soit la taille du lot.
+    """
+    execution = await db.get(Execution, execution_id)
+    if not execution or execution.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    updates = sync_data.updates
+    # Toutes les étapes du lot vérifiées en une requête
+    step_ids = {update.step_id for update in updates}
+    step_orders = dict((await db.execute(
+        select(Step.id, Step.order).where(Step.id.in_(step_ids), Step.procedure_id == execution.procedure_id)
+    )).all()) if step_ids else {}
+    invalid = sorted(step_ids - step_orders.keys())
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid steps: {invalid}")
+    
+    keys = {update.idempotency_key for update in updates}
+    seen_keys = set((await db.scalars(select(StepSyncOperation.idempotency_key).where(
+        StepSyncOperation.execution_id == execution_id,
+        StepSyncOperation.idempotency_key.in_(keys)
+    ))).all()) if keys else set()
+    step_executions = {
+        step_execution.step_id: step_execution
+        for step_execution in (await db.scalars(
+            select(StepExecution).where(StepExecution.execution_id == execution_id)
+        )).all()
+    }
+    
+    # Validations connues de l'exécution: durée de chaque étape (depuis la précédente)
+    completions = {
+        step_id: utc_naive(step_execution.completed_at)
+        for step_id, step_execution in step_executions.items()
+        if step_execution.status == "completed" and step_execution.completed_at is not None
+    }
+    stats = ExecutionStatsDelta()
+    
+    # Nouvelles lignes (étapes jamais synchronisées, journal) écrites en un executemany chacune
+    # plutôt qu'un INSERT ... RETURNING par ligne
+    new_step_executions = {}
+    operations = []
+    results = []
+    for update in updates:
+        if update.idempotency_key in seen_keys:
+            results.append(StepExecutionSyncResult(
+                idempotency_key=update.idempotency_key, step_id=update.step_id, result="duplicate"
+            ))
+            continue
+        seen_keys.add(update.idempotency_key)
+        
+        client_updated_at = utc_naive(update.client_updated_at)
+        existing = step_executions.get(update.step_id)
+        if existing is not None:
+            last_update = utc_naive(existing.client_updated_at)
+        else:
+            last_update = new_step_executions.get(update.step_id, {}).get("client_updated_at")
+        if last_update is not None and client_updated_at < last_update:
+            result = "stale"
+        else:
+            result = "applied"
+            if existing is not None:
+                old_status, old_duration = existing.status, existing.duration_seconds
+            else:
+                pending = new_step_executions.get(update.step_id, {})
+                old_status, old_duration = pending.get("status"), pending.get("duration_seconds")
+            values = {
+                "status": update.status,
+                "photos": json.dumps(update.photos) if update.photos else "[]",
+                "comments": update.comments,
+                "client_updated_at": client_updated_at,
+                "duration_seconds": None,
+            }
+            completions.pop(update.step_id, None)
+            if update.status == "completed":
+                # Heure réelle de l'étape, pas celle de la synchronisation
+                values["completed_at"] = client_updated_at
+                values["duration_seconds"] = step_duration(client_updated_at, execution.started_at, completions.values())
+                completions[update.step_id] = client_updated_at
+                execution.current_step = step_orders[update.step_id] + 1
+            stats.step_changed(
+                execution.procedure_id, update.step_id, old_status, old_duration,
+                update.status, values["duration_seconds"]
+            )
+            if existing is not None:
+                for column, value in values.items():
+                    setattr(existing, column, value)
+            else:
+                new_step_executions.setdefault(update.step_id, {
+                    "execution_id": execution_id, "step_id": update.step_id, "completed_at": None
+                }).update(values)
+        
+        operations.append({
+            "execution_id": execution_id, "idempotency_key": update.idempotency_key,
+            "step_id": update.step_id, "result": result
+        })
+        results.append(StepExecutionSyncResult(
+            idempotency_key=update.idempotency_key, step_id=update.step_id, result=result
+        ))
+    
+    try:
+        if new_step_executions:
+            await db.execute(insert(StepExecution), list(new_step_executions.values()))
+        if operations:
+            await db.execute(insert(StepSyncOperation), operations)
+        await stats.flush(db)
+        await db.commit()
+    except IntegrityError:
+        # Même clé envoyée en parallèle par un autre appel: renvoyer le lot le résoudra en doublons
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Concurrent sync for this execution, retry")
+    
+    return ExecutionSyncResponse(execution=await load_execution(db, execution_id), results=results)
+
+
 @router.put("/{execution_id}/complete", response_model=ExecutionSchema)
 async def complete_execution(
     execution_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Marquer une exécution comme terminée"""
-    execution = db.query(Execution).filter(Execution.id == execution_id).first()
+    execution = await db.get(Execution, execution_id)
     if not execution or execution.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Execution not found")
     
-    from datetime import datetime
-    from app.models.execution import ExecutionStatus
+    stats = ExecutionStatsDelta()
+    if execution.status != ExecutionStatus.COMPLETED.value:
+        # Une exécution terminée deux fois n'est comptée qu'une fois
+        now = datetime.utcnow()
+        stats.execution_completed(execution.procedure_id, seconds_between(execution.started_at, now))
+    else:
+        now = execution.completed_at
     execution.status = ExecutionStatus.COMPLETED.value
-    execution.completed_at = datetime.utcnow()
+    execution.completed_at = now
     
-    db.commit()
-    db.refresh(execution)
-    return execution
+    await stats.flush(db)
+    await db.commit()
+    return await load_execution(db, execution_id)
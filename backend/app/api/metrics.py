@@ -0,0 +1,24 @@
+"""
+Métriques d'exploitation (format Prometheus), sans authentification comme /health
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import render_prometheus
+from app.core.pool_metrics import pool_snapshots
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Toutes les métriques enregistrées (latence par route et spans, pools de connexions, caches...)"""
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/metrics/pools")
+async def pool_metrics():
+    """État des pools de connexions en JSON (dimensionnement par worker)"""
+    return {"pools": pool_snapshots()}
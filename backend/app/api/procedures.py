@@ -1,41 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.core.database import get_async_db
 from app.core.dependencies import get_current_user, get_current_admin
+from app.core.pagination import InvalidCursor, NEXT_CURSOR_HEADER
 from app.models.user import User
-from app.models.procedure import Procedure, Step
-from app.schemas.procedure import Procedure as ProcedureSchema, ProcedureCreate, ProcedureUpdate, Step as StepSchema, StepCreate
+from app.models.procedure import Procedure
+from app.schemas.procedure import Procedure as ProcedureSchema, ProcedureCreate, ProcedureUpdate, ProcedureSummary, Step as StepSchema, StepCreate
+from app.services.fulltext_search import FullTextSearchService
+from app.services.procedure_service import ProcedureService
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[ProcedureSchema])
 async def get_procedures(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     category: str = None,
-    db: Session = Depends(get_db),
+    search: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtenir la liste des procédures"""
-    query = db.query(Procedure).filter(Procedure.is_active == 1)
-    
-    if category:
-        query = query.filter(Procedure.category == category)
-    
-    procedures = query.offset(skip).limit(limit).all()
+    """
+    Obtenir la liste des procédures
+
+    Pagination par curseur: repasser l'en-tête X-Next-Cursor dans `cursor`.
+    `skip` reste accepté (pagination par offset, coûteuse en profondeur).
+    Avec `search`, les résultats sont triés par pertinence et paginés par `skip`.
+    """
+    if search:
+        # Service plein texte synchrone, exécuté sur la connexion de la session async
+        hits = await db.run_sync(lambda session: FullTextSearchService(session).search(
+            search, ["procedure"], limit=limit, offset=skip, category=category
+        )["procedure"])
+        return await ProcedureService.get_procedures_by_ids(db, [hit["document_id"] for hit in hits])
+
+    if skip and not cursor:
+        return await ProcedureService.get_procedures(db, skip=skip, limit=limit, category=category)
+
+    try:
+        procedures, next_cursor = await ProcedureService.get_procedures_page(db, cursor=cursor, limit=limit, category=category)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return procedures
 
 
+@router.get("/summary", response_model=List[ProcedureSummary])
+async def get_procedure_summaries(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    category: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Liste légère des procédures (sans étapes), avec le nombre d'étapes; pagination par curseur"""
+    try:
+        rows, next_cursor = await ProcedureService.get_procedure_summaries(db, cursor=cursor, limit=limit, category=category)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [
+        ProcedureSummary.model_validate(procedure).model_copy(update={"step_count": step_count})
+        for procedure, step_count in rows
+    ]
+
+
 @router.get("/{procedure_id}", response_model=ProcedureSchema)
 async def get_procedure(
     procedure_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir une procédure par ID"""
-    procedure = db.query(Procedure).filter(Procedure.id == procedure_id).first()
+    procedure = await ProcedureService.get_procedure_by_id(db, procedure_id)
     if not procedure:
         raise HTTPException(status_code=404, detail="Procedure not found")
     return procedure
@@ -44,52 +88,42 @@ async def get_procedure(
 @router.post("/", response_model=ProcedureSchema, status_code=status.HTTP_201_CREATED)
 async def create_procedure(
     procedure_data: ProcedureCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
 ):
     """Créer une nouvelle procédure (Admin uniquement)"""
-    db_procedure = Procedure(
+    return await ProcedureService.create_procedure(
+        db,
         title=procedure_data.title,
         description=procedure_data.description,
         category=procedure_data.category,
         tags=procedure_data.tags or [],
         created_by=current_user.id,
-        flowchart_data=procedure_data.flowchart_data
+        flowchart_data=procedure_data.flowchart_data,
+        steps=[
+            {
+                "title": step_data.title,
+                "description": step_data.description,
+                "instructions": step_data.instructions,
+                "order": step_data.order,
+                "validation_type": step_data.validation_type or "manual",
+                "photos": step_data.photos or [],
+                "files": step_data.files or []
+            }
+            for step_data in procedure_data.steps or []
+        ]
     )
-    db.add(db_procedure)
-    db.flush()
-    
-    # Créer les étapes
-    if procedure_data.steps:
-        for step_data in sorted(procedure_data.steps, key=lambda x: x.order):
-            db_step = Step(
-                procedure_id=db_procedure.id,
-                title=step_data.title,
-                description=step_data.description,
-                instructions=step_data.instructions,
-                order=step_data.order,
-                validation_type=step_data.validation_type or "manual",
-                photos=step_data.photos or [],
-                files=step_data.files or []
-            )
-            db.add(db_step)
-    
-    db.commit()
-    db.refresh(db_procedure)
-    # Recharger avec les étapes
-    db_procedure = db.query(Procedure).filter(Procedure.id == db_procedure.id).first()
-    return db_procedure
 
 
 @router.put("/{procedure_id}", response_model=ProcedureSchema)
 async def update_procedure(
     procedure_id: int,
     procedure_data: ProcedureUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
 ):
     """Mettre à jour une procédure (Admin uniquement)"""
-    procedure = db.query(Procedure).filter(Procedure.id == procedure_id).first()
+    procedure = await db.get(Procedure, procedure_id)
     if not procedure:
         raise HTTPException(status_code=404, detail="Procedure not found")
     
@@ -97,22 +131,21 @@ async def update_procedure(
     for field, value in update_data.items():
         setattr(procedure, field, value)
     
-    db.commit()
-    db.refresh(procedure)
-    return procedure
+    await db.commit()
+    return await ProcedureService.get_procedure_by_id(db, procedure_id)
 
 
 @router.delete("/{procedure_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_procedure(
     procedure_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
 ):
     """Supprimer une procédure (Admin uniquement)"""
-    procedure = db.query(Procedure).filter(Procedure.id == procedure_id).first()
+    procedure = await db.get(Procedure, procedure_id)
     if not procedure:
         raise HTTPException(status_code=404, detail="Procedure not found")
     
     procedure.is_active = 0
-    db.commit()
+    await db.commit()
     return None
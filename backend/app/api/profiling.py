@@ -0,0 +1,63 @@
+"""
+Profilage des requêtes à la demande (administrateurs, PROFILING_ENABLED)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse, Response
+from app.core.config import settings
+from app.core.dependencies import get_current_admin
+from app.core.profiling import get_request_profiler
+from app.models.user import User
+from app.schemas.profiling import ProfileArmRequest, ProfilingStatus
+
+router = APIRouter()
+
+
+@router.get("/", response_model=ProfilingStatus)
+async def profiling_status(current_user: User = Depends(get_current_admin)):
+    """État du profileur et profils conservés"""
+    return get_request_profiler().status()
+
+
+@router.post("/arm", response_model=ProfilingStatus)
+async def arm_profiler(request: ProfileArmRequest, current_user: User = Depends(get_current_admin)):
+    """Profiler les prochaines requêtes d'un préfixe de chemin"""
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profilage désactivé (PROFILING_ENABLED=false)"
+        )
+    profiler = get_request_profiler()
+    profiler.arm(request.path_prefix, request.count, request.ttl_seconds)
+    return profiler.status()
+
+
+@router.delete("/arm", response_model=ProfilingStatus)
+async def disarm_profiler(current_user: User = Depends(get_current_admin)):
+    profiler = get_request_profiler()
+    profiler.disarm()
+    return profiler.status()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("text", pattern="^(text|raw)$"),
+    current_user: User = Depends(get_current_admin)
+):
+    """Rapport texte, ou fichier brut (format=raw: .html pyinstrument, .prof cProfile)"""
+    profile = get_request_profiler().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return PlainTextResponse(profile.report)
+    return Response(
+        profile.raw,
+        media_type=profile.raw_media_type,
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.{profile.raw_extension}"'}
+    )
+
+
+@router.delete("/profiles", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_profiles(current_user: User = Depends(get_current_admin)):
+    get_request_profiler().clear()
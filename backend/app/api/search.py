@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core.database import get_db
+from app.core.dependencies import get_current_user
+from app.core.logger import api_logger
+from app.models.user import User
+from app.schemas.search import HybridSearchResponse, SearchResponse
+from app.services.fulltext_search import FullTextSearchService
+from app.services.hybrid_search import HybridSearchService
+
+router = APIRouter()
+
+
+def parse_types(types: Optional[str]) -> Optional[List[str]]:
+    return [t.strip() for t in types.split(",") if t.strip()] if types else None
+
+
+@router.get("/", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = Query(None, description="Types séparés par des virgules (procedure,step,tip)"),
+    category: Optional[str] = None,
+    match_all: bool = True,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recherche plein texte classée, avec termes surlignés (HTML échappé, <mark>) et pagination"""
+    result = FullTextSearchService(db).search_page(
+        q, parse_types(types), page=page, page_size=page_size, match_all=match_all, category=category
+    )
+    return SearchResponse(query=q, **result)
+
+
+@router.get("/hybrid", response_model=HybridSearchResponse)
+async def hybrid_search(
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = Query(None, description="Types séparés par des virgules (procedure,tip)"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recherche hybride plein texte + sémantique (Reciprocal Rank Fusion)"""
+    result = await HybridSearchService(db).search(q, parse_types(types), limit=limit)
+
+    api_logger.debug("Recherche hybride", {"query": q, "results": len(result["results"]), "timings_ms": result["timings_ms"]})
+    return HybridSearchResponse(query=q, **result)
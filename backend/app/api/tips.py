@@ -1,47 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.dependencies import get_current_user, get_current_admin
+from app.core.pagination import InvalidCursor, NEXT_CURSOR_HEADER, paginate_by_id_async
 from app.models.user import User
 from app.models.tip import Tip
 from app.schemas.tip import Tip as TipSchema, TipCreate, TipUpdate
+from app.services.fulltext_search import FullTextSearchService
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[TipSchema])
 async def get_tips(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     category: Optional[str] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtenir la liste des tips"""
-    query = db.query(Tip)
+    """
+    Obtenir la liste des tips
+
+    Pagination par curseur (en-tête X-Next-Cursor), `skip` reste accepté.
+    Avec `search`, les résultats sont triés par pertinence et paginés par `skip`.
+    """
+    if search:
+        # Service plein texte synchrone, exécuté sur la connexion de la session async
+        hits = await db.run_sync(lambda session: FullTextSearchService(session).search(
+            search, ["tip"], limit=limit, offset=skip, category=category
+        )["tip"])
+        ids = [hit["document_id"] for hit in hits]
+        tips = {tip.id: tip for tip in (await db.scalars(select(Tip).where(Tip.id.in_(ids)))).all()}
+        return [tips[tip_id] for tip_id in ids if tip_id in tips]
+
+    query = select(Tip)
     
     if category:
-        query = query.filter(Tip.category == category)
+        query = query.where(Tip.category == category)
     
-    if search:
-        query = query.filter(
-            (Tip.title.contains(search)) | (Tip.content.contains(search))
-        )
+    if skip and not cursor:
+        return (await db.scalars(query.order_by(Tip.id).offset(skip).limit(limit))).all()
     
-    tips = query.offset(skip).limit(limit).all()
+    try:
+        tips, next_cursor = await paginate_by_id_async(db, query, Tip.id, cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return tips
 
 
 @router.get("/{tip_id}", response_model=TipSchema)
 async def get_tip(
     tip_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir un tip par ID"""
-    tip = db.query(Tip).filter(Tip.id == tip_id).first()
+    tip = await db.get(Tip, tip_id)
     if not tip:
         raise HTTPException(status_code=404, detail="Tip not found")
     return tip
@@ -50,7 +72,7 @@ async def get_tip(
 @router.post("/", response_model=TipSchema, status_code=status.HTTP_201_CREATED)
 async def create_tip(
     tip_data: TipCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
 ):
     """Créer un nouveau tip (Admin uniquement)"""
@@ -62,8 +84,8 @@ async def create_tip(
         created_by=current_user.id
     )
     db.add(db_tip)
-    db.commit()
-    db.refresh(db_tip)
+    await db.commit()
+    await db.refresh(db_tip)
     return db_tip
 
 
@@ -71,11 +93,11 @@ async def create_tip(
 async def update_tip(
     tip_id: int,
     tip_data: TipUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
 ):
     """Mettre à jour un tip (Admin uniquement)"""
-    tip = db.query(Tip).filter(Tip.id == tip_id).first()
+    tip = await db.get(Tip, tip_id)
     if not tip:
         raise HTTPException(status_code=404, detail="Tip not found")
     
@@ -83,22 +105,22 @@ async def update_tip(
     for field, value in update_data.items():
         setattr(tip, field, value)
     
-    db.commit()
-    db.refresh(tip)
+    await db.commit()
+    await db.refresh(tip)
     return tip
 
 
 @router.delete("/{tip_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_tip(
     tip_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
 ):
     """Supprimer un tip (Admin uniquement)"""
-    tip = db.query(Tip).filter(Tip.id == tip_id).first()
+    tip = await db.get(Tip, tip_id)
     if not tip:
         raise HTTPException(status_code=404, detail="Tip not found")
     
-    db.delete(tip)
-    db.commit()
+    await db.delete(tip)
+    await db.commit()
     return None
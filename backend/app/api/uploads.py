@@ -0,0 +1,89 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from starlette.datastructures import UploadFile
+from app.core.dependencies import get_current_user
+from app.core.upload import (
+    IMMUTABLE_CACHE_CONTROL, StoredUpload, check_content_length, delete_upload_file,
+    save_upload_stream, store_upload_file
+)
+from app.models.user import User
+from app.services.image_variants import VARIANTS, ensure_variant, generate_variants, is_image, resolve_source, source_hash
+
+router = APIRouter()
+
+# Enveloppe multipart (délimiteurs, en-têtes de la partie) tolérée au-delà de MAX_UPLOAD_SIZE
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+def _subfolder(filename: str) -> str:
+    return "photos" if is_image(filename) else "files"
+
+
+async def _stored(upload: StoredUpload) -> dict:
+    """Réponse d'un upload; pour une image, variantes générées dans un thread (refusée si illisible)"""
+    variants = None
+    if is_image(upload.path):
+        try:
+            variants = await asyncio.to_thread(generate_variants, upload.path, upload.sha256)
+        except Exception:
+            if not upload.deduplicated:
+                delete_upload_file(upload.path)
+            raise HTTPException(status_code=400, detail="Image illisible")
+    return {
+        "path": upload.path,
+        "url": upload.url,
+        "size": upload.size,
+        "sha256": upload.sha256,
+        "deduplicated": upload.deduplicated,
+        "variants": variants,
+    }
+
+
+@router.post("/")
+async def upload_file(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Envoyer un fichier (multipart, champ `file`)
+
+    Content-Length vérifié avant lecture du corps; le formulaire est analysé
+    ici plutôt que par un paramètre File(...) pour que ce contrôle passe avant.
+    """
+    check_content_length(request, overhead=MULTIPART_OVERHEAD)
+    async with request.form(max_files=1, max_fields=5) as form:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=400, detail="Champ 'file' manquant")
+        return await _stored(await store_upload_file(file, _subfolder(file.filename or "")))
+
+
+@router.put("/{filename}")
+async def upload_raw(filename: str, request: Request, current_user: User = Depends(get_current_user)):
+    """Envoyer un fichier brut (corps de la requête), écrit au fil de la réception"""
+    check_content_length(request)
+    return await _stored(await save_upload_stream(request.stream(), filename, _subfolder(filename)))
+
+
+@router.get("/{variant}/{path:path}")
+async def get_image_variant(variant: str, path: str, request: Request):
+    """
+    Variante réduite d'une photo (thumb, screen, vision)
+
+    Publique comme /uploads (balises <img>). Générée au premier accès pour
+    les photos antérieures aux variantes; ETag fort = empreinte de la source.
+    """
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail="Variante inconnue")
+    source = resolve_source(path)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Image introuvable")
+
+    sha256 = await asyncio.to_thread(source_hash, source)
+    headers = {"ETag": f'"{sha256}-{variant}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    try:
+        target = await asyncio.to_thread(ensure_variant, source, variant, sha256)
+    except Exception:
+        raise HTTPException(status_code=422, detail="Image illisible")
+    return FileResponse(target, media_type="image/jpeg", headers=headers)
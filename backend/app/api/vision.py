@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
+import asyncio
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
+from app.core.config import settings
+from app.core.disconnect import ClientDisconnected, cancel_on_disconnect
+from app.core.upload import too_large_exception
 from app.models.user import User
+from app.services.image_variants import render_variant
 from app.services.vision_service import VisionService
 
 router = APIRouter()
@@ -11,6 +16,7 @@ vision_service = VisionService()
 
 @router.post("/recognize")
 async def recognize_equipment(
+    request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -18,14 +24,23 @@ async def recognize_equipment(
     """Reconnaître un équipement via photo"""
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+        raise too_large_exception()
     
     try:
-        # Lire le fichier
-        image_data = await file.read()
+        # Variante « vision » (JPEG ≤ 1024 px) lue depuis le fichier temporaire, sans charger l'original
+        try:
+            image_data = await asyncio.to_thread(render_variant, file.file, "vision")
+        except Exception:
+            # Format non décodable par Pillow: envoyé tel quel
+            await file.seek(0)
+            image_data = await file.read()
         
         # Analyser avec OpenAI Vision
-        result = await vision_service.recognize_equipment(image_data)
+        result = await cancel_on_disconnect(request, vision_service.recognize_equipment(image_data))
         
         return result
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
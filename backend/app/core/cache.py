@@ -0,0 +1,243 @@
+"""
+Caches en mémoire (LRU + TTL, budget en octets optionnel) avec niveau disque SQLite optionnel
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Normaliser un texte pour une clé de cache (unicode, casse, espaces)"""
+    query = unicodedata.normalize("NFKC", query)
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def canonical_json(value: Any) -> str:
+    """JSON canonique (clés triées): deux dicts égaux donnent la même clé"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def json_size(value: Any) -> int:
+    """Taille approximative d'une valeur en octets (sa forme JSON UTF-8)"""
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class SQLiteCacheStore:
+    """
+    Niveau disque d'un cache: table clé/valeur JSON avec expiration
+
+    Le fichier peut être partagé entre plusieurs workers uvicorn (mode WAL).
+    """
+
+    def __init__(self, path: str, table: str = "cache"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=5)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Lire une valeur non expirée, None sinon"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """(valeur, expiration en secondes epoch ou None) si non expirée, None sinon"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Écrire une valeur (sérialisée en JSON)"""
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at)
+                )
+        except sqlite3.Error:
+            pass
+
+    def delete(self, key: str):
+        """Supprimer une entrée"""
+        try:
+            with self._connect() as conn:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def purge_expired(self) -> int:
+        """Supprimer les entrées expirées, retourne le nombre de lignes supprimées"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at < ?",
+                    (time.time(),)
+                )
+                return cursor.rowcount
+        except sqlite3.Error:
+            return 0
+
+    def clear(self):
+        """Vider la table"""
+        try:
+            with self._connect() as conn:
+                conn.execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error:
+            pass
+
+
+class TTLCache:
+    """
+    Cache LRU borné avec expiration, thread-safe
+
+    Si un `disk` est fourni, il sert de second niveau: un défaut en mémoire est
+    recherché sur disque, et chaque écriture est répercutée sur disque.
+
+    Avec `max_bytes`, les entrées les moins récemment utilisées sont aussi
+    évincées pour rester sous ce budget (taille mesurée par `sizeof`); une
+    valeur plus grande que le budget n'est gardée que sur disque.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        disk: Optional[SQLiteCacheStore] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = json_size
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Lire une valeur (None si absente ou expirée)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value, disk_expires_at = entry
+                # Remontée en mémoire avec le temps restant sur disque, pas un TTL neuf
+                ttl = self.ttl
+                if disk_expires_at is not None:
+                    remaining = disk_expires_at - time.time()
+                    ttl = min(ttl, remaining) if ttl else remaining
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, value, ttl)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        """Écrire une valeur en mémoire (et sur disque si configuré)"""
+        with self._lock:
+            self._store(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value, self.ttl)
+
+    def _store(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = ttl or self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = self.sizeof(value) if self.max_bytes else 0
+        self._remove(key)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        self._entries[key] = (value, expires_at, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def delete(self, key: str):
+        """Supprimer une entrée des deux niveaux"""
+        with self._lock:
+            self._remove(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        """Vider le cache et remettre les compteurs à zéro"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs de hits/misses"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
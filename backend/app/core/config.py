@@ -10,11 +10,22 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./app.db"
-    
+    ASYNC_DATABASE_URL: Optional[str] = None  # défaut: DATABASE_URL avec le driver async (asyncpg / aiosqlite)
+    # Pools (par worker et par engine: sync et async ont chacun le leur)
+    DB_POOL_SIZE: int = 5  # connexions permanentes
+    DB_MAX_OVERFLOW: int = 10  # connexions temporaires au-delà de DB_POOL_SIZE
+    DB_POOL_TIMEOUT: float = 30.0  # secondes d'attente d'une connexion libre avant erreur
+    DB_POOL_RECYCLE: int = 1800  # secondes; sous le délai d'inactivité du serveur/proxy
+    DB_POOL_PRE_PING: bool = True  # vérifier la connexion avant usage (coupures réseau, proxy)
+    DB_PGBOUNCER: Optional[bool] = None  # pgbouncer en mode transaction; None: port 6543 ou ?pgbouncer=true
+
     # Security
     SECRET_KEY: str = "change-me-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    AUTH_USER_CACHE_TTL: float = 30.0  # secondes de cache de l'utilisateur authentifié (0: désactivé)
+    AUTH_USER_CACHE_SIZE: int = 4096
+    AUTH_STATELESS_ROLES: bool = False  # get_current_admin lit la claim "role" du token, sans requête (valable jusqu'à expiration)
     
     # Ollama (IA locale)
     USE_LOCAL_AI: bool = True
@@ -34,6 +45,41 @@ class Settings(BaseSettings):
 
     # OpenAI (Vision)
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None  # serveur compatible OpenAI (proxy, tests); défaut: api.openai.com
+    OPENAI_TIMEOUT: float = 60.0  # secondes sans réponse (ou entre deux fragments streamés)
+    OPENAI_CONNECT_TIMEOUT: float = 5.0
+    OPENAI_MAX_RETRIES: int = 2
+    OPENAI_MAX_CONNECTIONS: int = 20  # pool HTTP partagé par worker
+    OPENAI_MAX_CONCURRENCY: int = 8  # appels chat/vision simultanés par worker (les autres attendent)
+    
+    # Chat: contexte documentaire (RAG) injecté dans le prompt système
+    CHAT_MAX_TOKENS: int = 1000  # tokens de réponse maximum
+    CHAT_RAG_ENABLED: bool = True  # procédure/étape en cours + passages proches de la question
+    CHAT_RAG_TOP_K: int = 3  # passages de la recherche vectorielle (0: procédure/étape seulement)
+    CHAT_RAG_THRESHOLD: float = 0.4  # similarité minimale des passages
+    CHAT_RAG_MAX_TOKENS: int = 1200  # budget du contexte injecté
+    
+    # Cache des réponses du chat
+    CHAT_CACHE_ENABLED: bool = True
+    CHAT_CACHE_SIZE: int = 1000  # réponses gardées en mémoire
+    CHAT_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # budget mémoire par worker
+    CHAT_CACHE_TTL: int = 24 * 3600  # secondes
+    CHAT_CACHE_PATH: Optional[str] = None  # ex: ./cache/chat_responses.db, partagé par les workers
+    # Cache sémantique: questions reformulées (un appel d'embeddings par question non servie par le cache exact)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # similarité cosinus minimale (voir scripts/eval_semantic_cache.py)
+    SEMANTIC_CACHE_SIZE: int = 2000
+    SEMANTIC_CACHE_TTL: int = 7 * 24 * 3600  # secondes
+    
+    # Recherche vectorielle
+    VECTOR_BACKEND: str = "auto"  # auto (pgvector si PostgreSQL, sinon local), pgvector, local
+    LOCAL_VECTOR_INDEX_PATH: Optional[str] = None  # défaut: à côté de la base SQLite (app.db → app_vectors/)
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_CACHE_SIZE: int = 2048  # Embeddings de requêtes gardés en mémoire
+    EMBEDDING_CACHE_TTL: int = 7 * 24 * 3600  # secondes
+    EMBEDDING_CACHE_PATH: Optional[str] = None  # ex: ./cache/query_embeddings.db pour survivre aux redémarrages
+    VECTOR_HNSW_EF_SEARCH: Optional[int] = None  # hnsw.ef_search (défaut pgvector: 40)
+    VECTOR_IVFFLAT_PROBES: Optional[int] = None  # ivfflat.probes (défaut pgvector: 1)
     
     # Smart Router
     ENABLE_SMART_ROUTING: bool = True
@@ -47,7 +93,24 @@ class Settings(BaseSettings):
     # File Upload
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # blocs lus/écrits (mémoire par upload en cours)
     ALLOWED_EXTENSIONS: set = {".jpg", ".jpeg", ".png", ".pdf", ".doc", ".docx"}
+
+    # Logs: file d'attente vidée par un thread dédié, fichiers JSON lines avec rotation par taille
+    LOG_DIR: str = "./logs"
+    LOG_LEVEL: str = "DEBUG"
+    LOG_CONSOLE_LEVEL: str = "INFO"
+    LOG_CONSOLE_FORMAT: str = "text"  # text (lisible) ou json (collecteur de logs)
+    LOG_MAX_BYTES: int = 20 * 1024 * 1024  # par fichier avant rotation
+    LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000  # au-delà (sortie bloquée), les enregistrements sont abandonnés et comptés
+
+    # Traçage: latence par route et spans (base, OpenAI, recherche vectorielle) sur /metrics et Server-Timing
+    TRACING_ENABLED: bool = True
+    # Profilage des requêtes à la demande (administrateurs, /api/profiling)
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0  # fraction des requêtes profilées au hasard, en plus des requêtes armées
+    PROFILING_MAX_PROFILES: int = 20  # derniers profils gardés en mémoire
     
     # CORS
     BACKEND_CORS_ORIGINS: Union[List[str], str] = ["http://localhost:3000", "http://localhost:3001", "http://localhost:8000"]
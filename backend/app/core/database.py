@@ -1,12 +1,94 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from typing import Optional
+from uuid import uuid4
+import threading
 from app.core.config import settings
+from app.core.pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument_engine
+from app.core.tracing import trace_queries
+
+# Port du pooler Supabase en mode transaction
+PGBOUNCER_PORT = 6543
+
+
+def uses_pgbouncer(url: str) -> bool:
+    """
+    Connexion via pgbouncer en mode transaction (DB_PGBOUNCER, sinon auto-détection)
+
+    Chaque transaction peut changer de connexion serveur: les requêtes préparées
+    nommées d'une connexion n'existent pas sur la suivante.
+    """
+    if settings.DB_PGBOUNCER is not None:
+        return settings.DB_PGBOUNCER
+    parsed = make_url(url)
+    if parsed.get_backend_name() not in ("postgresql", "postgres"):
+        return False
+    return str(parsed.query.get("pgbouncer", "")).lower() == "true" or parsed.port == PGBOUNCER_PORT
+
+
+def engine_url(url: str) -> str:
+    """URL passée au driver: sans le paramètre pgbouncer (convention Prisma, refusé par libpq)"""
+    parsed = make_url(url)
+    if "pgbouncer" not in parsed.query:
+        return url
+    return parsed.difference_update_query(["pgbouncer"]).render_as_string(hide_password=False)
+
+
+def pool_options(url: str, name: str, asynchronous: bool = False) -> dict:
+    """
+    Options de pool issues des réglages DB_POOL_* (pool instrumenté, voir /metrics)
+
+    SQLite en mémoire garde le pool par défaut (une seule connexion partagée).
+    """
+    parsed = make_url(url)
+    is_sqlite = parsed.get_backend_name() == "sqlite"
+    if is_sqlite and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncAdaptedQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        # Fichier local: ni coupure réseau ni proxy à détecter
+        "pool_pre_ping": settings.DB_POOL_PRE_PING and not is_sqlite,
+        "pool_logging_name": name,
+    }
+
+
+def connect_args(url: str) -> dict:
+    """Arguments du driver (SQLite multi-thread, pgbouncer sans requêtes préparées nommées)"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return {} if parsed.get_driver_name() == "aiosqlite" else {"check_same_thread": False}
+    if not uses_pgbouncer(url):
+        return {}
+
+    driver = parsed.get_driver_name()
+    if driver == "asyncpg":
+        return {
+            # Caches asyncpg et SQLAlchemy désactivés, noms uniques pour les
+            # requêtes préparées restantes (pas de collision entre clients)
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    if driver == "psycopg":
+        return {"prepare_threshold": None}
+    # psycopg2 n'utilise pas de requêtes préparées côté serveur
+    return {}
+
 
 engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    engine_url(settings.DATABASE_URL),
+    connect_args=connect_args(settings.DATABASE_URL),
+    **pool_options(settings.DATABASE_URL, "sync")
 )
+instrument_engine(engine, "sync")
+trace_queries(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -20,3 +102,70 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Couche asynchrone (asyncpg / aiosqlite): les routes async n'immobilisent plus
+# la boucle d'événements pendant les requêtes SQL
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+_async_lock = threading.Lock()
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """URL SQLAlchemy équivalente avec le driver asynchrone"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if parsed.drivername == ASYNC_DRIVERS.get(backend) or backend not in ASYNC_DRIVERS:
+        return url
+
+    parsed = parsed.set(drivername=ASYNC_DRIVERS[backend])
+    # asyncpg n'accepte pas sslmode (libpq): le traduire en ssl
+    if "sslmode" in parsed.query:
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed.render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine asynchrone, créé au premier usage"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        with _async_lock:
+            if _async_engine is None:
+                url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+                _async_engine = create_async_engine(
+                    engine_url(url), connect_args=connect_args(url), **pool_options(url, "async", asynchronous=True)
+                )
+                instrument_engine(_async_engine.sync_engine, "async")
+                trace_queries(_async_engine.sync_engine)
+                # expire_on_commit=False: pas de rechargement implicite (impossible en async)
+                # quand la réponse est sérialisée après le commit
+                _async_session_factory = async_sessionmaker(
+                    _async_engine, autoflush=False, expire_on_commit=False
+                )
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Nouvelle session asynchrone"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+async def dispose_async_engine():
+    """Fermer les connexions async (arrêt de l'application)"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
+async def get_async_db():
+    """Dependency pour obtenir une session asynchrone"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,43 +1,78 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.core.security import decode_access_token
+from app.core.user_cache import AuthenticatedUser, cache_user, get_cached_user
 from app.models.user import User, UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Obtenir l'utilisateur actuel depuis le token"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _decode_subject(token: str):
+    """Payload du token et ID de l'utilisateur ("sub")"""
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
-    user_id: int = payload.get("sub")
+    user_id = payload.get("sub")
     if user_id is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    
+    # La claim "sub" est une chaîne (JWT)
+    try:
+        return payload, int(user_id)
+    except (TypeError, ValueError):
+        raise _credentials_exception()
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> AuthenticatedUser:
+    """Obtenir l'utilisateur actuel depuis le token (cache court, voir app.core.user_cache)"""
+    payload, user_id = _decode_subject(token)
+    
+    cached = get_cached_user(user_id)
+    if cached is not None:
+        return cached
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
-    return user
+    current_user = cache_user(user)
+    # Fin de la lecture: la connexion retourne au pool au lieu de rester prise
+    # pendant toute la requête (appel au modèle, flux) alors que le contexte du
+    # chat en demande une autre (pool épuisé au démarrage, cache vide)
+    await db.rollback()
+    return current_user
 
 
 async def get_current_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> AuthenticatedUser:
     """Vérifier que l'utilisateur est un admin"""
+    if settings.AUTH_STATELESS_ROLES:
+        # Rôle signé dans le token: aucune requête (la session n'est jamais utilisée)
+        payload, user_id = _decode_subject(token)
+        if payload.get("role") not in {role.value for role in UserRole}:
+            raise _credentials_exception()
+        current_user = AuthenticatedUser.from_claims(user_id, payload)
+    else:
+        current_user = await get_current_user(token, db)
+    
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
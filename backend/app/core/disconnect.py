@@ -0,0 +1,32 @@
+"""
+Annulation du travail d'une requête quand le client se déconnecte
+
+Starlette annule déjà les réponses streamées; pour une réponse classique,
+le handler continuerait (et paierait l'appel à OpenAI) jusqu'au bout.
+"""
+
+import asyncio
+from typing import Awaitable, TypeVar
+from starlette.requests import Request
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """Le client a fermé la connexion avant la fin du traitement"""
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.25) -> T:
+    """Attendre `awaitable`, annulé si le client se déconnecte entre-temps"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
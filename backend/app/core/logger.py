@@ -1,82 +1,240 @@
 """
-Système de logging détaillé pour le débogage
+Système de logging structuré et non bloquant
+
+Les handlers de requêtes ne font aucune entrée/sortie: un enregistrement est
+placé dans une file (QueueHandler), un thread dédié (QueueListener) le met en
+forme et l'écrit. Le message n'est pas construit si le niveau est désactivé,
+et les données (extra_data) ne sont sérialisées que dans ce thread.
+
+Sorties:
+- fichier LOG_DIR/<logger>.jsonl, une ligne JSON par enregistrement, rotation
+  par taille (LOG_MAX_BYTES, LOG_BACKUP_COUNT)
+- console (LOG_CONSOLE_LEVEL): texte lisible ou JSON (LOG_CONSOLE_FORMAT)
+
+Chaque enregistrement porte l'identifiant de la requête en cours
+(X-Request-ID, voir app/core/request_context.py).
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
+import traceback
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from app.core.config import settings
+from app.core.metrics import MetricFamily, register_collector
+from app.core.request_context import get_request_id
+
+# Encodeur réutilisé (json.dumps en recrée un à chaque appel avec ces options)
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+TEXT_FORMAT = '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(request_id)s | %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement (données structurées dans "data")"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        # RotatingFileHandler met en forme deux fois (shouldRollover puis emit): une seule sérialisation
+        cached = record.__dict__.get("_json_line")
+        if cached is not None:
+            return cached
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + ".%03dZ" % record.msecs,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "source": f"{record.module}.{record.funcName}:{record.lineno}",
+        }
+        data = getattr(record, "data", None)
+        if data:
+            entry["data"] = data
+        if record.exc_info:
+            error = record.exc_info[1]
+            entry["exception"] = {
+                "type": type(error).__name__,
+                "message": str(error),
+                "traceback": "".join(traceback.format_exception(*record.exc_info)),
+            }
+        record._json_line = _json_encoder.encode(entry)
+        return record._json_line
+
+
+class TextFormatter(logging.Formatter):
+    """Format lisible (console), données ajoutées en fin de ligne"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT, datefmt='%Y-%m-%d %H:%M:%S')
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        # Avant la trace de l'exception, ajoutée ensuite par format()
+        text = super().formatMessage(record)
+        data = getattr(record, "data", None)
+        if data:
+            text += f" | Data: {data}"
+        return text
+
+
+class RequestContextFilter(logging.Filter):
+    """Identifiant de la requête en cours (lu dans le thread de l'appelant, avant la file)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = get_request_id()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler qui ne bloque jamais l'appelant
+
+    File pleine (sortie trop lente): l'enregistrement est abandonné et compté.
+    Pas de mise en forme ici (prepare): elle a lieu dans le thread d'écriture.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.addFilter(RequestContextFilter())
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener dont l'arrêt attend une place dans la file pleine (au lieu de lever queue.Full)"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class _LoggingPipeline:
+    """File et thread d'écriture partagés par tous les loggers"""
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.console = logging.StreamHandler(sys.stdout)
+        self.console.setLevel(settings.LOG_CONSOLE_LEVEL.upper())
+        self.console.setFormatter(JsonFormatter() if settings.LOG_CONSOLE_FORMAT == "json" else TextFormatter())
+        self.file_handlers: List[logging.Handler] = []
+        self.listener: Optional[_Listener] = _Listener(self.queue, self.console, respect_handler_level=True)
+        self.listener.start()
+
+    def add_file(self, name: str, log_dir: Optional[str] = None):
+        """Fichier JSON lines d'un logger (seuls ses enregistrements y sont écrits)"""
+        log_dir = Path(log_dir or settings.LOG_DIR)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_dir / f"{name}.jsonl",
+            maxBytes=settings.LOG_MAX_BYTES,
+            backupCount=settings.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+            delay=True,
+        )
+        file_handler.setFormatter(JsonFormatter())
+        file_handler.addFilter(logging.Filter(name))
+        self.file_handlers.append(file_handler)
+        if self.listener is not None:
+            # Tuple remplacé d'un bloc: lu par le thread d'écriture à chaque enregistrement
+            self.listener.handlers = (self.console, *self.file_handlers)
+
+    def stop(self):
+        """Vider la file et arrêter le thread (arrêt de l'application, atexit)"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        for file_handler in self.file_handlers:
+            file_handler.close()
+
+    def collect_metrics(self):
+        yield MetricFamily("app_log_queue_size", "gauge", "Enregistrements de log en attente d'écriture").add(self.queue.qsize())
+        yield MetricFamily(
+            "app_log_records_dropped", "counter", "Enregistrements de log abandonnés (file pleine)"
+        ).add(self.handler.dropped, suffix="_total")
+
+
+_pipeline: Optional[_LoggingPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_logging_pipeline() -> _LoggingPipeline:
+    """Pipeline unique, démarré au premier logger"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = _LoggingPipeline()
+                register_collector(_pipeline.collect_metrics)
+                atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def stop_logging():
+    """Écrire les enregistrements en attente (arrêt de l'application)"""
+    if _pipeline is not None:
+        _pipeline.stop()
+
 
 class DetailedLogger:
-    """Logger détaillé avec fichiers et console"""
-    
-    def __init__(self, name: str, log_dir: str = "./logs"):
+    """Logger structuré: message + données, écrit hors du thread appelant"""
+
+    def __init__(self, name: str, log_dir: Optional[str] = None):
         self.name = name
-        self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(exist_ok=True)
-        
-        # Créer le logger
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
-        
-        # Formatter détaillé
-        detailed_formatter = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
-        # Handler fichier avec rotation
-        file_handler = logging.FileHandler(
-            self.log_dir / f"{name}_{datetime.now().strftime('%Y%m%d')}.log",
-            encoding='utf-8'
-        )
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(detailed_formatter)
-        
-        # Handler console
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(detailed_formatter)
-        
-        # Ajouter les handlers
+        self.logger.setLevel(settings.LOG_LEVEL.upper())
+        # La file seulement: pas de doublon via le logger racine
+        self.logger.propagate = False
+
+        pipeline = get_logging_pipeline()
         if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
-            self.logger.addHandler(console_handler)
-    
+            self.logger.addHandler(pipeline.handler)
+            pipeline.add_file(name, log_dir)
+
+    def _log(self, level: int, message: str, error: Optional[Exception], extra_data: Optional[dict]):
+        # Rien n'est construit si le niveau est désactivé
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(
+            level,
+            message,
+            # Copie: le dict peut être modifié par l'appelant avant l'écriture
+            extra={"data": dict(extra_data) if extra_data else None},
+            exc_info=(type(error), error, error.__traceback__) if error is not None else None,
+            stacklevel=3,
+        )
+
     def debug(self, message: str, extra_data: Optional[dict] = None):
         """Log niveau debug"""
-        if extra_data:
-            message += f" | Data: {extra_data}"
-        self.logger.debug(message)
-    
+        self._log(logging.DEBUG, message, None, extra_data)
+
     def info(self, message: str, extra_data: Optional[dict] = None):
         """Log niveau info"""
-        if extra_data:
-            message += f" | Data: {extra_data}"
-        self.logger.info(message)
-    
+        self._log(logging.INFO, message, None, extra_data)
+
     def warning(self, message: str, extra_data: Optional[dict] = None):
         """Log niveau warning"""
-        if extra_data:
-            message += f" | Data: {extra_data}"
-        self.logger.warning(message)
-    
+        self._log(logging.WARNING, message, None, extra_data)
+
     def error(self, message: str, error: Optional[Exception] = None, extra_data: Optional[dict] = None):
         """Log niveau error avec exception"""
-        if error:
-            message += f" | Exception: {type(error).__name__}: {str(error)}"
-        if extra_data:
-            message += f" | Data: {extra_data}"
-        self.logger.error(message, exc_info=error is not None)
-    
+        self._log(logging.ERROR, message, error, extra_data)
+
     def critical(self, message: str, error: Optional[Exception] = None, extra_data: Optional[dict] = None):
         """Log niveau critical"""
-        if error:
-            message += f" | Exception: {type(error).__name__}: {str(error)}"
-        if extra_data:
-            message += f" | Data: {extra_data}"
-        self.logger.critical(message, exc_info=error is not None)
+        self._log(logging.CRITICAL, message, error, extra_data)
 
 # Loggers globaux
 app_logger = DetailedLogger("app")
@@ -0,0 +1,119 @@
+"""
+Métriques de l'application au format d'exposition Prometheus (texte)
+
+Les modules enregistrent un collecteur (fonction sans argument retournant des
+MetricFamily); /metrics les interroge à chaque lecture.
+"""
+
+import bisect
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Dict[str, str]
+
+# Durées en secondes
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+@dataclass
+class MetricFamily:
+    """Une métrique et ses échantillons: [(suffixe, labels, valeur)]"""
+    name: str
+    kind: str  # counter, gauge, histogram
+    help: str
+    samples: List[Tuple[str, Labels, float]] = field(default_factory=list)
+
+    def add(self, value: float, labels: Optional[Labels] = None, suffix: str = ""):
+        self.samples.append((suffix, labels or {}, value))
+        return self
+
+
+class Histogram:
+    """Histogramme cumulatif thread-safe (buckets Prometheus)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def max(self) -> float:
+        return self._max
+
+    def add_to(self, family: MetricFamily, labels: Optional[Labels] = None):
+        """Ajouter les échantillons _bucket/_sum/_count à une famille"""
+        labels = labels or {}
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            family.add(cumulative, {**labels, "le": _format_value(bound)}, "_bucket")
+        family.add(total, labels, "_sum")
+        family.add(cumulative, labels, "_count")
+        return family
+
+
+_collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+_collectors_lock = threading.Lock()
+
+
+def register_collector(collector: Callable[[], Iterable[MetricFamily]]):
+    """Ajouter un collecteur interrogé à chaque lecture de /metrics"""
+    with _collectors_lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+    return collector
+
+
+def collect() -> List[MetricFamily]:
+    with _collectors_lock:
+        collectors = list(_collectors)
+    return [family for collector in collectors for family in collector()]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(families: Optional[List[MetricFamily]] = None) -> str:
+    """Format d'exposition texte Prometheus 0.0.4"""
+    lines = []
+    for family in collect() if families is None else families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for suffix, labels, value in family.samples:
+            lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
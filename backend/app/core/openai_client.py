@@ -0,0 +1,72 @@
+"""
+Client OpenAI asynchrone partagé
+
+Un seul AsyncOpenAI par processus (et par boucle d'événements): un pool de
+connexions HTTP commun, des timeouts explicites et un nombre borné d'appels
+simultanés, pour qu'une complétion lente n'immobilise ni le worker ni le quota.
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+import httpx
+from openai import AsyncOpenAI
+from app.core.config import settings
+
+_client: Optional[AsyncOpenAI] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_lock = threading.Lock()
+
+
+def openai_timeout() -> httpx.Timeout:
+    """Connexion courte; lecture = délai maximal entre deux fragments (streaming compris)"""
+    return httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Client de la boucle courante, créé au premier usage
+
+    Les connexions httpx sont liées à leur boucle: une nouvelle boucle
+    (tests, scripts) obtient son propre client.
+    """
+    global _client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        with _lock:
+            if _client is None or _client_loop is not loop:
+                http_client = httpx.AsyncClient(
+                    timeout=openai_timeout(),
+                    limits=httpx.Limits(
+                        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS
+                    )
+                )
+                _client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    base_url=settings.OPENAI_BASE_URL,
+                    timeout=openai_timeout(),
+                    max_retries=settings.OPENAI_MAX_RETRIES,
+                    http_client=http_client
+                )
+                _client_loop = loop
+                _semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+    return _client
+
+
+@asynccontextmanager
+async def openai_slot():
+    """Réserver une place parmi les OPENAI_MAX_CONCURRENCY appels simultanés"""
+    get_async_openai_client()
+    async with _semaphore:
+        yield
+
+
+async def close_openai_client():
+    """Fermer le pool HTTP (arrêt de l'application)"""
+    global _client, _client_loop, _semaphore
+    client, _client, _client_loop, _semaphore = _client, None, None, None
+    if client is not None:
+        await client.close()
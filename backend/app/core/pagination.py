@@ -0,0 +1,96 @@
+"""
+Pagination par curseur (keyset) sur la clé primaire
+
+Contrairement à offset(skip), le coût d'une page ne dépend pas de sa
+profondeur et une insertion concurrente ne décale pas les pages suivantes.
+Le curseur est opaque pour le client: il est renvoyé dans l'en-tête
+X-Next-Cursor et repassé tel quel en paramètre `cursor`.
+"""
+
+from typing import Any, Callable, List, Optional, Tuple
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+import base64
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou falsifié"""
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Curseur invalide: {cursor}") from e
+    if not isinstance(last_id, int):
+        raise InvalidCursor(f"Curseur invalide: {cursor}")
+    return last_id
+
+
+def paginate_by_id(
+    query: Query,
+    id_column: Any,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    id_of: Optional[Callable[[Any], int]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Une page de `query` triée sur `id_column`, à partir de `cursor`
+
+    Args:
+        id_of: extraire l'id d'un élément (défaut: attribut du même nom que la colonne)
+
+    Returns:
+        (éléments, curseur de la page suivante ou None si c'est la dernière)
+    """
+    items = _page_query(query, id_column, cursor, limit, descending).all()
+    return _split_page(items, limit, id_column, id_of)
+
+
+async def paginate_by_id_async(
+    db: AsyncSession,
+    statement: Select,
+    id_column: Any,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    id_of: Optional[Callable[[Any], int]] = None,
+    scalars: bool = True
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Variante asynchrone de paginate_by_id pour un select()
+
+    Args:
+        scalars: une entité par ligne (sinon les lignes complètes sont retournées)
+    """
+    result = await db.execute(_page_query(statement, id_column, cursor, limit, descending))
+    items = list(result.scalars().all() if scalars else result.all())
+    return _split_page(items, limit, id_column, id_of)
+
+
+def _page_query(query, id_column, cursor, limit, descending):
+    """Filtre du curseur, tri sur la clé, une ligne de plus pour savoir s'il reste une page"""
+    if cursor:
+        last_id = decode_cursor(cursor)
+        query = query.filter(id_column < last_id if descending else id_column > last_id)
+    order = id_column.desc() if descending else id_column.asc()
+    return query.order_by(order).limit(limit + 1)
+
+
+def _split_page(items, limit, id_column, id_of):
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(id_of(last) if id_of else getattr(last, id_column.key))
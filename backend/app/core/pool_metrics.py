@@ -0,0 +1,167 @@
+"""
+Instrumentation des pools de connexions SQLAlchemy
+
+- compteurs: ouvertures, checkouts, checkins, invalidations, timeouts
+- histogramme du temps d'obtention d'une connexion (attente + ouverture éventuelle)
+- jauges lues à chaque collecte: taille, connexions prêtées, overflow, libres
+
+Les pools instrumentés retrouvent leurs métriques par leur nom de journalisation
+(pool_logging_name), conservé quand l'engine recrée son pool (dispose()).
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.metrics import Histogram, MetricFamily, register_collector
+
+# Attentes de connexion: de la milliseconde au timeout par défaut (30 s)
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolMetrics:
+    """Compteurs d'un pool (thread-safe)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine: Optional[Engine] = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+        self._lock = threading.Lock()
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def state(self) -> Dict[str, Optional[int]]:
+        """Jauges du pool courant (None si le pool ne les fournit pas, ex: StaticPool)"""
+        pool = self.engine.pool if self.engine is not None else None
+        gauges = {}
+        for gauge in ("size", "checkedout", "overflow", "checkedin"):
+            method = getattr(pool, gauge, None)
+            gauges[gauge] = method() if callable(method) else None
+        if isinstance(pool, QueuePool):
+            gauges["max_overflow"] = pool._max_overflow
+        return gauges
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "pool": self.name,
+            "class": type(self.engine.pool).__name__ if self.engine is not None else None,
+            **self.state(),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait_count": self.wait.count,
+            "wait_seconds_total": round(self.wait.sum, 6),
+            "wait_seconds_max": round(self.wait.max, 6),
+        }
+
+
+_pools: Dict[str, PoolMetrics] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = PoolMetrics(name)
+        return _pools[name]
+
+
+def pool_snapshots():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [metrics.snapshot() for metrics in pools]
+
+
+class _TimedCheckoutMixin:
+    """Mesurer _do_get(): attente d'une connexion libre et ouverture des nouvelles"""
+
+    def _do_get(self):
+        metrics = get_pool_metrics(self._orig_logging_name or "default")
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            metrics.increment("timeouts")
+            metrics.wait.observe(time.perf_counter() - started)
+            raise
+        metrics.wait.observe(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine: Engine, name: str) -> PoolMetrics:
+    """Compter les événements du pool de l'engine (engine async: engine.sync_engine)"""
+    metrics = get_pool_metrics(name)
+    metrics.engine = engine
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.increment("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.increment("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidations")
+
+    return metrics
+
+
+@register_collector
+def collect_pool_metrics() -> Iterable[MetricFamily]:
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    gauges = {
+        "size": MetricFamily("db_pool_size", "gauge", "Connexions permanentes du pool (pool_size)"),
+        "checkedout": MetricFamily("db_pool_checked_out", "gauge", "Connexions actuellement prêtées"),
+        "overflow": MetricFamily("db_pool_overflow", "gauge", "Connexions ouvertes au-delà de pool_size (négatif: places restantes)"),
+        "checkedin": MetricFamily("db_pool_checked_in", "gauge", "Connexions ouvertes et libres"),
+        "max_overflow": MetricFamily("db_pool_max_overflow", "gauge", "Overflow maximal autorisé (max_overflow)"),
+    }
+    counters = {
+        "connects": MetricFamily("db_pool_connects_total", "counter", "Connexions ouvertes"),
+        "checkouts": MetricFamily("db_pool_checkouts_total", "counter", "Connexions prêtées"),
+        "checkins": MetricFamily("db_pool_checkins_total", "counter", "Connexions rendues"),
+        "invalidations": MetricFamily("db_pool_invalidations_total", "counter", "Connexions invalidées"),
+        "timeouts": MetricFamily("db_pool_timeouts_total", "counter", "Attentes ayant dépassé pool_timeout"),
+    }
+    wait = MetricFamily(
+        "db_pool_checkout_wait_seconds", "histogram",
+        "Temps d'obtention d'une connexion (attente d'une place + ouverture)"
+    )
+
+    for metrics in pools:
+        labels = {"pool": metrics.name}
+        for gauge, value in metrics.state().items():
+            if value is not None:
+                gauges[gauge].add(value, labels)
+        for counter, family in counters.items():
+            family.add(getattr(metrics, counter), labels)
+        metrics.wait.add_to(wait, labels)
+
+    return [*gauges.values(), *counters.values(), wait]
@@ -0,0 +1,225 @@
+"""
+Profilage des requêtes à la demande (administrateurs, opt-in)
+
+Désactivé par défaut (PROFILING_ENABLED). Un administrateur arme le
+profileur pour les N prochaines requêtes d'un préfixe de chemin
+(POST /api/profiling/arm); PROFILING_SAMPLE_RATE en profile en plus une
+fraction au hasard. Une seule requête profilée à la fois, les autres
+passent sans surcoût. Les derniers profils (PROFILING_MAX_PROFILES) sont
+gardés en mémoire: rapport texte, ou fichier brut (.html pyinstrument,
+.prof cProfile pour pstats/snakeviz).
+
+pyinstrument (échantillonnage, pile async attribuée à la requête) est
+utilisé s'il est installé. Sinon cProfile (déterministe, plus coûteux):
+sur la boucle d'événements, il compte aussi les autres requêtes traitées
+pendant celle profilée, et ne voit pas les threads (asyncio.to_thread).
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+from starlette.types import Scope
+from app.core.config import settings
+from app.core.request_context import get_request_id
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+# Jamais profilés: consultation des profils et des métriques
+EXCLUDED_PREFIXES = ("/api/profiling", "/metrics")
+# Lignes du rapport cProfile (tri par temps cumulé)
+CPROFILE_REPORT_LINES = 60
+
+
+@dataclass
+class RequestProfile:
+    """Profil d'une requête terminée"""
+    id: str
+    created_at: datetime
+    method: str
+    path: str
+    route: str
+    status: int
+    duration_ms: float
+    request_id: Optional[str]
+    engine: str  # pyinstrument ou cProfile
+    report: str
+    raw: bytes = field(repr=False)
+    raw_media_type: str = "application/octet-stream"
+    raw_extension: str = "prof"
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "created_at": self.created_at,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "request_id": self.request_id,
+            "engine": self.engine,
+        }
+
+
+class _Session:
+    """Profileur démarré pour une requête"""
+
+    def __init__(self):
+        if PYINSTRUMENT_AVAILABLE:
+            self.engine = "pyinstrument"
+            self.profiler = PyinstrumentProfiler(async_mode="enabled")
+        else:
+            self.engine = "cProfile"
+            self.profiler = cProfile.Profile()
+        self.request_id = get_request_id()
+
+    def start(self):
+        if self.engine == "pyinstrument":
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self) -> dict:
+        """Rapport texte et fichier brut"""
+        if self.engine == "pyinstrument":
+            self.profiler.stop()
+            return {
+                "report": self.profiler.output_text(unicode=True, color=False),
+                "raw": self.profiler.output_html().encode("utf-8"),
+                "raw_media_type": "text/html; charset=utf-8",
+                "raw_extension": "html",
+            }
+        self.profiler.disable()
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        # Format de pstats.Stats.dump_stats (lisible par pstats.Stats(fichier), snakeviz), avant le tri
+        raw = marshal.dumps(stats.stats)
+        stats.sort_stats("cumulative").print_stats(CPROFILE_REPORT_LINES)
+        return {"report": stream.getvalue(), "raw": raw}
+
+
+class RequestProfiler:
+    """Choix des requêtes profilées et profils conservés (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = False
+        self.path_prefix: Optional[str] = None
+        self.remaining = 0
+        self.expires_at: Optional[datetime] = None
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+
+    @property
+    def engine(self) -> str:
+        return "pyinstrument" if PYINSTRUMENT_AVAILABLE else "cProfile"
+
+    def arm(self, path_prefix: str, count: int, ttl_seconds: int):
+        """Profiler les `count` prochaines requêtes dont le chemin commence par `path_prefix`"""
+        with self._lock:
+            self.path_prefix = path_prefix
+            self.remaining = count
+            self.expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+
+    def disarm(self):
+        with self._lock:
+            self.path_prefix, self.remaining, self.expires_at = None, 0, None
+
+    def status(self) -> dict:
+        with self._lock:
+            armed = bool(self.remaining) and self.expires_at is not None and self.expires_at > datetime.utcnow()
+            return {
+                "enabled": settings.PROFILING_ENABLED,
+                "engine": self.engine,
+                "sample_rate": settings.PROFILING_SAMPLE_RATE,
+                "armed_path_prefix": self.path_prefix if armed else None,
+                "armed_remaining": self.remaining if armed else 0,
+                "armed_expires_at": self.expires_at if armed else None,
+                "profiles": [profile.summary() for profile in reversed(self._profiles.values())],
+            }
+
+    def start(self, scope: Scope) -> Optional[_Session]:
+        """Profileur démarré si la requête doit être profilée, None sinon (cas courant: aucun coût)"""
+        if not settings.PROFILING_ENABLED:
+            return None
+        path = scope.get("path", "")
+        if path.startswith(EXCLUDED_PREFIXES):
+            return None
+        with self._lock:
+            if self._active:
+                return None
+            armed = (
+                self.remaining > 0 and self.expires_at is not None and self.expires_at > datetime.utcnow()
+                and path.startswith(self.path_prefix or "/")
+            )
+            if armed:
+                self.remaining -= 1
+            elif not (settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE):
+                return None
+            self._active = True
+        try:
+            session = _Session()
+            session.start()
+        except Exception:
+            # Autre profileur actif (sys.setprofile, débogueur)
+            with self._lock:
+                self._active = False
+            return None
+        return session
+
+    def finish(self, session: _Session, scope: Scope, route: str, status: int, duration: float):
+        """Arrêter le profileur et conserver le profil"""
+        try:
+            output = session.stop()
+        finally:
+            with self._lock:
+                self._active = False
+        profile = RequestProfile(
+            id=uuid.uuid4().hex[:12],
+            created_at=datetime.utcnow(),
+            method=scope.get("method", ""),
+            path=scope.get("path", ""),
+            route=route,
+            status=status,
+            duration_ms=round(duration * 1000, 2),
+            request_id=session.request_id,
+            engine=session.engine,
+            **output,
+        )
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > settings.PROFILING_MAX_PROFILES:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+_request_profiler: Optional[RequestProfiler] = None
+_request_profiler_lock = threading.Lock()
+
+
+def get_request_profiler() -> RequestProfiler:
+    """Profileur partagé par le processus"""
+    global _request_profiler
+    if _request_profiler is None:
+        with _request_profiler_lock:
+            if _request_profiler is None:
+                _request_profiler = RequestProfiler()
+    return _request_profiler
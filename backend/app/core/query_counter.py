@@ -0,0 +1,52 @@
+"""
+Comptage des requêtes SQL, pour détecter les régressions N+1
+
+    with QueryCounter(engine, get_async_engine().sync_engine) as counter:
+        client.get("/api/procedures/")
+    assert counter.count <= 3, counter.report()
+"""
+
+from typing import List
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Un appel a exécuté plus de requêtes que son budget"""
+
+
+class QueryCounter:
+    """Context manager comptant les requêtes exécutées sur un ou plusieurs engines"""
+
+    def __init__(self, *engines: Engine):
+        self.engines = engines
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        self.statements = []
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    def report(self) -> str:
+        """Liste numérotée des requêtes (première ligne de chacune)"""
+        lines = [f"{self.count} requête(s):"]
+        for i, statement in enumerate(self.statements, start=1):
+            lines.append(f"  {i:>3}. {' '.join(statement.split())[:160]}")
+        return "\n".join(lines)
+
+    def assert_max(self, budget: int, label: str = ""):
+        """Lever QueryBudgetExceeded si le budget est dépassé"""
+        if self.count > budget:
+            raise QueryBudgetExceeded(f"{label or 'Appel'}: {self.count} requêtes > budget {budget}\n{self.report()}")
@@ -0,0 +1,58 @@
+"""
+Identifiant de corrélation des requêtes (X-Request-ID)
+
+Repris du client ou du proxy s'il est valide, généré sinon; renvoyé dans la
+réponse et porté par chaque log émis pendant la requête (contextvars: suit
+les tâches asyncio et asyncio.to_thread).
+"""
+
+import re
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Valeur reçue acceptée telle quelle: courte, sans caractère de contrôle (injection dans les logs).
+# fullmatch: avec ^…$, "abc\n" passerait ($ accepte un saut de ligne final)
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    """Identifiant de la requête en cours (None hors requête)"""
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """Middleware ASGI: identifiant de corrélation par requête HTTP"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = REQUEST_ID_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == self.header:
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.fullmatch(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,239 @@
+"""
+Traçage de la latence des requêtes
+
+- TracingMiddleware (ASGI): durée de chaque requête par route (gabarit du
+  chemin, pas le chemin réel: cardinalité bornée), méthode et statut
+- span(name) / traced(name): temps passé dans une portion de code (OpenAI,
+  recherche vectorielle...), histogramme par nom de span
+- trace_queries(engine): span "db" autour de chaque requête SQL
+
+Les spans d'une requête sont cumulés (contextvars: suivent les tâches
+asyncio et asyncio.to_thread), résumés dans l'en-tête Server-Timing (durées
+au début de la réponse; un flux continue ensuite) et cumulés par route
+(http_request_span_seconds_total): part de la base, d'OpenAI... dans chaque
+route. Les spans sont inclusifs et peuvent se chevaucher (requêtes SQL
+d'une recherche vectorielle comptées dans "db" et "vector_search"); le
+reste de la durée est le code de l'application (validation, sérialisation).
+"""
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.metrics import Histogram, MetricFamily, register_collector
+from app.core.profiling import get_request_profiler
+
+SERVER_TIMING_HEADER = "Server-Timing"
+# Requêtes sans route (404, méthodes inconnues): un seul label
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestTrace:
+    """Spans cumulés d'une requête: nom -> [nombre, secondes] (partagé avec ses threads)"""
+
+    def __init__(self):
+        self.spans: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+
+    def snapshot(self) -> Dict[str, Tuple[int, float]]:
+        with self._lock:
+            return {name: (int(count), seconds) for name, (count, seconds) in self.spans.items()}
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+_lock = threading.Lock()
+_route_latency: Dict[Tuple[str, str, str], Histogram] = {}
+_span_latency: Dict[str, Histogram] = {}
+_route_spans: Dict[Tuple[str, str], List[float]] = {}
+_in_progress = 0
+
+
+def get_current_trace() -> Optional[RequestTrace]:
+    """Spans de la requête en cours (None hors requête ou traçage désactivé)"""
+    return _current_trace.get()
+
+
+def record_span(name: str, seconds: float):
+    """Ajouter une durée au span `name` (histogramme global et requête en cours)"""
+    if not settings.TRACING_ENABLED:
+        return
+    histogram = _span_latency.get(name)
+    if histogram is None:
+        with _lock:
+            histogram = _span_latency.setdefault(name, Histogram())
+    histogram.observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Mesurer le bloc (exceptions comprises)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def traced(name: str):
+    """Décorateur: span autour d'une fonction ou d'une coroutine"""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_queries(engine: Engine):
+    """Span "db" autour de chaque requête SQL (engine async: engine.sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._tracing_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_tracing_started", None)
+        if started is not None:
+            record_span("db", time.perf_counter() - started)
+
+
+def route_label(scope: Scope, root_path: str = "") -> str:
+    """Gabarit de la route (/api/procedures/{procedure_id}), montage (/uploads/{path}) ou <unmatched>"""
+    route = scope.get("route")
+    path = getattr(route, "path_format", None)
+    if path:
+        return path
+    mounted = scope.get("root_path", "")
+    if mounted != root_path:
+        return f"{mounted[len(root_path):]}/{{path}}"
+    return UNMATCHED_ROUTE
+
+
+def server_timing(trace: RequestTrace, total_seconds: float) -> str:
+    """Valeur de l'en-tête Server-Timing (millisecondes, nombre d'appels en description)"""
+    entries = [
+        f'{name};dur={seconds * 1000:.2f};desc="{count}x"'
+        for name, (count, seconds) in sorted(trace.snapshot().items())
+    ]
+    entries.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def _observe_request(method: str, route: str, status: int, seconds: float, trace: RequestTrace):
+    key = (method, route, str(status))
+    with _lock:
+        histogram = _route_latency.get(key)
+        if histogram is None:
+            histogram = _route_latency[key] = Histogram()
+        for name, (count, span_seconds) in trace.snapshot().items():
+            totals = _route_spans.setdefault((route, name), [0, 0.0])
+            totals[0] += count
+            totals[1] += span_seconds
+    histogram.observe(seconds)
+
+
+class TracingMiddleware:
+    """Middleware ASGI: latence par route, Server-Timing, profilage des requêtes armées"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = SERVER_TIMING_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        global _in_progress
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        root_path = scope.get("root_path", "")
+        status = 500  # exception avant la réponse
+        profile = get_request_profiler().start(scope)
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = server_timing(trace, time.perf_counter() - started)
+                message["headers"] = [*message.get("headers", []), (self.header, timing.encode("latin-1"))]
+            await send(message)
+
+        with _lock:
+            _in_progress += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - started
+            with _lock:
+                _in_progress -= 1
+            route = route_label(scope, root_path)
+            _observe_request(scope["method"], route, status, duration, trace)
+            _current_trace.reset(token)
+            if profile is not None:
+                get_request_profiler().finish(profile, scope, route, status, duration)
+
+
+@register_collector
+def collect_tracing_metrics() -> Iterable[MetricFamily]:
+    with _lock:
+        routes = list(_route_latency.items())
+        spans = list(_span_latency.items())
+        route_spans = [(key, tuple(totals)) for key, totals in _route_spans.items()]
+        in_progress = _in_progress
+
+    latency = MetricFamily(
+        "http_request_duration_seconds", "histogram", "Durée des requêtes HTTP par route (jusqu'à la fin de la réponse)"
+    )
+    for (method, route, status), histogram in sorted(routes):
+        histogram.add_to(latency, {"method": method, "route": route, "status": status})
+    span_latency = MetricFamily("app_span_duration_seconds", "histogram", "Durée des spans (base, OpenAI, recherche...)")
+    for name, histogram in sorted(spans):
+        histogram.add_to(span_latency, {"span": name})
+    span_seconds = MetricFamily(
+        "http_request_span_seconds_total", "counter", "Temps cumulé de chaque span dans les requêtes d'une route"
+    )
+    span_calls = MetricFamily(
+        "http_request_span_calls_total", "counter", "Appels de chaque span dans les requêtes d'une route"
+    )
+    for (route, name), (count, seconds) in sorted(route_spans):
+        span_seconds.add(seconds, {"route": route, "span": name})
+        span_calls.add(count, {"route": route, "span": name})
+
+    return [
+        latency,
+        MetricFamily("http_requests_in_progress", "gauge", "Requêtes HTTP en cours").add(in_progress),
+        span_latency,
+        span_seconds,
+        span_calls,
+    ]
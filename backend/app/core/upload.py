@@ -1,56 +1,179 @@
 """
 Utilitaires pour la gestion des uploads de fichiers
+
+Le contenu est écrit par blocs dans un fichier temporaire (aiofiles), haché
+au fil de l'eau et abandonné dès que MAX_UPLOAD_SIZE est dépassé; il n'est
+jamais entièrement en mémoire. Le fichier est ensuite renommé atomiquement
+vers un chemin dérivé de son SHA-256: le même fichier envoyé deux fois
+donne le même objet.
 """
 
+import hashlib
 import os
+import re
 import uuid
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
-from fastapi import UploadFile, HTTPException
+from typing import AsyncIterable, AsyncIterator, Optional
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
 from app.core.config import settings
 
+TMP_SUBFOLDER = ".tmp"  # même système de fichiers que la destination: renommage atomique
+CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}$")  # nom = SHA-256 du contenu
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-async def save_upload_file(file: UploadFile, subfolder: str = "") -> str:
-    """
-    Sauvegarder un fichier uploadé
-    Retourne le chemin relatif du fichier
-    """
-    # Vérifier l'extension
-    file_ext = Path(file.filename).suffix.lower()
+
+@dataclass
+class StoredUpload:
+    """Fichier enregistré (chemin relatif à UPLOAD_DIR)"""
+    path: str
+    sha256: str
+    size: int
+    deduplicated: bool  # objet déjà présent: rien n'a été écrit
+
+    @property
+    def url(self) -> str:
+        return f"/uploads/{self.path}"
+
+
+def too_large_exception() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Fichier trop volumineux. Maximum: {settings.MAX_UPLOAD_SIZE / 1024 / 1024}MB"
+    )
+
+
+def check_extension(filename: Optional[str]) -> str:
+    """Extension autorisée du fichier (en minuscules), 400 sinon"""
+    file_ext = Path(filename or "").suffix.lower()
     if file_ext not in settings.ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail=f"Extension de fichier non autorisée. Autorisées: {', '.join(settings.ALLOWED_EXTENSIONS)}"
         )
-    
-    # Créer le répertoire si nécessaire
-    upload_dir = Path(settings.UPLOAD_DIR) / subfolder
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Générer un nom de fichier unique
-    file_id = str(uuid.uuid4())
-    file_path = upload_dir / f"{file_id}{file_ext}"
-    
-    # Lire et sauvegarder le fichier
-    content = await file.read()
-    
-    # Vérifier la taille
-    if len(content) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Fichier trop volumineux. Maximum: {settings.MAX_UPLOAD_SIZE / 1024 / 1024}MB"
+    return file_ext
+
+
+def check_content_length(request: Request, overhead: int = 0):
+    """Refuser avant lecture du corps un Content-Length annoncé trop grand (overhead: enveloppe multipart)"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_UPLOAD_SIZE + overhead:
+        raise too_large_exception()
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Contenu d'un UploadFile par blocs (déjà sur disque au-delà de 1 Mo, voir Starlette)"""
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def save_upload_stream(
+    chunks: AsyncIterable[bytes],
+    filename: Optional[str],
+    subfolder: str = "",
+    max_size: Optional[int] = None
+) -> StoredUpload:
+    """
+    Enregistrer un flux d'octets sous UPLOAD_DIR/<subfolder>/<sha256[:2]>/<sha256><ext>
+
+    Lève 413 dès que max_size (défaut: MAX_UPLOAD_SIZE) est dépassé; le
+    fichier temporaire est supprimé en cas d'erreur ou d'annulation.
+    """
+    file_ext = check_extension(filename)
+    max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
+    upload_root = Path(settings.UPLOAD_DIR)
+    tmp_dir = upload_root / TMP_SUBFOLDER
+    await aiofiles.os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = tmp_dir / f"{uuid.uuid4()}{file_ext}"
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise too_large_exception()
+                digest.update(chunk)
+                await f.write(chunk)
+
+        sha256 = digest.hexdigest()
+        target_dir = upload_root / subfolder / sha256[:2]
+        target = target_dir / f"{sha256}{file_ext}"
+        if await aiofiles.os.path.exists(target):
+            await aiofiles.os.remove(tmp_path)
+            deduplicated = True
+        else:
+            await aiofiles.os.makedirs(target_dir, exist_ok=True)
+            # Atomique: un lecteur voit l'ancien fichier ou le nouveau, jamais un fichier partiel
+            await aiofiles.os.replace(tmp_path, target)
+            deduplicated = False
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return StoredUpload(
+        path=target.relative_to(upload_root).as_posix(),
+        sha256=sha256,
+        size=size,
+        deduplicated=deduplicated
+    )
+
+
+async def store_upload_file(file: UploadFile, subfolder: str = "") -> StoredUpload:
+    """Enregistrer un UploadFile par blocs (voir save_upload_stream)"""
+    return await save_upload_stream(iter_upload_file(file), file.filename, subfolder)
+
+
+async def save_upload_file(file: UploadFile, subfolder: str = "") -> str:
+    """
+    Sauvegarder un fichier uploadé
+    Retourne le chemin relatif du fichier
+    """
+    return (await store_upload_file(file, subfolder)).path
+
+
+class UploadStaticFiles(StaticFiles):
+    """
+    /uploads: les fichiers nommés par leur SHA-256 ne changent jamais
+
+    ETag fort (l'empreinte) et cache immuable: le navigateur ne revalide pas.
+    Les autres fichiers (uploads antérieurs) gardent le comportement standard.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        name = Path(full_path).stem
+        if status_code != 200 or not CONTENT_ADDRESSED_NAME.match(name):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        response = FileResponse(
+            full_path, stat_result=stat_result,
+            headers={"etag": f'"{name}"', "cache-control": IMMUTABLE_CACHE_CONTROL}
         )
-    
-    with open(file_path, "wb") as f:
-        f.write(content)
-    
-    # Retourner le chemin relatif
-    return str(file_path.relative_to(settings.UPLOAD_DIR))
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
 
 
 def delete_upload_file(file_path: str) -> bool:
     """
-    Supprimer un fichier uploadé
+    Supprimer un fichier uploadé, sans vérifier qu'il n'est plus référencé
+
+    Les fichiers sont dédupliqués: un même objet peut être référencé par
+    plusieurs étapes. À l'appelant de s'assurer qu'il ne l'est plus (par
+    exemple StoredUpload.deduplicated faux: objet créé par cet upload).
     """
     try:
         full_path = Path(settings.UPLOAD_DIR) / file_path
@@ -0,0 +1,89 @@
+"""
+Cache des utilisateurs authentifiés (clé: "sub" du token)
+
+get_current_user ne relit l'utilisateur en base qu'après expiration du TTL.
+Les entrées sont des instantanés immuables (pas des objets ORM attachés à une
+session fermée) et sont invalidées quand un utilisateur est modifié ou supprimé
+via l'ORM; les UPDATE en masse doivent appeler invalidate_user().
+Avec plusieurs workers, la modification n'est visible des autres processus
+qu'à l'expiration du TTL.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User, UserRole
+
+_PENDING_KEY = "invalidated_user_ids"
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Instantané d'un utilisateur (attributs utilisés par les routes et UserResponse)"""
+    id: int
+    email: Optional[str]
+    role: UserRole
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        return cls(id=user.id, email=user.email, role=user.role, created_at=user.created_at)
+
+    @classmethod
+    def from_claims(cls, user_id: int, payload: Dict[str, Any]) -> "AuthenticatedUser":
+        """Utilisateur reconstruit depuis les claims du token, sans requête"""
+        return cls(id=user_id, email=payload.get("email"), role=UserRole(payload["role"]))
+
+
+user_cache = TTLCache(
+    max_entries=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL
+)
+
+
+def cache_enabled() -> bool:
+    return settings.AUTH_USER_CACHE_TTL > 0
+
+
+def get_cached_user(user_id: int) -> Optional[AuthenticatedUser]:
+    if not cache_enabled():
+        return None
+    return user_cache.get(str(user_id))
+
+
+def cache_user(user: User) -> AuthenticatedUser:
+    """Mettre en cache l'instantané de l'utilisateur et le retourner"""
+    snapshot = AuthenticatedUser.from_user(user)
+    if cache_enabled():
+        user_cache.set(str(user.id), snapshot)
+    return snapshot
+
+
+def invalidate_user(user_id: int):
+    user_cache.delete(str(user_id))
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _on_user_changed(mapper, connection, target):
+    # Invalider tout de suite, puis après le commit: une requête concurrente
+    # a pu remettre en cache l'ancienne version entre le flush et le commit
+    invalidate_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,12 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from sqlalchemy import inspect, text
 from pathlib import Path
 from contextlib import asynccontextmanager
+import asyncio
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, Base, dispose_async_engine
 from app.core.logger import app_logger
-from app.api import auth, procedures, chat, vision, tips, executions, startup
+from app.core.openai_client import close_openai_client
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.request_context import REQUEST_ID_HEADER, RequestIdMiddleware
+from app.core.tracing import SERVER_TIMING_HEADER, TracingMiddleware
+from app.core.upload import UploadStaticFiles
+from app.services.fulltext_search import ensure_fulltext_index
+from app.api import auth, procedures, chat, vision, tips, executions, startup, search, metrics, uploads, analytics, profiling
 from app.api import router as nextgen_router
 from app.api import command_center
 from app.api import import_pipeline
@@ -34,6 +41,11 @@ async def lifespan(app: FastAPI):
     
     app_logger.info("Services Command Center démarrés")
     
+    # Précharger l'index vectoriel local (déploiements SQLite) sans bloquer le démarrage
+    from app.services.vector_backends import resolve_backend_name, preload_local_vector_index
+    if resolve_backend_name() == "local":
+        asyncio.get_running_loop().run_in_executor(None, preload_local_vector_index)
+    
     yield
     
     # Shutdown
@@ -41,12 +53,34 @@ async def lifespan(app: FastAPI):
     await idle_manager.stop()
     await throttler.stop()
     await rag_service.stop()
+    from app.services.chat_history import wait_pending_chat_messages
+    await wait_pending_chat_messages()
+    await dispose_async_engine()
+    await close_openai_client()
     app_logger.info("Services Command Center arrêtés")
 
 # Créer les tables
 Base.metadata.create_all(bind=engine)
+# create_all ignore les tables existantes: en SQLite (sans Alembic), ajouter les
+# index déclarés depuis et les colonnes nullables. En PostgreSQL, les migrations
+# Alembic s'en chargent (sans recréer les index déjà couverts par ceux de Prisma)
+if engine.dialect.name == "sqlite":
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns and column.nullable:
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                    ))
 app_logger.info("Tables de base de données créées/vérifiées")
 
+# Index plein texte (FTS5 en SQLite; en PostgreSQL via migration Alembic)
+ensure_fulltext_index(engine)
+
 # Créer le répertoire d'uploads
 Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
 app_logger.info(f"Répertoire d'uploads créé/vérifié: {settings.UPLOAD_DIR}")
@@ -63,7 +97,7 @@ app = FastAPI(
 app_logger.info("Application FastAPI initialisée", {"title": settings.PROJECT_NAME})
 
 # Servir les fichiers statiques (uploads)
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+app.mount("/uploads", UploadStaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 # CORS
 app.add_middleware(
@@ -72,7 +106,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, REQUEST_ID_HEADER, SERVER_TIMING_HEADER],
 )
+# Latence par route, Server-Timing, profilage à la demande
+app.add_middleware(TracingMiddleware)
+# Identifiant de corrélation (logs, réponse): ajouté en dernier, donc exécuté en premier
+app.add_middleware(RequestIdMiddleware)
 
 # Routes
 app.include_router(auth.router, prefix=settings.API_V1_STR, tags=["auth"])
@@ -82,6 +121,13 @@ app.include_router(vision.router, prefix=f"{settings.API_V1_STR}/vision", tags=[
 app.include_router(tips.router, prefix=f"{settings.API_V1_STR}/tips", tags=["tips"])
 app.include_router(executions.router, prefix=f"{settings.API_V1_STR}/executions", tags=["executions"])
 app.include_router(startup.router, prefix=f"{settings.API_V1_STR}/startup", tags=["startup"])
+app.include_router(search.router, prefix=f"{settings.API_V1_STR}/search", tags=["search"])
+app.include_router(uploads.router, prefix=f"{settings.API_V1_STR}/uploads", tags=["uploads"])
+app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics", tags=["analytics"])
+app.include_router(profiling.router, prefix=f"{settings.API_V1_STR}/profiling", tags=["profiling"])
+
+# Métriques (Prometheus)
+app.include_router(metrics.router, tags=["metrics"])
 
 # Next-Gen Dashboard Routes
 app.include_router(nextgen_router.router, tags=["Next-Gen"])
@@ -1,6 +1,9 @@
 from app.models.user import User
 from app.models.procedure import Procedure, Step
-from app.models.execution import Execution, StepExecution
+from app.models.execution import (
+    Execution, StepExecution, StepSyncOperation,
+    ProcedureExecutionStats, ProcedureDurationBucket, StepExecutionStats,
+)
 from app.models.tip import Tip
 from app.models.chat import ChatMessage
 
@@ -10,6 +13,10 @@ __all__ = [
     "Step",
     "Execution",
     "StepExecution",
+    "StepSyncOperation",
+    "ProcedureExecutionStats",
+    "ProcedureDurationBucket",
+    "StepExecutionStats",
     "Tip",
     "ChatMessage",
 ]
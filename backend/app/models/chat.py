@@ -11,4 +11,12 @@ class ChatMessage(Base):
     message = Column(Text, nullable=False)
     response = Column(Text)
     context = Column(JSON)  # Contexte (procedure_id, step_id, etc.)
+    # Réponse streamée: modèle, usage et latences
+    model = Column(String(100))
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    total_tokens = Column(Integer)
+    time_to_first_token_ms = Column(Integer)
+    duration_ms = Column(Integer)
+    finish_reason = Column(String(20))  # stop, length, error, cancelled, cached, cached_semantic
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Enum, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -14,6 +14,10 @@ class ExecutionStatus(str, enum.Enum):
 
 class Execution(Base):
     __tablename__ = "executions"
+    __table_args__ = (
+        # Historique par utilisateur, pagination par curseur (id décroissant)
+        Index("ix_executions_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -30,6 +34,11 @@ class Execution(Base):
 
 class StepExecution(Base):
     __tablename__ = "step_executions"
+    __table_args__ = (
+        # Étape d'une exécution (mise à jour, synchronisation) et statistiques par étape
+        Index("ix_step_executions_execution_id_step_id", "execution_id", "step_id"),
+        Index("ix_step_executions_step_id", "step_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     execution_id = Column(Integer, ForeignKey("executions.id"), nullable=False)
@@ -38,7 +47,61 @@ class StepExecution(Base):
     photos = Column(String, default="[]")  # JSON string de photos
     comments = Column(String)
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    client_updated_at = Column(DateTime(timezone=True), nullable=True)  # horodatage client de la dernière mise à jour synchronisée
+    duration_seconds = Column(Float, nullable=True)  # temps passé sur l'étape (depuis la validation précédente), pour les statistiques
 
     # Relations
     execution = relationship("Execution", back_populates="step_executions")
     step = relationship("Step", back_populates="step_executions")
+
+
+class StepSyncOperation(Base):
+    """Mise à jour d'étape déjà reçue (clé d'idempotence): un lot renvoyé n'est pas réappliqué"""
+    __tablename__ = "step_sync_operations"
+    __table_args__ = (
+        UniqueConstraint("execution_id", "idempotency_key", name="uq_step_sync_operations_execution_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    execution_id = Column(Integer, ForeignKey("executions.id", ondelete="CASCADE"), nullable=False)
+    idempotency_key = Column(String(100), nullable=False)
+    step_id = Column(Integer, ForeignKey("steps.id"), nullable=False)
+    result = Column(String(20), nullable=False)  # applied, stale
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProcedureExecutionStats(Base):
+    """
+    Compteurs d'exécution d'une procédure, tenus à jour à chaque écriture
+
+    Voir app/services/execution_stats.py: les tableaux de bord lisent une
+    ligne au lieu de parcourir l'historique des exécutions.
+    """
+    __tablename__ = "procedure_execution_stats"
+
+    procedure_id = Column(Integer, ForeignKey("procedures.id", ondelete="CASCADE"), primary_key=True)
+    executions_started = Column(Integer, nullable=False, default=0)
+    executions_completed = Column(Integer, nullable=False, default=0)
+    total_duration_seconds = Column(Float, nullable=False, default=0)  # exécutions terminées
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProcedureDurationBucket(Base):
+    """Histogramme des durées des exécutions terminées (médiane estimée sans parcourir l'historique)"""
+    __tablename__ = "procedure_duration_buckets"
+
+    procedure_id = Column(Integer, ForeignKey("procedures.id", ondelete="CASCADE"), primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # index dans DURATION_BUCKETS (execution_stats)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class StepExecutionStats(Base):
+    """Compteurs par étape: validations, étapes passées, temps passé"""
+    __tablename__ = "step_execution_stats"
+
+    step_id = Column(Integer, ForeignKey("steps.id", ondelete="CASCADE"), primary_key=True)
+    procedure_id = Column(Integer, ForeignKey("procedures.id", ondelete="CASCADE"), nullable=False, index=True)
+    completed_count = Column(Integer, nullable=False, default=0)
+    skipped_count = Column(Integer, nullable=False, default=0)
+    timed_count = Column(Integer, nullable=False, default=0)  # validations dont la durée est connue
+    total_duration_seconds = Column(Float, nullable=False, default=0)
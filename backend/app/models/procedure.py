@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, ARRAY
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, ARRAY, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -6,6 +6,11 @@ from app.core.database import Base
 
 class Procedure(Base):
     __tablename__ = "procedures"
+    __table_args__ = (
+        # Pagination par curseur (WHERE is_active/category ... AND id > :curseur ORDER BY id)
+        Index("ix_procedures_is_active_id", "is_active", "id"),
+        Index("ix_procedures_category_id", "category", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
@@ -20,7 +25,7 @@ class Procedure(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relations
-    steps = relationship("Step", back_populates="procedure", cascade="all, delete-orphan")
+    steps = relationship("Step", back_populates="procedure", cascade="all, delete-orphan", order_by="Step.order")
     executions = relationship("Execution", back_populates="procedure")
 
 
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 
 class Tip(Base):
     __tablename__ = "tips"
+    __table_args__ = (
+        # Pagination par curseur filtrée par catégorie
+        Index("ix_tips_category_id", "category", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
@@ -1,8 +1,11 @@
 from app.schemas.user import User, UserCreate, UserLogin, UserResponse
-from app.schemas.procedure import Procedure, ProcedureCreate, ProcedureUpdate, Step, StepCreate, StepUpdate
-from app.schemas.execution import Execution, ExecutionCreate, StepExecution, StepExecutionCreate
+from app.schemas.procedure import Procedure, ProcedureCreate, ProcedureUpdate, ProcedureSummary, Step, StepCreate, StepUpdate
+from app.schemas.execution import Execution, ExecutionCreate, ExecutionSummary, StepExecution, StepExecutionCreate
 from app.schemas.tip import Tip, TipCreate, TipUpdate
 from app.schemas.chat import ChatMessage, ChatMessageCreate, ChatResponse
+from app.schemas.search import HybridSearchResult, HybridSearchResponse, SearchResult, SearchResponse
+from app.schemas.analytics import ProcedureStats, ProcedureStatsSummary, StepStats
+from app.schemas.profiling import ProfileArmRequest, ProfilingStatus, RequestProfileSummary
 
 __all__ = [
     "User",
@@ -12,11 +15,13 @@ __all__ = [
     "Procedure",
     "ProcedureCreate",
     "ProcedureUpdate",
+    "ProcedureSummary",
     "Step",
     "StepCreate",
     "StepUpdate",
     "Execution",
     "ExecutionCreate",
+    "ExecutionSummary",
     "StepExecution",
     "StepExecutionCreate",
     "Tip",
@@ -25,4 +30,14 @@ __all__ = [
     "ChatMessage",
     "ChatMessageCreate",
     "ChatResponse",
+    "HybridSearchResult",
+    "HybridSearchResponse",
+    "SearchResult",
+    "SearchResponse",
+    "ProcedureStats",
+    "ProcedureStatsSummary",
+    "StepStats",
+    "ProfileArmRequest",
+    "ProfilingStatus",
+    "RequestProfileSummary",
 ]
@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class StepStats(BaseModel):
+    step_id: int
+    order: int
+    title: str
+    completed_count: int = 0
+    skipped_count: int = 0
+    skip_rate: Optional[float] = None  # passées / (validées + passées)
+    average_duration_seconds: Optional[float] = None  # depuis la validation précédente
+
+
+class ProcedureStatsSummary(BaseModel):
+    procedure_id: int
+    title: str
+    executions_started: int = 0
+    executions_completed: int = 0
+    completion_rate: Optional[float] = None
+    average_duration_seconds: Optional[float] = None
+
+
+class ProcedureStats(ProcedureStatsSummary):
+    """Tableau de bord d'une procédure (résumés tenus à jour, pas de parcours de l'historique)"""
+    median_duration_seconds: Optional[float] = None  # estimée (histogramme des durées)
+    p90_duration_seconds: Optional[float] = None
+    steps: List[StepStats] = []
+    most_skipped: List[StepStats] = []
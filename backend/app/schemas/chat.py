@@ -16,6 +16,13 @@ class ChatMessage(ChatMessageBase):
     id: int
     user_id: int
     response: Optional[str] = None
+    model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    time_to_first_token_ms: Optional[int] = None
+    duration_ms: Optional[int] = None
+    finish_reason: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Literal
 from datetime import datetime
+import json
 from app.models.execution import ExecutionStatus
 
 
@@ -19,11 +20,31 @@ class StepExecution(StepExecutionBase):
     id: int
     execution_id: int
     completed_at: Optional[datetime] = None
+    client_updated_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None  # temps passé sur l'étape (depuis la validation précédente)
+
+    @field_validator("photos", mode="before")
+    @classmethod
+    def parse_photos(cls, v):
+        # Colonne texte (JSON) en base
+        if isinstance(v, str):
+            return json.loads(v) if v else []
+        return v
 
     class Config:
         from_attributes = True
 
 
+class StepExecutionSyncItem(StepExecutionBase):
+    """Mise à jour d'étape faite hors ligne"""
+    idempotency_key: str = Field(..., min_length=1, max_length=100)  # unique par mise à jour (UUID côté client)
+    client_updated_at: datetime  # heure de la mise à jour sur l'appareil
+
+
+class StepExecutionSyncRequest(BaseModel):
+    updates: List[StepExecutionSyncItem] = Field(..., max_length=500)  # dans l'ordre où elles ont été faites
+
+
 class ExecutionBase(BaseModel):
     procedure_id: int
     status: Optional[str] = ExecutionStatus.IN_PROGRESS.value
@@ -34,6 +55,17 @@ class ExecutionCreate(ExecutionBase):
     pass
 
 
+class ExecutionSummary(ExecutionBase):
+    """Historique: exécution sans le détail des étapes"""
+    id: int
+    user_id: int
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class Execution(ExecutionBase):
     id: int
     user_id: int
@@ -43,3 +75,15 @@ class Execution(ExecutionBase):
 
     class Config:
         from_attributes = True
+
+
+class StepExecutionSyncResult(BaseModel):
+    idempotency_key: str
+    step_id: int
+    result: Literal["applied", "stale", "duplicate"]  # stale: une mise à jour plus récente de l'étape existe déjà
+
+
+class ExecutionSyncResponse(BaseModel):
+    """État réconcilié de l'exécution après synchronisation"""
+    execution: Execution
+    results: List[StepExecutionSyncResult]
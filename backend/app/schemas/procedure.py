@@ -57,6 +57,23 @@ class ProcedureUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class ProcedureSummary(BaseModel):
+    """Projection légère pour les listes: sans étapes ni logigramme"""
+    id: int
+    title: str
+    description: Optional[str] = None
+    category: Optional[str] = None
+    tags: Optional[List[str]] = []
+    version: int
+    is_active: bool
+    created_at: datetime
+    updated_at: Optional[datetime]
+    step_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+
 class Procedure(ProcedureBase):
     id: int
     created_by: int
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class ProfileArmRequest(BaseModel):
+    path_prefix: str = Field("/api/", min_length=1, max_length=200)  # ex: /api/chat
+    count: int = Field(1, ge=1, le=50)  # prochaines requêtes du préfixe à profiler
+    ttl_seconds: int = Field(600, ge=10, le=86400)  # désarmé ensuite, même si count n'est pas atteint
+
+
+class RequestProfileSummary(BaseModel):
+    id: str
+    created_at: datetime
+    method: str
+    path: str
+    route: str
+    status: int
+    duration_ms: float
+    request_id: Optional[str] = None
+    engine: str
+
+
+class ProfilingStatus(BaseModel):
+    enabled: bool
+    engine: str  # pyinstrument si installé, sinon cProfile
+    sample_rate: float
+    armed_path_prefix: Optional[str] = None
+    armed_remaining: int = 0
+    armed_expires_at: Optional[datetime] = None
+    profiles: List[RequestProfileSummary] = []  # plus récents d'abord
@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict
+
+
+class HybridSearchResult(BaseModel):
+    document_type: str
+    document_id: int
+    title: Optional[str] = None
+    score: float
+    ranks: Dict[str, int] = {}
+
+
+class HybridSearchResponse(BaseModel):
+    query: str
+    results: List[HybridSearchResult]
+    timings_ms: Dict[str, float]
+
+
+class SearchResult(BaseModel):
+    document_type: str
+    document_id: int
+    procedure_id: Optional[int] = None
+    title: Optional[str] = None
+    # Fragments HTML: texte stocké échappé (html.escape), seules les balises
+    # <mark>…</mark> autour des termes trouvés sont du balisage. `title` reste
+    # du texte brut, à échapper par le client comme tout contenu
+    title_highlight: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    counts: Dict[str, int]
+    page: int
+    page_size: int
+    results: List[SearchResult]
@@ -1,13 +1,91 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
+from app.core.openai_client import get_async_openai_client, openai_slot
+from app.services.response_cache import ChatResponseCache, get_chat_response_cache
+from app.services.semantic_cache import get_semantic_cache, partition_key
+from app.services.chat_context import ChatContext, retrieve_chat_context
 from app.core.config import settings
-from typing import Optional, Dict, Any, AsyncGenerator
+from app.core.logger import app_logger
+from app.core.tracing import record_span, span, traced
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, AsyncGenerator, List, Set
+import asyncio
 import json
+import time
+
+
+@dataclass
+class ChatStreamResult:
+    """Bilan d'une réponse streamée, rempli au fil du flux (texte exact envoyé au client)"""
+    model: str
+    chunks: List[str] = field(default_factory=list)
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    finish_reason: Optional[str] = None  # stop, length, error, cancelled (client déconnecté), cached, cached_semantic
+    started_at: float = field(default_factory=time.perf_counter)
+    time_to_first_token_ms: Optional[int] = None
+    duration_ms: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def add(self, content: str):
+        if self.time_to_first_token_ms is None:
+            self.time_to_first_token_ms = round((time.perf_counter() - self.started_at) * 1000)
+        self.chunks.append(content)
+
+    def set_usage(self, usage: Any):
+        """Usage du dernier fragment (objet du SDK ou dict selon la version)"""
+        if not isinstance(usage, dict):
+            usage = usage.model_dump()
+        self.prompt_tokens = usage.get("prompt_tokens")
+        self.completion_tokens = usage.get("completion_tokens")
+        self.total_tokens = usage.get("total_tokens")
+
+    def finish(self):
+        if self.finish_reason is None:
+            self.finish_reason = "cancelled"
+        if self.duration_ms is None:
+            self.duration_ms = round((time.perf_counter() - self.started_at) * 1000)
+
+
+# Récupérations devenues inutiles (cache sémantique), gardées jusqu'à leur fin
+_discarded: Set[asyncio.Task] = set()
+
+
+def _discard_retrieval(task: asyncio.Task):
+    _discarded.discard(task)
+    if not task.cancelled():
+        task.exception()  # déjà journalisée par retrieve_chat_context
+
+
+@dataclass
+class ChatPrompt:
+    """Préparation d'un message: caches consultés, contexte documentaire, durées des étapes"""
+    cache_key: str
+    system_prompt: str  # sans contexte documentaire: clé des caches exact et sémantique
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    cached: Optional[Dict[str, Any]] = None
+    cached_reason: Optional[str] = None  # cached, cached_semantic
+    embedding: Optional[List[float]] = None
+    context: Optional[ChatContext] = None
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
 
 class AIService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = "gpt-4o-mini"  # Modèle le moins cher
-        self.cache = {}  # Cache simple pour réduire les coûts
+    
+    @property
+    def cache(self) -> Optional[ChatResponseCache]:
+        """Cache des réponses partagé (None si CHAT_CACHE_ENABLED=false)"""
+        return get_chat_response_cache()
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Client async partagé (pool HTTP, timeouts, concurrence bornée)"""
+        return get_async_openai_client()
     
     async def get_chat_response(
         self,
@@ -16,31 +94,30 @@ class AIService:
         user_id: Optional[int] = None
     ) -> str:
         """Obtenir une réponse du chat IA avec cache"""
-        # Vérifier le cache (simple hash du message)
-        import hashlib
-        cache_key = hashlib.md5(f"{message}{str(context)}".encode()).hexdigest()
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
-        system_prompt = self._build_system_prompt(context)
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": message}
-        ]
+        started = time.perf_counter()
+        prompt = await self._prepare(message, context)
+        if prompt.cached is not None:
+            self._log(prompt, prompt.cached_reason, started)
+            return prompt.cached["response"]
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000
-            )
+            with span("openai.chat"):
+                async with openai_slot():
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=prompt.messages,
+                        temperature=0.7,
+                        max_tokens=settings.CHAT_MAX_TOKENS
+                    )
             result = response.choices[0].message.content or ""
-            # Mettre en cache (limiter à 100 entrées)
-            if len(self.cache) > 100:
-                self.cache.pop(next(iter(self.cache)))
-            self.cache[cache_key] = result
+            usage = response.usage
+            self._remember(
+                prompt, message, result,
+                prompt_tokens=usage.prompt_tokens if usage else None,
+                completion_tokens=usage.completion_tokens if usage else None,
+                duration_ms=round((time.perf_counter() - started) * 1000)
+            )
+            self._log(prompt, response.choices[0].finish_reason, started, usage.prompt_tokens if usage else None)
             return result
         except Exception as e:
             return f"Erreur lors de la communication avec l'IA: {str(e)}"
@@ -49,33 +126,194 @@ class AIService:
         self,
         message: str,
         context: Optional[Dict[str, Any]] = None,
-        user_id: Optional[int] = None
+        user_id: Optional[int] = None,
+        result: Optional[ChatStreamResult] = None
     ) -> AsyncGenerator[str, None]:
-        """Obtenir une réponse streamée du chat IA"""
+        """
+        Obtenir une réponse streamée du chat IA
+
+        Args:
+            result: rempli au fil du flux (texte, usage, temps au premier token)
+        """
+        result = result or ChatStreamResult(model=self.model)
+        prompt = await self._prepare(message, context)
+        if prompt.cached is not None:
+            # Réponse déjà connue: un seul fragment, aucun token consommé
+            result.add(prompt.cached["response"])
+            result.finish_reason = prompt.cached_reason
+            result.finish()
+            self._log(prompt, result.finish_reason, result.started_at)
+            yield prompt.cached["response"]
+            return
+        
+        # Flux complet (jusqu'au dernier fragment ou à la déconnexion du client).
+        # Lecture en amont dans une tâche: le créneau OpenAI est rendu dès la fin
+        # du flux OpenAI, pas quand un client lent a tout téléchargé. Au plus un
+        # fragment de contenu par token: la file ne fait pas attendre la lecture
+        openai_started = time.perf_counter()
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=settings.CHAT_MAX_TOKENS + 1)
+        reader = asyncio.create_task(self._read_stream(prompt, result, chunks))
+        try:
+            while True:
+                content = await chunks.get()
+                if content is None:
+                    break
+                if isinstance(content, Exception):
+                    raise content
+                result.add(content)
+                yield content
+            result.finish_reason = result.finish_reason or "stop"
+            if result.finish_reason == "stop":
+                self._remember(
+                    prompt, message, result.text,
+                    prompt_tokens=result.prompt_tokens,
+                    completion_tokens=result.completion_tokens,
+                    duration_ms=round((time.perf_counter() - result.started_at) * 1000)
+                )
+        except Exception as e:
+            result.finish_reason = "error"
+            error = f"Erreur: {str(e)}"
+            result.add(error)
+            yield error
+        finally:
+            # Client déconnecté: l'annulation de la lecture ferme le flux (et la requête en amont)
+            if not reader.done():
+                reader.cancel()
+                await asyncio.wait({reader})
+            record_span("openai.chat", time.perf_counter() - openai_started)
+            result.finish()
+            prompt.timings_ms["first_token"] = result.time_to_first_token_ms
+            self._log(prompt, result.finish_reason, result.started_at, result.prompt_tokens)
+
+    async def _read_stream(self, prompt: ChatPrompt, result: ChatStreamResult, chunks: asyncio.Queue):
+        """Lire le flux OpenAI dans la file (None à la fin, l'exception en cas d'échec)"""
+        try:
+            async with openai_slot():
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=prompt.messages,
+                    temperature=0.7,
+                    max_tokens=settings.CHAT_MAX_TOKENS,
+                    stream=True,
+                    # Usage (tokens) dans un dernier fragment sans choices
+                    extra_body={"stream_options": {"include_usage": True}}
+                )
+                async with stream:
+                    async for chunk in stream:
+                        usage = getattr(chunk, "usage", None)
+                        if usage:
+                            result.set_usage(usage)
+                        if not chunk.choices:
+                            continue
+                        if chunk.choices[0].finish_reason:
+                            result.finish_reason = chunk.choices[0].finish_reason
+                        content = chunk.choices[0].delta.content
+                        if content:
+                            await chunks.put(content)
+        except Exception as e:
+            await chunks.put(e)
+            return
+        await chunks.put(None)
+    
+    @traced("ai.prepare")
+    async def _prepare(self, message: str, context: Optional[Dict[str, Any]] = None) -> ChatPrompt:
+        """
+        Caches, puis contexte documentaire
+
+        Sur un échec du cache exact, l'embedding de la question (thread) et la
+        lecture de la procédure/étape démarrent ensemble; l'embedding sert au
+        cache sémantique puis à la recherche des passages proches.
+        """
+        started = time.perf_counter()
         system_prompt = self._build_system_prompt(context)
+        prompt = ChatPrompt(
+            cache_key=ChatResponseCache.key(self.model, system_prompt, message, context),
+            system_prompt=system_prompt
+        )
+        cache = self.cache
+        prompt.cached = cache.get(prompt.cache_key) if cache is not None else None
+        if prompt.cached is not None:
+            prompt.cached_reason = "cached"
+            return prompt
+        
+        semantic = get_semantic_cache()
+        embedding_task = retrieval = None
+        if semantic is not None or (settings.CHAT_RAG_ENABLED and settings.CHAT_RAG_TOP_K > 0):
+            from app.services.vector_search import generate_query_embedding
+            embedding_task = asyncio.ensure_future(asyncio.to_thread(generate_query_embedding, message))
+        if settings.CHAT_RAG_ENABLED:
+            retrieval = asyncio.ensure_future(retrieve_chat_context(context, embedding_task))
+        
+        try:
+            if semantic is not None:
+                prompt.embedding = await embedding_task
+                hit = semantic.lookup(partition_key(self.model, system_prompt), prompt.embedding) \
+                    if prompt.embedding is not None else None
+                if hit is not None:
+                    prompt.cached, prompt.cached_reason = hit[0], "cached_semantic"
+                    if retrieval is not None:
+                        # Lecture en cours laissée à son terme: l'annuler invaliderait la connexion du pool
+                        _discarded.add(retrieval)
+                        retrieval.add_done_callback(_discard_retrieval)
+                        retrieval = None
+                    return prompt
+            if retrieval is not None:
+                prompt.context = await retrieval
+        finally:
+            # Client déconnecté (annulation) ou erreur
+            for task in (retrieval, embedding_task):
+                if task is not None and not task.done():
+                    task.cancel()
+        prompt.timings_ms["retrieval"] = round((time.perf_counter() - started) * 1000, 3)
         
-        messages = [
+        stage = time.perf_counter()
+        if prompt.context is not None and prompt.context.sections:
+            system_prompt = self._build_system_prompt(context, prompt.context)
+        prompt.messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": message}
         ]
-        
-        try:
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000,
-                stream=True
+        prompt.timings_ms["prompt_build"] = round((time.perf_counter() - stage) * 1000, 3)
+        return prompt
+    
+    def _remember(self, prompt: ChatPrompt, message: str, response: str, **usage):
+        """Enregistrer une réponse dans le cache exact et, si l'embedding est connu, le cache sémantique"""
+        cache = self.cache
+        if cache is not None:
+            cache.set(prompt.cache_key, response, self.model, **usage)
+        semantic = get_semantic_cache()
+        if semantic is not None and prompt.embedding is not None:
+            semantic.add(
+                partition_key(self.model, prompt.system_prompt), message, prompt.embedding, response, self.model, **usage
             )
-            
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
-        except Exception as e:
-            yield f"Erreur: {str(e)}"
     
-    def _build_system_prompt(self, context: Optional[Dict[str, Any]] = None) -> str:
-        """Construire le prompt système avec le contexte"""
+    def _log(
+        self,
+        prompt: ChatPrompt,
+        finish_reason: Optional[str],
+        started: float,
+        prompt_tokens: Optional[int] = None
+    ):
+        """Durées par étape: récupération, construction du prompt, premier token, total"""
+        timings = dict(prompt.timings_ms)
+        timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+        data = {"model": self.model, "finish_reason": finish_reason, "timings_ms": timings}
+        if prompt.context is not None:
+            data.update(
+                context_tokens=prompt.context.tokens,
+                context_timings_ms=prompt.context.timings_ms,
+                sources=prompt.context.sources
+            )
+        if prompt_tokens is not None:
+            data["prompt_tokens"] = prompt_tokens
+        app_logger.info("Réponse du chat", data)
+    
+    def _build_system_prompt(
+        self,
+        context: Optional[Dict[str, Any]] = None,
+        documents: Optional[ChatContext] = None
+    ) -> str:
+        """Construire le prompt système avec le contexte (et les extraits de documentation récupérés)"""
         base_prompt = """Tu es un assistant technique spécialisé dans la maintenance de centrales photovoltaïques.
 Tu aides les techniciens sur site à résoudre des problèmes techniques, comprendre les procédures, et fournir des conseils pratiques.
 Réponds de manière claire, concise et professionnelle en français."""
@@ -86,4 +324,11 @@ Réponds de manière claire, concise et professionnelle en français."""
             if context.get("step_id"):
                 base_prompt += f"\nIl est à l'étape ID {context['step_id']}."
         
+        if documents is not None and documents.sections:
+            base_prompt += (
+                "\n\nExtraits de la documentation (appuie-toi dessus en priorité, "
+                "réponds brièvement et signale si l'information n'y figure pas):\n\n"
+                + documents.render()
+            )
+        
         return base_prompt
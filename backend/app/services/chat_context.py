@@ -0,0 +1,243 @@
+"""
+Contexte documentaire du chat (RAG)
+
+La procédure et l'étape en cours (base async) et les passages les plus proches
+de la question (recherche vectorielle, dans un thread) sont récupérés en
+parallèle, puis empaquetés par priorité dans un budget de tokens: étape en
+cours, procédure, puis passages par similarité décroissante.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, List, Optional
+from sqlalchemy import select
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.logger import app_logger
+from app.models.procedure import Procedure, Step
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens d'un texte (tiktoken si installé, sinon ~4 caractères par token)"""
+    global _encoding
+    if TIKTOKEN_AVAILABLE:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Couper un texte à max_tokens (sur un espace si possible)"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if TIKTOKEN_AVAILABLE:
+        cut = _encoding.decode(_encoding.encode(text)[:max_tokens])
+    else:
+        cut = text[:max_tokens * 4]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+@dataclass
+class ContextSection:
+    """Bloc de contexte candidat (priorité croissante = inclus d'abord)"""
+    title: str
+    text: str
+    priority: int
+    source: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ChatContext:
+    """Contexte empaqueté pour le prompt système"""
+    sections: List[ContextSection] = field(default_factory=list)
+    tokens: int = 0
+    dropped: int = 0  # sections hors budget
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def sources(self) -> List[Dict[str, Any]]:
+        return [section.source for section in self.sections if section.source]
+
+    def render(self) -> str:
+        return "\n\n".join(f"### {section.title}\n{section.text}" for section in self.sections)
+
+
+def pack_sections(sections: List[ContextSection], max_tokens: int, min_section_tokens: int = 40) -> ChatContext:
+    """
+    Remplir le budget par priorité
+
+    Une section trop longue est tronquée s'il reste au moins
+    min_section_tokens, sinon écartée.
+    """
+    packed = ChatContext()
+    remaining = max_tokens
+    for section in sorted(sections, key=lambda section: section.priority):
+        # Titre et séparateurs comptés avec le texte
+        tokens = count_tokens(f"### {section.title}\n{section.text}\n\n")
+        if tokens > remaining:
+            overhead = count_tokens(f"### {section.title}\n\n\n")
+            if remaining - overhead < min_section_tokens:
+                packed.dropped += 1
+                continue
+            section = ContextSection(
+                section.title, truncate_to_tokens(section.text, remaining - overhead), section.priority, section.source
+            )
+            tokens = count_tokens(f"### {section.title}\n{section.text}\n\n")
+        packed.sections.append(section)
+        packed.tokens += tokens
+        remaining -= tokens
+    return packed
+
+
+def context_id(context: Optional[Dict[str, Any]], key: str) -> Optional[int]:
+    """ID entier du contexte envoyé par le client ("12" comme 12), None si absent ou invalide"""
+    value = (context or {}).get(key)
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def fetch_procedure_sections(context: Optional[Dict[str, Any]]) -> List[ContextSection]:
+    """Étape en cours et résumé de la procédure (plan des étapes)"""
+    procedure_id = context_id(context, "procedure_id")
+    step_id = context_id(context, "step_id")
+    if not procedure_id and not step_id:
+        return []
+
+    sections = []
+    async with AsyncSessionLocal() as db:
+        step = None
+        if step_id:
+            step = await db.get(Step, step_id)
+            if step is not None and procedure_id and step.procedure_id != procedure_id:
+                step = None
+        procedure_id = procedure_id or (step.procedure_id if step is not None else None)
+        procedure = await db.get(Procedure, procedure_id) if procedure_id else None
+        outline = (await db.execute(
+            select(Step.id, Step.order, Step.title).where(Step.procedure_id == procedure_id).order_by(Step.order)
+        )).all() if procedure is not None else []
+
+    if step is not None:
+        text = "\n".join(part for part in (step.description, step.instructions) if part) or step.title
+        sections.append(ContextSection(
+            f"Étape en cours ({step.order}): {step.title}", text, priority=0,
+            source={"document_type": "step", "document_id": step.id}
+        ))
+    if procedure is not None:
+        lines = [procedure.description] if procedure.description else []
+        if outline:
+            lines.append("Étapes: " + "; ".join(f"{order}. {title}" for _, order, title in outline))
+        sections.append(ContextSection(
+            f"Procédure: {procedure.title}" + (f" ({procedure.category})" if procedure.category else ""),
+            "\n".join(lines) or procedure.title, priority=1,
+            source={"document_type": "procedure", "document_id": procedure.id}
+        ))
+    return sections
+
+
+def search_related_sections(
+    embedding: List[float],
+    exclude_procedure_id: Optional[int] = None,
+    top_k: int = 3,
+    threshold: float = 0.4
+) -> List[ContextSection]:
+    """Passages proches de la question (appel bloquant: depuis l'async, via asyncio.to_thread)"""
+    from app.services.vector_search import VectorSearchService
+
+    db = SessionLocal()
+    try:
+        per_type = VectorSearchService(db).search_top_k_per_type(
+            embedding, ["procedure", "tip"], limit=top_k + 1, threshold=threshold
+        )
+    finally:
+        db.close()
+
+    hits = sorted(
+        (hit for hits in per_type.values() for hit in hits
+         # La procédure en cours est déjà dans le contexte
+         if not (hit["document_type"] == "procedure" and hit["document_id"] == exclude_procedure_id)),
+        key=lambda hit: hit["similarity"], reverse=True
+    )[:top_k]
+    kinds = {"procedure": "Procédure liée", "tip": "Astuce"}
+    return [
+        ContextSection(
+            f"{kinds.get(hit['document_type'], hit['document_type'])}: {hit['metadata'].get('title') or hit['document_id']}",
+            hit["content"] or "", priority=10 + rank,
+            source={"document_type": hit["document_type"], "document_id": hit["document_id"],
+                    "similarity": round(hit["similarity"], 4)}
+        )
+        for rank, hit in enumerate(hits)
+        if hit["content"]
+    ]
+
+
+async def retrieve_chat_context(
+    context: Optional[Dict[str, Any]],
+    embedding: Optional[Awaitable[Optional[List[float]]]] = None,
+    max_tokens: Optional[int] = None,
+    top_k: Optional[int] = None
+) -> ChatContext:
+    """
+    Récupérer en parallèle procédure/étape et passages proches, puis empaqueter
+
+    Args:
+        embedding: embedding de la question en cours de calcul (tâche partagée
+            avec le cache sémantique), None pour ne pas faire de recherche
+    """
+    started = time.perf_counter()
+    top_k = settings.CHAT_RAG_TOP_K if top_k is None else top_k
+    timings: Dict[str, float] = {}
+
+    async def timed(name: str, awaitable):
+        stage = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[name] = round((time.perf_counter() - stage) * 1000, 3)
+
+    async def related() -> List[ContextSection]:
+        query_embedding = await embedding if embedding is not None else None
+        if not query_embedding or top_k <= 0:
+            return []
+        return await asyncio.to_thread(
+            search_related_sections, query_embedding, context_id(context, "procedure_id"),
+            top_k, settings.CHAT_RAG_THRESHOLD
+        )
+
+    procedure, vector = await asyncio.gather(
+        timed("procedure", fetch_procedure_sections(context)),
+        timed("vector", related()),
+        return_exceptions=True
+    )
+    sections = []
+    for found in (procedure, vector):
+        if isinstance(found, BaseException):
+            if not isinstance(found, Exception):
+                raise found
+            app_logger.error("Erreur récupération du contexte du chat", error=found)
+            continue
+        sections.extend(found)
+
+    stage = time.perf_counter()
+    packed = pack_sections(sections, settings.CHAT_RAG_MAX_TOKENS if max_tokens is None else max_tokens)
+    timings["pack"] = round((time.perf_counter() - stage) * 1000, 3)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+    packed.timings_ms = timings
+    return packed
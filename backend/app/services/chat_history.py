@@ -0,0 +1,97 @@
+"""
+Enregistrement des messages du chat hors du chemin de la réponse
+
+Le texte streamé est enregistré tel quel, avec l'usage (tokens) et le temps
+au premier token, dans une tâche de fond: le client reçoit [DONE] sans
+attendre l'écriture en base. En SQLite (un seul écrivain), ces écritures
+passent l'une après l'autre: en rafale, les connexions en attente du verrou
+se relaient mal et certaines dépassaient le délai d'attente ("database is
+locked", message perdu).
+"""
+
+import asyncio
+import weakref
+from typing import Any, Dict, Optional, Set
+from app.core.database import AsyncSessionLocal, get_async_engine
+from app.core.logger import app_logger
+from app.models.chat import ChatMessage
+from app.services.ai_service import ChatStreamResult
+
+# Références fortes: une tâche non référencée peut être détruite avant la fin
+_pending: Set[asyncio.Task] = set()
+# Un verrou par boucle d'événements (tests, scripts, plusieurs instances)
+_sqlite_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _sqlite_write_lock() -> asyncio.Lock:
+    """Verrou des écritures SQLite de la boucle courante, créé au premier usage"""
+    loop = asyncio.get_running_loop()
+    lock = _sqlite_write_locks.get(loop)
+    if lock is None:
+        lock = _sqlite_write_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def save_chat_message(
+    user_id: int,
+    message: str,
+    context: Optional[Dict[str, Any]],
+    result: ChatStreamResult
+) -> int:
+    """Enregistrer un échange streamé, retourne l'ID du message"""
+    result.finish()
+    if get_async_engine().dialect.name == "sqlite":
+        async with _sqlite_write_lock():
+            return await _insert_chat_message(user_id, message, context, result)
+    return await _insert_chat_message(user_id, message, context, result)
+
+
+async def _insert_chat_message(
+    user_id: int,
+    message: str,
+    context: Optional[Dict[str, Any]],
+    result: ChatStreamResult
+) -> int:
+    async with AsyncSessionLocal() as db:
+        chat_message = ChatMessage(
+            user_id=user_id,
+            message=message,
+            response=result.text,
+            context=context,
+            model=result.model,
+            prompt_tokens=result.prompt_tokens,
+            completion_tokens=result.completion_tokens,
+            total_tokens=result.total_tokens,
+            time_to_first_token_ms=result.time_to_first_token_ms,
+            duration_ms=result.duration_ms,
+            finish_reason=result.finish_reason
+        )
+        db.add(chat_message)
+        await db.commit()
+        return chat_message.id
+
+
+async def _save_logged(user_id: int, message: str, context: Optional[Dict[str, Any]], result: ChatStreamResult):
+    try:
+        await save_chat_message(user_id, message, context, result)
+    except Exception as e:
+        app_logger.error("Échec de l'enregistrement du message de chat", e, {"user_id": user_id})
+
+
+def save_chat_message_later(
+    user_id: int,
+    message: str,
+    context: Optional[Dict[str, Any]],
+    result: ChatStreamResult
+) -> asyncio.Task:
+    """Planifier l'enregistrement sans l'attendre (erreurs journalisées)"""
+    task = asyncio.get_running_loop().create_task(_save_logged(user_id, message, context, result))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return task
+
+
+async def wait_pending_chat_messages(timeout: float = 10.0):
+    """Attendre les enregistrements en cours (arrêt de l'application)"""
+    if _pending:
+        await asyncio.wait(set(_pending), timeout=timeout)
@@ -0,0 +1,243 @@
+"""
+Statistiques d'exécution tenues à jour à chaque écriture
+
+Chaque écriture (exécution créée / terminée, étape mise à jour ou
+synchronisée) enregistre des variations de compteurs, écrites en fin de
+requête dans la même transaction par un upsert atomique par table
+(INSERT ... ON CONFLICT DO UPDATE SET n = n + excluded.n): pas de
+lecture-modification-écriture, donc pas de mise à jour perdue entre
+requêtes concurrentes. Une transition d'étape retire l'ancien état avant
+d'ajouter le nouveau (complétée -> passée, nouvelle validation).
+
+Les tableaux de bord lisent ces résumés: quelques lignes par procédure,
+quelle que soit la taille de l'historique. La médiane des durées est
+estimée à partir d'un histogramme à bornes fixes (DURATION_BUCKETS).
+rebuild_execution_stats() recalcule tout depuis l'historique (après la
+migration, ou pour vérifier les compteurs).
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.models.execution import (
+    Execution, ExecutionStatus, StepExecution,
+    ProcedureExecutionStats, ProcedureDurationBucket, StepExecutionStats,
+)
+
+# Bornes supérieures (secondes) des classes de durée d'exécution; au-delà: dernière classe
+DURATION_BUCKETS: Tuple[int, ...] = (
+    60, 120, 300, 600, 900, 1200, 1800, 2700, 3600, 5400, 7200, 10800, 14400, 28800, 86400
+)
+
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """UTC sans fuseau, comme datetime.utcnow() (comparaisons entre horodatages client et base)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def seconds_between(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+    """Durée en secondes (0 si les horloges se contredisent), None si une borne manque"""
+    if start is None or end is None:
+        return None
+    return max(0.0, (utc_naive(end) - utc_naive(start)).total_seconds())
+
+
+def duration_bucket(seconds: float) -> int:
+    """Classe d'une durée: DURATION_BUCKETS[i - 1] < secondes <= DURATION_BUCKETS[i]"""
+    return bisect_left(DURATION_BUCKETS, seconds)
+
+
+def step_duration(
+    completed_at: datetime,
+    execution_started_at: Optional[datetime],
+    other_completions: Iterable[Optional[datetime]]
+) -> Optional[float]:
+    """Temps passé sur une étape: depuis la validation précédente de l'exécution, ou son début"""
+    completed_at = utc_naive(completed_at)
+    previous = max(
+        (utc_naive(other) for other in other_completions if other is not None and utc_naive(other) <= completed_at),
+        default=None
+    )
+    return seconds_between(previous or execution_started_at, completed_at)
+
+
+def estimate_quantile(buckets: Dict[int, int], quantile: float) -> Optional[float]:
+    """Quantile estimé par interpolation linéaire dans sa classe (erreur bornée par la largeur de la classe)"""
+    total = sum(buckets.values())
+    if not total:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    for bucket in sorted(buckets):
+        count = buckets[bucket]
+        if count and cumulative + count >= rank:
+            lower = DURATION_BUCKETS[bucket - 1] if bucket else 0
+            if bucket >= len(DURATION_BUCKETS):
+                return float(lower)
+            return lower + (DURATION_BUCKETS[bucket] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return float(DURATION_BUCKETS[-1])
+
+
+class ExecutionStatsDelta:
+    """Variations des compteurs au cours d'une transaction, écrites par flush()"""
+
+    def __init__(self):
+        self.procedures: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.buckets: Dict[Tuple[int, int], int] = defaultdict(int)
+        self.steps: Dict[int, Dict[str, float]] = {}
+
+    def execution_started(self, procedure_id: int):
+        self.procedures[procedure_id]["executions_started"] += 1
+
+    def execution_completed(self, procedure_id: int, duration: Optional[float]):
+        counters = self.procedures[procedure_id]
+        counters["executions_completed"] += 1
+        if duration is not None:
+            counters["total_duration_seconds"] += duration
+            self.buckets[(procedure_id, duration_bucket(duration))] += 1
+
+    def step_changed(
+        self,
+        procedure_id: int,
+        step_id: int,
+        old_status: Optional[str],
+        old_duration: Optional[float],
+        new_status: str,
+        new_duration: Optional[float]
+    ):
+        """Transition d'une étape: l'ancien état est retiré, le nouveau ajouté"""
+        counters = self.steps.setdefault(step_id, {
+            "procedure_id": procedure_id, "completed_count": 0, "skipped_count": 0,
+            "timed_count": 0, "total_duration_seconds": 0.0,
+        })
+        for status, duration, sign in ((old_status, old_duration, -1), (new_status, new_duration, 1)):
+            if status == "completed":
+                counters["completed_count"] += sign
+                if duration is not None:
+                    counters["timed_count"] += sign
+                    counters["total_duration_seconds"] += sign * duration
+            elif status == "skipped":
+                counters["skipped_count"] += sign
+
+    def statements(self, dialect: str) -> List[tuple]:
+        """(requête, lignes): un upsert incrémental (executemany) par table modifiée"""
+        if dialect not in _DIALECT_INSERTS:
+            raise NotImplementedError(f"Statistiques d'exécution non supportées pour {dialect}")
+        statements = []
+        procedure_rows = [
+            {
+                "procedure_id": procedure_id,
+                "executions_started": int(counters["executions_started"]),
+                "executions_completed": int(counters["executions_completed"]),
+                "total_duration_seconds": counters["total_duration_seconds"],
+            }
+            for procedure_id, counters in self.procedures.items()
+        ]
+        if procedure_rows:
+            statements.append(self._increment(
+                dialect, ProcedureExecutionStats, ["procedure_id"], procedure_rows, touch="updated_at"
+            ))
+        bucket_rows = [
+            {"procedure_id": procedure_id, "bucket": bucket, "count": count}
+            for (procedure_id, bucket), count in self.buckets.items()
+        ]
+        if bucket_rows:
+            statements.append(self._increment(dialect, ProcedureDurationBucket, ["procedure_id", "bucket"], bucket_rows))
+        step_rows = [
+            {"step_id": step_id, **counters} for step_id, counters in self.steps.items()
+            if any(counters[column] for column in ("completed_count", "skipped_count", "timed_count", "total_duration_seconds"))
+        ]
+        if step_rows:
+            statements.append(self._increment(
+                dialect, StepExecutionStats, ["step_id"], step_rows, fixed=("procedure_id",)
+            ))
+        return statements
+
+    @staticmethod
+    def _increment(dialect: str, model, keys: List[str], rows: List[dict], fixed=(), touch: Optional[str] = None):
+        table = model.__table__
+        statement = _DIALECT_INSERTS[dialect](table)
+        counters = [column for column in rows[0] if column not in keys and column not in fixed]
+        values = {column: table.c[column] + statement.excluded[column] for column in counters}
+        if touch:
+            values[touch] = func.now()
+        return statement.on_conflict_do_update(index_elements=keys, set_=values), rows
+
+    async def flush(self, db: AsyncSession):
+        """Écrire les variations dans la transaction en cours (avant commit)"""
+        for statement, rows in self.statements(db.get_bind().dialect.name):
+            await db.execute(statement, rows)
+        self.__init__()
+
+
+async def load_previous_completion(db: AsyncSession, execution_id: int, step_id: int) -> Optional[datetime]:
+    """Dernière validation d'une autre étape de l'exécution (index execution_id, step_id)"""
+    return await db.scalar(
+        select(func.max(StepExecution.completed_at)).where(
+            StepExecution.execution_id == execution_id,
+            StepExecution.step_id != step_id,
+            StepExecution.status == "completed"
+        )
+    )
+
+
+def rebuild_execution_stats(db: Session, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Recalculer résumés et durées d'étapes depuis l'historique complet
+
+    Parcours par lots (yield_per); remplace le contenu des tables de
+    statistiques dans la transaction de la session (commit par l'appelant).
+    Les durées d'étapes déjà relevées sont conservées, les manquantes
+    reconstituées.
+    """
+    delta = ExecutionStatsDelta()
+    durations = []
+    executions = 0
+    result = db.execute(
+        select(Execution)
+        .options(selectinload(Execution.step_executions))
+        .order_by(Execution.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for execution in result.scalars():
+        executions += 1
+        delta.execution_started(execution.procedure_id)
+        if execution.status == ExecutionStatus.COMPLETED.value:
+            delta.execution_completed(
+                execution.procedure_id, seconds_between(execution.started_at, execution.completed_at)
+            )
+        for step_execution in execution.step_executions:
+            duration = None
+            if step_execution.status == "completed":
+                # Durée relevée à la validation si connue (une étape revalidée depuis déplace
+                # completed_at); sinon (historique antérieur) reconstituée depuis les validations
+                duration = step_execution.duration_seconds
+                if duration is None and step_execution.completed_at is not None:
+                    others = [
+                        other.completed_at for other in execution.step_executions
+                        if other is not step_execution and other.status == "completed"
+                    ]
+                    duration = step_duration(step_execution.completed_at, execution.started_at, others)
+            if duration != step_execution.duration_seconds:
+                durations.append({"id": step_execution.id, "duration_seconds": duration})
+            delta.step_changed(
+                execution.procedure_id, step_execution.step_id, None, None, step_execution.status, duration
+            )
+
+    for model in (ProcedureDurationBucket, StepExecutionStats, ProcedureExecutionStats):
+        db.execute(delete(model))
+    for start in range(0, len(durations), batch_size):
+        db.execute(update(StepExecution), durations[start:start + batch_size])
+    for statement, rows in delta.statements(db.get_bind().dialect.name):
+        db.execute(statement, rows)
+    return {"executions": executions, "durations_updated": len(durations), "steps": len(delta.steps)}
@@ -0,0 +1,342 @@
+"""
+Recherche plein texte sur les procédures, étapes et tips
+- SQLite : tables virtuelles FTS5 synchronisées par triggers
+- PostgreSQL : colonnes tsvector générées (configuration 'french') + index GIN
+"""
+
+from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+import html
+import re
+
+# Sources indexées: table, colonnes (par poids décroissant en SQLite), colonne de
+# l'extrait, jointure éventuelle, colonne is_active à vérifier (procédures
+# désactivées exclues) et colonnes supplémentaires retournées
+FULLTEXT_SOURCES = {
+    "procedure": {
+        "table": "procedures",
+        "columns": ["title", "description", "tags"],
+        "weights": [10.0, 2.0, 4.0],
+        "body": "description",
+        "join": None,
+        "active_column": "src.is_active",
+        "extra": [],
+        "has_category": True,
+    },
+    "step": {
+        "table": "steps",
+        "columns": ["title", "instructions", "description"],
+        "weights": [10.0, 2.0, 2.0],
+        "body": "instructions",
+        "join": "JOIN procedures parent ON parent.id = src.procedure_id",
+        "active_column": "parent.is_active",
+        "extra": ["procedure_id"],
+        "has_category": False,
+    },
+    "tip": {
+        "table": "tips",
+        "columns": ["title", "content", "tags"],
+        "weights": [10.0, 2.0, 4.0],
+        "body": "content",
+        "join": None,
+        "active_column": None,
+        "extra": [],
+        "has_category": True,
+    },
+}
+
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+# Marqueurs posés par highlight()/snippet()/ts_headline (caractères d'usage
+# privé), remplacés par <mark> après échappement HTML du texte stocké
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_END = "\ue001"
+
+
+def query_terms(query: str) -> List[str]:
+    """Découper une requête utilisateur en termes sûrs (lettres/chiffres)"""
+    return re.findall(r"\w+", query.lower())
+
+
+def highlight_html(value: Optional[str]) -> Optional[str]:
+    """Texte surligné en HTML sûr: contenu échappé, seuls les <mark> sont du balisage"""
+    if value is None:
+        return None
+    return html.escape(value).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+
+def fts5_match_expression(query: str, match_all: bool = True) -> Optional[str]:
+    """Expression MATCH FTS5: termes entre guillemets, en préfixe ("sg110"* trouve SG110CX)"""
+    terms = query_terms(query)
+    if not terms:
+        return None
+    return (" " if match_all else " OR ").join(f'"{term}"*' for term in terms)
+
+
+def tsquery_expression(query: str, match_all: bool = True) -> Optional[str]:
+    """Expression to_tsquery PostgreSQL, en préfixe (terme:*)"""
+    terms = query_terms(query)
+    if not terms:
+        return None
+    return (" & " if match_all else " | ").join(f"{term}:*" for term in terms)
+
+
+def ensure_fulltext_index(engine: Engine):
+    """
+    Créer les index FTS5 et leurs triggers (SQLite, idempotent)
+
+    Les triggers maintiennent l'index à chaque création/modification/suppression.
+    En PostgreSQL les index sont créés par les migrations Alembic
+    003_fulltext_search et 004_fulltext_steps.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        }
+        for source in FULLTEXT_SOURCES.values():
+            table = source["table"]
+            fts = f"{table}_fts"
+            columns = ", ".join(source["columns"])
+            new_values = ", ".join(f"new.{column}" for column in source["columns"])
+            old_values = ", ".join(f"old.{column}" for column in source["columns"])
+
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{columns}, content='{table}', content_rowid='id', tokenize='{FTS_TOKENIZER}')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            ))
+
+            # Première création: indexer les lignes existantes
+            if fts not in existing:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+class FullTextSearchService:
+    """Recherche plein texte classée (bm25 en SQLite, ts_rank_cd en PostgreSQL)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    def search(
+        self,
+        query: str,
+        document_types: Optional[List[str]] = None,
+        limit: int = 20,
+        offset: int = 0,
+        match_all: bool = True,
+        highlight: bool = False,
+        category: Optional[str] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Rechercher par type de document
+
+        Args:
+            highlight: ajouter `title_highlight` et `snippet` (HTML échappé, termes entourés de <mark>)
+            category: filtrer les procédures/tips par catégorie (les étapes sont exclues)
+
+        Returns:
+            {document_type: [{document_type, document_id, title, score, ...}]} triés par pertinence
+        """
+        document_types = document_types or list(FULLTEXT_SOURCES)
+        results = {document_type: [] for document_type in document_types}
+
+        for document_type in document_types:
+            source = FULLTEXT_SOURCES.get(document_type)
+            if source is None or (category and not source["has_category"]):
+                continue
+            if self.dialect == "sqlite":
+                rows = self._search_sqlite(source, query, limit, offset, match_all, highlight, category)
+            else:
+                rows = self._search_postgres(source, query, limit, offset, match_all, highlight, category)
+
+            for row in rows:
+                result = {
+                    "document_type": document_type,
+                    "document_id": row.document_id,
+                    "title": row.title,
+                    "score": float(row.score),
+                }
+                for column in source["extra"]:
+                    result[column] = getattr(row, column)
+                if highlight:
+                    result["title_highlight"] = highlight_html(row.title_highlight)
+                    result["snippet"] = highlight_html(row.snippet)
+                results[document_type].append(result)
+
+        return results
+
+    def count(
+        self,
+        query: str,
+        document_types: Optional[List[str]] = None,
+        match_all: bool = True,
+        category: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Nombre de résultats par type de document"""
+        document_types = document_types or list(FULLTEXT_SOURCES)
+        counts = {}
+        for document_type in document_types:
+            source = FULLTEXT_SOURCES.get(document_type)
+            if source is None or (category and not source["has_category"]):
+                counts[document_type] = 0
+                continue
+            where, params = self._where(source, query, match_all, category)
+            if where is None:
+                counts[document_type] = 0
+                continue
+            if self.dialect == "sqlite" and not source["join"] and not source["active_column"] and not category:
+                # Pas de filtre sur la table source: compter dans l'index seul
+                fts = f"{source['table']}_fts"
+                sql = f"SELECT count(*) FROM {fts} WHERE {where}"
+            else:
+                sql = f"SELECT count(*) {self._from(source)} WHERE {where}"
+            counts[document_type] = self.db.execute(text(sql), params).scalar() or 0
+        return counts
+
+    def search_page(
+        self,
+        query: str,
+        document_types: Optional[List[str]] = None,
+        page: int = 1,
+        page_size: int = 20,
+        match_all: bool = True,
+        category: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Une page de résultats tous types confondus, classés par score, avec extraits
+
+        Chaque type fournit ses `page * page_size` meilleurs résultats, fusionnés
+        puis découpés: les extraits ne sont calculés que pour ces lignes.
+        """
+        offset = (page - 1) * page_size
+        per_type = self.search(
+            query, document_types, limit=offset + page_size, match_all=match_all,
+            highlight=True, category=category
+        )
+        merged = sorted(
+            (result for results in per_type.values() for result in results),
+            key=lambda result: result["score"],
+            reverse=True
+        )
+        counts = self.count(query, document_types, match_all, category)
+
+        return {
+            "total": sum(counts.values()),
+            "counts": counts,
+            "page": page,
+            "page_size": page_size,
+            "results": merged[offset:offset + page_size],
+        }
+
+    def _from(self, source: Dict[str, Any]) -> str:
+        if self.dialect == "sqlite":
+            fts = f"{source['table']}_fts"
+            clause = f"FROM {fts} JOIN {source['table']} src ON src.id = {fts}.rowid"
+        else:
+            clause = f"FROM {source['table']} src"
+        if source["join"]:
+            clause += f" {source['join']}"
+        return clause
+
+    def _active(self, column: str) -> str:
+        """
+        Prédicat "actif" valable pour les deux schémas PostgreSQL: is_active
+        entier (Alembic) ou booléen (Prisma; boolean = integer y est une erreur).
+        En SQLite, le "+" unaire écarte l'index (is_active, id): sans lui le
+        planificateur parcourt toutes les procédures actives et sonde l'index FTS
+        ligne par ligne au lieu de partir des correspondances FTS
+        """
+        if self.dialect == "sqlite":
+            return f"+{column} = 1"
+        return f"{column}::int = 1"
+
+    def _where(self, source: Dict[str, Any], query: str, match_all: bool, category: Optional[str]):
+        """Clause WHERE et paramètres, None si la requête ne contient aucun terme"""
+        if self.dialect == "sqlite":
+            expression = fts5_match_expression(query, match_all)
+            where = f"{source['table']}_fts MATCH :expression"
+        else:
+            expression = tsquery_expression(query, match_all)
+            where = "src.search_vector @@ to_tsquery('french', :expression)"
+        if expression is None:
+            return None, {}
+
+        params = {"expression": expression}
+        if source["active_column"]:
+            where += f" AND {self._active(source['active_column'])}"
+        if category:
+            where += " AND src.category = :category"
+            params["category"] = category
+        return where, params
+
+    def _search_sqlite(self, source, query, limit, offset, match_all, highlight, category):
+        where, params = self._where(source, query, match_all, category)
+        if where is None:
+            return []
+
+        fts = f"{source['table']}_fts"
+        weights = ", ".join(str(weight) for weight in source["weights"])
+        extra = "".join(f", src.{column} AS {column}" for column in source["extra"])
+        highlights = ""
+        if highlight:
+            body_index = source["columns"].index(source["body"])
+            highlights = (
+                f", highlight({fts}, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}') AS title_highlight"
+                f", snippet({fts}, {body_index}, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 24) AS snippet"
+            )
+        # bm25() est négatif: plus petit = plus pertinent
+        sql = f"""
+        SELECT src.id AS document_id, src.title AS title, -bm25({fts}, {weights}) AS score{extra}{highlights}
+        {self._from(source)}
+        WHERE {where}
+        ORDER BY bm25({fts}, {weights})
+        LIMIT :limit OFFSET :offset
+        """
+        return self.db.execute(text(sql), {**params, "limit": limit, "offset": offset}).fetchall()
+
+    def _search_postgres(self, source, query, limit, offset, match_all, highlight, category):
+        where, params = self._where(source, query, match_all, category)
+        if where is None:
+            return []
+
+        extra = "".join(f", src.{column} AS {column}" for column in source["extra"])
+        extra_outer = "".join(f", hits.{column}" for column in source["extra"])
+        # ts_headline est coûteux: calculé uniquement sur la page retenue
+        highlights = ""
+        if highlight:
+            highlights = (
+                f", ts_headline('french', hits.title, to_tsquery('french', :expression), "
+                f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, HighlightAll=true') AS title_highlight"
+                f", ts_headline('french', coalesce(hits.body, ''), to_tsquery('french', :expression), "
+                f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=24, MinWords=8') AS snippet"
+            )
+        sql = f"""
+        SELECT hits.document_id, hits.title, hits.score{extra_outer}{highlights}
+        FROM (
+            SELECT src.id AS document_id, src.title AS title, src.{source['body']} AS body,
+                   ts_rank_cd(src.search_vector, to_tsquery('french', :expression)) AS score{extra}
+            {self._from(source)}
+            WHERE {where}
+            ORDER BY score DESC
+            LIMIT :limit OFFSET :offset
+        ) hits
+        ORDER BY hits.score DESC
+        """
+        return self.db.execute(text(sql), {**params, "limit": limit, "offset": offset}).fetchall()
@@ -0,0 +1,117 @@
+"""
+Recherche hybride: plein texte + vectorielle, fusionnées par Reciprocal Rank Fusion
+Le plein texte attrape les codes d'erreur et références (2032, SG110CX),
+les embeddings les reformulations.
+"""
+
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
+import asyncio
+import time
+
+from app.services.fulltext_search import FullTextSearchService
+from app.services.vector_search import VectorSearchService
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    k: int = RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Fusionner plusieurs classements: score = somme des 1 / (k + rang)
+
+    Args:
+        rankings: {nom_du_classement: [documents triés]} (clé: document_type + document_id)
+    """
+    fused: Dict[tuple, Dict[str, Any]] = {}
+    for name, documents in rankings.items():
+        for rank, doc in enumerate(documents, start=1):
+            key = (doc["document_type"], doc["document_id"])
+            entry = fused.setdefault(key, {
+                "document_type": doc["document_type"],
+                "document_id": doc["document_id"],
+                "title": None,
+                "score": 0.0,
+                "ranks": {},
+            })
+            entry["score"] += 1.0 / (k + rank)
+            entry["ranks"][name] = rank
+            if not entry["title"]:
+                entry["title"] = doc.get("title") or (doc.get("metadata") or {}).get("title")
+
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+class HybridSearchService:
+    """Recherche hybride avec mesure de la latence de chaque étape"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.fulltext = FullTextSearchService(db)
+        self.vector = VectorSearchService(db)
+
+    async def search(
+        self,
+        query: str,
+        document_types: Optional[List[str]] = None,
+        limit: int = 10,
+        candidates: int = 50,
+        threshold: float = 0.3
+    ) -> Dict[str, Any]:
+        """
+        Rechercher et fusionner
+
+        L'embedding de la requête (appel réseau) est calculé dans un thread
+        pendant la recherche plein texte, elle aussi dans un thread (requête
+        synchrone FTS5/tsvector), comme la recherche vectorielle: la boucle
+        d'événements n'est jamais bloquée. La session n'est utilisée que par
+        un thread à la fois (plein texte, puis vectorielle).
+
+        Returns:
+            {"results": [...], "timings_ms": {étape: durée}}
+        """
+        document_types = document_types or ["procedure", "tip"]
+        timings = {}
+        started = time.perf_counter()
+
+        embedding_task = asyncio.create_task(asyncio.to_thread(self.vector.generate_embedding, query))
+
+        stage = time.perf_counter()
+        lexical = await asyncio.to_thread(
+            self.fulltext.search, query, document_types, limit=candidates, match_all=False
+        )
+        timings["lexical"] = (time.perf_counter() - stage) * 1000
+
+        stage = time.perf_counter()
+        query_embedding = await embedding_task
+        timings["embedding_wait"] = (time.perf_counter() - stage) * 1000
+
+        semantic = {document_type: [] for document_type in document_types}
+        stage = time.perf_counter()
+        if query_embedding:
+            semantic = await asyncio.to_thread(
+                self.vector.search_top_k_per_type,
+                query_embedding, document_types, limit=candidates, threshold=threshold
+            )
+        timings["vector"] = (time.perf_counter() - stage) * 1000
+
+        stage = time.perf_counter()
+        fused = reciprocal_rank_fusion({
+            "lexical": self._merge_by_score(lexical, "score"),
+            "vector": self._merge_by_score(semantic, "similarity"),
+        })[:limit]
+        timings["fusion"] = (time.perf_counter() - stage) * 1000
+        timings["total"] = (time.perf_counter() - started) * 1000
+
+        return {
+            "results": fused,
+            "timings_ms": {name: round(value, 3) for name, value in timings.items()},
+        }
+
+    @staticmethod
+    def _merge_by_score(per_type: Dict[str, List[Dict[str, Any]]], score_key: str) -> List[Dict[str, Any]]:
+        """Un classement unique tous types confondus"""
+        merged = [doc for documents in per_type.values() for doc in documents]
+        return sorted(merged, key=lambda doc: doc[score_key], reverse=True)
@@ -0,0 +1,157 @@
+"""
+Variantes réduites des photos (vignette, écran, entrée vision)
+
+Les photos de téléphone (4–8 Mo, 12 Mpx) sont réduites à une taille bornée,
+réorientées selon l'EXIF puis réencodées en JPEG sans métadonnées (GPS
+compris). Chaque variante est mise en cache sur disque sous le SHA-256 du
+fichier source: UPLOAD_DIR/.variants/<variante>/<sha[:2]>/<sha>.jpg. Le
+contenu d'une URL ne change jamais, d'où ETag fort et cache immuable.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from app.core.config import settings
+from app.core.upload import CONTENT_ADDRESSED_NAME
+
+VARIANTS_SUBFOLDER = ".variants"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+# Nom: (plus grand côté en pixels, qualité JPEG)
+VARIANTS: Dict[str, Tuple[int, int]] = {
+    "thumb": (320, 70),    # listes et vignettes d'étapes
+    "screen": (1280, 80),  # affichage plein écran sur mobile
+    "vision": (1024, 85),  # entrée du modèle de vision (au-delà, l'API réduit elle-même)
+}
+
+# Empreintes des sources non nommées par leur contenu (uploads antérieurs): (chemin, mtime, taille) -> sha256
+_source_hashes: Dict[Tuple[str, int, int], str] = {}
+_source_hashes_lock = threading.Lock()
+
+
+def is_image(path: Union[str, Path]) -> bool:
+    return Path(path).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def source_hash(source: Path) -> str:
+    """SHA-256 du fichier source (nom du fichier s'il est déjà adressé par contenu)"""
+    if CONTENT_ADDRESSED_NAME.match(source.stem):
+        return source.stem
+    stat = source.stat()
+    key = (str(source), stat.st_mtime_ns, stat.st_size)
+    with _source_hashes_lock:
+        cached = _source_hashes.get(key)
+    if cached is None:
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        cached = digest.hexdigest()
+        with _source_hashes_lock:
+            _source_hashes[key] = cached
+    return cached
+
+
+def variant_path(sha256: str, variant: str) -> Path:
+    return Path(settings.UPLOAD_DIR) / VARIANTS_SUBFOLDER / variant / sha256[:2] / f"{sha256}.jpg"
+
+
+def _load(source: Union[str, Path, BinaryIO], max_side: int) -> "Image.Image":
+    """Image orientée et en RGB, décodée à l'échelle utile"""
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow est requis pour les variantes d'images (pip install pillow)")
+    with Image.open(source) as image:
+        # JPEG: décodage directement à une échelle réduite (1/2, 1/4, 1/8), bien plus rapide
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            # Transparence: fond blanc
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        image.load()
+        return image
+
+
+def _encode(image: "Image.Image", variant: str) -> bytes:
+    max_side, quality = VARIANTS[variant]
+    image.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=3.0)
+    output = io.BytesIO()
+    # Réencodage sans EXIF (GPS compris)
+    image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def render_variant(source: Union[str, Path, BinaryIO], variant: str) -> bytes:
+    """JPEG réduit (plus grand côté borné, jamais agrandi) d'une image"""
+    return _encode(_load(source, VARIANTS[variant][0]), variant)
+
+
+def render_variants(source: Union[str, Path, BinaryIO], variants: Iterable[str]) -> Dict[str, bytes]:
+    """Plusieurs variantes pour un seul décodage (du plus grand au plus petit)"""
+    ordered = sorted(variants, key=lambda variant: VARIANTS[variant][0], reverse=True)
+    if not ordered:
+        return {}
+    image = _load(source, VARIANTS[ordered[0]][0])
+    rendered = {}
+    for variant in ordered:
+        # Chaque variante repart de la précédente, déjà réduite
+        rendered[variant] = _encode(image, variant)
+    return rendered
+
+
+def _write_atomic(target: Path, data: bytes):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+
+
+def ensure_variant(source: Path, variant: str, sha256: Optional[str] = None) -> Path:
+    """Chemin de la variante, générée au premier appel (écriture atomique)"""
+    target = variant_path(sha256 or source_hash(source), variant)
+    if not target.exists():
+        _write_atomic(target, render_variant(source, variant))
+    return target
+
+
+def generate_variants(relative_path: str, sha256: Optional[str] = None) -> Dict[str, str]:
+    """
+    Toutes les variantes d'une image uploadée (appel bloquant: asyncio.to_thread)
+
+    Returns:
+        {variante: URL}
+    """
+    source = Path(settings.UPLOAD_DIR) / relative_path
+    sha256 = sha256 or source_hash(source)
+    missing = [variant for variant in VARIANTS if not variant_path(sha256, variant).exists()]
+    for variant, data in render_variants(source, missing).items():
+        _write_atomic(variant_path(sha256, variant), data)
+    return {variant: variant_url(relative_path, variant) for variant in VARIANTS}
+
+
+def variant_url(relative_path: str, variant: str) -> str:
+    return f"{settings.API_V1_STR}/uploads/{variant}/{relative_path}"
+
+
+def resolve_source(relative_path: str) -> Optional[Path]:
+    """Image source sous UPLOAD_DIR (None si absente, hors du répertoire ou pas une image)"""
+    root = Path(settings.UPLOAD_DIR).resolve()
+    source = (root / relative_path).resolve()
+    if root not in source.parents or not is_image(source) or not source.is_file():
+        return None
+    if VARIANTS_SUBFOLDER in source.relative_to(root).parts:
+        return None
+    return source
@@ -2,47 +2,118 @@
 Service pour la gestion des procédures
 """
 
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy import Select, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, selectinload
+from app.core.pagination import paginate_by_id_async
 from app.models.procedure import Procedure, Step
 
 
 class ProcedureService:
     @staticmethod
-    def get_procedures(
-        db: Session,
+    def _filtered(statement: Select, category: Optional[str], is_active: bool) -> Select:
+        if is_active:
+            statement = statement.where(Procedure.is_active == 1)
+
+        if category:
+            statement = statement.where(Procedure.category == category)
+
+        return statement
+
+    @staticmethod
+    async def get_procedures(
+        db: AsyncSession,
         skip: int = 0,
         limit: int = 100,
         category: Optional[str] = None,
         is_active: bool = True
     ) -> List[Procedure]:
-        """Obtenir la liste des procédures"""
-        query = db.query(Procedure)
-        
-        if is_active:
-            query = query.filter(Procedure.is_active == 1)
-        
-        if category:
-            query = query.filter(Procedure.category == category)
-        
-        return query.offset(skip).limit(limit).all()
-    
+        """Obtenir la liste des procédures, étapes chargées en une requête (selectinload)"""
+        statement = ProcedureService._filtered(
+            select(Procedure).options(selectinload(Procedure.steps)), category, is_active
+        )
+        result = await db.scalars(statement.order_by(Procedure.id).offset(skip).limit(limit))
+        return list(result.all())
+
+    @staticmethod
+    async def get_procedures_page(
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        category: Optional[str] = None,
+        is_active: bool = True
+    ) -> Tuple[List[Procedure], Optional[str]]:
+        """Une page de procédures par curseur (clé: id), avec le curseur de la page suivante"""
+        statement = ProcedureService._filtered(
+            select(Procedure).options(selectinload(Procedure.steps)), category, is_active
+        )
+        return await paginate_by_id_async(db, statement, Procedure.id, cursor, limit)
+
     @staticmethod
-    def get_procedure_by_id(db: Session, procedure_id: int) -> Optional[Procedure]:
-        """Obtenir une procédure par ID"""
-        return db.query(Procedure).filter(Procedure.id == procedure_id).first()
-    
+    async def get_procedures_by_ids(db: AsyncSession, procedure_ids: List[int]) -> List[Procedure]:
+        """Obtenir des procédures dans l'ordre des IDs fournis (résultats de recherche)"""
+        if not procedure_ids:
+            return []
+        result = await db.scalars(
+            select(Procedure)
+            .options(selectinload(Procedure.steps))
+            .where(Procedure.id.in_(procedure_ids))
+        )
+        procedures = {procedure.id: procedure for procedure in result.all()}
+        return [procedures[procedure_id] for procedure_id in procedure_ids if procedure_id in procedures]
+
     @staticmethod
-    def create_procedure(
-        db: Session,
+    async def get_procedure_summaries(
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        category: Optional[str] = None,
+        is_active: bool = True
+    ) -> Tuple[List[Tuple[Procedure, int]], Optional[str]]:
+        """
+        Liste légère par curseur: procédures sans étapes ni logigramme,
+        avec leur nombre d'étapes (une requête par page)
+        """
+        step_count = (
+            select(func.count(Step.id))
+            .where(Step.procedure_id == Procedure.id)
+            .correlate(Procedure)
+            .scalar_subquery()
+        )
+        statement = ProcedureService._filtered(
+            select(Procedure, step_count.label("step_count")).options(defer(Procedure.flowchart_data)),
+            category,
+            is_active
+        )
+        rows, next_cursor = await paginate_by_id_async(
+            db, statement, Procedure.id, cursor, limit, id_of=lambda row: row[0].id, scalars=False
+        )
+        return [(procedure, count) for procedure, count in rows], next_cursor
+
+    @staticmethod
+    async def get_procedure_by_id(db: AsyncSession, procedure_id: int) -> Optional[Procedure]:
+        """Obtenir une procédure par ID, avec ses étapes"""
+        # populate_existing: recharger aussi les attributs expirés par un flush (updated_at)
+        return await db.scalar(
+            select(Procedure)
+            .options(selectinload(Procedure.steps))
+            .where(Procedure.id == procedure_id)
+            .execution_options(populate_existing=True)
+        )
+
+    @staticmethod
+    async def create_procedure(
+        db: AsyncSession,
         title: str,
         description: Optional[str],
         category: Optional[str],
         tags: List[str],
         created_by: int,
-        flowchart_data: Optional[dict] = None
+        flowchart_data: Optional[dict] = None,
+        steps: Optional[List[dict]] = None
     ) -> Procedure:
-        """Créer une nouvelle procédure"""
+        """Créer une nouvelle procédure et ses étapes"""
         procedure = Procedure(
             title=title,
             description=description,
@@ -52,6 +123,14 @@ class ProcedureService:
             flowchart_data=flowchart_data
         )
         db.add(procedure)
-        db.commit()
-        db.refresh(procedure)
-        return procedure
+        await db.flush()
+
+        # Étapes en un seul INSERT (executemany) plutôt qu'un INSERT ... RETURNING par étape
+        if steps:
+            await db.execute(insert(Step), [
+                {**step, "procedure_id": procedure.id}
+                for step in sorted(steps, key=lambda step: step["order"])
+            ])
+        await db.commit()
+        # Un seul rechargement, étapes comprises
+        return await ProcedureService.get_procedure_by_id(db, procedure.id)
@@ -0,0 +1,144 @@
+"""
+Cache des réponses du chat IA
+
+Clé: modèle, prompt système, message normalisé (unicode, casse, espaces) et
+contexte en JSON canonique. Mémoire LRU + TTL bornée en octets, niveau disque
+SQLite optionnel partagé par les workers (CHAT_CACHE_PATH).
+Chaque hit compte les tokens, le coût et la latence économisés.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, Optional
+from app.core.cache import SQLiteCacheStore, TTLCache, canonical_json, normalize_query
+from app.core.config import settings
+from app.core.metrics import MetricFamily, register_collector
+
+# Prix publics en dollars par million de tokens (entrée, sortie)
+MODEL_PRICES_PER_MTOK = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+
+def response_cost(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> float:
+    """Coût estimé d'un appel en dollars (0 si le modèle ou l'usage est inconnu)"""
+    input_price, output_price = MODEL_PRICES_PER_MTOK.get(model, (0.0, 0.0))
+    return ((prompt_tokens or 0) * input_price + (completion_tokens or 0) * output_price) / 1_000_000
+
+
+class ChatResponseCache:
+    """Réponses du chat avec compteurs d'économies (thread-safe)"""
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self.tokens_saved = 0
+        self.cost_saved = 0.0
+        self.latency_saved_ms = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, system_prompt: str, message: str, context: Optional[Dict[str, Any]]) -> str:
+        parts = [
+            model,
+            hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+            normalize_query(message),
+            canonical_json(context or {}),
+        ]
+        return "chat:" + hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Entrée en cache ({response, model, prompt_tokens, completion_tokens, duration_ms}) ou None"""
+        entry = self.cache.get(key)
+        if entry is not None:
+            with self._lock:
+                self.tokens_saved += (entry.get("prompt_tokens") or 0) + (entry.get("completion_tokens") or 0)
+                self.cost_saved += response_cost(
+                    entry.get("model"), entry.get("prompt_tokens"), entry.get("completion_tokens")
+                )
+                self.latency_saved_ms += entry.get("duration_ms") or 0
+        return entry
+
+    def set(
+        self,
+        key: str,
+        response: str,
+        model: str,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        duration_ms: Optional[int] = None
+    ):
+        self.cache.set(key, {
+            "response": response,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "duration_ms": duration_ms,
+        })
+
+    def clear(self):
+        self.cache.clear()
+        with self._lock:
+            self.tokens_saved = 0
+            self.cost_saved = 0.0
+            self.latency_saved_ms = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            savings = {
+                "tokens_saved": self.tokens_saved,
+                "cost_saved_usd": round(self.cost_saved, 6),
+                "latency_saved_ms": self.latency_saved_ms,
+            }
+        return {
+            **self.cache.stats(),
+            "ttl": self.cache.ttl,
+            "disk": str(self.cache.disk.path) if self.cache.disk is not None else None,
+            **savings,
+        }
+
+
+_chat_response_cache: Optional[ChatResponseCache] = None
+_chat_response_cache_lock = threading.Lock()
+
+
+def get_chat_response_cache() -> Optional[ChatResponseCache]:
+    """Cache des réponses du chat, partagé par tout le processus (None si désactivé)"""
+    global _chat_response_cache
+    if not settings.CHAT_CACHE_ENABLED:
+        return None
+    if _chat_response_cache is None:
+        with _chat_response_cache_lock:
+            if _chat_response_cache is None:
+                disk = None
+                if settings.CHAT_CACHE_PATH:
+                    disk = SQLiteCacheStore(settings.CHAT_CACHE_PATH, table="chat_responses")
+                    disk.purge_expired()
+                _chat_response_cache = ChatResponseCache(TTLCache(
+                    max_entries=settings.CHAT_CACHE_SIZE,
+                    ttl=settings.CHAT_CACHE_TTL,
+                    disk=disk,
+                    max_bytes=settings.CHAT_CACHE_MAX_BYTES
+                ))
+    return _chat_response_cache
+
+
+@register_collector
+def collect_chat_cache_metrics() -> Iterable[MetricFamily]:
+    cache = _chat_response_cache
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        MetricFamily("chat_cache_hits_total", "counter", "Réponses servies depuis le cache")
+        .add(stats["hits"], {"tier": "memory"})
+        .add(stats["disk_hits"], {"tier": "disk"}),
+        MetricFamily("chat_cache_misses_total", "counter", "Réponses absentes du cache").add(stats["misses"]),
+        MetricFamily("chat_cache_evictions_total", "counter", "Réponses évincées (entrées ou octets)").add(stats["evictions"]),
+        MetricFamily("chat_cache_entries", "gauge", "Réponses en mémoire").add(stats["entries"]),
+        MetricFamily("chat_cache_bytes", "gauge", "Taille des réponses en mémoire").add(stats["bytes"]),
+        MetricFamily("chat_cache_tokens_saved_total", "counter", "Tokens non consommés grâce au cache").add(stats["tokens_saved"]),
+        MetricFamily("chat_cache_cost_saved_usd_total", "counter", "Coût estimé économisé (dollars)").add(stats["cost_saved_usd"]),
+        MetricFamily("chat_cache_latency_saved_seconds_total", "counter", "Latence des appels évités")
+        .add(stats["latency_saved_ms"] / 1000),
+    ]
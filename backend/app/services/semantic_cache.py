@@ -0,0 +1,247 @@
+"""
+Cache sémantique des réponses du chat (questions reformulées)
+
+L'embedding de la question est comparé (cosinus) à ceux des questions déjà
+répondues dans la même partition: même modèle et même prompt système, donc
+même procédure/étape de contexte. Au-dessus du seuil, la réponse enregistrée
+est servie sans appel au modèle.
+
+En mémoire, par processus: éviction LRU (nombre d'entrées) et TTL.
+Seuil à choisir avec scripts/eval_semantic_cache.py (hit rate vs réponses erronées).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from app.core.config import settings
+from app.core.metrics import MetricFamily, register_collector
+from app.services.response_cache import response_cost
+
+
+def partition_key(model: str, system_prompt: str) -> str:
+    """Partition: les réponses ne sont réutilisées qu'à prompt système identique"""
+    return hashlib.sha256(f"{model}\0{system_prompt}".encode("utf-8")).hexdigest()
+
+
+class _Partition:
+    """
+    Vecteurs normalisés (une ligne par entrée) et IDs des entrées
+
+    Matrice préallouée, doublée quand elle est pleine: un ajout ne recopie pas
+    toutes les lignes. Une suppression déplace la dernière ligne à sa place
+    (l'ordre des lignes est sans importance pour la recherche).
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, dimensions: int):
+        self.ids: List[int] = []
+        self._rows: Dict[int, int] = {}
+        self._matrix = np.empty((self.INITIAL_CAPACITY, dimensions), dtype=np.float32)
+
+    @property
+    def vectors(self) -> "np.ndarray":
+        """Lignes occupées (vue, sans copie)"""
+        return self._matrix[:len(self.ids)]
+
+    def add(self, entry_id: int, vector: "np.ndarray"):
+        row = len(self.ids)
+        if row == self._matrix.shape[0]:
+            grown = np.empty((row * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:row] = self._matrix
+            self._matrix = grown
+        self._matrix[row] = vector
+        self.ids.append(entry_id)
+        self._rows[entry_id] = row
+
+    def remove(self, entry_id: int):
+        row = self._rows.pop(entry_id)
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self._matrix[row] = self._matrix[last]
+            self._rows[moved] = row
+        self.ids.pop()
+
+
+class SemanticResponseCache:
+    """Réponses indexées par l'embedding de leur question (thread-safe)"""
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 2000, ttl: Optional[float] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._partitions: Dict[str, _Partition] = {}
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._lru: "OrderedDict[int, str]" = OrderedDict()  # entry_id -> partition
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+        self.cost_saved = 0.0
+        self.latency_saved_ms = 0
+        self.hit_similarity_sum = 0.0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> "np.ndarray":
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, partition: str, embedding: List[float]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Entrée la plus proche au-dessus du seuil et sa similarité, None sinon"""
+        vector = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            candidates = self._partitions.get(partition)
+            if candidates is not None and candidates.ids and candidates.vectors.shape[1] == vector.shape[0]:
+                similarities = candidates.vectors @ vector
+                # Meilleure entrée non expirée au-dessus du seuil
+                for row in np.argsort(-similarities):
+                    similarity = float(similarities[row])
+                    if similarity < self.threshold:
+                        break
+                    entry_id = candidates.ids[row]
+                    entry = self._entries[entry_id]
+                    if entry["expires_at"] is not None and entry["expires_at"] <= now:
+                        continue
+                    self._lru.move_to_end(entry_id)
+                    self.hits += 1
+                    self.hit_similarity_sum += similarity
+                    self.tokens_saved += (entry["prompt_tokens"] or 0) + (entry["completion_tokens"] or 0)
+                    self.cost_saved += response_cost(entry["model"], entry["prompt_tokens"], entry["completion_tokens"])
+                    self.latency_saved_ms += entry["duration_ms"] or 0
+                    return entry, similarity
+            self.misses += 1
+        return None
+
+    def add(
+        self,
+        partition: str,
+        question: str,
+        embedding: List[float],
+        response: str,
+        model: str,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        duration_ms: Optional[int] = None
+    ):
+        """Enregistrer une réponse (les entrées les moins récemment servies sont évincées)"""
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._purge_expired()
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "question": question,
+                "response": response,
+                "model": model,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "duration_ms": duration_ms,
+                "expires_at": time.monotonic() + self.ttl if self.ttl else None,
+            }
+            target = self._partitions.get(partition)
+            if target is None or target.vectors.shape[1] != vector.shape[0]:
+                # Nouvelle partition (ou changement de modèle d'embeddings)
+                if target is not None:
+                    for old_id in list(target.ids):
+                        self._remove(old_id)
+                target = self._partitions[partition] = _Partition(vector.shape[0])
+            target.add(entry_id, vector)
+            self._lru[entry_id] = partition
+            while len(self._lru) > self.max_entries:
+                self._remove(next(iter(self._lru)))
+                self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        partition = self._lru.pop(entry_id)
+        self._entries.pop(entry_id, None)
+        target = self._partitions[partition]
+        target.remove(entry_id)
+        if not target.ids:
+            del self._partitions[partition]
+
+    def _purge_expired(self):
+        if not self.ttl:
+            return
+        now = time.monotonic()
+        for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry["expires_at"] <= now]:
+            self._remove(entry_id)
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._entries.clear()
+            self._lru.clear()
+            self.hits = self.misses = self.evictions = self.tokens_saved = self.latency_saved_ms = 0
+            self.cost_saved = self.hit_similarity_sum = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "partitions": len(self._partitions),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "mean_hit_similarity": round(self.hit_similarity_sum / self.hits, 4) if self.hits else None,
+                "tokens_saved": self.tokens_saved,
+                "cost_saved_usd": round(self.cost_saved, 6),
+                "latency_saved_ms": self.latency_saved_ms,
+            }
+
+
+_semantic_cache: Optional[SemanticResponseCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticResponseCache]:
+    """Cache sémantique du processus (None si désactivé ou NumPy absent)"""
+    global _semantic_cache
+    if not settings.SEMANTIC_CACHE_ENABLED or not NUMPY_AVAILABLE:
+        return None
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticResponseCache(
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                    max_entries=settings.SEMANTIC_CACHE_SIZE,
+                    ttl=settings.SEMANTIC_CACHE_TTL
+                )
+    return _semantic_cache
+
+
+@register_collector
+def collect_semantic_cache_metrics() -> Iterable[MetricFamily]:
+    cache = _semantic_cache
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        MetricFamily("chat_semantic_cache_hits_total", "counter", "Réponses servies pour une question reformulée").add(stats["hits"]),
+        MetricFamily("chat_semantic_cache_misses_total", "counter", "Questions sans voisine au-dessus du seuil").add(stats["misses"]),
+        MetricFamily("chat_semantic_cache_evictions_total", "counter", "Entrées évincées (LRU)").add(stats["evictions"]),
+        MetricFamily("chat_semantic_cache_entries", "gauge", "Questions indexées").add(stats["entries"]),
+        MetricFamily("chat_semantic_cache_tokens_saved_total", "counter", "Tokens non consommés").add(stats["tokens_saved"]),
+        MetricFamily("chat_semantic_cache_cost_saved_usd_total", "counter", "Coût estimé économisé (dollars)").add(stats["cost_saved_usd"]),
+    ]
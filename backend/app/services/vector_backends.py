@@ -0,0 +1,417 @@
+"""
+Backends de stockage/recherche des embeddings
+- PgVectorBackend : table document_embeddings (PostgreSQL + pgvector)
+- LocalVectorIndex : index NumPy embarqué, persisté à côté de la base SQLite
+"""
+
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import json
+import os
+import shutil
+import threading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from app.core.config import settings
+
+
+def _format_result(
+    id: int,
+    document_type: str,
+    document_id: int,
+    content: str,
+    metadata: Any,
+    similarity: float
+) -> Dict[str, Any]:
+    """Format commun des résultats de recherche"""
+    if metadata and isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except:
+            metadata = {}
+
+    return {
+        "id": id,
+        "document_type": document_type,
+        "document_id": document_id,
+        "content": content,
+        "metadata": metadata or {},
+        "similarity": float(similarity)
+    }
+
+
+class PgVectorBackend:
+    """Recherche k-NN dans document_embeddings via pgvector"""
+
+    name = "pgvector"
+
+    def __init__(
+        self,
+        db: Session,
+        table_name: str = "document_embeddings",
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
+    ):
+        self.db = db
+        self.table_name = table_name
+        # Paramètres de recherche de l'index ANN (précision vs latence)
+        self.ef_search = ef_search if ef_search is not None else settings.VECTOR_HNSW_EF_SEARCH
+        self.probes = probes if probes is not None else settings.VECTOR_IVFFLAT_PROBES
+
+    def search(
+        self,
+        query_embedding: List[float],
+        document_type: Optional[str] = None,
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> List[Dict[str, Any]]:
+        """Top-k sur un type de document (ou tous)"""
+        # La distance est calculée une seule fois dans la sous-requête, le seuil
+        # est appliqué sur les k plus proches (équivalent, le seuil étant monotone)
+        params = {
+            "embedding": self.format_embedding(query_embedding),
+            "limit": limit,
+            "max_distance": 1 - threshold
+        }
+
+        # Filtrer par type si spécifié
+        type_filter = ""
+        if document_type:
+            type_filter = "AND document_type = :document_type"
+            params["document_type"] = document_type
+
+        sql = f"""
+        SELECT id, document_type, document_id, content, metadata, 1 - distance AS similarity
+        FROM ({self._knn_subquery(type_filter)}) hits
+        WHERE distance <= :max_distance
+        ORDER BY distance
+        """
+
+        self._apply_index_settings()
+        return [self._format_row(row) for row in self.db.execute(text(sql), params).fetchall()]
+
+    def search_per_type(
+        self,
+        query_embedding: List[float],
+        document_types: List[str],
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Top-k par type de document en une seule requête SQL
+
+        Chaque type est une sous-requête `ORDER BY distance LIMIT k` (compatible
+        avec un index HNSW/IVFFlat), réunies par UNION ALL.
+        """
+        results = {document_type: [] for document_type in document_types}
+        if not document_types:
+            return results
+
+        params = {
+            "embedding": self.format_embedding(query_embedding),
+            "limit": limit,
+            "max_distance": 1 - threshold
+        }
+        subqueries = []
+        for i, document_type in enumerate(document_types):
+            params[f"document_type_{i}"] = document_type
+            subqueries.append(f"({self._knn_subquery(f'AND document_type = :document_type_{i}')})")
+
+        sql = f"""
+        SELECT id, document_type, document_id, content, metadata, 1 - distance AS similarity
+        FROM ({" UNION ALL ".join(subqueries)}) hits
+        WHERE distance <= :max_distance
+        ORDER BY document_type, distance
+        """
+
+        self._apply_index_settings()
+        for row in self.db.execute(text(sql), params).fetchall():
+            results[row.document_type].append(self._format_row(row))
+        return results
+
+    def _apply_index_settings(self):
+        """Appliquer ef_search/probes à la transaction courante (SET LOCAL)"""
+        if self.ef_search is not None:
+            self.db.execute(text(f"SET LOCAL hnsw.ef_search = {int(self.ef_search)}"))
+        if self.probes is not None:
+            self.db.execute(text(f"SET LOCAL ivfflat.probes = {int(self.probes)}"))
+
+    def _knn_subquery(self, type_filter: str = "") -> str:
+        """Sous-requête des k plus proches voisins (distance cosinus calculée une fois)"""
+        return f"""
+            SELECT id, document_type, document_id, content, metadata,
+                   embedding <=> CAST(:embedding AS vector) AS distance
+            FROM {self.table_name}
+            WHERE embedding IS NOT NULL {type_filter}
+            ORDER BY distance
+            LIMIT :limit
+        """
+
+    @staticmethod
+    def format_embedding(embedding: List[float]) -> str:
+        return "[" + ",".join(map(str, embedding)) + "]"
+
+    @staticmethod
+    def _format_row(row) -> Dict[str, Any]:
+        return _format_result(row.id, row.document_type, row.document_id, row.content, row.metadata, row.similarity)
+
+
+class LocalVectorIndex:
+    """
+    Index vectoriel embarqué (force brute NumPy)
+
+    Fichiers du répertoire d'index:
+      - vectors.npy   : matrice float32 (N x D) normalisée, ouverte en mémoire mappée
+      - vectors_q8.npy, scales.npy : variante quantifiée int8 (optionnelle)
+      - records.json  : métadonnées des documents, dans l'ordre des lignes
+
+    Avec la variante quantifiée, les candidats sont présélectionnés sur les
+    vecteurs int8 puis reclassés sur les vecteurs float32.
+    """
+
+    name = "local"
+    RERANK_FACTOR = 4
+    CHUNK_ROWS = 16384
+
+    def __init__(self, path: str):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy est requis pour l'index vectoriel local (pip install numpy)")
+
+        self.path = Path(path)
+        self.vectors = None
+        self.vectors_q8 = None
+        self.scales = None
+        self.records: List[Dict[str, Any]] = []
+        self.type_masks: Dict[str, Any] = {}
+        self.loaded_mtime: Optional[float] = None
+
+    @property
+    def manifest(self) -> Path:
+        return self.path / "records.json"
+
+    def exists(self) -> bool:
+        return self.manifest.exists()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def load(self) -> "LocalVectorIndex":
+        """Charger l'index (matrices en mémoire mappée, pas de copie en RAM)"""
+        if not self.exists():
+            self.vectors, self.records, self.type_masks = None, [], {}
+            return self
+
+        with open(self.manifest, encoding="utf-8") as f:
+            self.records = json.load(f)["records"]
+
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        if (self.path / "vectors_q8.npy").exists():
+            self.vectors_q8 = np.load(self.path / "vectors_q8.npy", mmap_mode="r")
+            self.scales = np.load(self.path / "scales.npy")
+        else:
+            self.vectors_q8 = self.scales = None
+
+        types = np.array([record["document_type"] for record in self.records])
+        self.type_masks = {document_type: types == document_type for document_type in set(types.tolist())}
+        self.loaded_mtime = self.manifest.stat().st_mtime
+        return self
+
+    def is_stale(self) -> bool:
+        """Le fichier sur disque a été reconstruit depuis le chargement"""
+        return self.exists() and self.manifest.stat().st_mtime != self.loaded_mtime
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        records: List[Dict[str, Any]],
+        embeddings: List[List[float]],
+        quantize: bool = False
+    ) -> "LocalVectorIndex":
+        """
+        Écrire un index complet de façon atomique
+
+        `records` contient id, document_type, document_id, content, metadata
+        (et content_hash pour les reconstructions incrémentales).
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy est requis pour l'index vectoriel local (pip install numpy)")
+
+        target = Path(path)
+        tmp = target.with_name(target.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        if records:
+            vectors = cls._normalize(np.asarray(embeddings, dtype=np.float32))
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        np.save(tmp / "vectors.npy", vectors)
+        if quantize:
+            # Quantification symétrique par ligne: v ≈ q8 * scale / 127
+            scales = np.abs(vectors).max(axis=1)
+            scales[scales == 0] = 1.0
+            np.save(tmp / "vectors_q8.npy", np.round(vectors / scales[:, None] * 127).astype(np.int8))
+            np.save(tmp / "scales.npy", scales.astype(np.float32))
+
+        with open(tmp / "records.json", "w", encoding="utf-8") as f:
+            json.dump({"dimensions": int(vectors.shape[1]), "records": records}, f, ensure_ascii=False)
+
+        # Remplacer l'ancien répertoire
+        old = target.with_name(target.name + ".old")
+        if target.exists():
+            if old.exists():
+                shutil.rmtree(old)
+            os.replace(target, old)
+        os.replace(tmp, target)
+        if old.exists():
+            shutil.rmtree(old)
+
+        return cls(str(target)).load()
+
+    def _scores(self, query):
+        """Similarité cosinus de toutes les lignes (approchée si quantifié) et indicateur de quantification"""
+        if self.vectors_q8 is None:
+            return np.asarray(self.vectors @ query), False
+
+        # Score approché int8 par blocs (évite de convertir toute la matrice)
+        approx = np.empty(len(self.records), dtype=np.float32)
+        for start in range(0, len(self.records), self.CHUNK_ROWS):
+            block = np.asarray(self.vectors_q8[start:start + self.CHUNK_ROWS], dtype=np.float32)
+            approx[start:start + self.CHUNK_ROWS] = (block @ query) * (self.scales[start:start + self.CHUNK_ROWS] / 127)
+        return approx, True
+
+    def _top_k(self, scores, candidates, query, limit: int, threshold: float, quantized: bool):
+        if candidates.size == 0:
+            return []
+
+        pool = limit * self.RERANK_FACTOR if quantized else limit
+        if candidates.size > pool:
+            part = np.argpartition(-scores[candidates], pool - 1)[:pool]
+            candidates = candidates[part]
+
+        if quantized:
+            # Reclassement exact sur les vecteurs float32 (lecture triée du fichier mappé)
+            candidates = np.sort(candidates)
+            top_scores = np.asarray(self.vectors[candidates] @ query)
+        else:
+            top_scores = scores[candidates]
+
+        order = np.argsort(-top_scores)[:limit]
+        results = []
+        for i in order:
+            similarity = float(top_scores[i])
+            if similarity < threshold:
+                break
+            record = self.records[int(candidates[i])]
+            results.append(_format_result(
+                record["id"], record["document_type"], record["document_id"],
+                record["content"], record.get("metadata"), similarity
+            ))
+        return results
+
+    def _prepare_query(self, query_embedding: List[float]):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def search(
+        self,
+        query_embedding: List[float],
+        document_type: Optional[str] = None,
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> List[Dict[str, Any]]:
+        """Top-k sur un type de document (ou tous)"""
+        if not self.records:
+            return []
+
+        query = self._prepare_query(query_embedding)
+        scores, quantized = self._scores(query)
+        if document_type:
+            mask = self.type_masks.get(document_type)
+            candidates = np.flatnonzero(mask) if mask is not None else np.array([], dtype=np.int64)
+        else:
+            candidates = np.arange(len(self.records))
+        return self._top_k(scores, candidates, query, limit, threshold, quantized)
+
+    def search_per_type(
+        self,
+        query_embedding: List[float],
+        document_types: List[str],
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Top-k par type avec un seul produit matrice-vecteur"""
+        results = {document_type: [] for document_type in document_types}
+        if not self.records:
+            return results
+
+        query = self._prepare_query(query_embedding)
+        scores, quantized = self._scores(query)
+        for document_type in document_types:
+            mask = self.type_masks.get(document_type)
+            if mask is not None:
+                results[document_type] = self._top_k(
+                    scores, np.flatnonzero(mask), query, limit, threshold, quantized
+                )
+        return results
+
+
+def default_local_index_path() -> str:
+    """Répertoire de l'index local: à côté du fichier SQLite (app.db → app_vectors/)"""
+    if settings.LOCAL_VECTOR_INDEX_PATH:
+        return settings.LOCAL_VECTOR_INDEX_PATH
+
+    url = settings.DATABASE_URL
+    if url.startswith("sqlite:///") and url != "sqlite:///:memory:":
+        db_path = Path(url[len("sqlite:///"):])
+        return str(db_path.with_name(db_path.stem + "_vectors"))
+    return "./vectors"
+
+
+_local_index: Optional[LocalVectorIndex] = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_vector_index() -> LocalVectorIndex:
+    """Index local partagé par le processus, chargé au premier usage et rechargé s'il a été reconstruit"""
+    global _local_index
+    with _local_index_lock:
+        if _local_index is None or _local_index.is_stale():
+            _local_index = LocalVectorIndex(default_local_index_path()).load()
+        return _local_index
+
+
+def preload_local_vector_index():
+    """Charger l'index local en arrière-plan au démarrage (erreurs journalisées, pas levées)"""
+    try:
+        index = get_local_vector_index()
+        print(f"Index vectoriel local chargé: {len(index)} documents")
+    except Exception as e:
+        print(f"Index vectoriel local indisponible: {e}")
+
+
+def resolve_backend_name(db: Optional[Session] = None) -> str:
+    """Backend configuré, ou choisi selon la base ('auto')"""
+    if settings.VECTOR_BACKEND != "auto":
+        return settings.VECTOR_BACKEND
+    if db is not None:
+        dialect = db.get_bind().dialect.name
+    else:
+        dialect = settings.DATABASE_URL.split(":", 1)[0].split("+", 1)[0]
+    return "pgvector" if dialect in ("postgresql", "postgres") else "local"
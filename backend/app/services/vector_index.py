@@ -0,0 +1,113 @@
+"""
+Gestion de l'index ANN (pgvector) de la table document_embeddings
+HNSW ou IVFFlat, construit/reconstruit sans bloquer les lectures
+"""
+
+import math
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+VECTOR_INDEX_METHODS = ("hnsw", "ivfflat")
+
+
+class VectorIndexManager:
+    """Construction, reconstruction et inspection de l'index vectoriel"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        table_name: str = "document_embeddings",
+        index_name: Optional[str] = None
+    ):
+        self.engine = engine
+        self.table_name = table_name
+        self.index_name = index_name or f"{table_name}_embedding_idx"
+
+    def _autocommit(self):
+        # CREATE/DROP INDEX CONCURRENTLY ne peut pas s'exécuter dans une transaction
+        return self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+    def count_rows(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(f"SELECT count(*) FROM {self.table_name} WHERE embedding IS NOT NULL")
+            ).scalar() or 0
+
+    def default_lists(self) -> int:
+        """Nombre de listes IVFFlat recommandé par pgvector (rows/1000, sqrt(rows) au-delà de 1M)"""
+        rows = self.count_rows()
+        if rows > 1_000_000:
+            return max(1, int(math.sqrt(rows)))
+        return max(1, rows // 1000)
+
+    def index_definition(
+        self,
+        method: str = "hnsw",
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None
+    ) -> str:
+        """Clause USING ... WITH (...) de l'index"""
+        if method not in VECTOR_INDEX_METHODS:
+            raise ValueError(f"Méthode d'index inconnue: {method} (attendu: {', '.join(VECTOR_INDEX_METHODS)})")
+
+        if method == "hnsw":
+            return f"USING hnsw (embedding vector_cosine_ops) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+        return f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {int(lists or self.default_lists())})"
+
+    def build(
+        self,
+        method: str = "hnsw",
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+        maintenance_work_mem: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Construire (ou reconstruire) l'index
+
+        Le nouvel index est créé en CONCURRENTLY sous un nom temporaire, puis
+        remplace l'ancien: les recherches continuent pendant la construction.
+        """
+        definition = self.index_definition(method, m, ef_construction, lists)
+        temp_name = f"{self.index_name}_new"
+
+        with self._autocommit() as conn:
+            # CONCURRENTLY interdit toute transaction (pas de SET LOCAL): réglage de
+            # session, rétabli même en cas d'échec avant le retour au pool
+            if maintenance_work_mem:
+                conn.execute(text("SELECT set_config('maintenance_work_mem', :value, false)"), {"value": maintenance_work_mem})
+            try:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {temp_name}"))
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY {temp_name} ON {self.table_name} {definition}"))
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.index_name}"))
+                conn.execute(text(f"ALTER INDEX {temp_name} RENAME TO {self.index_name}"))
+                conn.execute(text(f"ANALYZE {self.table_name}"))
+            finally:
+                if maintenance_work_mem:
+                    conn.execute(text("RESET maintenance_work_mem"))
+
+        return self.status()
+
+    def drop(self):
+        """Supprimer l'index (les recherches repassent en parcours séquentiel)"""
+        with self._autocommit() as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.index_name}"))
+
+    def status(self) -> Dict[str, Any]:
+        """Définition et taille de l'index, None si absent"""
+        with self.engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT indexdef, pg_size_pretty(pg_relation_size(quote_ident(indexname)::regclass)) AS size
+                FROM pg_indexes
+                WHERE tablename = :table AND indexname = :index
+            """), {"table": self.table_name, "index": self.index_name}).fetchone()
+
+        return {
+            "table": self.table_name,
+            "index": self.index_name,
+            "rows": self.count_rows(),
+            "definition": row.indexdef if row else None,
+            "size": row.size if row else None,
+        }
@@ -1,12 +1,11 @@
 """
 Service de recherche vectorielle pour les procédures et tips
-Utilise pgvector pour la recherche sémantique
+Utilise pgvector (PostgreSQL) ou un index NumPy local (SQLite) pour la recherche sémantique
 """
 
 from typing import List, Dict, Any, Optional
-from sqlalchemy import text
 from sqlalchemy.orm import Session
-import json
+import threading
 
 try:
     from openai import OpenAI
@@ -15,40 +14,125 @@ except ImportError:
     OPENAI_AVAILABLE = False
 
 from app.core.config import settings
+from app.core.cache import TTLCache, SQLiteCacheStore, normalize_query
+from app.core.tracing import span
+from app.services.vector_backends import PgVectorBackend, get_local_vector_index, resolve_backend_name
+
+
+_query_embedding_cache: Optional[TTLCache] = None
+_query_embedding_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> TTLCache:
+    """Cache des embeddings de requêtes, partagé par tout le processus"""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        with _query_embedding_cache_lock:
+            if _query_embedding_cache is None:
+                disk = None
+                if settings.EMBEDDING_CACHE_PATH:
+                    disk = SQLiteCacheStore(settings.EMBEDDING_CACHE_PATH, table="query_embeddings")
+                _query_embedding_cache = TTLCache(
+                    max_entries=settings.EMBEDDING_CACHE_SIZE,
+                    ttl=settings.EMBEDDING_CACHE_TTL,
+                    disk=disk
+                )
+    return _query_embedding_cache
+
+
+_embedding_client = None
+_embedding_client_lock = threading.Lock()
+
+
+def _default_embedding_client():
+    """Client OpenAI (synchrone) des embeddings de requêtes, None sans clé API"""
+    global _embedding_client
+    if _embedding_client is None and OPENAI_AVAILABLE and settings.OPENAI_API_KEY:
+        with _embedding_client_lock:
+            if _embedding_client is None:
+                _embedding_client = OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    base_url=settings.OPENAI_BASE_URL,
+                    timeout=settings.OPENAI_TIMEOUT,
+                    max_retries=settings.OPENAI_MAX_RETRIES
+                )
+    return _embedding_client
+
+
+def generate_query_embedding(text: str, client=None) -> Optional[List[float]]:
+    """
+    Embedding d'une requête, avec le cache des requêtes (sans session ni backend)
+
+    Appel réseau bloquant: depuis une route async, passer par asyncio.to_thread.
+    """
+    client = client or _default_embedding_client()
+    if client is None:
+        return None
+    
+    cache = get_query_embedding_cache()
+    cache_key = f"{settings.EMBEDDING_MODEL}:{normalize_query(text)}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        with span("openai.embedding"):
+            response = client.embeddings.create(
+                model=settings.EMBEDDING_MODEL,
+                input=text[:8000]  # Limiter la longueur
+            )
+        embedding = response.data[0].embedding
+        cache.set(cache_key, embedding)
+        return embedding
+    except Exception as e:
+        print(f"Erreur génération embedding: {e}")
+        return None
 
 
 class VectorSearchService:
     """Service pour la recherche vectorielle"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        backend=None
+    ):
         self.db = db
-        self.openai_client = None
         
-        # Initialiser le client OpenAI si disponible
-        if OPENAI_AVAILABLE and settings.OPENAI_API_KEY:
-            self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Backend de recherche: pgvector, ou index local NumPy (déploiements SQLite)
+        if backend is None:
+            if resolve_backend_name(db) == "pgvector":
+                backend = PgVectorBackend(db, ef_search=ef_search, probes=probes)
+            else:
+                try:
+                    backend = get_local_vector_index()
+                except RuntimeError as e:
+                    print(f"Index vectoriel local indisponible: {e}")
+        self.backend = backend
+        
+        # Client OpenAI partagé par le processus, si disponible
+        self.openai_client = _default_embedding_client()
     
     def generate_embedding(self, text: str) -> Optional[List[float]]:
-        """Générer un embedding pour un texte"""
+        """Générer un embedding pour un texte (avec cache des requêtes)"""
         if not self.openai_client:
             return None
-        
-        try:
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text[:8000]  # Limiter la longueur
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            print(f"Erreur génération embedding: {e}")
-            return None
+        return generate_query_embedding(text, self.openai_client)
+    
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Compteurs hits/misses du cache d'embeddings de requêtes"""
+        return get_query_embedding_cache().stats()
     
     def search_similar(
         self,
         query: str,
         document_type: Optional[str] = None,
         limit: int = 5,
-        threshold: float = 0.7
+        threshold: float = 0.7,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Rechercher des documents similaires à une requête
@@ -58,93 +142,80 @@ class VectorSearchService:
             document_type: Type de document ('procedure' ou 'tip'), None pour tous
             limit: Nombre de résultats
             threshold: Seuil de similarité (0-1)
+            query_embedding: Embedding déjà calculé de la requête (évite un appel API)
         
         Returns:
             Liste de documents avec score de similarité
         """
         # Générer l'embedding de la requête
-        query_embedding = self.generate_embedding(query)
-        if not query_embedding:
+        if query_embedding is None:
+            query_embedding = self.generate_embedding(query)
+        if not query_embedding or self.backend is None:
             return []
         
-        # Construire la requête SQL
-        embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
-        
-        # Requête SQL pour recherche vectorielle
-        sql = """
-        SELECT 
-            id,
-            document_type,
-            document_id,
-            content,
-            metadata,
-            1 - (embedding <=> :embedding::vector) as similarity
-        FROM document_embeddings
-        WHERE embedding IS NOT NULL
-        """
-        
-        params = {"embedding": embedding_str}
-        
-        # Filtrer par type si spécifié
-        if document_type:
-            sql += " AND document_type = :document_type"
-            params["document_type"] = document_type
-        
-        # Filtrer par seuil de similarité
-        sql += " AND (1 - (embedding <=> :embedding::vector)) >= :threshold"
-        params["threshold"] = threshold
-        
-        # Trier par similarité et limiter
-        sql += " ORDER BY similarity DESC LIMIT :limit"
-        params["limit"] = limit
-        
         try:
-            result = self.db.execute(text(sql), params)
-            rows = result.fetchall()
-            
-            # Formater les résultats
-            results = []
-            for row in rows:
-                metadata = {}
-                if row.metadata:
-                    try:
-                        metadata = json.loads(row.metadata) if isinstance(row.metadata, str) else row.metadata
-                    except:
-                        pass
-                
-                results.append({
-                    "id": row.id,
-                    "document_type": row.document_type,
-                    "document_id": row.document_id,
-                    "content": row.content,
-                    "metadata": metadata,
-                    "similarity": float(row.similarity)
-                })
-            
-            return results
+            with span("vector_search"):
+                return self.backend.search(query_embedding, document_type, limit, threshold)
         except Exception as e:
             print(f"Erreur recherche vectorielle: {e}")
             return []
     
-    def search_procedures(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def search_top_k_per_type(
+        self,
+        query_embedding: List[float],
+        document_types: List[str],
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Top-k par type de document en un seul passage sur le backend"""
+        if self.backend is None:
+            return {document_type: [] for document_type in document_types}
+        
+        try:
+            with span("vector_search"):
+                return self.backend.search_per_type(query_embedding, document_types, limit, threshold)
+        except Exception as e:
+            print(f"Erreur recherche vectorielle: {e}")
+            return {document_type: [] for document_type in document_types}
+    
+    def search_procedures(
+        self,
+        query: str,
+        limit: int = 5,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
         """Rechercher des procédures similaires"""
-        return self.search_similar(query, document_type="procedure", limit=limit)
+        return self.search_similar(query, document_type="procedure", limit=limit, query_embedding=query_embedding)
     
-    def search_tips(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def search_tips(
+        self,
+        query: str,
+        limit: int = 5,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
         """Rechercher des tips similaires"""
-        return self.search_similar(query, document_type="tip", limit=limit)
+        return self.search_similar(query, document_type="tip", limit=limit, query_embedding=query_embedding)
     
     def search_all(self, query: str, limit: int = 5) -> Dict[str, List[Dict[str, Any]]]:
         """Rechercher dans toutes les procédures et tips"""
-        procedures = self.search_procedures(query, limit=limit)
-        tips = self.search_tips(query, limit=limit)
+        # Un seul embedding pour les deux recherches
+        query_embedding = self.generate_embedding(query)
+        if not query_embedding:
+            return {"procedures": [], "tips": []}
+        
+        # Un seul aller-retour pour les deux types
+        results = self.search_top_k_per_type(query_embedding, ["procedure", "tip"], limit=limit)
         
         return {
-            "procedures": procedures,
-            "tips": tips
+            "procedures": results["procedure"],
+            "tips": results["tip"]
         }
 
 
-def get_vector_search_service(db: Session) -> VectorSearchService:
+def get_vector_search_service(
+    db: Session,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None
+) -> VectorSearchService:
     """Factory pour créer une instance du service"""
-    return VectorSearchService(db)
+    return VectorSearchService(db, ef_search=ef_search, probes=probes)
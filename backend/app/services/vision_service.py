@@ -1,13 +1,19 @@
-from openai import OpenAI
-from app.core.config import settings
+from openai import AsyncOpenAI
+from app.core.openai_client import get_async_openai_client, openai_slot
+from app.core.tracing import traced
 from typing import Dict, Any
 import base64
 
 class VisionService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = "gpt-4o-mini"  # Supporte aussi la vision
     
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Client async partagé (pool HTTP, timeouts, concurrence bornée)"""
+        return get_async_openai_client()
+    
+    @traced("openai.vision")
     async def recognize_equipment(self, image_data: bytes) -> Dict[str, Any]:
         """Reconnaître un équipement via photo"""
         # Encoder l'image en base64
@@ -22,27 +28,28 @@ class VisionService:
 Réponds en JSON avec les clés: equipment_type, brand_model, condition, maintenance_suggestions (liste)"""
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",  # GPT-4o pour la vision
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+            async with openai_slot():
+                response = await self.client.chat.completions.create(
+                    model="gpt-4o",  # GPT-4o pour la vision
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": prompt
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:image/jpeg;base64,{base64_image}"
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=500
-            )
+                            ]
+                        }
+                    ],
+                    max_tokens=500
+                )
             
             result_text = response.choices[0].message.content or "{}"
             
@@ -0,0 +1,944 @@
+#!/usr/bin/env python3
+"""
+Banc de charge reproductible de l'API (latences et débit, comparables d'un run à l'autre)
+
+1. Jeu de données déterministe (--seed): procédures avec étapes, astuces,
+   techniciens, exécutions (terminées et en cours) avec leurs étapes,
+   statistiques d'exécution, index plein texte et embeddings (index
+   vectoriel local en SQLite, document_embeddings en PostgreSQL).
+   Réutilisé tel quel si --data-dir contient déjà le même jeu.
+2. Serveur OpenAI simulé (latences fixes: chat, streaming, vision,
+   embeddings): le client OpenAI de l'application est exercé de bout en bout,
+   sans réseau ni coût. Les embeddings sont des sacs de mots hachés: la
+   question d'un technicien retrouve bien les passages proches (RAG).
+3. L'application tourne dans un processus uvicorn séparé (comme en
+   production); chaque scénario envoie un nombre fixe de requêtes avec
+   --concurrency clients en boucle fermée, après --warmup requêtes:
+   procedures_list, procedure_detail, tips_search, execution_step_update,
+   chat, chat_stream, vision.
+4. Résultats JSON (p50/p95/p99/max, débit, erreurs, temps serveur de
+   l'en-tête Server-Timing), avec la version du code et la configuration.
+   --compare signale les régressions par rapport à un run précédent
+   (code de sortie 1).
+
+Par défaut l'application est assemblée à partir des routeurs mesurés (avec
+les middlewares de production); --target main sert app.main:app complète.
+
+Usage:
+    python scripts/bench_api.py
+    python scripts/bench_api.py --data-dir /tmp/bench_api --output bench_results/avant.json
+    python scripts/bench_api.py --data-dir /tmp/bench_api --compare bench_results/avant.json
+    python scripts/bench_api.py --scenarios chat,vision --concurrency 32 --llm-latency-ms 800
+    python scripts/bench_api.py --database-url postgresql://.../procedure_bench --data-dir /tmp/bench_pg
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import platform
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+RESULTS_FORMAT = 1
+DATASET_FILE = "dataset.json"
+SCENARIOS = [
+    "procedures_list", "procedure_detail", "tips_search", "execution_step_update",
+    "chat", "chat_stream", "vision",
+]
+# Scénarios qui passent par le modèle simulé: --ai-requests requêtes
+AI_SCENARIOS = {"chat", "chat_stream", "vision"}
+
+CATEGORIES = ["onduleurs", "panneaux", "câblage", "sécurité", "mesures", "transformateurs", "supervision"]
+TIP_CATEGORIES = ["réglages", "contacts", "conseils", "outillage", "pièces"]
+ACTIONS = [
+    "Remplacement", "Inspection", "Nettoyage", "Contrôle", "Mesure d'isolement", "Serrage",
+    "Thermographie", "Consignation", "Mise en service", "Diagnostic",
+]
+EQUIPMENTS = [
+    "onduleur", "panneau", "coffret DC", "compteur", "transformateur", "sectionneur", "parafoudre",
+    "ventilateur", "tracker", "fusible", "connecteur MC4", "boîte de jonction", "batterie", "string",
+]
+BRANDS = ["SMA", "Huawei", "Fronius", "SolarEdge", "Schneider", "ABB", "Sungrow", "Enphase"]
+STEP_VERBS = [
+    "Vérifier", "Mesurer", "Photographier", "Débrancher", "Resserrer", "Nettoyer", "Remplacer",
+    "Consigner", "Contrôler", "Noter",
+]
+STEP_OBJECTS = [
+    "la tension en entrée", "les bornes", "l'état des câbles", "le voyant d'alarme", "le disjoncteur",
+    "la température", "les fixations", "le joint d'étanchéité", "le relevé du compteur", "la mise à la terre",
+]
+QUESTIONS = [
+    "Comment {verb} {object} sur le {equipment} {brand} ?",
+    "Quelle valeur attendre pour {object} d'un {equipment} {brand} ?",
+    "Le {equipment} {brand} affiche une alarme après {object}, que faire ?",
+]
+
+
+# --- Serveur OpenAI simulé -------------------------------------------------
+
+def embed_text(text: str, dimensions: int) -> List[float]:
+    """Sac de mots haché (déterministe): mêmes mots, même direction, quel que soit l'ordre"""
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dimensions] += 1.0
+    return vector
+
+
+@dataclass
+class StubConfig:
+    llm_latency: float
+    vision_latency: float
+    embedding_latency: float
+    chunks: int
+    dimensions: int
+    calls: Dict[str, int] = field(default_factory=lambda: {"chat": 0, "chat_stream": 0, "vision": 0, "embeddings": 0})
+
+
+def stub_openai_app(config: StubConfig) -> FastAPI:
+    """Serveur compatible OpenAI: latences fixes, réponses courtes"""
+    app = FastAPI()
+    vision_answer = json.dumps({
+        "equipment_type": "Onduleur", "brand_model": "SMA Sunny Tripower", "condition": "normal",
+        "maintenance_suggestions": ["Nettoyage des ventilateurs", "Contrôle des connecteurs MC4"],
+    }, ensure_ascii=False)
+
+    def completion(content: str) -> dict:
+        return {
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 400, "completion_tokens": 120, "total_tokens": 520},
+        }
+
+    def chunk(content=None, finish_reason=None) -> dict:
+        return {
+            "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": "stub", "choices": [{
+                "index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason
+            }],
+        }
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        vision = any(
+            isinstance(message.get("content"), list)
+            and any(part.get("type") == "image_url" for part in message["content"])
+            for message in body.get("messages", [])
+        )
+        if vision:
+            config.calls["vision"] += 1
+            await asyncio.sleep(config.vision_latency)
+            return JSONResponse(completion(vision_answer))
+        if not body.get("stream"):
+            config.calls["chat"] += 1
+            await asyncio.sleep(config.llm_latency)
+            return JSONResponse(completion("Couper le sectionneur DC, vérifier l'absence de tension, puis resserrer."))
+
+        config.calls["chat_stream"] += 1
+
+        async def events():
+            # Même durée totale que la réponse complète, répartie sur les fragments
+            for i in range(config.chunks):
+                await asyncio.sleep(config.llm_latency / config.chunks)
+                yield f"data: {json.dumps(chunk(f'fragment {i} '))}\n\n"
+            yield f"data: {json.dumps(chunk(finish_reason='stop'))}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = {"prompt_tokens": 400, "completion_tokens": config.chunks, "total_tokens": 400 + config.chunks}
+                yield f"data: {json.dumps({**chunk(), 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        config.calls["embeddings"] += 1
+        await asyncio.sleep(config.embedding_latency)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return JSONResponse({
+            "object": "list", "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": embed_text(text, config.dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 8, "total_tokens": 8},
+        })
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(app: FastAPI, port: int) -> uvicorn.Server:
+    """Lancer uvicorn dans un thread (serveur simulé)"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+# --- Application mesurée ---------------------------------------------------
+
+def suite_app() -> FastAPI:
+    """
+    Application servie par le processus uvicorn (--factory)
+
+    Routeurs mesurés et middlewares de production; app.main importe aussi
+    les modules Command Center, absents de certains déploiements.
+    """
+    from contextlib import asynccontextmanager
+    from app.core.config import settings
+    from app.core.database import dispose_async_engine
+    from app.core.openai_client import close_openai_client
+    from app.core.request_context import RequestIdMiddleware
+    from app.core.tracing import TracingMiddleware
+    from app.api import chat, executions, procedures, tips, vision
+    from app.services.chat_history import wait_pending_chat_messages
+    from app.services.vector_backends import preload_local_vector_index, resolve_backend_name
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if resolve_backend_name() == "local":
+            asyncio.get_running_loop().run_in_executor(None, preload_local_vector_index)
+        yield
+        await wait_pending_chat_messages()
+        await dispose_async_engine()
+        await close_openai_client()
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+    app.include_router(procedures.router, prefix=f"{settings.API_V1_STR}/procedures")
+    app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat")
+    app.include_router(vision.router, prefix=f"{settings.API_V1_STR}/vision")
+    app.include_router(tips.router, prefix=f"{settings.API_V1_STR}/tips")
+    app.include_router(executions.router, prefix=f"{settings.API_V1_STR}/executions")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def start_app_server(target: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    """Processus uvicorn (environnement courant: base, serveur simulé); retourne (processus, url)"""
+    port = free_port()
+    if target == "main":
+        command = ["app.main:app", "--app-dir", str(BACKEND_DIR)]
+    else:
+        command = ["bench_api:suite_app", "--factory", "--app-dir", str(Path(__file__).resolve().parent)]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *command, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Le serveur de l'application s'est arrêté (code {process.returncode})")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise SystemExit("Le serveur de l'application n'a pas démarré en 60 s")
+
+
+def stop_app_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# --- Jeu de données --------------------------------------------------------
+
+def dataset_params(args) -> dict:
+    """Paramètres qui déterminent le jeu de données (réutilisation si identiques)"""
+    return {
+        "seed": args.seed,
+        "procedures": args.procedures,
+        "tips": args.tips,
+        "technicians": args.technicians,
+        "executions": args.executions,
+        "dimensions": args.dimensions,
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+    }
+
+
+def database_label() -> str:
+    """URL de la base sans mot de passe"""
+    return re.sub(r"//[^@/]*@", "//***@", os.environ["DATABASE_URL"])
+
+
+def _insert(conn, table, rows: List[dict], batch: int = 2000):
+    for start in range(0, len(rows), batch):
+        conn.execute(table.insert(), rows[start:start + batch])
+
+
+def _reset_sequences(conn, tables: List[str]):
+    """PostgreSQL: identifiants insérés explicitement, réaligner les séquences"""
+    from sqlalchemy import text
+    for table in tables:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def seed_dataset(args) -> dict:
+    """Insérer le jeu de données (base vide); retourne la description enregistrée dans dataset.json"""
+    import numpy as np
+    from sqlalchemy import func, inspect, select, text
+    from app.core.database import Base, SessionLocal, engine
+    from app.models.execution import Execution, ExecutionStatus, StepExecution
+    from app.models.procedure import Procedure, Step
+    from app.models.tip import Tip
+    from app.models.user import User, UserRole
+    from app.services.execution_stats import rebuild_execution_stats
+    from app.services.fulltext_search import ensure_fulltext_index
+    from app.services.vector_backends import LocalVectorIndex, default_local_index_path, resolve_backend_name
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    ensure_fulltext_index(engine)
+    with engine.connect() as conn:
+        if conn.scalar(select(func.count()).select_from(Procedure.__table__)):
+            raise SystemExit("Base non vide: le banc a besoin d'une base dédiée (--data-dir vide ou --database-url)")
+
+    now = datetime.utcnow().replace(microsecond=0)
+    users = [{"id": 1, "email": "bench-admin@example.com", "password_hash": "-", "role": UserRole.ADMIN}]
+    users += [
+        {"id": i + 2, "email": f"bench-tech-{i + 1}@example.com", "password_hash": "-", "role": UserRole.TECHNICIAN}
+        for i in range(args.technicians)
+    ]
+
+    procedures, steps, documents = [], [], []
+    procedure_steps: Dict[int, List[int]] = {}
+    for procedure_id in range(1, args.procedures + 1):
+        equipment, brand = rng.choice(EQUIPMENTS), rng.choice(BRANDS)
+        title = f"{rng.choice(ACTIONS)} {equipment} {brand} #{procedure_id}"
+        description = (
+            f"Intervention sur {equipment} {brand}: {rng.choice(STEP_OBJECTS)} et {rng.choice(STEP_OBJECTS)}. "
+            f"Site {rng.randint(1, 80)}, niveau {rng.choice(['N1', 'N2', 'N3'])}."
+        )
+        procedures.append({
+            "id": procedure_id, "title": title, "description": description,
+            "category": rng.choice(CATEGORIES), "tags": [equipment, brand.lower()],
+            "created_by": 1, "version": 1, "is_active": 1,
+        })
+        procedure_steps[procedure_id] = []
+        for order in range(1, rng.randint(5, 15) + 1):
+            step_id = len(steps) + 1
+            steps.append({
+                "id": step_id, "procedure_id": procedure_id, "order": order,
+                "title": f"{rng.choice(STEP_VERBS)} {rng.choice(STEP_OBJECTS)}",
+                "description": f"Étape {order} sur {equipment}",
+                "instructions": (
+                    f"{rng.choice(STEP_VERBS)} {rng.choice(STEP_OBJECTS)} du {equipment} {brand}, "
+                    f"puis {rng.choice(STEP_VERBS).lower()} {rng.choice(STEP_OBJECTS)}. "
+                    f"Valeur attendue: {rng.randint(10, 1000)} {rng.choice(['V', 'A', 'MΩ', '°C'])}."
+                ),
+                "photos": [], "files": [], "validation_type": rng.choice(["manual", "manual", "photo"]),
+            })
+            procedure_steps[procedure_id].append(step_id)
+        documents.append(("procedure", procedure_id, f"{title}\n{description}", {
+            "title": title, "category": procedures[-1]["category"], "tags": procedures[-1]["tags"],
+        }))
+
+    tips = []
+    for tip_id in range(1, args.tips + 1):
+        equipment, brand = rng.choice(EQUIPMENTS), rng.choice(BRANDS)
+        title = f"{equipment.capitalize()} {brand}: {rng.choice(STEP_OBJECTS)}"
+        content = (
+            f"Sur les {equipment}s {brand}, {rng.choice(STEP_VERBS).lower()} {rng.choice(STEP_OBJECTS)} "
+            f"avant de {rng.choice(STEP_VERBS).lower()} {rng.choice(STEP_OBJECTS)}. "
+            f"Astuce terrain n°{tip_id}, code {rng.randint(100, 999)}."
+        )
+        tips.append({
+            "id": tip_id, "title": title, "content": content, "category": rng.choice(TIP_CATEGORIES),
+            "tags": [equipment, brand.lower()], "created_by": rng.randint(1, args.technicians + 1),
+        })
+        documents.append(("tip", tip_id, f"{title}\n{content}", {
+            "title": title, "category": tips[-1]["category"], "tags": tips[-1]["tags"],
+        }))
+
+    # Exécutions: ~60% terminées (étapes validées avec durée), les autres en cours
+    executions, step_executions, in_progress = [], [], []
+    for execution_id in range(1, args.executions + 1):
+        procedure_id = rng.randint(1, args.procedures)
+        user_id = rng.randint(2, args.technicians + 1)
+        step_ids = procedure_steps[procedure_id]
+        completed = rng.random() < 0.6
+        done = len(step_ids) if completed else rng.randint(0, len(step_ids) - 1)
+        started_at = now - timedelta(days=rng.uniform(0, 180))
+        moment = started_at
+        for step_id in step_ids[:done]:
+            duration = rng.uniform(30, 900)
+            moment += timedelta(seconds=duration)
+            step_executions.append({
+                "execution_id": execution_id, "step_id": step_id, "status": "completed", "photos": "[]",
+                "comments": None, "completed_at": moment, "duration_seconds": round(duration, 1),
+            })
+        executions.append({
+            "id": execution_id, "user_id": user_id, "procedure_id": procedure_id,
+            "status": (ExecutionStatus.COMPLETED if completed else ExecutionStatus.IN_PROGRESS).value,
+            "current_step": done, "started_at": started_at, "completed_at": moment if completed else None,
+        })
+        if not completed:
+            in_progress.append([execution_id, user_id, procedure_id, step_ids])
+
+    with engine.begin() as conn:
+        _insert(conn, User.__table__, users)
+        _insert(conn, Procedure.__table__, procedures)
+        _insert(conn, Step.__table__, steps)
+        _insert(conn, Tip.__table__, tips)
+        _insert(conn, Execution.__table__, executions)
+        _insert(conn, StepExecution.__table__, step_executions)
+        if engine.dialect.name == "postgresql":
+            _reset_sequences(conn, ["users", "procedures", "steps", "tips", "executions"])
+
+    db = SessionLocal()
+    try:
+        rebuild_execution_stats(db)
+        db.commit()
+    finally:
+        db.close()
+
+    # Embeddings calculés comme ceux du serveur simulé (même fonction)
+    vectors = np.array([embed_text(content, args.dimensions) for _, _, content, _ in documents], dtype=np.float32)
+    embeddings_target = resolve_backend_name()
+    if embeddings_target == "local":
+        records = [
+            {
+                "id": i + 1, "document_type": document_type, "document_id": document_id, "content": content,
+                "metadata": metadata, "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+            }
+            for i, (document_type, document_id, content, metadata) in enumerate(documents)
+        ]
+        LocalVectorIndex.write(default_local_index_path(), records, vectors)
+    elif inspect(engine).has_table("document_embeddings"):
+        rows = [
+            {
+                "document_type": document_type, "document_id": document_id, "content": content,
+                "embedding": "[" + ",".join(f"{value:g}" for value in vector) + "]",
+                "metadata": json.dumps(metadata, ensure_ascii=False),
+            }
+            for (document_type, document_id, content, metadata), vector in zip(documents, vectors)
+        ]
+        with engine.begin() as conn:
+            for start in range(0, len(rows), 500):
+                conn.execute(text(
+                    "INSERT INTO document_embeddings (document_type, document_id, content, embedding, metadata) "
+                    "VALUES (:document_type, :document_id, :content, CAST(:embedding AS vector), :metadata)"
+                ), rows[start:start + 500])
+    else:
+        embeddings_target = "none"
+        print("⚠️  Table document_embeddings absente (migrations pgvector): chat sans passages RAG")
+
+    return {
+        "params": dataset_params(args),
+        "database_url": database_label(),
+        "seed_seconds": round(time.perf_counter() - started, 2),
+        "counts": {
+            "users": len(users), "procedures": len(procedures), "steps": len(steps), "tips": len(tips),
+            "executions": len(executions), "step_executions": len(step_executions),
+            "in_progress_executions": len(in_progress), "embeddings": len(documents),
+        },
+        "embeddings": embeddings_target,
+        "in_progress": in_progress,
+    }
+
+
+def load_or_seed(args, data_dir: Path) -> dict:
+    """dataset.json du répertoire s'il correspond aux paramètres, sinon nouveau jeu"""
+    path = data_dir / DATASET_FILE
+    if path.exists():
+        dataset = json.loads(path.read_text(encoding="utf-8"))
+        if dataset["params"] == dataset_params(args) and dataset["database_url"] == database_label():
+            print(f"Jeu de données réutilisé: {path}")
+            return dataset
+        if args.database_url:
+            raise SystemExit(f"{path} décrit un autre jeu de données: base dédiée à recréer pour ces paramètres")
+        print("Paramètres du jeu de données modifiés: nouvelle génération")
+        for stale in (data_dir / "bench.db", data_dir / "bench_vectors"):
+            if stale.is_dir():
+                shutil.rmtree(stale)
+            elif stale.exists():
+                stale.unlink()
+        path.unlink()
+
+    print("Génération du jeu de données...")
+    dataset = seed_dataset(args)
+    path.write_text(json.dumps(dataset, ensure_ascii=False), encoding="utf-8")
+    counts = ", ".join(f"{name} {count}" for name, count in dataset["counts"].items())
+    print(f"  {counts} ({dataset['seed_seconds']} s)")
+    return dataset
+
+
+# --- Scénarios -------------------------------------------------------------
+
+@dataclass
+class Scenario:
+    name: str
+    requests: int
+    build: Callable[[int], Dict[str, Any]]  # index -> arguments de httpx.AsyncClient.request
+    valid: Callable[[httpx.Response], bool] = lambda response: True
+    stream: bool = False
+
+
+def vision_image(seed: int) -> bytes:
+    """Photo de terrain simulée (JPEG 1600x1200, comme un téléphone en qualité réduite)"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((1600, 1200)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        x, y = rng.randint(0, 1500), rng.randint(0, 1100)
+        draw.rectangle(
+            (x, y, x + rng.randint(20, 300), y + rng.randint(20, 300)),
+            fill=(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        )
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def build_scenarios(args, dataset: dict) -> List[Scenario]:
+    """Requêtes déterministes de chaque scénario (même graine, mêmes requêtes)"""
+    from app.core.security import create_access_token
+
+    counts = dataset["counts"]
+    lifetime = timedelta(days=1)
+    tokens = {
+        user_id: {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)}, lifetime)}"}
+        for user_id in range(1, counts["users"] + 1)
+    }
+    technicians = list(range(2, counts["users"] + 1))
+    in_progress = dataset["in_progress"]
+    image = vision_image(args.seed)
+
+    def rng_for(name: str, index: int) -> random.Random:
+        return random.Random(f"{args.seed}:{name}:{index}")
+
+    def procedures_list(i):
+        rng = rng_for("procedures_list", i)
+        params = {"limit": 20}
+        kind = i % 4
+        if kind == 1:
+            params["category"] = rng.choice(CATEGORIES)
+        elif kind == 2:
+            params["search"] = rng.choice(EQUIPMENTS).split()[0]
+        elif kind == 3:
+            params["skip"] = rng.randint(0, 10) * 20
+        return {"method": "GET", "url": "/api/procedures/", "params": params, "headers": tokens[rng.choice(technicians)]}
+
+    def procedure_detail(i):
+        rng = rng_for("procedure_detail", i)
+        return {
+            "method": "GET", "url": f"/api/procedures/{rng.randint(1, counts['procedures'])}",
+            "headers": tokens[rng.choice(technicians)],
+        }
+
+    def tips_search(i):
+        rng = rng_for("tips_search", i)
+        terms = [rng.choice(EQUIPMENTS).split()[0]]
+        if i % 2:
+            terms.append(rng.choice(BRANDS))
+        return {
+            "method": "GET", "url": "/api/tips/", "params": {"search": " ".join(terms), "limit": 20},
+            "headers": tokens[rng.choice(technicians)],
+        }
+
+    def execution_step_update(i):
+        rng = rng_for("execution_step_update", i)
+        execution_id, user_id, _, step_ids = rng.choice(in_progress)
+        return {
+            "method": "PUT", "url": f"/api/executions/{execution_id}/step", "headers": tokens[user_id],
+            "json": {"step_id": rng.choice(step_ids), "status": "completed", "comments": f"Relevé {i}"},
+        }
+
+    def question(name, i):
+        # Question unique (pas de réponse en cache), dans le contexte d'une étape
+        rng = rng_for(name, i)
+        _, user_id, procedure_id, step_ids = rng.choice(in_progress)
+        message = rng.choice(QUESTIONS).format(
+            verb=rng.choice(STEP_VERBS).lower(), object=rng.choice(STEP_OBJECTS),
+            equipment=rng.choice(EQUIPMENTS), brand=rng.choice(BRANDS),
+        )
+        context = {"procedure_id": procedure_id, "step_id": rng.choice(step_ids)}
+        return {
+            "method": "POST", "url": "/api/chat/" if name == "chat" else "/api/chat/stream",
+            "headers": tokens[user_id], "json": {"message": f"{message} (réf. {i})", "context": context},
+        }
+
+    def vision(i):
+        rng = rng_for("vision", i)
+        return {
+            "method": "POST", "url": "/api/vision/recognize", "headers": tokens[rng.choice(technicians)],
+            "files": {"file": ("terrain.jpg", image, "image/jpeg")},
+        }
+
+    def request_count(name):
+        return args.ai_requests if name in AI_SCENARIOS else args.requests
+
+    scenarios = {
+        "procedures_list": Scenario("procedures_list", request_count("procedures_list"), procedures_list),
+        "procedure_detail": Scenario("procedure_detail", request_count("procedure_detail"), procedure_detail),
+        "tips_search": Scenario("tips_search", request_count("tips_search"), tips_search),
+        "execution_step_update": Scenario(
+            "execution_step_update", request_count("execution_step_update"), execution_step_update
+        ),
+        "chat": Scenario(
+            "chat", request_count("chat"), lambda i: question("chat", i),
+            valid=lambda response: bool(response.json().get("response")),
+        ),
+        "chat_stream": Scenario(
+            "chat_stream", request_count("chat_stream"), lambda i: question("chat_stream", i), stream=True
+        ),
+        "vision": Scenario(
+            "vision", request_count("vision"), vision,
+            valid=lambda response: response.json().get("success") is True,
+        ),
+    }
+    if not in_progress:
+        # Questions et mises à jour d'étapes portent sur des exécutions en cours
+        for name in ("execution_step_update", "chat", "chat_stream"):
+            scenarios.pop(name)
+    return [scenarios[name] for name in args.scenarios if name in scenarios]
+
+
+def parse_server_timing(value: str) -> Dict[str, float]:
+    """Durées (ms) de l'en-tête Server-Timing"""
+    spans = {}
+    for entry in value.split(","):
+        name, _, rest = entry.strip().partition(";")
+        match = re.search(r"dur=([\d.]+)", rest)
+        if name and match:
+            spans[name] = float(match.group(1))
+    return spans
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    if len(values) == 1:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 2),
+        "p95": round(cuts[94], 2),
+        "p99": round(cuts[98], 2),
+        "max": round(max(values), 2),
+        "mean": round(statistics.fmean(values), 2),
+    }
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, index: int) -> dict:
+    """Une requête: durée (ms), erreur éventuelle, Server-Timing, premier octet (flux)"""
+    request = scenario.build(index)
+    started = time.perf_counter()
+    first_byte, detail = None, None
+    try:
+        if scenario.stream:
+            async with client.stream(**request) as response:
+                async for chunk in response.aiter_bytes():
+                    if first_byte is None:
+                        first_byte = (time.perf_counter() - started) * 1000
+                body_ok = response.status_code < 400
+                if not body_ok:
+                    detail = (await response.aread()).decode("utf-8", "replace")
+        else:
+            response = await client.request(**request)
+            body_ok = response.status_code < 400 and scenario.valid(response)
+            if not body_ok:
+                detail = response.text
+        error = None if body_ok else (
+            str(response.status_code) if response.status_code >= 400 else "réponse invalide"
+        )
+        timing = parse_server_timing(response.headers.get("server-timing", ""))
+    except (httpx.HTTPError, ValueError) as e:
+        error, timing, detail = type(e).__name__, {}, str(e) or repr(e)
+    return {
+        "ms": (time.perf_counter() - started) * 1000, "error": error, "timing": timing, "first_byte": first_byte,
+        "detail": detail[:300] if detail else None,
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int, warmup: int) -> dict:
+    """Préchauffage, puis `concurrency` clients en boucle fermée jusqu'à `requests` requêtes"""
+    warmup_indexes = iter(range(scenario.requests, scenario.requests + warmup))
+
+    async def warm():
+        for index in warmup_indexes:
+            await send(client, scenario, index)
+
+    await asyncio.gather(*(warm() for _ in range(min(concurrency, warmup))))
+
+    indexes = iter(range(scenario.requests))
+    results = []
+
+    async def worker():
+        for index in indexes:
+            results.append(await send(client, scenario, index))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    succeeded = [result for result in results if result["error"] is None]
+    errors: Dict[str, int] = {}
+    error_samples: Dict[str, str] = {}
+    for result in results:
+        if result["error"] is not None:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+            error_samples.setdefault(result["error"], result["detail"])
+    spans: Dict[str, List[float]] = {}
+    for result in succeeded:
+        for name, ms in result["timing"].items():
+            spans.setdefault(name, []).append(ms)
+
+    summary = {
+        "requests": len(results),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "error_samples": error_samples,  # première réponse de chaque type d'erreur
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(succeeded) / duration, 2) if duration else 0.0,
+        "latency_ms": percentiles([result["ms"] for result in succeeded]),
+        # Début de réponse côté serveur (un flux continue ensuite): moyenne par span
+        "server_timing_ms": {name: round(statistics.fmean(values), 2) for name, values in sorted(spans.items())},
+    }
+    first_bytes = [result["first_byte"] for result in succeeded if result["first_byte"] is not None]
+    if first_bytes:
+        summary["first_byte_ms"] = percentiles(first_bytes)
+    return summary
+
+
+async def run_all(url: str, scenarios: List[Scenario], args) -> Dict[str, dict]:
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        for scenario in scenarios:
+            summary = await run_scenario(client, scenario, args.concurrency, args.warmup)
+            results[scenario.name] = summary
+            latency = summary["latency_ms"]
+            print(
+                f"  {scenario.name:<22} {summary['throughput_rps']:>8.1f} req/s"
+                f"  p50 {latency.get('p50', 0):>8.1f}  p95 {latency.get('p95', 0):>8.1f}"
+                f"  p99 {latency.get('p99', 0):>8.1f} ms  erreurs {summary['errors']}"
+            )
+    return results
+
+
+# --- Résultats -------------------------------------------------------------
+
+def git_revision() -> dict:
+    def git(*command):
+        return subprocess.run(
+            ["git", *command], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except (OSError, subprocess.SubprocessError):
+        return {"commit": None, "dirty": None}
+
+
+def comparable_config(results: dict) -> dict:
+    """Configuration qui doit être identique pour comparer deux runs"""
+    config = dict(results["config"])
+    for key in ("output", "compare", "max_regression", "data_dir", "scenarios"):
+        config.pop(key, None)
+    return config
+
+
+def compare_results(current: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Tableau des écarts; retourne les régressions (p95, débit, erreurs)"""
+    if baseline.get("format") != current["format"]:
+        print("⚠️  Format de résultats différent")
+    if baseline["dataset"]["params"] != current["dataset"]["params"]:
+        print("⚠️  Jeux de données différents: comparaison indicative")
+    if comparable_config(baseline) != comparable_config(current):
+        print("⚠️  Configuration différente (concurrence, latences simulées, cible...): comparaison indicative")
+    if baseline["meta"].get("cpu_count") != current["meta"]["cpu_count"]:
+        print("⚠️  Machine différente (nombre de CPU)")
+
+    def delta(before, after):
+        return (after - before) / before if before else 0.0
+
+    print(f"\nComparaison avec {(baseline['meta'].get('commit') or 'run précédent')[:12]} "
+          f"({baseline['meta'].get('timestamp')}), seuil {max_regression:.0%}")
+    print(f"  {'scénario':<22} {'p50 ms':>20} {'p95 ms':>20} {'req/s':>20}")
+    regressions = []
+    for name, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"  {name:<22} (absent du run de référence)")
+            continue
+        columns = []
+        for metric, old, new in (
+            ("p50", before["latency_ms"].get("p50", 0), after["latency_ms"].get("p50", 0)),
+            ("p95", before["latency_ms"].get("p95", 0), after["latency_ms"].get("p95", 0)),
+            ("req/s", before["throughput_rps"], after["throughput_rps"]),
+        ):
+            columns.append(f"{old:>7.1f} → {new:>7.1f} {delta(old, new):>+4.0%}")
+        print(f"  {name:<22} " + " ".join(f"{column:>20}" for column in columns))
+
+        p95_growth = delta(before["latency_ms"].get("p95", 0), after["latency_ms"].get("p95", 0))
+        throughput_drop = -delta(before["throughput_rps"], after["throughput_rps"])
+        if p95_growth > max_regression:
+            regressions.append(f"{name}: p95 +{p95_growth:.0%}")
+        if throughput_drop > max_regression:
+            regressions.append(f"{name}: débit -{throughput_drop:.0%}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: {after['errors']} erreur(s) (avant {before['errors']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge reproductible de l'API")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Parmi: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients simultanés (boucle fermée)")
+    parser.add_argument("--requests", type=int, default=500, help="Requêtes par scénario (hors IA)")
+    parser.add_argument("--ai-requests", type=int, default=100, help="Requêtes par scénario chat/vision")
+    parser.add_argument("--warmup", type=int, default=20, help="Requêtes de préchauffage par scénario (non mesurées)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Délai maximal d'une requête (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--procedures", type=int, default=2000)
+    parser.add_argument("--tips", type=int, default=3000)
+    parser.add_argument("--technicians", type=int, default=20)
+    parser.add_argument("--executions", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=1536, help="Dimension des embeddings")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Réponse complète du modèle simulé")
+    parser.add_argument("--vision-latency-ms", type=float, default=800, help="Analyse d'image du modèle simulé")
+    parser.add_argument("--embedding-latency-ms", type=float, default=30)
+    parser.add_argument("--llm-chunks", type=int, default=20, help="Fragments d'une réponse en streaming")
+    parser.add_argument("--target", choices=["routes", "main"], default="routes",
+                        help="routes: routeurs mesurés et middlewares; main: app.main:app complète")
+    parser.add_argument("--workers", type=int, default=1, help="Processus uvicorn de l'application")
+    parser.add_argument("--data-dir", help="Répertoire du jeu de données (réutilisé d'un run à l'autre)")
+    parser.add_argument("--database-url", help="Base dédiée (PostgreSQL); défaut: SQLite dans --data-dir")
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut: bench_results/api_<date>.json)")
+    parser.add_argument("--compare", help="Résultats de référence: régression -> code de sortie 1")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Écart toléré (p95, débit)")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = sorted(set(args.scenarios) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"scénarios inconnus: {', '.join(unknown)}")
+
+    data_dir = Path(args.data_dir or tempfile.mkdtemp(prefix="bench_api_")).resolve()
+    data_dir.mkdir(parents=True, exist_ok=True)
+    stub = StubConfig(
+        llm_latency=args.llm_latency_ms / 1000, vision_latency=args.vision_latency_ms / 1000,
+        embedding_latency=args.embedding_latency_ms / 1000, chunks=max(args.llm_chunks, 1),
+        dimensions=args.dimensions,
+    )
+    stub_port = free_port()
+
+    # Avant tout import de l'application: configuration partagée avec le processus uvicorn
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{data_dir / 'bench.db'}"
+    os.environ["LOCAL_VECTOR_INDEX_PATH"] = str(data_dir / "bench_vectors")
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-bench-api"
+    os.environ["UPLOAD_DIR"] = str(data_dir / "uploads")
+    os.environ["LOG_DIR"] = str(data_dir / "logs")
+    os.environ["LOG_CONSOLE_LEVEL"] = "WARNING"
+    # Niveau de production (DEBUG journalise chaque connexion du pool)
+    os.environ.setdefault("LOG_LEVEL", "INFO")
+    # Chaque question doit aller jusqu'au modèle (pas de réponse en cache)
+    os.environ["CHAT_CACHE_ENABLED"] = "false"
+    os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("SECRET_KEY", "bench-api-secret")
+
+    dataset = load_or_seed(args, data_dir)
+    scenarios = build_scenarios(args, dataset)
+    serve_in_thread(stub_openai_app(stub), stub_port)
+    process, url = start_app_server(args.target, args.workers)
+    print(f"\nApplication ({args.target}, {args.workers} worker(s)) sur {url}, "
+          f"{args.concurrency} clients, modèle simulé {args.llm_latency_ms:g}/{args.vision_latency_ms:g} ms")
+    try:
+        scenario_results = asyncio.run(run_all(url, scenarios, args))
+    finally:
+        stop_app_server(process)
+
+    timestamp = datetime.now().astimezone()
+    results = {
+        "format": RESULTS_FORMAT,
+        "meta": {
+            "timestamp": timestamp.isoformat(timespec="seconds"),
+            **git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "database_url"},
+        "dataset": {key: value for key, value in dataset.items() if key not in ("in_progress", "database_url")},
+        "stub_calls": stub.calls,
+        "scenarios": scenario_results,
+    }
+    output = Path(args.output or BACKEND_DIR / "bench_results" / f"api_{timestamp:%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nRésultats: {output}")
+    if not args.data_dir:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    failed = [name for name, summary in scenario_results.items() if summary["errors"]]
+    if failed:
+        print(f"❌ Erreurs: {', '.join(failed)}")
+    if args.compare:
+        regressions = compare_results(results, json.loads(Path(args.compare).read_text(encoding="utf-8")),
+                                      args.max_regression)
+        print()
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Aucune régression au-delà du seuil")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark du coût de l'authentification par requête
+
+Compare, sur un endpoint vide, la latence et le nombre de requêtes SQL de:
+- sans authentification (référence)
+- get_current_user sans cache (une requête SELECT users par appel)
+- get_current_user avec le cache des utilisateurs
+- get_current_admin: cache, puis rôle lu dans le token (AUTH_STATELESS_ROLES)
+
+Usage:
+    python scripts/bench_auth_overhead.py --requests 2000
+    DATABASE_URL=postgresql://... python scripts/bench_auth_overhead.py   # avec latence réseau
+"""
+
+import sys
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_auth.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-auth")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine, get_async_engine
+from app.core.dependencies import get_current_admin, get_current_user
+from app.core.query_counter import QueryCounter
+from app.core.security import create_access_token
+from app.core.user_cache import user_cache
+from app.models.user import User, UserRole
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/public")
+    async def public():
+        return {}
+
+    @app.get("/user")
+    async def user(current_user=Depends(get_current_user)):
+        return {"id": current_user.id}
+
+    @app.get("/admin")
+    async def admin(current_user=Depends(get_current_admin)):
+        return {"id": current_user.id}
+
+    return app
+
+
+def seed() -> str:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        admin = User(email=f"bench-{time.time_ns()}@example.com", password_hash="-", role=UserRole.ADMIN)
+        db.add(admin)
+        db.commit()
+        return create_access_token({"sub": str(admin.id), "role": admin.role.value, "email": admin.email})
+    finally:
+        db.close()
+
+
+def measure(client: TestClient, path: str, headers: dict, requests: int):
+    """Latences (ms) et requêtes SQL par appel"""
+    client.get(path, headers=headers)  # échauffement (connexion, cache)
+    timings = []
+    with QueryCounter(engine, get_async_engine().sync_engine) as counter:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.text
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "mean": statistics.mean(timings),
+        "queries": counter.count / requests,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Coût de l'authentification par requête")
+    parser.add_argument("--requests", type=int, default=2000, help="Appels par variante")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {seed()}"}
+    client = TestClient(create_app())
+    ttl = settings.AUTH_USER_CACHE_TTL
+
+    variants = [
+        ("sans authentification", "/public", 0, False),
+        ("utilisateur, sans cache", "/user", 0, False),
+        ("utilisateur, cache", "/user", ttl or 30.0, False),
+        ("admin, cache", "/admin", ttl or 30.0, False),
+        ("admin, rôle du token", "/admin", 0, True),
+    ]
+
+    print(f"{engine.dialect.name}: {args.requests} appels par variante")
+    print(f"{'variante':<26} {'p50':>9} {'p95':>9} {'moyenne':>9} {'SQL/appel':>10}")
+    reference = None
+    for label, path, cache_ttl, stateless in variants:
+        settings.AUTH_USER_CACHE_TTL = cache_ttl
+        settings.AUTH_STATELESS_ROLES = stateless
+        user_cache.clear()
+        result = measure(client, path, headers, args.requests)
+        reference = reference if reference is not None else result["mean"]
+        print(
+            f"{label:<26} {result['p50']:>7.3f}ms {result['p95']:>7.3f}ms {result['mean']:>7.3f}ms "
+            f"{result['queries']:>10.2f}   (+{result['mean'] - reference:.3f}ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
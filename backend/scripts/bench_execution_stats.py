@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Statistiques d'exécution: parcours de l'historique vs résumés tenus à jour
+
+1. Cohérence: exécutions réelles via l'API (étapes validées puis passées,
+   revalidées, lots synchronisés rejoués, exécution terminée deux fois);
+   les compteurs tenus à jour doivent égaler un recalcul complet
+   (rebuild_execution_stats).
+2. Passage à l'échelle: historique croissant (--sizes exécutions); temps du
+   tableau de bord d'une procédure en parcourant executions/step_executions
+   (avant) vs GET /api/analytics/procedures/{id} (après), requêtes SQL.
+3. Plans de requête: index composites de step_executions utilisés.
+
+Usage:
+    python scripts/bench_execution_stats.py
+    python scripts/bench_execution_stats.py --sizes 1000 10000 100000 --steps 15
+"""
+
+import sys
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_execution_stats.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-stats")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, text
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine, get_async_engine
+from app.core.query_counter import QueryCounter
+from app.core.security import create_access_token
+from app.models.execution import (
+    Execution, StepExecution, ProcedureExecutionStats, ProcedureDurationBucket, StepExecutionStats,
+)
+from app.models.procedure import Procedure, Step
+from app.models.user import User, UserRole
+from app.services.execution_stats import (
+    DURATION_BUCKETS, ExecutionStatsDelta, duration_bucket, rebuild_execution_stats, seconds_between,
+)
+from app.api import analytics, executions
+
+# Probabilité qu'une étape soit passée (les autres: 2 %)
+SKIP_PROBABILITIES = {3: 0.30, 8: 0.15}
+
+
+def seed_users_and_procedure(db, steps: int):
+    admin = User(email=f"admin-{uuid.uuid4()}@example.com", password_hash="-", role=UserRole.ADMIN)
+    db.add(admin)
+    db.flush()
+    procedure = Procedure(
+        title=f"Mise en service armoire {uuid.uuid4().hex[:6]}", created_by=admin.id, is_active=1,
+        steps=[Step(order=order, title=f"Étape {order}", instructions="Contrôler") for order in range(1, steps + 1)]
+    )
+    db.add(procedure)
+    db.commit()
+    return admin, procedure
+
+
+def snapshot(db, procedure_id: int) -> dict:
+    """Contenu des tables de résumés pour une procédure (flottants arrondis)"""
+    def rows(model, *order):
+        return [
+            tuple(round(value, 6) if isinstance(value, float) else value
+                  for column, value in sorted(vars(row).items()) if not column.startswith("_") and column != "updated_at")
+            for row in db.scalars(select(model).where(model.procedure_id == procedure_id).order_by(*order))
+        ]
+    db.expire_all()
+    return {
+        "procedure": rows(ProcedureExecutionStats, ProcedureExecutionStats.procedure_id),
+        "buckets": rows(ProcedureDurationBucket, ProcedureDurationBucket.bucket),
+        "steps": rows(StepExecutionStats, StepExecutionStats.step_id),
+    }
+
+
+def seed_history(db, procedure: Procedure, user_id: int, count: int, rng: random.Random, next_ids: dict):
+    """
+    `count` exécutions terminées (80 %) ou abandonnées, insérées en masse;
+    compteurs alimentés par ExecutionStatsDelta comme le font les endpoints
+    """
+    delta = ExecutionStatsDelta()
+    executions_rows, step_rows = [], []
+    now = datetime.utcnow()
+    for _ in range(count):
+        execution_id = next_ids["execution"]
+        next_ids["execution"] += 1
+        started_at = now - timedelta(days=rng.uniform(1, 365))
+        finished = rng.random() < 0.8
+        last_step = len(procedure.steps) if finished else rng.randrange(len(procedure.steps))
+        clock = previous = started_at
+        delta.execution_started(procedure.id)
+        for index, step in enumerate(procedure.steps[:last_step]):
+            skipped = rng.random() < SKIP_PROBABILITIES.get(index, 0.02)
+            clock += timedelta(seconds=rng.lognormvariate(4.5, 0.6))  # ~90 s, longue traîne
+            duration = None if skipped else (clock - previous).total_seconds()
+            step_rows.append({
+                "id": next_ids["step_execution"], "execution_id": execution_id, "step_id": step.id,
+                "status": "skipped" if skipped else "completed", "photos": "[]",
+                "completed_at": None if skipped else clock, "duration_seconds": duration,
+            })
+            next_ids["step_execution"] += 1
+            delta.step_changed(procedure.id, step.id, None, None, step_rows[-1]["status"], duration)
+            if not skipped:
+                previous = clock
+        completed_at = clock + timedelta(seconds=30) if finished else None
+        executions_rows.append({
+            "id": execution_id, "user_id": user_id, "procedure_id": procedure.id,
+            "status": "completed" if finished else "in_progress", "current_step": last_step + 1,
+            "started_at": started_at, "completed_at": completed_at,
+        })
+        if finished:
+            delta.execution_completed(procedure.id, seconds_between(started_at, completed_at))
+
+    for start in range(0, len(executions_rows), 5000):
+        db.execute(insert(Execution), executions_rows[start:start + 5000])
+    for start in range(0, len(step_rows), 5000):
+        db.execute(insert(StepExecution), step_rows[start:start + 5000])
+    for statement, rows in delta.statements(engine.dialect.name):
+        db.execute(statement, rows)
+    db.commit()
+
+
+def scan_procedure_stats(db, procedure_id: int) -> dict:
+    """Avant: mêmes indicateurs en parcourant tout l'historique de la procédure"""
+    runs = db.execute(
+        select(Execution.status, Execution.started_at, Execution.completed_at)
+        .where(Execution.procedure_id == procedure_id)
+    ).all()
+    durations = sorted(
+        seconds_between(started_at, completed_at) for status, started_at, completed_at in runs if status == "completed"
+    )
+    counts = defaultdict(lambda: {"completed": 0, "skipped": 0, "time": 0.0})
+    previous_execution, previous = None, None
+    for execution_id, step_id, status, completed_at, started_at in db.execute(
+        select(StepExecution.execution_id, StepExecution.step_id, StepExecution.status,
+               StepExecution.completed_at, Execution.started_at)
+        .join(Execution, Execution.id == StepExecution.execution_id)
+        .where(Execution.procedure_id == procedure_id)
+        .order_by(StepExecution.execution_id, StepExecution.completed_at)
+    ):
+        if execution_id != previous_execution:
+            previous_execution, previous = execution_id, started_at
+        if status == "completed":
+            counts[step_id]["completed"] += 1
+            counts[step_id]["time"] += seconds_between(previous, completed_at)
+            previous = completed_at
+        elif status == "skipped":
+            counts[step_id]["skipped"] += 1
+    return {
+        "executions_started": len(runs),
+        "executions_completed": len(durations),
+        "median_duration_seconds": statistics.median(durations) if durations else None,
+        "steps": dict(counts),
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tableau de bord d'exécution: parcours vs résumés")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Exécutions dans l'historique")
+    parser.add_argument("--steps", type=int, default=12, help="Étapes de la procédure")
+    parser.add_argument("--runs", type=int, default=5, help="Répétitions par mesure (médiane)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(executions.router, prefix=f"{settings.API_V1_STR}/executions")
+    app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics")
+    client = TestClient(app)
+    engines = (engine, get_async_engine().sync_engine)
+    db = SessionLocal()
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    # 1. Cohérence des compteurs tenus à jour
+    admin, procedure = seed_users_and_procedure(db, 6)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin.id)})}"}
+    step_ids = [step.id for step in procedure.steps]
+
+    def new_execution() -> int:
+        return client.post("/api/executions/", json={"procedure_id": procedure.id}, headers=headers).json()["id"]
+
+    def put_step(execution_id: int, step_id: int, status: str):
+        client.put(f"/api/executions/{execution_id}/step", json={"step_id": step_id, "status": status},
+                   headers=headers).raise_for_status()
+
+    first = new_execution()
+    for step_id in step_ids:
+        put_step(first, step_id, "skipped" if step_id == step_ids[2] else "completed")
+    put_step(first, step_ids[2], "completed")  # étape passée puis validée
+    put_step(first, step_ids[4], "skipped")    # validée puis passée
+    put_step(first, step_ids[1], "completed")  # validée à nouveau
+    client.put(f"/api/executions/{first}/complete", headers=headers).raise_for_status()
+    client.put(f"/api/executions/{first}/complete", headers=headers).raise_for_status()
+
+    second = new_execution()
+    started = datetime.now(timezone.utc)
+    updates = [
+        {"step_id": step_id, "status": "skipped" if i == 3 else "completed",
+         "idempotency_key": str(uuid.uuid4()), "client_updated_at": (started + timedelta(minutes=i + 1)).isoformat()}
+        for i, step_id in enumerate(step_ids)
+    ]
+    updates.append(dict(updates[0], idempotency_key=str(uuid.uuid4()), status="skipped",
+                        client_updated_at=started.isoformat()))  # plus ancienne: ignorée
+    for _ in range(2):  # lot rejoué: doublons
+        client.post(f"/api/executions/{second}/steps/sync", json={"updates": updates}, headers=headers).raise_for_status()
+    client.put(f"/api/executions/{second}/complete", headers=headers).raise_for_status()
+
+    third = new_execution()
+    put_step(third, step_ids[0], "completed")
+    put_step(third, step_ids[1], "skipped")
+
+    incremental = snapshot(db, procedure.id)
+    rebuild_execution_stats(db)
+    db.commit()
+    rebuilt = snapshot(db, procedure.id)
+    check(incremental == rebuilt and incremental["steps"],
+          "compteurs tenus à jour = recalcul complet (transitions, lots rejoués, double complétion)")
+    dashboard = client.get(f"/api/analytics/procedures/{procedure.id}", headers=headers).json()
+    by_step = {step["step_id"]: step for step in dashboard["steps"]}
+    check(
+        dashboard["executions_started"] == 3 and dashboard["executions_completed"] == 2
+        and abs(dashboard["completion_rate"] - 2 / 3) < 1e-9
+        and (by_step[step_ids[2]]["completed_count"], by_step[step_ids[2]]["skipped_count"]) == (2, 0)
+        and (by_step[step_ids[4]]["completed_count"], by_step[step_ids[4]]["skipped_count"]) == (1, 1)
+        and by_step[step_ids[1]]["completed_count"] == 2 and by_step[step_ids[1]]["skipped_count"] == 1
+        and by_step[step_ids[0]]["completed_count"] == 3,
+        "tableau de bord: 3 démarrées, 2 terminées, transitions d'étapes comptées une fois"
+    )
+    print()
+
+    # 2. Passage à l'échelle
+    rng = random.Random(42)
+    _, measured = seed_users_and_procedure(db, args.steps)
+    next_ids = {
+        "execution": (db.scalar(select(Execution.id).order_by(Execution.id.desc()).limit(1)) or 0) + 1,
+        "step_execution": (db.scalar(select(StepExecution.id).order_by(StepExecution.id.desc()).limit(1)) or 0) + 1,
+    }
+    url = f"/api/analytics/procedures/{measured.id}"
+    print(f"Procédure de {args.steps} étapes, médiane de {args.runs} essais")
+    print(f"{'exécutions':>10} {'étapes exécutées':>17} {'parcours':>10} {'résumés':>9} {'requêtes':>9}")
+    timings = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed_history(db, measured, admin.id, size - seeded, rng, next_ids)
+        seeded = size
+        scans, reads = [], []
+        for _ in range(args.runs):
+            db.expire_all()
+            started_at = time.perf_counter()
+            scanned = scan_procedure_stats(db, measured.id)
+            scans.append(time.perf_counter() - started_at)
+            with QueryCounter(*engines) as counter:
+                started_at = time.perf_counter()
+                response = client.get(url, headers=headers)
+                reads.append(time.perf_counter() - started_at)
+        summary = response.json()
+        step_rows = sum(counts["completed"] + counts["skipped"] for counts in scanned["steps"].values())
+        timings.append((size, statistics.median(scans), statistics.median(reads), counter.count))
+        print(f"{size:>10} {step_rows:>17} {statistics.median(scans) * 1000:>8.0f}ms "
+              f"{statistics.median(reads) * 1000:>7.1f}ms {counter.count:>9}")
+    print()
+
+    smallest, largest = timings[0], timings[-1]
+    check(largest[2] < max(3 * smallest[2], smallest[2] + 0.005) and largest[3] == smallest[3],
+          f"résumés en temps constant: {smallest[2] * 1000:.1f} ms → {largest[2] * 1000:.1f} ms, "
+          f"{largest[3]} requêtes pour {smallest[0]} comme pour {largest[0]} exécutions")
+    check(largest[1] > 5 * largest[2], f"parcours {largest[1] / largest[2]:.0f}× plus lent à {largest[0]} exécutions")
+
+    by_step = {step["step_id"]: step for step in summary["steps"]}
+    check(
+        summary["executions_started"] == scanned["executions_started"]
+        and summary["executions_completed"] == scanned["executions_completed"]
+        and all(by_step[step_id]["completed_count"] == counts["completed"]
+                and by_step[step_id]["skipped_count"] == counts["skipped"]
+                and abs(by_step[step_id]["average_duration_seconds"] * counts["completed"] - counts["time"]) < 1e-3 * counts["time"]
+                for step_id, counts in scanned["steps"].items()),
+        "mêmes taux de complétion, comptes et temps par étape que le parcours"
+    )
+    exact = scanned["median_duration_seconds"]
+    bucket = duration_bucket(exact)
+    lower = DURATION_BUCKETS[bucket - 1] if bucket else 0
+    upper = DURATION_BUCKETS[bucket] if bucket < len(DURATION_BUCKETS) else float("inf")
+    check(lower <= summary["median_duration_seconds"] <= upper,
+          f"médiane estimée {summary['median_duration_seconds'] / 60:.1f} min (exacte {exact / 60:.1f} min, "
+          f"classe {lower / 60:.0f}–{upper / 60:.0f} min)")
+    top = [step["order"] for step in summary["most_skipped"][:2]]
+    check(top == [4, 9], f"étapes les plus passées: {top} (seedées à 30 % et 15 %)")
+
+    # 3. Plans de requête
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM step_executions WHERE execution_id = 1 AND step_id = 2"
+        )))
+        stats_plan = " ".join(row[-1] for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM step_execution_stats WHERE procedure_id = 1"
+        )))
+    check("ix_step_executions_execution_id_step_id" in plan, f"étape d'une exécution: {plan}")
+    check("ix_step_execution_stats_procedure_id" in stats_plan, f"résumés par étape: {stats_plan}")
+
+    db.close()
+    print()
+    if failures:
+        print(f"{len(failures)} vérification(s) en échec")
+        sys.exit(1)
+    print("Toutes les vérifications sont passées")
+
+
+if __name__ == "__main__":
+    main()
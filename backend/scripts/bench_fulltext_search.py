@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche plein texte (FTS5 en SQLite, GIN tsvector en PostgreSQL)
+
+Peuple une base de test (100k documents par défaut: procédures, étapes, tips)
+puis mesure une page de résultats avec extraits surlignés.
+
+Usage:
+    python scripts/bench_fulltext_search.py --documents 100000
+    # PostgreSQL: base de test migrée (alembic upgrade head)
+    python scripts/bench_fulltext_search.py --database-url postgresql://.../procedure_bench
+"""
+
+import sys
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.procedure import Procedure, Step
+from app.models.tip import Tip
+from app.models.user import User
+from app.services.fulltext_search import FullTextSearchService, ensure_fulltext_index
+
+# Termes métier (rares) noyés dans un vocabulaire de remplissage à distribution de Zipf
+DOMAIN_TERMS = (
+    "onduleur inverter SG110CX SG250HX string disjoncteur sectionneur câble MC4 isolement "
+    "défaut terre erreur 2032 alarme redémarrage firmware mise à jour communication modbus "
+    "ventilateur température surchauffe tension courant batterie panneau module compteur "
+    "maintenance préventive nettoyage vérification serrage mesure multimètre consignation"
+).split()
+QUERIES = ["onduleur", "erreur 2032", "sg110", "défaut isolement", "modbus communication", "firmware"]
+SYLLABLES = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ru", "sa", "te", "vi", "zo"]
+FILLER = sorted({"".join(random.Random(i).choices(SYLLABLES, k=3)) for i in range(20000)})
+FILLER_WEIGHTS = [1.0 / rank for rank in range(1, len(FILLER) + 1)]
+
+
+def sentence(words: int, domain_ratio: float = 0.03) -> str:
+    tokens = random.choices(FILLER, weights=FILLER_WEIGHTS, k=words)
+    for i in range(words):
+        if random.random() < domain_ratio:
+            tokens[i] = random.choice(DOMAIN_TERMS)
+    return " ".join(tokens)
+
+
+def seed(db, documents: int):
+    """Peupler procédures (avec 3 étapes chacune) et tips: ~`documents` documents au total"""
+    procedures = documents // 5
+    tips = documents - procedures * 4
+    print(f"Peuplement: {procedures} procédures, {procedures * 3} étapes, {tips} tips...")
+    author = User(email=f"bench-{time.time_ns()}@example.com", password_hash="-")
+    db.add(author)
+    db.commit()
+    batch = []
+    for i in range(procedures):
+        procedure = Procedure(
+            title=sentence(5), description=sentence(40), category="maintenance",
+            tags=random.sample(DOMAIN_TERMS, 3), is_active=1, created_by=author.id
+        )
+        procedure.steps = [
+            Step(order=order, title=sentence(4), instructions=sentence(30)) for order in range(1, 4)
+        ]
+        batch.append(procedure)
+        if len(batch) >= 2000:
+            db.add_all(batch)
+            db.commit()
+            batch = []
+    batch.extend(
+        Tip(title=sentence(6), content=sentence(50), category="dépannage",
+            tags=random.sample(DOMAIN_TERMS, 3), created_by=author.id)
+        for _ in range(tips)
+    )
+    db.add_all(batch)
+    db.commit()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche plein texte")
+    parser.add_argument("--database-url", type=str, help="Base de test (défaut: SQLite temporaire)")
+    parser.add_argument("--documents", type=int, default=100_000, help="Nombre de documents")
+    parser.add_argument("--iterations", type=int, default=50, help="Requêtes par mesure")
+    parser.add_argument("--page-size", type=int, default=20, help="Résultats par page")
+    parser.add_argument("--no-seed", action="store_true", help="Réutiliser les données existantes")
+
+    args = parser.parse_args()
+    random.seed(42)
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench_fulltext.db"
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    ensure_fulltext_index(engine)
+    db = sessionmaker(bind=engine)()
+
+    try:
+        if not args.no_seed:
+            started = time.perf_counter()
+            seed(db, args.documents)
+            print(f"  {time.perf_counter() - started:.1f}s")
+
+        service = FullTextSearchService(db)
+        print(f"\n{engine.dialect.name}, page de {args.page_size}, {args.iterations} itérations:")
+        for page in (1, 5):
+            timings = []
+            for i in range(args.iterations):
+                query = QUERIES[i % len(QUERIES)]
+                started = time.perf_counter()
+                result = service.search_page(query, page=page, page_size=args.page_size)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(
+                f"  page {page}: p50={statistics.median(timings):7.2f}ms  p95={p95:7.2f}ms  "
+                f"(dernier total: {result['total']})"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
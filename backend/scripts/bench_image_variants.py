@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Variantes d'images: tailles, temps de génération et en-têtes de cache
+
+Photo de téléphone synthétique (12 Mpx, JPEG, orientation EXIF et GPS)
+envoyée sur /api/uploads, puis:
+- octets et dimensions de chaque variante vs l'original
+- temps de génération (décodage réduit draft() vs décodage complet)
+- ETag fort / Cache-Control immuable et 304 sur les variantes et l'original
+- octets envoyés au modèle de vision (base64) avant / après
+
+Usage:
+    python scripts/bench_image_variants.py
+    python scripts/bench_image_variants.py --width 4032 --height 3024 --runs 5
+"""
+
+import sys
+import os
+import asyncio
+import base64
+import io
+import shutil
+import statistics
+import tempfile
+import time
+
+UPLOAD_DIR = tempfile.mkdtemp(prefix="bench_variants_")
+os.environ["UPLOAD_DIR"] = UPLOAD_DIR
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_variants.db")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from PIL import Image, ImageOps
+from app.core.config import settings
+from app.core.dependencies import get_current_user
+from app.core.upload import UploadStaticFiles
+from app.core.user_cache import AuthenticatedUser
+from app.api import uploads
+from app.services.image_variants import VARIANTS, render_variant
+
+
+def phone_photo(width: int, height: int) -> bytes:
+    """JPEG bruité (se compresse mal, comme une vraie photo), orientation 6 (90°) et coordonnées GPS"""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 40, (height, width, 3)), 0, 255).astype(np.uint8)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotation de 90° à l'affichage
+    exif[0x8825] = {1: "N", 2: (45.0, 10.0, 0.0), 3: "E", 4: (5.0, 43.0, 0.0)}  # GPSInfo
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, "JPEG", quality=92, exif=exif)
+    return output.getvalue()
+
+
+def full_decode_variant(data: bytes, variant: str) -> bytes:
+    """Référence: décodage pleine résolution puis réduction (sans draft)"""
+    max_side, quality = VARIANTS[variant]
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+def bench_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(uploads.router, prefix=f"{settings.API_V1_STR}/uploads")
+    app.mount("/uploads", UploadStaticFiles(directory=UPLOAD_DIR), name="uploads")
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+        id=1, email="bench@example.com", role="technician", created_at=None
+    )
+    return app
+
+
+async def main_async(args) -> int:
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    photo = phone_photo(args.width, args.height)
+    settings.MAX_UPLOAD_SIZE = max(settings.MAX_UPLOAD_SIZE, len(photo))
+    print(f"Photo: {args.width}×{args.height}, {len(photo) / 1e6:.1f} Mo\n")
+
+    # Temps de génération par variante
+    print(f"{'variante':<8} {'draft()':>10} {'complet':>10} {'octets':>10} {'ratio':>8} {'dimensions':>12}")
+    sizes = {}
+    for variant in VARIANTS:
+        timings = {}
+        for label, render in (
+            ("draft", lambda: render_variant(io.BytesIO(photo), variant)),
+            ("full", lambda: full_decode_variant(photo, variant)),
+        ):
+            runs = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                data = render()
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[label] = statistics.median(runs)
+        data = render_variant(io.BytesIO(photo), variant)
+        with Image.open(io.BytesIO(data)) as image:
+            sizes[variant] = (len(data), image.size, image.getexif())
+        print(f"{variant:<8} {timings['draft']:>8.0f}ms {timings['full']:>8.0f}ms {len(data) / 1e3:>8.0f}Ko "
+              f"{len(photo) / len(data):>7.0f}× {'%d×%d' % sizes[variant][1]:>12}")
+    print()
+
+    for variant, (size, dimensions, exif) in sizes.items():
+        max_side = VARIANTS[variant][0]
+        check(max(dimensions) <= max_side and dimensions[1] > dimensions[0] and size < len(photo) / 5,
+              f"{variant}: ≤ {max_side} px, orientation appliquée (portrait), {size / 1e3:.0f} Ko")
+    check(all(0x8825 not in exif and 0x0112 not in exif for _, _, exif in sizes.values()),
+          "métadonnées EXIF (GPS, orientation) retirées")
+
+    transport = httpx.ASGITransport(app=bench_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        stored = (await client.put("/api/uploads/photo.jpg", content=photo)).json()
+        upload_ms = (time.perf_counter() - started) * 1000
+        check(stored["variants"] is not None and set(stored["variants"]) == set(VARIANTS),
+              f"variantes générées à l'upload ({upload_ms:.0f} ms au total)")
+
+        thumb = await client.get(stored["variants"]["thumb"])
+        check(
+            thumb.status_code == 200 and thumb.headers["etag"] == f'"{stored["sha256"]}-thumb"'
+            and "immutable" in thumb.headers["cache-control"],
+            f"variante: ETag fort, cache immuable ({len(thumb.content) / 1e3:.0f} Ko)"
+        )
+        revalidated = await client.get(stored["variants"]["thumb"], headers={"If-None-Match": thumb.headers["etag"]})
+        check(revalidated.status_code == 304 and not revalidated.content, "variante: 304 sur If-None-Match")
+
+        original = await client.get(stored["url"])
+        not_modified = await client.get(stored["url"], headers={"If-None-Match": original.headers["etag"]})
+        check(
+            original.headers["etag"] == f'"{stored["sha256"]}"' and "immutable" in original.headers["cache-control"]
+            and not_modified.status_code == 304,
+            "original adressé par contenu: ETag = SHA-256, cache immuable, 304"
+        )
+
+        missing = await client.get("/api/uploads/thumb/../../etc/passwd")
+        unknown = await client.get(f"/api/uploads/huge/{stored['path']}")
+        check(missing.status_code == 404 and unknown.status_code == 404, "chemin hors uploads ou variante inconnue: 404")
+
+        # Photo antérieure aux variantes (nom non adressé par contenu): générée au premier accès
+        legacy = os.path.join(UPLOAD_DIR, "ancienne.jpg")
+        with open(legacy, "wb") as f:
+            f.write(photo)
+        lazy = await client.get("/api/uploads/screen/ancienne.jpg")
+        check(lazy.status_code == 200 and lazy.headers["etag"] == f'"{stored["sha256"]}-screen"',
+              "photo antérieure: variante générée au premier accès, même cache")
+
+    vision_before = len(base64.b64encode(photo))
+    vision_after = len(base64.b64encode(render_variant(io.BytesIO(photo), "vision")))
+    check(vision_after < vision_before / 5,
+          f"requête vision: {vision_before / 1e6:.1f} Mo → {vision_after / 1e3:.0f} Ko de base64 "
+          f"({vision_before / vision_after:.0f}× moins)")
+
+    shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+    print()
+    if failures:
+        print(f"{len(failures)} vérification(s) en échec")
+        return 1
+    print("Toutes les vérifications sont passées")
+    return 0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Variantes d'images: tailles, temps et cache HTTP")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--runs", type=int, default=3, help="Répétitions par mesure (médiane)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
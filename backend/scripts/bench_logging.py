@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Latence des requêtes avec logs au niveau DEBUG: écriture synchrone vs file
+
+Endpoint async qui émet --log-calls logs avec données structurées (un INFO,
+les autres DEBUG, comme la recherche hybride), appelé --requests fois avec --concurrency
+requêtes simultanées (httpx sur l'application ASGI), pour:
+- avant: DetailedLogger d'origine (f-string, fichier DEBUG + stdout INFO
+  écrits dans le handler, donc dans la boucle d'événements)
+- après: app.core.logger (QueueHandler -> thread d'écriture, JSON lines)
+- référence: aucun log
+
+Deux sorties: stdout rapide et stdout lent (--slow-ms par écriture, comme
+un pipe vers un collecteur de logs saturé). Avec un seul cœur, le thread
+d'écriture partage le CPU avec la boucle: le gain vient des écritures
+bloquantes retirées du chemin de la requête, pas d'un travail en moins. Vérifie aussi les identifiants
+de corrélation, la rotation par taille et le coût d'un log désactivé.
+
+Usage:
+    python scripts/bench_logging.py
+    python scripts/bench_logging.py --requests 2000 --concurrency 50 --slow-ms 5
+"""
+
+import sys
+import os
+import asyncio
+import io
+import json
+import logging
+import statistics
+import tempfile
+import time
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+LOG_DIR = tempfile.mkdtemp(prefix="bench_logging_")
+os.environ["LOG_DIR"] = LOG_DIR
+os.environ["LOG_LEVEL"] = "DEBUG"
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-logging")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_logging.db")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+from app.core.config import settings
+from app.core.logger import DetailedLogger, api_logger, get_logging_pipeline, stop_logging
+from app.core.request_context import REQUEST_ID_HEADER, RequestIdMiddleware
+
+
+class Sink(io.TextIOBase):
+    """stdout simulé: chaque écriture coûte `delay` secondes (pipe saturé)"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.writes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        self.writes += 1
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class LegacyDetailedLogger:
+    """DetailedLogger d'origine (écriture synchrone, message construit avant le test de niveau)"""
+
+    def __init__(self, name: str, log_dir: str, stream):
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        detailed_formatter = logging.Formatter(
+            '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        file_handler = logging.FileHandler(
+            Path(log_dir) / f"{name}_{datetime.now().strftime('%Y%m%d')}.log", encoding='utf-8'
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(detailed_formatter)
+        self.console_handler = logging.StreamHandler(stream)
+        self.console_handler.setLevel(logging.INFO)
+        self.console_handler.setFormatter(detailed_formatter)
+        self.logger.handlers = [file_handler, self.console_handler]
+
+    def debug(self, message: str, extra_data: Optional[dict] = None):
+        if extra_data:
+            message += f" | Data: {extra_data}"
+        self.logger.debug(message)
+
+    def info(self, message: str, extra_data: Optional[dict] = None):
+        if extra_data:
+            message += f" | Data: {extra_data}"
+        self.logger.info(message)
+
+
+def search_log_data(i: int) -> dict:
+    """Données d'un log de recherche hybride (taille réaliste)"""
+    return {
+        "query": "remplacement ventilateur onduleur centrale",
+        "results": 12,
+        "page": i,
+        "timings_ms": {"embedding": 41.2, "vector": 8.7, "fulltext": 3.1, "fusion": 0.4, "total": 54.9},
+        "sources": ["procedure:12", "step:431", "tip:7"],
+    }
+
+
+def bench_app(args) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+    app.state.logger = None
+
+    @app.get("/work")
+    async def work(request: Request):
+        logger = request.app.state.logger
+        for i in range(args.log_calls):
+            if logger is not None:
+                if i == 0:
+                    logger.info("Recherche hybride", search_log_data(i))
+                else:
+                    logger.debug("Résultat de recherche", search_log_data(i))
+            # Accès base / réseau simulé entre deux logs
+            await asyncio.sleep(0.0005)
+        return {"ok": True}
+
+    return app
+
+
+async def run_load(app: FastAPI, args) -> dict:
+    """Latences côté client (ms) et identifiants de corrélation reçus"""
+    latencies, request_ids = [], []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get("/work")
+                latencies.append((time.perf_counter() - started) * 1000)
+                request_ids.append(response.headers[REQUEST_ID_HEADER])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "throughput": args.requests / elapsed,
+        "request_ids": request_ids,
+    }
+
+
+async def returned_request_id(value: bytes) -> str:
+    """X-Request-ID renvoyé pour une valeur reçue brute (httpx refuse un saut de ligne)"""
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = RequestIdMiddleware(app)
+    await middleware({"type": "http", "headers": [(middleware.header, value)]}, None, send)
+    return dict(sent[0]["headers"])[middleware.header].decode("latin-1")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Latence des requêtes avec logs DEBUG: synchrone vs file")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--log-calls", type=int, default=5, help="Logs par requête (un INFO, les autres DEBUG)")
+    parser.add_argument("--slow-ms", type=float, default=2.0, help="Coût d'une écriture sur stdout lent")
+    args = parser.parse_args()
+
+    app = bench_app(args)
+    pipeline = get_logging_pipeline()
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    print(f"{args.requests} requêtes ({args.concurrency} simultanées), {args.log_calls} logs par requête (DEBUG activé)\n")
+    print(f"{'stdout':<10} {'variante':<26} {'p50':>8} {'p99':>8} {'req/s':>7}")
+    results = {}
+    new_request_ids = []
+    for sink_label, delay in (("rapide", 0.0), ("lent", args.slow_ms / 1000)):
+        sink = Sink(delay)
+        pipeline.console.setStream(sink)
+        legacy = LegacyDetailedLogger(f"legacy_{sink_label}", LOG_DIR, sink)
+        for variant, logger in (("aucun log", None), ("avant (synchrone)", legacy), ("après (file, JSON)", api_logger)):
+            app.state.logger = logger
+            result = asyncio.run(run_load(app, args))
+            results[(sink_label, variant)] = result
+            if logger is api_logger:
+                new_request_ids += result["request_ids"]
+            print(f"{sink_label:<10} {variant:<26} {result['p50']:>6.1f}ms {result['p99']:>6.1f}ms {result['throughput']:>7.0f}")
+        print()
+
+    slow_before, slow_after = results[("lent", "avant (synchrone)")], results[("lent", "après (file, JSON)")]
+    fast_before, fast_after = results[("rapide", "avant (synchrone)")], results[("rapide", "après (file, JSON)")]
+    check(slow_after["p99"] * 3 < slow_before["p99"],
+          f"stdout lent: p99 {slow_before['p99']:.0f} ms → {slow_after['p99']:.0f} ms (écriture hors de la boucle)")
+    # Sortie rapide: la sérialisation JSON coûte plus que la f-string d'origine (même cœur)
+    check(fast_after["p50"] <= fast_before["p50"] * 1.5,
+          f"stdout rapide: p50 {fast_before['p50']:.1f} ms → {fast_after['p50']:.1f} ms (surcoût JSON borné)")
+
+    # Coût d'un log désactivé (niveau INFO): message et données ne sont plus construits
+    legacy.logger.setLevel(logging.INFO)
+    api_logger.logger.setLevel(logging.INFO)
+    calls = 100_000
+    data = search_log_data(0)
+    legacy_ns = timeit.timeit(lambda: legacy.debug("Recherche hybride", data), number=calls) / calls * 1e9
+    new_ns = timeit.timeit(lambda: api_logger.debug("Recherche hybride", data), number=calls) / calls * 1e9
+    api_logger.logger.setLevel(logging.DEBUG)
+    check(new_ns * 5 < legacy_ns, f"log DEBUG désactivé: {legacy_ns:.0f} ns → {new_ns:.0f} ns par appel")
+
+    # Rotation par taille
+    settings.LOG_MAX_BYTES = 64 * 1024
+    settings.LOG_BACKUP_COUNT = 3
+    rotation_logger = DetailedLogger("rotation")
+    for i in range(3000):
+        rotation_logger.debug("Ligne de test de rotation", search_log_data(i))
+
+    dropped = pipeline.handler.dropped
+    stop_logging()  # vide la file
+    rotated = sorted(Path(LOG_DIR).glob("rotation.jsonl*"))
+    check(
+        len(rotated) == 4 and all(path.stat().st_size <= settings.LOG_MAX_BYTES + 1024 for path in rotated),
+        f"rotation par taille: {len(rotated)} fichiers ≤ {settings.LOG_MAX_BYTES // 1024} Ko"
+    )
+
+    lines = [json.loads(line) for line in (Path(LOG_DIR) / "api.jsonl").read_text(encoding="utf-8").splitlines()]
+    expected = 2 * args.requests * args.log_calls
+    check(len(lines) == expected and dropped == 0,
+          f"JSON lines: {len(lines)}/{expected} enregistrements écrits, {dropped} abandonné(s)")
+    check(
+        sorted({line["request_id"] for line in lines}) == sorted(new_request_ids)
+        and all(line["data"]["timings_ms"]["total"] == 54.9 for line in lines),
+        "chaque ligne porte l'X-Request-ID de sa requête et ses données structurées"
+    )
+    kept = asyncio.run(returned_request_id(b"lb-7f3a:42"))
+    replaced = asyncio.run(returned_request_id(b"lb-7f3a:42\n"))
+    check(kept == "lb-7f3a:42" and "\n" not in replaced and replaced != "lb-7f3a:42",
+          f"X-Request-ID valide repris, valeur terminée par un saut de ligne remplacée ({replaced})")
+
+    print()
+    if failures:
+        print(f"{len(failures)} vérification(s) en échec")
+        sys.exit(1)
+    print("Toutes les vérifications sont passées")
+
+
+if __name__ == "__main__":
+    main()
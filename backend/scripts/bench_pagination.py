@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark pagination par offset vs par curseur (keyset)
+
+Peuple une base de test (tips et exécutions), puis mesure le temps d'une page
+à différentes profondeurs: offset(skip) parcourt toutes les lignes sautées,
+le curseur descend directement dans l'index.
+
+Usage:
+    python scripts/bench_pagination.py --rows 200000
+    python scripts/bench_pagination.py --database-url postgresql://.../procedure_bench
+"""
+
+import sys
+import os
+import statistics
+import tempfile
+import time
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.core.pagination import encode_cursor, paginate_by_id
+from app.models.procedure import Procedure
+from app.models.execution import Execution
+from app.models.tip import Tip
+from app.models.user import User
+
+
+def seed(db, rows: int):
+    """`rows` tips (2 catégories) et `rows` exécutions d'un même technicien"""
+    print(f"Peuplement: {rows} tips, {rows} exécutions...")
+    user = User(email=f"bench-{time.time_ns()}@example.com", password_hash="-")
+    db.add(user)
+    db.flush()
+    procedure = Procedure(title="Procédure de test", created_by=user.id, is_active=1)
+    db.add(procedure)
+    db.flush()
+    for start in range(0, rows, 10_000):
+        count = min(10_000, rows - start)
+        db.execute(insert(Tip), [
+            {"title": f"Tip {start + i}", "content": "Contenu", "category": ("réglages", "conseils")[i % 2],
+             "tags": [], "created_by": user.id}
+            for i in range(count)
+        ])
+        db.execute(insert(Execution), [
+            {"user_id": user.id, "procedure_id": procedure.id, "status": "completed", "current_step": 0}
+            for _ in range(count)
+        ])
+    db.commit()
+    return user.id
+
+
+def measure(func, iterations: int) -> float:
+    """Médiane en millisecondes"""
+    func()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pagination offset vs curseur")
+    parser.add_argument("--database-url", type=str, help="Base de test (défaut: SQLite temporaire)")
+    parser.add_argument("--rows", type=int, default=200_000, help="Lignes par table")
+    parser.add_argument("--page-size", type=int, default=50, help="Taille de page")
+    parser.add_argument("--iterations", type=int, default=20, help="Mesures par profondeur")
+    parser.add_argument("--depths", type=str, default="0,1000,10000,50000,150000", help="Profondeurs (lignes sautées)")
+
+    args = parser.parse_args()
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench_pagination.db"
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    try:
+        user_id = seed(db, args.rows)
+        tips = db.query(Tip).filter(Tip.category == "conseils")
+        tip_ids = [row.id for row in tips.with_entities(Tip.id).order_by(Tip.id)]
+        executions = db.query(Execution).filter(Execution.user_id == user_id)
+        execution_ids = [row.id for row in executions.with_entities(Execution.id).order_by(Execution.id.desc())]
+
+        print(f"\n{engine.dialect.name}, pages de {args.page_size} (médiane sur {args.iterations}):")
+        print(f"{'profondeur':>10} {'tips offset':>12} {'tips curseur':>13} {'exec offset':>12} {'exec curseur':>13}")
+        for depth in (int(d) for d in args.depths.split(",")):
+            if depth >= min(len(tip_ids), len(execution_ids)):
+                continue
+            tip_cursor = encode_cursor(tip_ids[depth - 1]) if depth else None
+            execution_cursor = encode_cursor(execution_ids[depth - 1]) if depth else None
+            timings = [
+                measure(lambda: tips.order_by(Tip.id).offset(depth).limit(args.page_size).all(), args.iterations),
+                measure(lambda: paginate_by_id(tips, Tip.id, tip_cursor, args.page_size), args.iterations),
+                measure(lambda: executions.order_by(Execution.id.desc()).offset(depth).limit(args.page_size).all(), args.iterations),
+                measure(lambda: paginate_by_id(executions, Execution.id, execution_cursor, args.page_size, descending=True), args.iterations),
+            ]
+            print(f"{depth:>10} " + " ".join(f"{t:>10.2f}ms" for t in timings))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
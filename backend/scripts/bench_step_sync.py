@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Débit de la synchronisation des étapes: une requête par étape vs un lot
+
+Un technicien revenu en zone couverte envoie N mises à jour d'étapes:
+- avant: N appels PUT /api/executions/{id}/step (N transactions)
+- après: un appel POST /api/executions/{id}/steps/sync (une transaction)
+
+Mesure durée, requêtes SQL et transactions (authentification comprise), et
+estime la durée sur un réseau mobile (--rtt-ms par aller-retour HTTP).
+Vérifie ensuite l'idempotence (lot renvoyé), les mises à jour périmées et
+l'atomicité (étape invalide: rien n'est appliqué).
+
+Usage:
+    python scripts/bench_step_sync.py
+    python scripts/bench_step_sync.py --steps 100 --rounds 5 --rtt-ms 150
+"""
+
+import sys
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_step_sync.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-sync")
+# Chaque appel recharge l'utilisateur, comme sans cache
+os.environ.setdefault("AUTH_USER_CACHE_TTL", "0")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine, get_async_engine
+from app.core.query_counter import QueryCounter
+from app.core.security import create_access_token
+from app.models.procedure import Procedure, Step
+from app.models.user import User, UserRole
+from app.api import executions
+
+
+class CommitCounter:
+    """Transactions validées sur les engines (événement commit)"""
+
+    def __init__(self, *engines):
+        self.engines = engines
+        self.count = 0
+
+    def _on_commit(self, conn):
+        self.count += 1
+
+    def __enter__(self):
+        for target in self.engines:
+            event.listen(target, "commit", self._on_commit)
+        return self
+
+    def __exit__(self, *exc):
+        for target in self.engines:
+            event.remove(target, "commit", self._on_commit)
+
+
+def seed(steps: int):
+    """Un technicien et une procédure de `steps` étapes; retourne (token, procedure_id, step_ids)"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(email=f"tech-{uuid.uuid4()}@example.com", password_hash="-", role=UserRole.TECHNICIAN)
+        db.add(user)
+        db.flush()
+        procedure = Procedure(
+            title="Maintenance préventive onduleur", created_by=user.id, is_active=1,
+            steps=[Step(order=order, title=f"Étape {order}", instructions="Contrôler") for order in range(1, steps + 1)]
+        )
+        db.add(procedure)
+        db.commit()
+        return create_access_token({"sub": str(user.id)}), procedure.id, [step.id for step in procedure.steps]
+    finally:
+        db.close()
+
+
+def offline_updates(step_ids, started: datetime):
+    """Une mise à jour par étape, une minute d'écart, comme sur le terrain"""
+    return [
+        {
+            "step_id": step_id,
+            "status": "completed",
+            "photos": [f"photos/{i:02x}/{uuid.uuid4().hex}.jpg"],
+            "comments": f"Mesure {i}: conforme",
+            "idempotency_key": str(uuid.uuid4()),
+            "client_updated_at": (started + timedelta(minutes=i)).isoformat(),
+        }
+        for i, step_id in enumerate(step_ids)
+    ]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synchronisation des étapes: appels unitaires vs lot")
+    parser.add_argument("--steps", type=int, default=40, help="Mises à jour par synchronisation")
+    parser.add_argument("--rounds", type=int, default=3, help="Répétitions (médiane)")
+    parser.add_argument("--rtt-ms", type=float, default=80.0, help="Aller-retour réseau mobile pour l'estimation")
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(executions.router, prefix=f"{settings.API_V1_STR}/executions")
+    client = TestClient(app)
+    token, procedure_id, step_ids = seed(args.steps)
+    headers = {"Authorization": f"Bearer {token}"}
+    engines = (engine, get_async_engine().sync_engine)
+
+    def new_execution() -> int:
+        response = client.post("/api/executions/", json={"procedure_id": procedure_id}, headers=headers)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def one_by_one(updates):
+        execution_id = new_execution()
+        for update in updates:
+            body = {key: update[key] for key in ("step_id", "status", "photos", "comments")}
+            client.put(f"/api/executions/{execution_id}/step", json=body, headers=headers).raise_for_status()
+        return execution_id, len(updates)
+
+    def batch(updates):
+        execution_id = new_execution()
+        client.post(
+            f"/api/executions/{execution_id}/steps/sync", json={"updates": updates}, headers=headers
+        ).raise_for_status()
+        return execution_id, 1
+
+    print(f"{args.steps} mises à jour d'étapes par synchronisation, médiane de {args.rounds} essais\n")
+    print(f"{'variante':<22} {'durée':>9} {'màj/s':>8} {'requêtes SQL':>13} {'transactions':>13} "
+          f"{'estimé RTT ' + str(int(args.rtt_ms)) + ' ms':>18}")
+    measured = {}
+    for label, run in (("une requête par étape", one_by_one), ("lot", batch)):
+        durations, queries, commits = [], [], []
+        for _ in range(args.rounds):
+            updates = offline_updates(step_ids, datetime.now(timezone.utc) - timedelta(hours=2))
+            with QueryCounter(*engines) as counter, CommitCounter(*engines) as transactions:
+                started = time.perf_counter()
+                execution_id, http_calls = run(updates)
+                durations.append(time.perf_counter() - started)
+            queries.append(counter.count)
+            commits.append(transactions.count)
+        duration = statistics.median(durations)
+        estimate = duration + http_calls * args.rtt_ms / 1000
+        measured[label] = (execution_id, duration, statistics.median(queries), statistics.median(commits))
+        print(f"{label:<22} {duration * 1000:>7.0f}ms {args.steps / duration:>8.0f} "
+              f"{statistics.median(queries):>13.0f} {statistics.median(commits):>13.0f} {estimate:>17.2f}s")
+    print()
+
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    single_id, _, _, single_commits = measured["une requête par étape"]
+    batch_id, _, batch_queries, batch_commits = measured["lot"]
+    single_state = client.get(f"/api/executions/{single_id}", headers=headers).json()
+    batch_state = client.get(f"/api/executions/{batch_id}", headers=headers).json()
+    check(
+        single_state["current_step"] == batch_state["current_step"] == args.steps + 1
+        and sorted(s["status"] for s in single_state["step_executions"])
+        == sorted(s["status"] for s in batch_state["step_executions"]),
+        "même état final que les appels unitaires"
+    )
+    # Création de l'exécution (2 transactions: insert + lecture) incluse dans les deux variantes
+    check(batch_commits <= 3 and single_commits >= args.steps,
+          f"lot en une transaction ({batch_commits} avec la création, contre {single_commits})")
+    small = offline_updates(step_ids[:5], datetime.now(timezone.utc))
+    with QueryCounter(*engines) as small_counter:
+        batch(small)
+    check(small_counter.count == batch_queries,
+          f"requêtes indépendantes de la taille du lot ({small_counter.count} pour 5 étapes, "
+          f"{batch_queries:.0f} pour {args.steps})")
+
+    # Lot renvoyé (réponse perdue): rien n'est réappliqué
+    execution_id = new_execution()
+    updates = offline_updates(step_ids[:5], datetime.now(timezone.utc) - timedelta(hours=1))
+    first = client.post(f"/api/executions/{execution_id}/steps/sync", json={"updates": updates}, headers=headers).json()
+    replay = client.post(f"/api/executions/{execution_id}/steps/sync", json={"updates": updates}, headers=headers).json()
+    check(
+        all(r["result"] == "applied" for r in first["results"])
+        and all(r["result"] == "duplicate" for r in replay["results"])
+        and replay["execution"] == first["execution"],
+        "lot renvoyé: doublons reconnus, état inchangé"
+    )
+
+    # Mise à jour d'un autre appareil, plus ancienne que celle déjà appliquée
+    older = dict(updates[0], idempotency_key=str(uuid.uuid4()), status="skipped",
+                 client_updated_at=(datetime.now(timezone.utc) - timedelta(days=1)).isoformat())
+    result = client.post(f"/api/executions/{execution_id}/steps/sync", json={"updates": [older]}, headers=headers).json()
+    step_state = next(s for s in result["execution"]["step_executions"] if s["step_id"] == older["step_id"])
+    check(result["results"][0]["result"] == "stale" and step_state["status"] == "completed",
+          "mise à jour plus ancienne ignorée (stale)")
+
+    # Étape d'une autre procédure dans le lot: tout est refusé
+    _, _, other_steps = seed(2)
+    mixed = offline_updates(step_ids[5:8] + other_steps[:1], datetime.now(timezone.utc))
+    response = client.post(f"/api/executions/{execution_id}/steps/sync", json={"updates": mixed}, headers=headers)
+    state = client.get(f"/api/executions/{execution_id}", headers=headers).json()
+    check(response.status_code == 400 and len(state["step_executions"]) == 5,
+          f"étape invalide: 400, rien appliqué ({response.json()['detail']})")
+
+    print()
+    if failures:
+        print(f"{len(failures)} vérification(s) en échec")
+        sys.exit(1)
+    print("Toutes les vérifications sont passées")
+
+
+if __name__ == "__main__":
+    main()
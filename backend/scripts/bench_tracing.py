@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Traçage des requêtes: surcoût, métriques exposées et profilage à la demande
+
+- surcoût du middleware et des spans (GET /api/procedures/, traçage
+  activé vs TRACING_ENABLED=false), médiane sur --requests appels
+- /metrics: histogramme par gabarit de route (pas par chemin réel), temps
+  SQL par route, span de recherche vectorielle exécutée dans un thread
+- en-tête Server-Timing (base, recherche vectorielle, total)
+- /api/profiling: réservé aux admins, refusé si PROFILING_ENABLED=false,
+  N requêtes armées profilées puis rapport et fichier brut lisibles
+
+Usage:
+    python scripts/bench_tracing.py
+    python scripts/bench_tracing.py --requests 2000 --procedures 200
+"""
+
+import sys
+import os
+import asyncio
+import marshal
+import re
+import statistics
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_tracing.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-tracing")
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="bench_tracing_logs_"))
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine, get_db
+from app.core.request_context import RequestIdMiddleware
+from app.core.security import create_access_token
+from app.core.tracing import SERVER_TIMING_HEADER, TracingMiddleware
+from app.models.procedure import Procedure, Step
+from app.models.user import User, UserRole
+from app.services.vector_search import VectorSearchService
+from app.api import metrics, procedures, profiling
+
+
+class FakeVectorBackend:
+    """Backend vectoriel local simulé (calcul de 2 ms)"""
+
+    def search(self, query_embedding, document_type, limit, threshold):
+        time.sleep(0.002)
+        return []
+
+
+def seed(count: int):
+    """Un admin, un technicien, `count` procédures de 5 étapes; retourne (token admin, token technicien, id)"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        admin = User(email=f"admin-{uuid.uuid4()}@example.com", password_hash="-", role=UserRole.ADMIN)
+        technician = User(email=f"tech-{uuid.uuid4()}@example.com", password_hash="-", role=UserRole.TECHNICIAN)
+        db.add_all([admin, technician])
+        db.flush()
+        db.add_all([
+            Procedure(
+                title=f"Procédure {i}", created_by=admin.id, is_active=1,
+                steps=[Step(order=order, title=f"Étape {order}", instructions="Contrôler") for order in range(1, 6)]
+            )
+            for i in range(count)
+        ])
+        db.commit()
+        procedure_id = db.query(Procedure.id).first()[0]
+        return (
+            create_access_token({"sub": str(admin.id)}),
+            create_access_token({"sub": str(technician.id)}),
+            procedure_id,
+        )
+    finally:
+        db.close()
+
+
+def bench_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+    app.include_router(procedures.router, prefix=f"{settings.API_V1_STR}/procedures")
+    app.include_router(profiling.router, prefix=f"{settings.API_V1_STR}/profiling")
+    app.include_router(metrics.router)
+
+    @app.get("/api/bench/vector")
+    async def vector(db: Session = Depends(get_db)):
+        # Recherche dans un thread, comme la recherche hybride: le span suit la requête
+        service = VectorSearchService(db, backend=FakeVectorBackend())
+        return await asyncio.to_thread(service.search_similar, "onduleur", query_embedding=[0.1] * 8)
+
+    return app
+
+
+def sample(metrics_text: str, name: str, **labels) -> float:
+    """Valeur d'un échantillon Prometheus (labels donnés, dans l'ordre d'exposition)"""
+    for line in metrics_text.splitlines():
+        if line.startswith(name + "{") and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Traçage des requêtes: surcoût, /metrics, profilage")
+    parser.add_argument("--requests", type=int, default=500, help="Appels par variante pour le surcoût")
+    parser.add_argument("--procedures", type=int, default=50)
+    args = parser.parse_args()
+
+    admin_token, technician_token, procedure_id = seed(args.procedures)
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    technician = {"Authorization": f"Bearer {technician_token}"}
+    client = TestClient(bench_app())
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    # Surcoût: variantes alternées pour neutraliser la dérive
+    durations = {True: [], False: []}
+    for i in range(args.requests * 2):
+        enabled = bool(i % 2)
+        settings.TRACING_ENABLED = enabled
+        started = time.perf_counter()
+        client.get("/api/procedures/", headers=technician).raise_for_status()
+        durations[enabled].append((time.perf_counter() - started) * 1000)
+    settings.TRACING_ENABLED = True
+    without, with_tracing = statistics.median(durations[False]), statistics.median(durations[True])
+    print(f"GET /api/procedures/ ({args.procedures} procédures), médiane sur {args.requests} appels")
+    print(f"  sans traçage   {without:.3f} ms")
+    print(f"  avec traçage   {with_tracing:.3f} ms  (+{(with_tracing - without) * 1000:.0f} µs)\n")
+    check(with_tracing - without < max(0.5, without * 0.1), "surcoût du traçage < 10% (ou 0,5 ms)")
+
+    response = client.get(f"/api/procedures/{procedure_id}", headers=technician)
+    timing = response.headers.get(SERVER_TIMING_HEADER, "")
+    check(re.search(r"db;dur=[\d.]+;desc=\"\d+x\"", timing) is not None and "total;dur=" in timing,
+          f"Server-Timing: {timing}")
+    vector_timing = client.get("/api/bench/vector").headers.get(SERVER_TIMING_HEADER, "")
+    check("vector_search;dur=" in vector_timing, "span de recherche vectorielle suivi dans asyncio.to_thread")
+    client.get("/api/inexistant")
+
+    exposed = client.get("/metrics").text
+    check(
+        sample(exposed, "http_request_duration_seconds_count",
+               method="GET", route="/api/procedures/{procedure_id}", status="200") == 1
+        and f"/api/procedures/{procedure_id}\"" not in exposed,
+        "latence par gabarit de route (pas par identifiant)"
+    )
+    check(sample(exposed, "http_request_duration_seconds_count", route="<unmatched>", status="404") == 1,
+          "404 regroupés sous <unmatched>")
+    check(sample(exposed, "http_request_span_seconds_total", route="/api/procedures/", span="db") > 0
+          and sample(exposed, "http_request_span_calls_total", route="/api/procedures/", span="db") >= args.requests,
+          "temps SQL cumulé par route")
+    check(sample(exposed, "app_span_duration_seconds_count", span="vector_search") >= 1,
+          "histogramme du span vector_search")
+
+    # Profilage
+    settings.PROFILING_ENABLED = False
+    arm = {"path_prefix": "/api/procedures/", "count": 2}
+    check(client.post("/api/profiling/arm", json=arm, headers=admin).status_code == 409,
+          "profilage désactivé par défaut (409)")
+    settings.PROFILING_ENABLED = True
+    check(client.post("/api/profiling/arm", json=arm, headers=technician).status_code == 403,
+          "profilage réservé aux administrateurs")
+    client.post("/api/profiling/arm", json=arm, headers=admin).raise_for_status()
+    for _ in range(3):
+        client.get("/api/procedures/", headers=technician).raise_for_status()
+    status = client.get("/api/profiling/", headers=admin).json()
+    profiles = status["profiles"]
+    check(len(profiles) == 2 and status["armed_remaining"] == 0
+          and all(profile["route"] == "/api/procedures/" for profile in profiles),
+          f"{len(profiles)} requêtes profilées sur 3 (armé pour 2, moteur {status['engine']})")
+    if profiles:
+        report = client.get(f"/api/profiling/profiles/{profiles[0]['id']}", headers=admin).text
+        raw = client.get(f"/api/profiling/profiles/{profiles[0]['id']}", params={"format": "raw"}, headers=admin)
+        if status["engine"] == "cProfile":
+            functions = {function for _, _, function in marshal.loads(raw.content)}
+            readable = "get_procedures" in functions
+        else:
+            readable = raw.headers["content-type"].startswith("text/html")
+        check("get_procedures" in report and readable, "rapport texte et fichier brut lisibles")
+    settings.PROFILING_ENABLED = False
+
+    print()
+    if failures:
+        print(f"{len(failures)} vérification(s) en échec")
+        sys.exit(1)
+    print("Toutes les vérifications sont passées")
+
+
+if __name__ == "__main__":
+    main()
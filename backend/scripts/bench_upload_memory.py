@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmark mémoire des uploads: lecture complète vs écriture par blocs
+
+Envoie N photos de ~10 Mo en parallèle (client httpx sur l'application ASGI,
+corps générés à la volée) et mesure la hausse du pic de mémoire résidente
+(ru_maxrss), chaque variante dans son propre processus:
+- avant: UploadFile lu en entier (await file.read()) puis écrit en une fois
+- après: /api/uploads (multipart) et PUT /api/uploads/{nom} (corps brut)
+
+Vérifie aussi le rejet anticipé d'un fichier trop gros et la déduplication.
+
+Usage:
+    python scripts/bench_upload_memory.py
+    python scripts/bench_upload_memory.py --uploads 50 --size-mb 9.5
+"""
+
+import sys
+import os
+import asyncio
+import io
+import json
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+UPLOAD_DIR = tempfile.mkdtemp(prefix="bench_uploads_")
+os.environ["UPLOAD_DIR"] = UPLOAD_DIR
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_upload.db")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from app.core.config import settings
+from app.core.dependencies import get_current_user
+from app.core.user_cache import AuthenticatedUser
+from app.api import uploads
+
+BLOCK = os.urandom(256 * 1024)  # contenu partagé par les photos générées (seul l'en-tête diffère)
+
+
+class GeneratedPhoto(io.RawIOBase):
+    """Fichier de `size` octets produit à la lecture (le client ne garde rien en mémoire)"""
+
+    def __init__(self, index: int, size: int):
+        self.header = f"photo-{index}-{uuid.uuid4()}".encode().ljust(64, b"\0")
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.position = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence] + offset
+        return self.position
+
+    def read(self, n=-1):
+        n = self.size - self.position if n is None or n < 0 else min(n, self.size - self.position)
+        if n <= 0:
+            return b""
+        chunk = bytearray()
+        while len(chunk) < n:
+            start = (self.position + len(chunk)) % len(BLOCK)
+            chunk += BLOCK[start:start + n - len(chunk)]
+        if self.position < len(self.header):
+            head = self.header[self.position:self.position + n]
+            chunk[:len(head)] = head
+        self.position += n
+        return bytes(chunk)
+
+
+async def photo_body(photo: GeneratedPhoto, chunk_size: int = 256 * 1024, consumed: list = None):
+    while True:
+        chunk = photo.read(chunk_size)
+        if not chunk:
+            break
+        if consumed is not None:
+            consumed[0] += len(chunk)
+        yield chunk
+
+
+async def legacy_save_upload_file(file: UploadFile) -> str:
+    """Implémentation précédente de save_upload_file (lecture complète, écriture bloquante)"""
+    file_path = Path(UPLOAD_DIR) / "legacy" / f"{uuid.uuid4()}{Path(file.filename).suffix.lower()}"
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    content = await file.read()
+    if len(content) > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=400, detail="Fichier trop volumineux")
+    with open(file_path, "wb") as f:
+        f.write(content)
+    return str(file_path.relative_to(UPLOAD_DIR))
+
+
+def bench_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(uploads.router, prefix=f"{settings.API_V1_STR}/uploads")
+    app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+        id=1, email="bench@example.com", role="technician", created_at=None
+    )
+
+    @app.post("/legacy")
+    async def legacy(file: UploadFile = File(...)):
+        return {"path": await legacy_save_upload_file(file)}
+
+    return app
+
+
+def max_rss() -> int:
+    """Pic de mémoire résidente du processus, en octets"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def run_variant(variant: str, uploads_count: int, size: int) -> dict:
+    """Uploads simultanés d'une variante (dans un processus dédié: pic RSS propre)"""
+    settings.MAX_UPLOAD_SIZE = max(settings.MAX_UPLOAD_SIZE, size)
+    transport = httpx.ASGITransport(app=bench_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        async def one(index: int):
+            photo = GeneratedPhoto(index, size)
+            if variant == "raw":
+                response = await client.put(
+                    f"/api/uploads/photo-{index}.jpg", content=photo_body(photo),
+                    headers={"Content-Length": str(size)}
+                )
+            else:
+                url = "/legacy" if variant == "legacy" else "/api/uploads/"
+                response = await client.post(url, files={"file": (f"photo-{index}.jpg", photo, "image/jpeg")})
+            response.raise_for_status()
+
+        await one(-1)  # échauffement: imports paresseux, pools
+        baseline = max_rss()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(uploads_count)))
+        return {"elapsed": time.perf_counter() - started, "peak": max_rss() - baseline}
+
+
+def measure(variant: str, args) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--variant", variant,
+         "--uploads", str(args.uploads), "--size-mb", str(args.size_mb)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def checks(args) -> int:
+    size = int(args.size_mb * 1_000_000)
+    transport = httpx.ASGITransport(app=bench_app())
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    print(f"{args.uploads} uploads simultanés de {size / 1e6:.1f} Mo (total {args.uploads * size / 1e6:.0f} Mo)\n")
+    print(f"{'variante':<28} {'durée':>8} {'hausse pic RSS':>15} {'par upload':>11}")
+    peaks = {}
+    for variant, label in (
+        ("legacy", "avant (lecture complète)"),
+        ("multipart", "après (multipart, blocs)"),
+        ("raw", "après (corps brut, blocs)"),
+    ):
+        result = measure(variant, args)
+        peaks[variant] = result["peak"]
+        print(f"{label:<28} {result['elapsed']:>7.2f}s {result['peak'] / 1e6:>13.1f}Mo "
+              f"{result['peak'] / args.uploads / 1e6:>9.2f}Mo")
+    print()
+
+    # Par upload en cours: un bloc lu + (multipart) le fichier temporaire de Starlette, 1 Mo en mémoire
+    bound = args.uploads * 3 * settings.UPLOAD_CHUNK_SIZE
+    check(peaks["raw"] < bound and peaks["multipart"] < bound,
+          f"mémoire bornée par les blocs, pas par la taille des fichiers (< {bound / 1e6:.0f} Mo)")
+    check(peaks["legacy"] > size, "avant: fichiers entiers en mémoire")
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        # Trop gros, Content-Length annoncé: refusé sans lire le corps
+        consumed = [0]
+        photo = GeneratedPhoto(0, settings.MAX_UPLOAD_SIZE * 3)
+        response = await client.put(
+            "/api/uploads/trop-gros.jpg", content=photo_body(photo, consumed=consumed),
+            headers={"Content-Length": str(photo.size)}
+        )
+        check(response.status_code == 413 and consumed[0] <= 256 * 1024,
+              f"Content-Length trop grand: 413 sans lire le corps ({consumed[0] / 1e6:.1f} Mo lus)")
+
+        # Trop gros, sans Content-Length (chunked): abandon dès le dépassement
+        consumed = [0]
+        photo = GeneratedPhoto(0, settings.MAX_UPLOAD_SIZE * 3)
+        response = await client.put("/api/uploads/trop-gros.jpg", content=photo_body(photo, consumed=consumed))
+        check(response.status_code == 413 and consumed[0] <= settings.MAX_UPLOAD_SIZE + 2 * settings.UPLOAD_CHUNK_SIZE,
+              f"flux trop long: 413 après {consumed[0] / 1e6:.1f} Mo sur {photo.size / 1e6:.0f} Mo")
+        leftovers = list((Path(UPLOAD_DIR) / ".tmp").iterdir())
+        check(not leftovers, "aucun fichier temporaire laissé")
+
+        # Même photo deux fois: même objet
+        photo = GeneratedPhoto(1, 2_000_000)
+        first = (await client.post("/api/uploads/", files={"file": ("a.jpg", photo, "image/jpeg")})).json()
+        photo.seek(0)
+        second = (await client.put("/api/uploads/b.JPG", content=photo_body(photo))).json()
+        check(first["path"] == second["path"] and second["deduplicated"] and not first["deduplicated"],
+              f"contenu identique dédupliqué ({first['path']})")
+
+    print()
+    if failures:
+        print(f"{len(failures)} vérification(s) en échec")
+        return 1
+    print("Toutes les vérifications sont passées")
+    return 0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pic mémoire des uploads simultanés")
+    parser.add_argument("--uploads", type=int, default=20, help="Uploads simultanés")
+    parser.add_argument("--size-mb", type=float, default=10.0, help="Taille de chaque photo (Mo)")
+    parser.add_argument("--variant", choices=["legacy", "multipart", "raw"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    try:
+        if args.variant:
+            result = asyncio.run(run_variant(args.variant, args.uploads, int(args.size_mb * 1_000_000)))
+            print(json.dumps(result))
+            return
+        sys.exit(asyncio.run(checks(args)))
+    finally:
+        shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
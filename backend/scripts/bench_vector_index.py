@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark recall@k / latence de l'index vectoriel (PostgreSQL + pgvector)
+
+Construit l'index demandé sur une table de test, puis compare pour chaque
+valeur de ef_search (HNSW) ou probes (IVFFlat) les résultats à la recherche
+exacte (parcours séquentiel).
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/bench_vector_index.py --method hnsw --ef-search 20,40,80,160
+    DATABASE_URL=postgresql://... python scripts/bench_vector_index.py --method ivfflat --lists 100 --probes 1,5,10,20
+    # Sur une copie des embeddings réels:
+    DATABASE_URL=postgresql://... python scripts/bench_vector_index.py --source-table document_embeddings
+"""
+
+import sys
+import os
+import json
+import statistics
+import time
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import SessionLocal, engine
+from app.services.vector_index import VectorIndexManager, VECTOR_INDEX_METHODS
+from app.services.vector_search import VectorSearchService
+from app.services.vector_backends import PgVectorBackend
+from bench_vector_search import BENCH_TABLE, seed_table
+
+
+def copy_source_table(db, source_table: str):
+    """Copier les embeddings réels dans la table de test"""
+    print(f"Copie de {source_table} vers {BENCH_TABLE}...")
+    db.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+    db.execute(text(f"""
+        CREATE TABLE {BENCH_TABLE} AS
+        SELECT id, document_type, document_id, content, content_hash, embedding, metadata
+        FROM {source_table}
+        WHERE embedding IS NOT NULL
+    """))
+    db.execute(text(f"ANALYZE {BENCH_TABLE}"))
+    db.commit()
+
+
+def sample_queries(db, count: int):
+    """Prendre des embeddings existants comme requêtes"""
+    rows = db.execute(
+        text(f"SELECT embedding::text AS embedding FROM {BENCH_TABLE} ORDER BY random() LIMIT :count"),
+        {"count": count}
+    ).fetchall()
+    db.rollback()
+    return [json.loads(row.embedding) for row in rows]
+
+
+def run_search(service: VectorSearchService, embedding, k: int, exact: bool = False):
+    """Top-k ids et durée (ms); `exact` désactive les index pour la vérité terrain"""
+    if exact:
+        service.db.execute(text("SET LOCAL enable_indexscan = off"))
+        service.db.execute(text("SET LOCAL enable_bitmapscan = off"))
+    started = time.perf_counter()
+    # threshold=-1: aucun filtre, la distance cosinus est dans [0, 2]
+    results = service.search_similar("", limit=k, threshold=-1.0, query_embedding=embedding)
+    elapsed = (time.perf_counter() - started) * 1000
+    service.db.rollback()
+    return [result["id"] for result in results], elapsed
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark recall@k vs latence de l'index vectoriel")
+    parser.add_argument("--method", choices=VECTOR_INDEX_METHODS, default="hnsw", help="Type d'index")
+    parser.add_argument("--rows", type=int, default=100_000, help="Lignes de test (si pas de --source-table)")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Dimension des vecteurs de test")
+    parser.add_argument("--source-table", type=str, help="Copier les embeddings de cette table au lieu de données aléatoires")
+    parser.add_argument("--queries", type=int, default=50, help="Nombre de requêtes")
+    parser.add_argument("--k", type=int, default=10, help="k du recall@k")
+    parser.add_argument("--m", type=int, default=16, help="HNSW: m")
+    parser.add_argument("--ef-construction", type=int, default=64, help="HNSW: ef_construction")
+    parser.add_argument("--ef-search", type=str, default="20,40,80,160", help="HNSW: valeurs de ef_search à tester")
+    parser.add_argument("--lists", type=int, help="IVFFlat: nombre de listes")
+    parser.add_argument("--probes", type=str, default="1,5,10,20", help="IVFFlat: valeurs de probes à tester")
+    parser.add_argument("--no-seed", action="store_true", help="Réutiliser la table de test existante")
+    parser.add_argument("--output", type=str, help="Fichier JSON de résultats")
+    parser.add_argument("--keep", action="store_true", help="Conserver la table de test après le benchmark")
+
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("Ce benchmark nécessite PostgreSQL avec l'extension pgvector (DATABASE_URL)")
+        sys.exit(1)
+
+    db = SessionLocal()
+    manager = VectorIndexManager(engine, table_name=BENCH_TABLE)
+
+    try:
+        if args.source_table:
+            copy_source_table(db, args.source_table)
+        elif not args.no_seed:
+            seed_table(db, args.rows, args.dimensions)
+
+        queries = sample_queries(db, args.queries)
+        backend = PgVectorBackend(db, table_name=BENCH_TABLE)
+        service = VectorSearchService(db, backend=backend)
+
+        # Vérité terrain: recherche exacte
+        print(f"Recherche exacte sur {len(queries)} requêtes...")
+        exact = [run_search(service, embedding, args.k, exact=True) for embedding in queries]
+        exact_latency = statistics.median(elapsed for _, elapsed in exact)
+
+        print(f"Construction de l'index {args.method}...")
+        started = time.perf_counter()
+        status = manager.build(method=args.method, m=args.m, ef_construction=args.ef_construction, lists=args.lists)
+        build_seconds = time.perf_counter() - started
+        print(f"  {status['definition']} ({status['size']}, {build_seconds:.1f}s)")
+
+        knob = "ef_search" if args.method == "hnsw" else "probes"
+        values = [int(v) for v in (args.ef_search if args.method == "hnsw" else args.probes).split(",")]
+
+        results = []
+        print(f"\n{knob:>10} {'recall@' + str(args.k):>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+        print(f"{'exact':>10} {1.0:>10.3f} {exact_latency:>10.2f} {'':>10}")
+        for value in values:
+            setattr(backend, knob, value)
+            recalls = []
+            timings = []
+            for embedding, (exact_ids, _) in zip(queries, exact):
+                ids, elapsed = run_search(service, embedding, args.k)
+                recalls.append(len(set(ids) & set(exact_ids)) / max(1, len(exact_ids)))
+                timings.append(elapsed)
+            timings.sort()
+            row = {
+                knob: value,
+                "recall": round(statistics.mean(recalls), 4),
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            }
+            results.append(row)
+            print(f"{value:>10} {row['recall']:>10.3f} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f}")
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({
+                    "method": args.method,
+                    "index": status,
+                    "build_seconds": round(build_seconds, 2),
+                    "k": args.k,
+                    "queries": len(queries),
+                    "exact_p50_ms": round(exact_latency, 3),
+                    "results": results,
+                }, f, indent=2)
+            print(f"\nRésultats écrits dans {args.output}")
+    finally:
+        db.close()
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche vectorielle search_all (PostgreSQL + pgvector)
+
+Compare sur une table de test peuplée (100k lignes par défaut):
+  - two_queries : une requête par type de document (ancien chemin)
+  - window      : une requête, ROW_NUMBER() OVER (PARTITION BY document_type)
+  - union_all   : une requête, sous-requêtes top-k par type (chemin actuel)
+
+Usage: DATABASE_URL=postgresql://... python scripts/bench_vector_search.py --rows 100000
+"""
+
+import sys
+import os
+import random
+import statistics
+import time
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import SessionLocal
+from app.services.vector_search import VectorSearchService
+from app.services.vector_backends import PgVectorBackend
+
+BENCH_TABLE = "bench_document_embeddings"
+
+
+def seed_table(db, rows: int, dimensions: int):
+    """Créer et peupler la table de test (vecteurs aléatoires générés côté serveur)"""
+    print(f"Création de {BENCH_TABLE} ({rows} lignes, dimension {dimensions})...")
+    db.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    db.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+    db.execute(text(f"""
+        CREATE TABLE {BENCH_TABLE} (
+            id SERIAL PRIMARY KEY,
+            document_type VARCHAR(50) NOT NULL,
+            document_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            content_hash VARCHAR(64),
+            embedding vector({dimensions}),
+            metadata TEXT
+        )
+    """))
+    # Le filtre `g > 0` force la réévaluation du sous-SELECT pour chaque ligne
+    db.execute(text(f"""
+        INSERT INTO {BENCH_TABLE} (document_type, document_id, content, embedding, metadata)
+        SELECT
+            CASE WHEN g % 3 = 0 THEN 'tip' ELSE 'procedure' END,
+            g,
+            'Document ' || g,
+            ARRAY(SELECT random() - 0.5 FROM generate_series(1, :dimensions) WHERE g > 0)::vector,
+            '{{}}'
+        FROM generate_series(1, :rows) AS g
+    """), {"rows": rows, "dimensions": dimensions})
+    db.execute(text(f"CREATE INDEX ON {BENCH_TABLE} (document_type)"))
+    db.execute(text(f"ANALYZE {BENCH_TABLE}"))
+    db.commit()
+
+
+def window_query(service: VectorSearchService, embedding, limit: int, threshold: float):
+    """Variante fenêtrée: une seule requête mais un parcours complet de la table"""
+    sql = f"""
+    SELECT id, document_type, document_id, content, metadata, 1 - distance AS similarity
+    FROM (
+        SELECT id, document_type, document_id, content, metadata, distance,
+               ROW_NUMBER() OVER (PARTITION BY document_type ORDER BY distance) AS rank
+        FROM (
+            SELECT id, document_type, document_id, content, metadata,
+                   embedding <=> CAST(:embedding AS vector) AS distance
+            FROM {service.backend.table_name}
+            WHERE embedding IS NOT NULL AND document_type IN ('procedure', 'tip')
+        ) scored
+        WHERE distance <= :max_distance
+    ) ranked
+    WHERE rank <= :limit
+    ORDER BY document_type, distance
+    """
+    return service.db.execute(text(sql), {
+        "embedding": service.backend.format_embedding(embedding),
+        "limit": limit,
+        "max_distance": 1 - threshold
+    }).fetchall()
+
+
+def measure(label: str, func, iterations: int):
+    """Exécuter `func` et afficher p50/p95/moyenne en millisecondes"""
+    func()  # échauffement
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"  {label:<12} p50={statistics.median(timings):8.2f}ms  p95={p95:8.2f}ms  moy={statistics.mean(timings):8.2f}ms")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de search_all (pgvector)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Nombre de lignes de test")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Dimension des vecteurs")
+    parser.add_argument("--iterations", type=int, default=20, help="Requêtes par variante")
+    parser.add_argument("--limit", type=int, default=5, help="Top-k par type")
+    parser.add_argument("--threshold", type=float, default=0.0, help="Seuil de similarité")
+    parser.add_argument("--no-seed", action="store_true", help="Réutiliser la table de test existante")
+    parser.add_argument("--keep", action="store_true", help="Conserver la table de test après le benchmark")
+
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    if db.bind.dialect.name != "postgresql":
+        print("Ce benchmark nécessite PostgreSQL avec l'extension pgvector (DATABASE_URL)")
+        sys.exit(1)
+
+    try:
+        if not args.no_seed:
+            seed_table(db, args.rows, args.dimensions)
+
+        service = VectorSearchService(db, backend=PgVectorBackend(db, table_name=BENCH_TABLE))
+        embedding = [random.uniform(-0.5, 0.5) for _ in range(args.dimensions)]
+
+        print(f"\nsearch_all top-{args.limit} par type, {args.iterations} itérations:")
+        measure("two_queries", lambda: (
+            service.search_similar("", "procedure", args.limit, args.threshold, query_embedding=embedding),
+            service.search_similar("", "tip", args.limit, args.threshold, query_embedding=embedding),
+        ), args.iterations)
+        measure("window", lambda: window_query(service, embedding, args.limit, args.threshold), args.iterations)
+        measure("union_all", lambda: service.search_top_k_per_type(
+            embedding, ["procedure", "tip"], args.limit, args.threshold
+        ), args.iterations)
+    finally:
+        if not args.keep:
+            db.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+            db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Script pour construire l'index vectoriel local (déploiements SQLite, postes terrain)
+Usage:
+    python scripts/build_local_vector_index.py                  # encoder la base locale via OpenAI
+    python scripts/build_local_vector_index.py --quantize       # + variante int8
+    python scripts/build_local_vector_index.py --from-database-url postgresql://...  # copier depuis pgvector
+
+Les documents dont le contenu n'a pas changé réutilisent leur vecteur existant.
+"""
+
+import sys
+import os
+import hashlib
+import json
+import time
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.procedure import Procedure
+from app.models.tip import Tip
+from app.services.vector_backends import LocalVectorIndex, default_local_index_path
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def load_documents():
+    """Procédures actives et tips de la base locale, au format de generate_embeddings_direct"""
+    db = SessionLocal()
+    try:
+        documents = []
+        for document_type, rows, body_field in (
+            ("procedure", db.query(Procedure).filter(Procedure.is_active == 1).all(), "description"),
+            ("tip", db.query(Tip).all(), "content"),
+        ):
+            for row in rows:
+                content = f"{row.title or ''}\n\n{getattr(row, body_field) or ''}".strip()
+                if not content:
+                    continue
+                documents.append({
+                    "document_type": document_type,
+                    "document_id": row.id,
+                    "content": content,
+                    "content_hash": content_hash(content),
+                    "metadata": {"title": row.title, "category": row.category, "tags": row.tags}
+                })
+        return documents
+    finally:
+        db.close()
+
+
+def load_from_pgvector(database_url: str):
+    """Copier les embeddings déjà calculés dans document_embeddings (PostgreSQL)"""
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT id, document_type, document_id, content, metadata, embedding::text AS embedding
+            FROM document_embeddings
+            WHERE embedding IS NOT NULL
+            ORDER BY document_type, document_id
+        """)).fetchall()
+
+    records, embeddings = [], []
+    for row in rows:
+        records.append({
+            "id": row.id,
+            "document_type": row.document_type,
+            "document_id": row.document_id,
+            "content": row.content,
+            "content_hash": content_hash(row.content),
+            "metadata": json.loads(row.metadata) if row.metadata else {}
+        })
+        embeddings.append(json.loads(row.embedding))
+    return records, embeddings
+
+
+def embed_documents(documents, existing: LocalVectorIndex, batch_size: int, base_url: str = None):
+    """Encoder les documents nouveaux/modifiés, réutiliser les vecteurs inchangés"""
+    from openai import OpenAI
+
+    reusable = {}
+    if existing.exists() and existing.vectors is not None:
+        for row, record in enumerate(existing.records):
+            key = (record["document_type"], record["document_id"], record.get("content_hash"))
+            reusable[key] = row
+
+    embeddings = [None] * len(documents)
+    to_embed = []
+    for i, doc in enumerate(documents):
+        row = reusable.get((doc["document_type"], doc["document_id"], doc["content_hash"]))
+        if row is not None:
+            embeddings[i] = existing.vectors[row].tolist()
+        else:
+            to_embed.append(i)
+
+    print(f"{len(documents) - len(to_embed)} vecteurs réutilisés, {len(to_embed)} à encoder")
+    if to_embed:
+        client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=base_url or None)
+        for start in range(0, len(to_embed), batch_size):
+            batch = to_embed[start:start + batch_size]
+            response = client.embeddings.create(
+                model=settings.EMBEDDING_MODEL,
+                input=[documents[i]["content"][:8000] for i in batch]
+            )
+            for item in sorted(response.data, key=lambda item: item.index):
+                embeddings[batch[item.index]] = item.embedding
+            print(f"  {min(start + batch_size, len(to_embed))}/{len(to_embed)}")
+
+    return embeddings
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Construire l'index vectoriel local (NumPy)")
+    parser.add_argument("--path", type=str, default=None, help="Répertoire de l'index (défaut: à côté de la base SQLite)")
+    parser.add_argument("--from-database-url", type=str, help="Copier les embeddings depuis une base PostgreSQL/pgvector")
+    parser.add_argument("--openai-base-url", type=str, help="URL d'un serveur d'embeddings compatible OpenAI")
+    parser.add_argument("--batch-size", type=int, default=128, help="Documents par requête d'embeddings")
+    parser.add_argument("--quantize", action="store_true", help="Ajouter la variante quantifiée int8")
+
+    args = parser.parse_args()
+    path = args.path or default_local_index_path()
+    started = time.perf_counter()
+
+    try:
+        if args.from_database_url:
+            records, embeddings = load_from_pgvector(args.from_database_url)
+        else:
+            documents = load_documents()
+            existing = LocalVectorIndex(path).load()
+            embeddings = embed_documents(documents, existing, args.batch_size, args.openai_base_url)
+            records = [
+                {"id": i + 1, **doc}
+                for i, doc in enumerate(documents)
+            ]
+
+        index = LocalVectorIndex.write(path, records, embeddings, quantize=args.quantize)
+        print(f"Index local écrit dans {path}: {len(index)} documents en {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"Erreur: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
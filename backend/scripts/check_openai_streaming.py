@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Vérifier les appels OpenAI non bloquants contre un serveur local factice
+
+Le serveur imite /v1/chat/completions (streaming SSE ou réponse complète) avec
+un délai par fragment. Le script vérifie que:
+- plusieurs flux progressent en parallèle (ancien client synchrone en référence)
+- la boucle d'événements reste disponible pendant les flux
+- OPENAI_MAX_CONCURRENCY borne les appels simultanés en amont, sans qu'un
+  client lent garde sa place pendant son téléchargement
+- annuler un flux ferme la requête en amont
+- OPENAI_TIMEOUT interrompt un serveur muet
+- /api/chat/stream enregistre le texte streamé, l'usage et le temps au premier
+  token, sans second appel au modèle
+- le cache des réponses sert un message équivalent (casse, espaces, ordre des
+  clés du contexte) sans appel au modèle et compte les économies
+
+Usage: python scripts/check_openai_streaming.py [--streams 8] [--chunks 10] [--delay 0.1]
+Code de sortie 1 si une vérification échoue.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import re
+import socket
+import threading
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/check_openai.db")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, Base, SessionLocal, engine
+from app.core.dependencies import get_current_user
+from app.core.openai_client import close_openai_client, get_async_openai_client
+from app.core.user_cache import AuthenticatedUser
+from app.models.chat import ChatMessage
+from app.models.user import User, UserRole
+from app.services.ai_service import AIService, ChatStreamResult
+from app.services.chat_history import wait_pending_chat_messages
+
+
+class StubState:
+    def __init__(self):
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.embeddings = 0
+        self.last_body = None
+        self.delay = 0.1
+        self.chunks = 10
+        self.stall = 0.0  # délai avant la première réponse (timeouts)
+
+
+def stub_app(state: StubState) -> FastAPI:
+    """Serveur compatible OpenAI minimal"""
+    app = FastAPI()
+
+    def chunk(content=None, finish_reason=None):
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": "stub", "choices": [{
+                "index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason
+            }],
+        }
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        state.requests += 1
+        state.last_body = body
+        state.active += 1
+        state.max_active = max(state.max_active, state.active)
+
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(state.stall + state.delay * state.chunks)
+                state.completed += 1
+            finally:
+                state.active -= 1
+            return JSONResponse({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "réponse complète"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+
+        async def events():
+            finished = False
+            try:
+                await asyncio.sleep(state.stall)
+                for i in range(state.chunks):
+                    await asyncio.sleep(state.delay)
+                    yield f"data: {json.dumps(chunk(f'fragment {i} '))}\n\n"
+                yield f"data: {json.dumps(chunk(finish_reason='stop'))}\n\n"
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    usage = {"prompt_tokens": 12, "completion_tokens": state.chunks, "total_tokens": 12 + state.chunks}
+                    yield f"data: {json.dumps({**chunk(), 'choices': [], 'usage': usage})}\n\n"
+                yield "data: [DONE]\n\n"
+                finished = True
+            finally:
+                state.active -= 1
+                if finished:
+                    state.completed += 1
+                else:
+                    state.cancelled += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        # Sac de mots: même vecteur pour les mêmes mots, quel que soit leur ordre
+        body = await request.json()
+        state.embeddings += 1
+        vector = [0.0] * 64
+        for word in re.findall(r"\w+", body["input"].lower()):
+            vector[sum(word.encode("utf-8")) % 64] += 1.0
+        return JSONResponse({
+            "object": "list", "model": body["model"],
+            "data": [{"object": "embedding", "index": 0, "embedding": vector}],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1},
+        })
+
+    return app
+
+
+def start_stub(state: StubState) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub_app(state), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+async def loop_lag_monitor(samples: list, stop: asyncio.Event, interval: float = 0.01):
+    """Retard maximal de la boucle: un appel bloquant l'allonge d'autant"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+async def consume(stream, first_chunks: list, started: float):
+    count = 0
+    async for _ in stream:
+        if count == 0:
+            first_chunks.append(time.perf_counter() - started)
+        count += 1
+    return count
+
+
+def blocking_stream(base_url: str):
+    """Ancien schéma: client synchrone itéré dans un générateur async"""
+    from openai import OpenAI
+
+    client = OpenAI(api_key="sk-stub", base_url=base_url, max_retries=0)
+
+    async def generate():
+        stream = client.chat.completions.create(
+            model="stub", messages=[{"role": "user", "content": "?"}], stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    return generate()
+
+
+async def run_streams(make_stream, streams: int):
+    lag, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(loop_lag_monitor(lag, stop))
+    first_chunks = []
+    started = time.perf_counter()
+    counts = await asyncio.gather(*(consume(make_stream(), first_chunks, started) for _ in range(streams)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    return {
+        "elapsed": elapsed,
+        "first_chunk_max": max(first_chunks),
+        "loop_lag_max": max(lag or [0.0]),
+        "chunks": sum(counts),
+    }
+
+
+async def main_async(args) -> int:
+    state = StubState()
+    state.delay, state.chunks = args.delay, args.chunks
+    base_url = start_stub(state)
+    settings.OPENAI_BASE_URL = base_url
+    settings.OPENAI_MAX_RETRIES = 0
+    # Mêmes messages répétés: cache désactivé sauf pour sa propre vérification
+    settings.CHAT_CACHE_ENABLED = False
+    # Flux concurrents: mesure du client seul, sans contexte documentaire (vérifié à part)
+    settings.CHAT_RAG_ENABLED = False
+    service = AIService()
+    single_stream = args.delay * args.chunks
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    print(f"Serveur factice: {base_url} ({args.chunks} fragments × {args.delay * 1000:.0f} ms par flux)\n")
+    print(f"{'variante':<28} {'durée':>8} {'1er fragment (max)':>19} {'retard boucle (max)':>20}")
+
+    before = await run_streams(lambda: blocking_stream(base_url), args.streams)
+    settings.OPENAI_MAX_CONCURRENCY = args.streams
+    get_async_openai_client()  # création du client (contexte TLS) hors mesure
+    after = await run_streams(lambda: service.get_chat_response_stream("?"), args.streams)
+    for label, result in (("avant (client synchrone)", before), ("après (AsyncOpenAI)", after)):
+        print(
+            f"{label:<28} {result['elapsed']:>7.2f}s {result['first_chunk_max'] * 1000:>17.0f}ms "
+            f"{result['loop_lag_max'] * 1000:>18.0f}ms"
+        )
+    print()
+
+    check(after["chunks"] == args.streams * args.chunks, f"{args.streams} flux complets")
+    check(after["elapsed"] < single_stream * 2, f"{args.streams} flux en parallèle (≈ durée d'un flux)")
+    check(after["first_chunk_max"] < single_stream, "chaque flux reçoit son premier fragment sans attendre les autres")
+    # Référence mesurée dans le même run: le client synchrone bloque la boucle au
+    # moins le temps d'un flux. Le serveur factice partage le GIL du processus et
+    # une machine chargée retarde la boucle sans la bloquer: seuil relatif
+    lag_limit = min(before["loop_lag_max"], single_stream) / 2
+    check(
+        after["loop_lag_max"] < lag_limit,
+        f"boucle d'événements disponible pendant les flux (retard < {lag_limit * 1000:.0f} ms, "
+        f"moitié du blocage d'un flux synchrone)"
+    )
+
+    # Concurrence bornée
+    await close_openai_client()
+    limit = max(1, args.streams // 2)
+    settings.OPENAI_MAX_CONCURRENCY = limit
+    state.max_active = 0
+    bounded = await run_streams(lambda: service.get_chat_response_stream("?"), args.streams)
+    check(state.max_active == limit, f"au plus {limit} appels simultanés en amont (observé: {state.max_active})")
+    check(bounded["chunks"] == args.streams * args.chunks, "les appels en attente aboutissent")
+
+    # Client lent: la place est rendue à la fin du flux amont, pas à la fin du téléchargement
+    await close_openai_client()
+    settings.OPENAI_MAX_CONCURRENCY = 1
+    slow = service.get_chat_response_stream("?")
+    await slow.__anext__()  # premier fragment, puis plus aucune lecture
+    await asyncio.sleep(single_stream * 1.5)
+    started = time.perf_counter()
+    try:
+        other = await asyncio.wait_for(consume(service.get_chat_response_stream("?"), [], started), single_stream * 3)
+    except asyncio.TimeoutError:
+        other = 0
+    elapsed = time.perf_counter() - started
+    remaining = [chunk async for chunk in slow]
+    check(
+        other == args.chunks and len(remaining) == args.chunks - 1 and elapsed < single_stream * 2,
+        f"un client qui ne lit plus ne garde pas la place (autre flux: {elapsed:.2f}s)"
+    )
+
+    # Annulation
+    await close_openai_client()
+    settings.OPENAI_MAX_CONCURRENCY = args.streams
+    cancelled_before = state.cancelled
+
+    async def read_stream():
+        # Comme StreamingResponse: la déconnexion annule la tâche pendant
+        # l'attente du fragment suivant
+        async for _ in service.get_chat_response_stream("?"):
+            pass
+
+    task = asyncio.create_task(read_stream())
+    await asyncio.sleep(args.delay * 3)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    deadline = time.perf_counter() + 2
+    while state.cancelled == cancelled_before and time.perf_counter() < deadline:
+        await asyncio.sleep(0.02)
+    check(state.cancelled > cancelled_before, "annuler le flux ferme la requête en amont")
+
+    # Stream puis enregistrement
+    await close_openai_client()
+    await check_stream_then_persist(state, check)
+
+    # Cache des réponses
+    settings.CHAT_CACHE_ENABLED = True
+    await check_response_cache(state, service, check)
+    settings.CHAT_CACHE_ENABLED = False
+
+    # Cache sémantique
+    await check_semantic_cache(state, service, check)
+
+    # Contexte documentaire (RAG)
+    settings.CHAT_RAG_ENABLED = True
+    await check_rag_context(state, service, check)
+    settings.CHAT_RAG_ENABLED = False
+
+    # Timeout
+    await close_openai_client()
+    settings.OPENAI_TIMEOUT = 0.3
+    state.stall = 2.0
+    started = time.perf_counter()
+    response = await service.get_chat_response("timeout ?")
+    elapsed = time.perf_counter() - started
+    check(response.startswith("Erreur") and elapsed < 1.0, f"timeout respecté ({elapsed:.2f}s)")
+
+    await close_openai_client()
+    print()
+    if failures:
+        print(f"{len(failures)} vérification(s) en échec")
+        return 1
+    print("Toutes les vérifications sont passées")
+    return 0
+
+
+def chat_app(user: AuthenticatedUser) -> FastAPI:
+    from app.api import chat
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat")
+    app.dependency_overrides[get_current_user] = lambda: user
+    return app
+
+
+async def check_stream_then_persist(state: StubState, check):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(email=f"stream-{time.time_ns()}@example.com", password_hash="-", role=UserRole.TECHNICIAN)
+        db.add(user)
+        db.commit()
+        authenticated = AuthenticatedUser.from_user(user)
+    finally:
+        db.close()
+
+    requests_before = state.requests
+    streamed = []
+    transport = httpx.ASGITransport(app=chat_app(authenticated))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("POST", "/api/chat/stream", json={"message": "Onduleur en défaut ?"}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and line != "data: [DONE]":
+                    streamed.append(json.loads(line[len("data: "):])["content"])
+    await wait_pending_chat_messages()
+
+    async with AsyncSessionLocal() as session:
+        stored = await session.scalar(
+            select(ChatMessage).where(ChatMessage.user_id == authenticated.id).order_by(ChatMessage.id.desc())
+        )
+    check(state.requests - requests_before == 1, "un seul appel au modèle par message streamé")
+    check(stored is not None and stored.response == "".join(streamed), "texte enregistré = texte streamé")
+    check(
+        stored is not None and stored.total_tokens == 12 + state.chunks and stored.time_to_first_token_ms is not None
+        and stored.finish_reason == "stop",
+        f"usage et temps au premier token enregistrés "
+        f"({stored.total_tokens if stored else None} tokens, {stored.time_to_first_token_ms if stored else None} ms)"
+    )
+
+
+async def check_response_cache(state: StubState, service: AIService, check):
+    from app.services.response_cache import get_chat_response_cache
+
+    cache = get_chat_response_cache()
+    cache.clear()
+    requests_before = state.requests
+    first = await service.get_chat_response(
+        "Onduleur  en défaut ?", context={"procedure_id": 3, "step_id": 7}
+    )
+    second = await service.get_chat_response(
+        "onduleur en DÉFAUT ?", context={"step_id": 7, "procedure_id": 3}
+    )
+    streamed = "".join([
+        chunk async for chunk in service.get_chat_response_stream(
+            "ONDULEUR EN DÉFAUT ?", context={"step_id": 7, "procedure_id": 3}
+        )
+    ])
+    stats = cache.stats()
+    check(
+        state.requests - requests_before == 1 and first == second == streamed,
+        "message équivalent servi par le cache (un seul appel au modèle)"
+    )
+    check(
+        stats["hits"] == 2 and stats["tokens_saved"] > 0 and stats["cost_saved_usd"] > 0,
+        f"économies comptées (hit rate {stats['hit_rate']:.2f}, {stats['tokens_saved']} tokens, "
+        f"{stats['cost_saved_usd']:.6f} $)"
+    )
+
+
+async def check_semantic_cache(state: StubState, service: AIService, check):
+    from app.services import semantic_cache, vector_search
+
+    settings.SEMANTIC_CACHE_ENABLED = True
+    vector_search._embedding_client = None
+    semantic_cache._semantic_cache = None
+    try:
+        requests_before = state.requests
+        first = await service.get_chat_response("procédure reset onduleur huawei", context={"procedure_id": 3})
+        second = await service.get_chat_response("reset onduleur huawei: procédure ?", context={"procedure_id": 3})
+        result = ChatStreamResult(model=service.model)
+        streamed = "".join([
+            chunk async for chunk in service.get_chat_response_stream(
+                "Onduleur Huawei, procédure reset ?", context={"procedure_id": 3}, result=result
+            )
+        ])
+        check(
+            state.requests - requests_before == 1 and first == second == streamed
+            and result.finish_reason == "cached_semantic",
+            "question reformulée servie par le cache sémantique"
+        )
+        await service.get_chat_response("procédure reset onduleur huawei", context={"procedure_id": 5})
+        await service.get_chat_response("nettoyage des panneaux", context={"procedure_id": 3})
+        stats = semantic_cache.get_semantic_cache().stats()
+        check(
+            state.requests - requests_before == 3 and stats["partitions"] == 2 and stats["hits"] == 2,
+            f"autre contexte ou autre question: appel au modèle ({stats['entries']} entrées, "
+            f"{stats['partitions']} partitions)"
+        )
+    finally:
+        settings.SEMANTIC_CACHE_ENABLED = False
+        semantic_cache._semantic_cache = None
+
+
+async def check_rag_context(state: StubState, service: AIService, check):
+    from app.models.procedure import Procedure, Step
+    from app.services.vector_backends import LocalVectorIndex, default_local_index_path
+    from app.services.vector_search import generate_query_embedding
+
+    db = SessionLocal()
+    try:
+        procedure = Procedure(
+            title="Remplacement ventilateur onduleur", description="Ventilation des onduleurs centraux",
+            category="onduleur", created_by=1, steps=[
+                Step(order=1, title="Consignation", instructions="Ouvrir le sectionneur AC puis DC"),
+                Step(order=2, title="Serrage", instructions="Couple de serrage des bornes: 12 Nm"),
+            ]
+        )
+        db.add(procedure)
+        db.commit()
+        procedure_id, step_id = procedure.id, procedure.steps[1].id
+    finally:
+        db.close()
+
+    documents = [
+        ("procedure", procedure_id, "Remplacement ventilateur onduleur filtre"),
+        ("tip", 1, "Astuce: nettoyer le filtre du ventilateur onduleur tous les six mois"),
+        ("tip", 2, "Contact support Huawei"),
+    ]
+    embeddings = [await asyncio.to_thread(generate_query_embedding, content) for _, _, content in documents]
+    LocalVectorIndex.write(default_local_index_path(), [
+        {"id": i, "document_type": kind, "document_id": document_id, "content": content, "metadata": {"title": content[:20]}}
+        for i, (kind, document_id, content) in enumerate(documents)
+    ], embeddings)
+
+    context = {"procedure_id": procedure_id, "step_id": step_id}
+    await service.get_chat_response("nettoyer le filtre du ventilateur onduleur", context=context)
+    system = state.last_body["messages"][0]["content"]
+    check(
+        "12 Nm" in system and "1. Consignation; 2. Serrage" in system and "tous les six mois" in system
+        and "Contact support" not in system and system.count("Remplacement ventilateur onduleur") == 1,
+        "étape, plan de la procédure et astuce proche injectés dans le prompt"
+    )
+
+    prompt = await service._prepare("nettoyer le filtre du ventilateur onduleur", context)
+    check(
+        set(prompt.timings_ms) == {"retrieval", "prompt_build"}
+        and {"procedure", "vector", "pack"} <= set(prompt.context.timings_ms),
+        f"durées par étape mesurées ({prompt.timings_ms}, contexte: {prompt.context.timings_ms})"
+    )
+
+    max_tokens = settings.CHAT_RAG_MAX_TOKENS
+    settings.CHAT_RAG_MAX_TOKENS = 25
+    try:
+        prompt = await service._prepare("nettoyer le filtre du ventilateur onduleur", context)
+    finally:
+        settings.CHAT_RAG_MAX_TOKENS = max_tokens
+    check(
+        prompt.context.tokens <= 25 and prompt.context.sections[0].source["document_type"] == "step"
+        and prompt.context.dropped > 0,
+        f"budget respecté: étape en cours d'abord ({prompt.context.tokens} tokens, "
+        f"{prompt.context.dropped} section(s) écartée(s))"
+    )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Appels OpenAI non bloquants contre un serveur factice")
+    parser.add_argument("--streams", type=int, default=8, help="Flux simultanés")
+    parser.add_argument("--chunks", type=int, default=10, help="Fragments par flux")
+    parser.add_argument("--delay", type=float, default=0.1, help="Secondes entre deux fragments")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
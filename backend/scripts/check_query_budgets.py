@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Vérifier le nombre de requêtes SQL des endpoints (régressions N+1)
+
+Peuple une base SQLite temporaire, appelle chaque endpoint via TestClient et
+échoue (code de sortie 1) dès qu'un endpoint dépasse son budget de requêtes.
+L'authentification (chargement de l'utilisateur) est comptée dans le budget.
+
+Usage: python scripts/check_query_budgets.py [--verbose]
+"""
+
+import sys
+import os
+import tempfile
+
+# Base de test isolée, configurée avant l'import de l'application
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/query_budgets.db"
+os.environ.setdefault("OPENAI_API_KEY", "sk-query-budgets")
+# Budgets mesurés sans le cache des utilisateurs: chaque appel recharge l'utilisateur
+os.environ.setdefault("AUTH_USER_CACHE_TTL", "0")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine, get_async_engine
+from app.core.query_counter import QueryCounter, QueryBudgetExceeded
+from app.core.security import create_access_token
+from app.models.user import User, UserRole
+from app.models.procedure import Procedure, Step
+from app.models.tip import Tip
+from app.api import procedures, tips, executions, search, analytics
+from app.services.fulltext_search import ensure_fulltext_index
+
+PROCEDURES = 50
+STEPS_PER_PROCEDURE = 5
+
+NEW_PROCEDURE = {
+    "title": "Remplacement ventilateur onduleur",
+    "description": "Procédure de remplacement",
+    "category": "maintenance",
+    "tags": ["onduleur"],
+    "steps": [{"title": f"Étape {i}", "instructions": "Instructions", "order": i} for i in range(1, 6)],
+}
+
+# (libellé, méthode, chemin, corps JSON, budget de requêtes)
+BUDGETS = [
+    ("liste des procédures", "GET", f"/api/procedures/?limit={PROCEDURES}", None, 3),
+    ("liste légère", "GET", f"/api/procedures/summary?limit={PROCEDURES}", None, 2),
+    ("recherche de procédures", "GET", "/api/procedures/?search=onduleur", None, 4),
+    ("détail d'une procédure", "GET", "/api/procedures/1", None, 3),
+    ("création d'une procédure", "POST", "/api/procedures/", NEW_PROCEDURE, 5),
+    ("mise à jour d'une procédure", "PUT", "/api/procedures/1", {"title": "Contrôle onduleur"}, 5),
+    ("liste des tips", "GET", "/api/tips/", None, 2),
+    ("historique des exécutions", "GET", "/api/executions/", None, 2),
+    ("démarrage d'une exécution", "POST", "/api/executions/", {"procedure_id": 1}, 6),
+    ("validation d'une étape", "PUT", "/api/executions/1/step", {"step_id": 1, "status": "completed"}, 9),
+    ("fin d'une exécution", "PUT", "/api/executions/1/complete", None, 7),
+    ("tableau de bord d'une procédure", "GET", "/api/analytics/procedures/1", None, 4),
+    ("statistiques des procédures", "GET", "/api/analytics/procedures", None, 2),
+    ("recherche plein texte", "GET", "/api/search/?q=onduleur", None, 7),
+]
+
+
+def create_app() -> FastAPI:
+    """Routes vérifiées, montées comme dans app.main"""
+    app = FastAPI()
+    app.include_router(procedures.router, prefix=f"{settings.API_V1_STR}/procedures")
+    app.include_router(tips.router, prefix=f"{settings.API_V1_STR}/tips")
+    app.include_router(executions.router, prefix=f"{settings.API_V1_STR}/executions")
+    app.include_router(search.router, prefix=f"{settings.API_V1_STR}/search")
+    app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics")
+    return app
+
+
+def seed():
+    """Un admin, des procédures avec leurs étapes et des tips; retourne le token admin"""
+    Base.metadata.create_all(bind=engine)
+    ensure_fulltext_index(engine)
+    db = SessionLocal()
+    try:
+        admin = User(email="admin@example.com", password_hash="-", role=UserRole.ADMIN)
+        db.add(admin)
+        db.flush()
+        for i in range(PROCEDURES):
+            db.add(Procedure(
+                title=f"Contrôle onduleur {i}", description="Vérification", category="maintenance",
+                tags=["onduleur"], created_by=admin.id, is_active=1,
+                steps=[
+                    Step(order=order, title=f"Étape {order}", instructions="Mesurer la tension")
+                    for order in range(1, STEPS_PER_PROCEDURE + 1)
+                ]
+            ))
+            db.add(Tip(title=f"Astuce onduleur {i}", content="Redémarrer", category="dépannage", created_by=admin.id))
+        db.commit()
+        return create_access_token({"sub": str(admin.id)})
+    finally:
+        db.close()
+
+
+def main():
+    verbose = "--verbose" in sys.argv
+    client = TestClient(create_app())
+    headers = {"Authorization": f"Bearer {seed()}"}
+
+    failures = 0
+    for label, method, path, body, budget in BUDGETS:
+        # Routes async (get_async_db) et routes encore synchrones (get_db)
+        with QueryCounter(engine, get_async_engine().sync_engine) as counter:
+            response = client.request(method, path, json=body, headers=headers)
+        status = "OK" if response.status_code < 400 else f"HTTP {response.status_code}"
+        try:
+            if response.status_code >= 400:
+                raise QueryBudgetExceeded(f"{label}: {response.status_code} {response.text[:200]}")
+            counter.assert_max(budget, label)
+            print(f"✅ {label:<30} {counter.count:>3}/{budget} requêtes")
+            if verbose:
+                print(counter.report())
+        except QueryBudgetExceeded as e:
+            failures += 1
+            print(f"❌ {status:<8} {e}")
+
+    if failures:
+        print(f"\n{failures} endpoint(s) hors budget")
+        sys.exit(1)
+    print("\nTous les endpoints respectent leur budget de requêtes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Vérifier que les extraits surlignés de la recherche plein texte sont du HTML sûr
+
+Peuple une base SQLite temporaire avec une procédure, une étape et un tip dont
+le texte contient du balisage (<script>, <img onerror=…>), puis vérifie via
+GET /api/search/ que title_highlight et snippet sont échappés: seules les
+balises <mark> autour des termes trouvés restent du balisage.
+
+Usage: python scripts/check_search_highlight.py
+Code de sortie 1 si une vérification échoue.
+"""
+
+import sys
+import os
+import tempfile
+
+# Base de test isolée, configurée avant l'import de l'application
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/search_highlight.db"
+os.environ.setdefault("OPENAI_API_KEY", "sk-search-highlight")
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.core.security import create_access_token
+from app.models.user import User, UserRole
+from app.models.procedure import Procedure, Step
+from app.models.tip import Tip
+from app.api import search
+from app.services.fulltext_search import HIGHLIGHT_END, HIGHLIGHT_START, ensure_fulltext_index
+
+SCRIPT = "<script>alert('onduleur')</script>"
+IMAGE = '<img src=x onerror="alert(1)">'
+
+
+def seed() -> str:
+    """Documents contenant du balisage; retourne le token de l'utilisateur"""
+    Base.metadata.create_all(bind=engine)
+    ensure_fulltext_index(engine)
+    db = SessionLocal()
+    try:
+        user = User(email="tech@example.com", password_hash="-", role=UserRole.TECHNICIAN)
+        db.add(user)
+        db.flush()
+        db.add(Procedure(
+            title=f"Redémarrage onduleur {SCRIPT}", description=f"Couper l'onduleur {IMAGE} puis attendre",
+            category="maintenance", tags=["onduleur"], created_by=user.id, is_active=1,
+            steps=[Step(order=1, title=f"Onduleur {IMAGE}", instructions=f"Vérifier l'onduleur {SCRIPT}")]
+        ))
+        db.add(Tip(title=f"Astuce onduleur {SCRIPT}", content=f"Onduleur & sectionneur {IMAGE}",
+                   category="dépannage", created_by=user.id))
+        db.commit()
+        return create_access_token({"sub": str(user.id)})
+    finally:
+        db.close()
+
+
+def main():
+    failures = []
+
+    def check(condition: bool, label: str):
+        print(f"{'✅' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    app = FastAPI()
+    app.include_router(search.router, prefix=f"{settings.API_V1_STR}/search")
+    client = TestClient(app)
+    response = client.get("/api/search/?q=onduleur", headers={"Authorization": f"Bearer {seed()}"})
+    check(response.status_code == 200, f"GET /api/search/?q=onduleur: HTTP {response.status_code}")
+    results = response.json().get("results", []) if response.status_code == 200 else []
+    check(
+        {result["document_type"] for result in results} == {"procedure", "step", "tip"},
+        f"procédure, étape et tip trouvés ({len(results)} résultat(s))"
+    )
+
+    for result in results:
+        label = f"{result['document_type']} {result['document_id']}"
+        for field in ("title_highlight", "snippet"):
+            value = result.get(field) or ""
+            markup = re.findall(r"<[^>]*>", value)
+            check(
+                bool(markup) and all(tag in ("<mark>", "</mark>") for tag in markup),
+                f"{label} {field}: seules les balises <mark> sont du balisage ({value!r})"
+            )
+            check(
+                HIGHLIGHT_START not in value and HIGHLIGHT_END not in value,
+                f"{label} {field}: marqueurs internes remplacés"
+            )
+        check(
+            "&lt;" in result["title_highlight"] + result["snippet"],
+            f"{label}: balisage stocké échappé (&lt;script&gt;, &lt;img …&gt;)"
+        )
+
+    print()
+    if failures:
+        print(f"❌ {len(failures)} vérification(s) en échec")
+        sys.exit(1)
+    print("✅ Extraits surlignés échappés")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Évaluation hors ligne du cache sémantique: hit rate vs réponses erronées
+
+Jeu de données: questions étiquetées par intention (`group`); deux questions du
+même groupe et du même contexte attendent la même réponse. Les questions sont
+rejouées dans un ordre aléatoire: une question servie par le cache avec la
+réponse d'un autre groupe compte comme réponse erronée.
+
+Usage:
+    python scripts/eval_semantic_cache.py                                # jeu intégré, embeddings OpenAI
+    python scripts/eval_semantic_cache.py --embedder hashing             # hors ligne (n-grammes, sans API)
+    python scripts/eval_semantic_cache.py --dataset questions.jsonl --thresholds 0.85,0.9,0.95
+
+Format JSONL: {"question": "...", "group": "reset-huawei", "context": {"procedure_id": 3}}
+"""
+
+import sys
+import os
+import hashlib
+import json
+import random
+import re
+import statistics
+import unicodedata
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.ai_service import AIService
+from app.services.semantic_cache import SemanticResponseCache, partition_key
+
+# Questions de techniciens reformulées (groupes proches volontairement: Huawei/SMA)
+SAMPLE_DATASET = [
+    ("reset-huawei", None, [
+        "comment reset onduleur Huawei",
+        "reset SUN2000 procédure",
+        "réinitialiser un onduleur Huawei SUN2000",
+        "procédure de redémarrage onduleur huawei",
+    ]),
+    ("reset-sma", None, [
+        "comment reset onduleur SMA",
+        "réinitialiser Sunny Tripower",
+        "procédure redémarrage onduleur SMA Sunny Boy",
+    ]),
+    ("isolement", None, [
+        "défaut d'isolement onduleur que faire",
+        "erreur isolement riso trop faible",
+        "alarme résistance d'isolement basse",
+        "comment trouver un défaut d'isolement sur les strings",
+    ]),
+    ("mesure-voc", None, [
+        "comment mesurer la tension à vide d'un string",
+        "mesure Voc string multimètre",
+        "vérifier tension circuit ouvert chaîne de panneaux",
+    ]),
+    ("mesure-isc", None, [
+        "mesurer le courant de court-circuit d'un string",
+        "mesure Isc pince ampèremétrique",
+    ]),
+    ("hotspot", None, [
+        "point chaud sur un module thermographie",
+        "hotspot panneau caméra thermique",
+        "module qui chauffe anormalement",
+    ]),
+    ("consignation", None, [
+        "procédure de consignation avant intervention",
+        "comment consigner l'installation",
+        "mise en sécurité avant travaux coffret DC",
+    ]),
+    ("fusible", None, [
+        "remplacer un fusible string",
+        "changer fusible dans le coffret DC",
+        "fusible de chaîne grillé",
+    ]),
+    ("compteur", None, [
+        "le compteur ne remonte plus la production",
+        "pas de données de production sur le compteur",
+        "compteur de production affiche zéro",
+    ]),
+    ("communication", None, [
+        "onduleur ne communique plus avec le datalogger",
+        "perte de communication RS485",
+        "l'onduleur n'apparaît plus dans la supervision",
+    ]),
+    ("nettoyage", None, [
+        "fréquence de nettoyage des panneaux",
+        "quand nettoyer les modules",
+        "nettoyer les panneaux solaires avec quoi",
+    ]),
+    ("etape-serrage", {"procedure_id": 3, "step_id": 2}, [
+        "quel couple de serrage ici",
+        "couple de serrage de cette étape",
+        "à combien serrer les bornes",
+    ]),
+    ("etape-serrage-autre", {"procedure_id": 5, "step_id": 1}, [
+        "quel couple de serrage ici",
+        "couple de serrage de cette étape",
+    ]),
+]
+
+
+def load_dataset(path):
+    if path is None:
+        return [
+            {"question": question, "group": group, "context": context}
+            for group, context, questions in SAMPLE_DATASET
+            for question in questions
+        ]
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def hashing_embedding(text: str, dimensions: int = 1024):
+    """Embedding hors ligne: mots et trigrammes de caractères hachés (sans API)"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = re.findall(r"\w+", text)
+    features = words + [f" {word} "[i:i + 3] for word in words for i in range(len(word))]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0 if digest[4] % 2 else -1.0
+    return vector.tolist()
+
+
+def openai_embedding(text: str):
+    from app.services.vector_search import generate_query_embedding
+
+    embedding = generate_query_embedding(text)
+    if embedding is None:
+        raise RuntimeError("Embeddings OpenAI indisponibles (OPENAI_API_KEY)")
+    return embedding
+
+
+def replay(items, embeddings, threshold: float, seed: int):
+    """Rejouer les questions dans un ordre aléatoire avec un cache vide"""
+    service = AIService()
+    cache = SemanticResponseCache(threshold=threshold, max_entries=len(items) + 1)
+    order = list(range(len(items)))
+    random.Random(seed).shuffle(order)
+    seen = set()
+    hits = wrong = reachable = 0
+
+    for index in order:
+        item = items[index]
+        partition = partition_key(service.model, service._build_system_prompt(item.get("context")))
+        if (partition, item["group"]) in seen:
+            reachable += 1
+        hit = cache.lookup(partition, embeddings[index])
+        if hit is not None:
+            hits += 1
+            if hit[0]["response"] != item["group"]:
+                wrong += 1
+            continue
+        # La « réponse » enregistrée est l'intention: une réponse servie à un autre groupe est erronée
+        cache.add(partition, item["question"], embeddings[index], item["group"], service.model)
+        seen.add((partition, item["group"]))
+
+    return {
+        "hit_rate": hits / len(items),
+        "mismatch_rate": wrong / hits if hits else 0.0,
+        "wrong_per_question": wrong / len(items),
+        "recall": (hits - wrong) / reachable if reachable else 0.0,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hit rate vs réponses erronées du cache sémantique")
+    parser.add_argument("--dataset", type=str, help="Fichier JSONL (défaut: jeu intégré)")
+    parser.add_argument("--embedder", choices=["openai", "hashing"], default="openai", help="Source des embeddings")
+    parser.add_argument("--thresholds", type=str, default="0.75,0.8,0.85,0.88,0.9,0.92,0.95", help="Seuils à tester")
+    parser.add_argument("--shuffles", type=int, default=20, help="Ordres aléatoires moyennés")
+    parser.add_argument("--output", type=str, help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    items = load_dataset(args.dataset)
+    embed = hashing_embedding if args.embedder == "hashing" else openai_embedding
+    embeddings = [embed(item["question"]) for item in items]
+    groups = len({item["group"] for item in items})
+    print(f"{len(items)} questions, {groups} intentions, embeddings: {args.embedder}\n")
+    print(f"{'seuil':>6} {'hit rate':>9} {'erronées/hits':>14} {'erronées/questions':>19} {'rappel':>7}")
+
+    results = []
+    for threshold in (float(value) for value in args.thresholds.split(",")):
+        runs = [replay(items, embeddings, threshold, seed) for seed in range(args.shuffles)]
+        row = {"threshold": threshold, **{
+            metric: round(statistics.mean(run[metric] for run in runs), 4) for metric in runs[0]
+        }}
+        results.append(row)
+        print(
+            f"{threshold:>6.2f} {row['hit_rate']:>9.1%} {row['mismatch_rate']:>14.1%} "
+            f"{row['wrong_per_question']:>19.1%} {row['recall']:>7.1%}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"embedder": args.embedder, "questions": len(items), "results": results}, f, indent=2)
+        print(f"\nRésultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
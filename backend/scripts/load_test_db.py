@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Test de charge: routes async sur session synchrone (avant) vs session asynchrone (après)
+
+Deux petites applications servies par uvicorn exposent la même liste de
+procédures et une requête lente. Pendant que des clients appellent la liste
+en parallèle, d'autres enchaînent la requête lente: avec une session
+synchrone, chaque requête SQL bloque la boucle d'événements et la latence de
+tous les appels explose; avec asyncpg/aiosqlite elle reste stable.
+
+Usage:
+    python scripts/load_test_db.py --requests 2000 --concurrency 50
+    python scripts/load_test_db.py --database-url postgresql://.../procedure_bench
+"""
+
+import sys
+import os
+import asyncio
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+from app.core.database import Base, async_database_url, connect_args, engine_url, pool_options
+from app.models.procedure import Procedure, Step
+from app.models.user import User
+
+# Requête lente qui attend sans consommer de CPU (comme une requête bloquée côté serveur).
+# SQLite n'a pas d'équivalent à pg_sleep: sleep_ms() est enregistrée sur chaque connexion.
+SLOW_QUERIES = {
+    "sqlite": "SELECT sleep_ms(200)",
+    "postgresql": "SELECT pg_sleep(0.2)",
+}
+
+
+def register_sleep(engine):
+    """Fonction SQL sleep_ms() pour SQLite (connexions pysqlite et aiosqlite)"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000))
+
+
+def seed(session_factory, procedures: int):
+    db = session_factory()
+    try:
+        user = User(email=f"load-{time.time_ns()}@example.com", password_hash="-")
+        db.add(user)
+        db.flush()
+        db.add_all(
+            Procedure(
+                title=f"Procédure {i}", description="Description", category="maintenance", created_by=user.id,
+                is_active=1, steps=[Step(order=o, title=f"Étape {o}", instructions="Instructions") for o in range(1, 6)]
+            )
+            for i in range(procedures)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def serialize(procedures):
+    return [{"id": p.id, "title": p.title, "steps": [s.title for s in p.steps]} for p in procedures]
+
+
+def sync_app(database_url: str, slow_sql: str, page_size: int, pool_size: int = 5) -> FastAPI:
+    """Ancien schéma: routes async, session synchrone"""
+    engine = create_engine(
+        database_url, pool_size=pool_size,
+        connect_args={"check_same_thread": False} if "sqlite" in database_url else {}
+    )
+    register_sleep(engine)
+    session_factory = sessionmaker(bind=engine)
+    app = FastAPI()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/procedures")
+    async def procedures(db: Session = Depends(get_db)):
+        return serialize(db.scalars(
+            select(Procedure).options(selectinload(Procedure.steps)).order_by(Procedure.id).limit(page_size)
+        ).all())
+
+    @app.get("/slow")
+    async def slow(db: Session = Depends(get_db)):
+        db.execute(text(slow_sql))
+        return {}
+
+    return app
+
+
+def async_app(database_url: str, slow_sql: str, page_size: int) -> FastAPI:
+    """Nouveau schéma: AsyncSession (asyncpg / aiosqlite)"""
+    # Options de l'application (get_async_engine): l'attente d'une connexion ne bloque pas la boucle
+    url = async_database_url(database_url)
+    engine = create_async_engine(
+        engine_url(url), connect_args=connect_args(url), **pool_options(url, "load-test-async", asynchronous=True)
+    )
+    register_sleep(engine.sync_engine)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    app = FastAPI()
+
+    async def get_db():
+        async with session_factory() as db:
+            yield db
+
+    @app.get("/procedures")
+    async def procedures(db: AsyncSession = Depends(get_db)):
+        return serialize((await db.scalars(
+            select(Procedure).options(selectinload(Procedure.steps)).order_by(Procedure.id).limit(page_size)
+        )).all())
+
+    @app.get("/slow")
+    async def slow(db: AsyncSession = Depends(get_db)):
+        await db.execute(text(slow_sql))
+        return {}
+
+    return app
+
+
+def serve(app: FastAPI):
+    """Lancer uvicorn dans un thread, retourne (serveur, url)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def run_load(base_url: str, requests: int, concurrency: int, slow_clients: int):
+    """Latences (ms) de /procedures pendant que `slow_clients` enchaînent /slow"""
+    latencies = []
+    remaining = iter(range(requests))
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.get("/procedures")
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        async def slow_worker():
+            while not done.is_set():
+                await client.get("/slow")
+
+        slow_tasks = [asyncio.create_task(slow_worker()) for _ in range(slow_clients)]
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*slow_tasks)
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    return {
+        "p50": statistics.median(latencies),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "rps": len(latencies) / elapsed,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Test de charge session synchrone vs asynchrone")
+    parser.add_argument("--database-url", type=str, help="Base de test (défaut: SQLite temporaire)")
+    parser.add_argument("--procedures", type=int, default=200, help="Procédures de test (5 étapes chacune)")
+    parser.add_argument("--page-size", type=int, default=10, help="Procédures par réponse")
+    parser.add_argument("--requests", type=int, default=1000, help="Appels à /procedures par variante")
+    parser.add_argument("--concurrency", type=int, default=50, help="Clients simultanés")
+    parser.add_argument("--slow-clients", type=int, default=2, help="Clients enchaînant la requête lente (0: aucun)")
+
+    args = parser.parse_args()
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/load_test.db"
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    seed(sessionmaker(bind=engine), args.procedures)
+    slow_sql = SLOW_QUERIES.get(engine.dialect.name, SLOW_QUERIES["postgresql"])
+
+    print(f"{engine.dialect.name}: {args.requests} requêtes, {args.concurrency} clients, {args.slow_clients} client(s) lent(s)")
+    print(f"{'variante':<22} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8}")
+    variants = (
+        # Pool synchrone à la taille de la charge: sinon l'attente d'une connexion bloque
+        # la boucle qui devrait justement en libérer une (interblocage)
+        ("avant (Session)", lambda: sync_app(database_url, slow_sql, args.page_size, args.concurrency + args.slow_clients)),
+        ("après (AsyncSession)", lambda: async_app(database_url, slow_sql, args.page_size)),
+    )
+    for label, factory in variants:
+        server, base_url = serve(factory())
+        try:
+            stats = asyncio.run(run_load(base_url, args.requests, args.concurrency, args.slow_clients))
+        finally:
+            server.should_exit = True
+        print(f"{label:<22} {stats['p50']:>7.1f}ms {stats['p95']:>7.1f}ms {stats['p99']:>7.1f}ms {stats['rps']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
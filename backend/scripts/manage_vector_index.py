@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Script d'administration de l'index vectoriel de document_embeddings
+Usage:
+    python scripts/manage_vector_index.py status
+    python scripts/manage_vector_index.py build --method hnsw --m 16 --ef-construction 64
+    python scripts/manage_vector_index.py build --method ivfflat --lists 300
+    python scripts/manage_vector_index.py drop
+"""
+
+import sys
+import os
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine
+from app.services.vector_index import VectorIndexManager, VECTOR_INDEX_METHODS
+
+
+def print_status(status: dict):
+    print(f"Table: {status['table']} ({status['rows']} embeddings)")
+    if status["definition"]:
+        print(f"Index: {status['index']} ({status['size']})")
+        print(f"  {status['definition']}")
+    else:
+        print(f"Index: {status['index']} absent (parcours séquentiel)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gérer l'index ANN (HNSW/IVFFlat) des embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="Afficher l'index actuel")
+
+    build_parser = subparsers.add_parser("build", help="Construire ou reconstruire l'index")
+    build_parser.add_argument("--method", choices=VECTOR_INDEX_METHODS, default="hnsw", help="Type d'index")
+    build_parser.add_argument("--m", type=int, default=16, help="HNSW: connexions par nœud")
+    build_parser.add_argument("--ef-construction", type=int, default=64, help="HNSW: taille de la liste de candidats à la construction")
+    build_parser.add_argument("--lists", type=int, help="IVFFlat: nombre de listes (défaut: rows/1000)")
+    build_parser.add_argument("--maintenance-work-mem", type=str, help="Mémoire allouée à la construction (ex: 2GB)")
+
+    subparsers.add_parser("drop", help="Supprimer l'index")
+
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("L'index vectoriel nécessite PostgreSQL avec l'extension pgvector (DATABASE_URL)")
+        sys.exit(1)
+
+    manager = VectorIndexManager(engine)
+
+    try:
+        if args.command == "build":
+            print(f"Construction de l'index {args.method}...")
+            status = manager.build(
+                method=args.method,
+                m=args.m,
+                ef_construction=args.ef_construction,
+                lists=args.lists,
+                maintenance_work_mem=args.maintenance_work_mem
+            )
+            print("Index construit avec succès!")
+            print_status(status)
+        elif args.command == "drop":
+            manager.drop()
+            print("Index supprimé")
+        else:
+            print_status(manager.status())
+    except Exception as e:
+        print(f"Erreur: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Recalculer les statistiques d'exécution depuis l'historique complet
+
+À lancer une fois après la migration 008_execution_stats (tables de résumés
+créées vides), ou pour corriger des compteurs. Les endpoints les tiennent
+ensuite à jour à chaque écriture.
+
+Usage:
+    python scripts/rebuild_execution_stats.py
+    python scripts/rebuild_execution_stats.py --batch-size 2000
+"""
+
+import sys
+import os
+import time
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.execution_stats import rebuild_execution_stats
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recalculer les résumés d'exécution (analytics)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Exécutions chargées par lot")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        counts = rebuild_execution_stats(db, batch_size=args.batch_size)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print(f"✅ {counts['executions']} exécutions, {counts['steps']} étapes résumées, "
+          f"{counts['durations_updated']} durées d'étapes reconstituées en {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+-- Migration: Clé unique (document_type, document_id) pour les upserts par lot
+-- (INSERT ... ON CONFLICT dans scripts/generate_embeddings_direct.py)
+
+-- Supprimer les doublons éventuels en gardant l'embedding le plus récent
+DELETE FROM "document_embeddings" a
+USING "document_embeddings" b
+WHERE a."document_type" = b."document_type"
+  AND a."document_id" = b."document_id"
+  AND a."id" < b."id";
+
+-- DropIndex
+DROP INDEX IF EXISTS "document_embeddings_document_type_document_id_idx";
+
+-- CreateIndex
+CREATE UNIQUE INDEX IF NOT EXISTS "document_embeddings_document_type_document_id_key" ON "document_embeddings"("document_type", "document_id");
@@ -0,0 +1,5 @@
+-- Migration: Empreinte du contenu encodé pour la ré-génération incrémentale des embeddings
+-- (scripts/generate_embeddings_direct.py --incremental)
+
+-- AlterTable
+ALTER TABLE "document_embeddings" ADD COLUMN IF NOT EXISTS "content_hash" VARCHAR(64);
@@ -0,0 +1,11 @@
+-- Migration: Usage et latence des messages du chat (réponse streamée enregistrée telle quelle)
+-- (backend: alembic/versions/006_chat_message_usage.py)
+
+-- AlterTable
+ALTER TABLE "chat_messages" ADD COLUMN IF NOT EXISTS "model" VARCHAR(100);
+ALTER TABLE "chat_messages" ADD COLUMN IF NOT EXISTS "prompt_tokens" INTEGER;
+ALTER TABLE "chat_messages" ADD COLUMN IF NOT EXISTS "completion_tokens" INTEGER;
+ALTER TABLE "chat_messages" ADD COLUMN IF NOT EXISTS "total_tokens" INTEGER;
+ALTER TABLE "chat_messages" ADD COLUMN IF NOT EXISTS "time_to_first_token_ms" INTEGER;
+ALTER TABLE "chat_messages" ADD COLUMN IF NOT EXISTS "duration_ms" INTEGER;
+ALTER TABLE "chat_messages" ADD COLUMN IF NOT EXISTS "finish_reason" VARCHAR(20);
@@ -0,0 +1,22 @@
+-- Migration: Synchronisation par lot des étapes (horodatage client, clés d'idempotence)
+-- (backend: alembic/versions/007_step_sync.py)
+
+-- AlterTable
+ALTER TABLE "step_executions" ADD COLUMN IF NOT EXISTS "client_updated_at" TIMESTAMPTZ(6);
+
+-- CreateTable
+CREATE TABLE IF NOT EXISTS "step_sync_operations" (
+    "id" SERIAL NOT NULL,
+    "execution_id" INTEGER NOT NULL,
+    "idempotency_key" VARCHAR(100) NOT NULL,
+    "step_id" INTEGER NOT NULL,
+    "result" VARCHAR(20) NOT NULL,
+    "created_at" TIMESTAMPTZ(6) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "step_sync_operations_pkey" PRIMARY KEY ("id"),
+    CONSTRAINT "step_sync_operations_execution_id_fkey" FOREIGN KEY ("execution_id") REFERENCES "executions"("id") ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT "step_sync_operations_step_id_fkey" FOREIGN KEY ("step_id") REFERENCES "steps"("id") ON DELETE RESTRICT ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX IF NOT EXISTS "uq_step_sync_operations_execution_key" ON "step_sync_operations"("execution_id", "idempotency_key");
@@ -0,0 +1,47 @@
+-- Migration: Résumés d'exécution tenus à jour par le backend (app/services/execution_stats.py)
+-- (backend: alembic/versions/008_execution_stats.py)
+-- Les index (execution_id, step_id) et (step_id) de step_executions existent déjà
+-- (0_init). Les tables sont créées vides: les remplir depuis l'historique avec
+--   python scripts/rebuild_execution_stats.py
+
+-- AlterTable
+ALTER TABLE "step_executions" ADD COLUMN IF NOT EXISTS "duration_seconds" DOUBLE PRECISION;
+
+-- CreateTable
+CREATE TABLE IF NOT EXISTS "procedure_execution_stats" (
+    "procedure_id" INTEGER NOT NULL,
+    "executions_started" INTEGER NOT NULL,
+    "executions_completed" INTEGER NOT NULL,
+    "total_duration_seconds" DOUBLE PRECISION NOT NULL,
+    "updated_at" TIMESTAMPTZ(6) DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "procedure_execution_stats_pkey" PRIMARY KEY ("procedure_id"),
+    CONSTRAINT "procedure_execution_stats_procedure_id_fkey" FOREIGN KEY ("procedure_id") REFERENCES "procedures"("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateTable
+CREATE TABLE IF NOT EXISTS "procedure_duration_buckets" (
+    "procedure_id" INTEGER NOT NULL,
+    "bucket" INTEGER NOT NULL,
+    "count" INTEGER NOT NULL,
+
+    CONSTRAINT "procedure_duration_buckets_pkey" PRIMARY KEY ("procedure_id", "bucket"),
+    CONSTRAINT "procedure_duration_buckets_procedure_id_fkey" FOREIGN KEY ("procedure_id") REFERENCES "procedures"("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateTable
+CREATE TABLE IF NOT EXISTS "step_execution_stats" (
+    "step_id" INTEGER NOT NULL,
+    "procedure_id" INTEGER NOT NULL,
+    "completed_count" INTEGER NOT NULL,
+    "skipped_count" INTEGER NOT NULL,
+    "timed_count" INTEGER NOT NULL,
+    "total_duration_seconds" DOUBLE PRECISION NOT NULL,
+
+    CONSTRAINT "step_execution_stats_pkey" PRIMARY KEY ("step_id"),
+    CONSTRAINT "step_execution_stats_step_id_fkey" FOREIGN KEY ("step_id") REFERENCES "steps"("id") ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT "step_execution_stats_procedure_id_fkey" FOREIGN KEY ("procedure_id") REFERENCES "procedures"("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE INDEX IF NOT EXISTS "ix_step_execution_stats_procedure_id" ON "step_execution_stats"("procedure_id");
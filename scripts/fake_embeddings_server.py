@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Serveur d'embeddings factice compatible avec l'API OpenAI (/v1/embeddings)
+Permet de tester et mesurer generate_embeddings_direct.py sans appeler OpenAI
+
+Usage:
+    python3 scripts/fake_embeddings_server.py --port 8765 --latency 0.2
+    python3 scripts/generate_embeddings_direct.py --openai-key fake \
+        --openai-base-url http://localhost:8765/v1
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+def fake_embedding(text: str, dimensions: int = 1536) -> List[float]:
+    """Vecteur déterministe dérivé du texte (même texte → même vecteur)"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
+    norm = sum(x * x for x in vector) ** 0.5 or 1.0
+    return [round(x / norm, 6) for x in vector]
+
+
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    """Handler HTTP répondant comme l'endpoint /v1/embeddings"""
+
+    latency = 0.0
+    dimensions = 1536
+    stats = {"requests": 0, "inputs": 0}
+    stats_lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/embeddings"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats["inputs"] += len(inputs)
+
+        # Simuler la latence réseau/modèle d'une requête
+        if self.latency:
+            time.sleep(self.latency)
+
+        body = json.dumps({
+            "object": "list",
+            "model": payload.get("model", "fake"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, self.dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {
+                "prompt_tokens": sum(max(1, len(text) // 4) for text in inputs),
+                "total_tokens": sum(max(1, len(text) // 4) for text in inputs)
+            }
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 8765, latency: float = 0.0, dimensions: int = 1536) -> ThreadingHTTPServer:
+    """Démarrer le serveur en arrière-plan et le retourner (appeler shutdown() pour l'arrêter)"""
+    FakeEmbeddingsHandler.latency = latency
+    FakeEmbeddingsHandler.dimensions = dimensions
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeEmbeddingsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serveur d'embeddings factice compatible OpenAI")
+    parser.add_argument("--port", type=int, default=8765, help="Port d'écoute")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulée par requête (secondes)")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Dimension des vecteurs")
+
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.dimensions)
+    print(f"🧪 Serveur d'embeddings factice sur http://127.0.0.1:{args.port}/v1")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n📊 {FakeEmbeddingsHandler.stats['requests']} requêtes, {FakeEmbeddingsHandler.stats['inputs']} textes")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
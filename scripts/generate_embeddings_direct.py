@@ -7,8 +7,12 @@ Script de génération d'embeddings avec connexion directe à Supabase
 import os
 import sys
 import json
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 from tqdm import tqdm
 import time
 
@@ -26,19 +30,92 @@ except ImportError:
 
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_values
     PSYCOPG2_AVAILABLE = True
 except ImportError:
     PSYCOPG2_AVAILABLE = False
     print("⚠️  psycopg2 non installé. Installation: pip install psycopg2-binary")
 
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+MAX_INPUT_CHARS = 8000
+
+
+def content_hash(content: str) -> str:
+    """Empreinte SHA-256 du texte encodé (titre + description/contenu)"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière du nombre de tokens (~4 caractères par token)"""
+    return max(1, len(text) // 4)
+
+
+class RateLimiter:
+    """
+    Budget requêtes/tokens par minute partagé entre les threads
+    (fenêtre glissante de 60 secondes)
+    """
+    
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, window: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._events = deque()  # (timestamp, tokens)
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+    
+    def _purge(self, now: float):
+        while self._events and now - self._events[0][0] >= self.window:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+    
+    def acquire(self, tokens: int):
+        """Bloquer jusqu'à ce qu'une requête de `tokens` tokens rentre dans le budget"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._purge(now)
+                
+                fits_rpm = not self.rpm or len(self._events) < self.rpm
+                # Une requête seule plus grosse que le budget TPM passe quand la fenêtre est vide
+                fits_tpm = (
+                    not self.tpm
+                    or self._tokens_in_window + tokens <= self.tpm
+                    or not self._events
+                )
+                
+                if fits_rpm and fits_tpm:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                
+                wait = self.window - (now - self._events[0][0])
+            time.sleep(max(wait, 0.01))
+
+
 class EmbeddingGeneratorDirect:
     """Génération d'embeddings avec connexion directe à Supabase"""
     
-    def __init__(self, database_url: str = None, openai_api_key: str = None):
+    def __init__(
+        self,
+        database_url: str = None,
+        openai_api_key: str = None,
+        openai_base_url: str = None,
+        model: str = EMBEDDING_MODEL,
+        batch_size: int = 128,
+        max_batch_tokens: int = 100_000,
+        concurrency: int = 4,
+        rpm: Optional[int] = 3000,
+        tpm: Optional[int] = 1_000_000
+    ):
         self.db_conn = None
         self.openai_client = None
+        self.model = model
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = RateLimiter(rpm=rpm, tpm=tpm)
         
         # Configuration base de données
         if database_url:
@@ -79,8 +156,12 @@ class EmbeddingGeneratorDirect:
             raise ValueError("OPENAI_API_KEY non trouvé. Spécifiez --openai-key ou configurez OPENAI_API_KEY")
         
         # Initialiser les clients
+        # base_url permet de pointer vers un serveur d'embeddings local (tests, bench)
         if OPENAI_AVAILABLE:
-            self.openai_client = OpenAI(api_key=self.openai_api_key)
+            self.openai_client = OpenAI(
+                api_key=self.openai_api_key,
+                base_url=openai_base_url or os.getenv("OPENAI_BASE_URL") or None
+            )
         
         if PSYCOPG2_AVAILABLE:
             self.db_conn = psycopg2.connect(self.database_url)
@@ -92,14 +173,36 @@ class EmbeddingGeneratorDirect:
         
         try:
             response = self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text[:8000]  # Limiter la longueur
+                model=self.model,
+                input=text[:MAX_INPUT_CHARS]  # Limiter la longueur
             )
             return response.data[0].embedding
         except Exception as e:
             print(f"❌ Erreur génération embedding: {e}")
             return None
     
+    def generate_embeddings_batch(self, texts: List[str], retries: int = 3) -> List[List[float]]:
+        """
+        Générer les embeddings de plusieurs textes en une seule requête
+        
+        Respecte le budget RPM/TPM et réessaie avec backoff exponentiel.
+        Lève une exception si la requête échoue après tous les essais.
+        """
+        inputs = [text[:MAX_INPUT_CHARS] for text in texts]
+        tokens = sum(estimate_tokens(text) for text in inputs)
+        
+        for attempt in range(retries + 1):
+            self.rate_limiter.acquire(tokens)
+            try:
+                response = self.openai_client.embeddings.create(model=self.model, input=inputs)
+                # L'API ne garantit pas l'ordre: on trie par index
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+    
     def get_procedures(self, limit: int = None) -> List[Dict[str, Any]]:
         """Récupérer toutes les procédures depuis la base de données"""
         if not self.db_conn:
@@ -142,53 +245,174 @@ class EmbeddingGeneratorDirect:
     
     def save_embedding(self, document_type: str, document_id: int, content: str, embedding: List[float], metadata: Dict[str, Any] = None) -> bool:
         """Sauvegarder un embedding dans la base de données"""
+        document = {
+            "document_type": document_type,
+            "document_id": document_id,
+            "content": content,
+            "metadata": metadata
+        }
+        return self.save_embeddings_batch([document], [embedding])
+    
+    def save_embeddings_batch(self, documents: List[Dict[str, Any]], embeddings: List[List[float]]) -> bool:
+        """Sauvegarder un lot d'embeddings avec un seul upsert multi-lignes"""
         if not self.db_conn:
             return False
+        if not documents:
+            return True
+        
+        rows = [
+            (
+                doc["document_type"],
+                doc["document_id"],
+                doc["content"],
+                content_hash(doc["content"]),
+                "[" + ",".join(map(str, embedding)) + "]",
+                json.dumps(doc.get("metadata") or {})
+            )
+            for doc, embedding in zip(documents, embeddings)
+        ]
+        
+        try:
+            cursor = self.db_conn.cursor()
+            execute_values(
+                cursor,
+                """
+                INSERT INTO document_embeddings (document_type, document_id, content, content_hash, embedding, metadata)
+                VALUES %s
+                ON CONFLICT (document_type, document_id) DO UPDATE
+                SET content = EXCLUDED.content,
+                    content_hash = EXCLUDED.content_hash,
+                    embedding = EXCLUDED.embedding,
+                    metadata = EXCLUDED.metadata
+                """,
+                rows,
+                template="(%s, %s, %s, %s, %s::vector, %s)",
+                page_size=len(rows)
+            )
+            self.db_conn.commit()
+            cursor.close()
+            return True
+        except Exception as e:
+            print(f"❌ Erreur sauvegarde lot d'embeddings: {e}")
+            self.db_conn.rollback()
+            return False
+    
+    def get_stored_hashes(self) -> Dict[tuple, Optional[str]]:
+        """Récupérer les empreintes des embeddings existants, par (document_type, document_id)"""
+        if not self.db_conn:
+            return {}
         
         try:
             cursor = self.db_conn.cursor()
-            
-            # Convertir l'embedding en format PostgreSQL vector
-            embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-            metadata_str = json.dumps(metadata or {})
-            
-            # Vérifier si l'embedding existe déjà
             cursor.execute(
-                "SELECT id FROM document_embeddings WHERE document_type = %s AND document_id = %s",
-                (document_type, document_id)
+                "SELECT document_type, document_id, content_hash FROM document_embeddings WHERE embedding IS NOT NULL"
             )
-            existing = cursor.fetchone()
+            rows = cursor.fetchall()
+            cursor.close()
             
-            if existing:
-                # Mettre à jour
-                cursor.execute(
-                    """
-                    UPDATE document_embeddings 
-                    SET content = %s, embedding = %s::vector, metadata = %s
-                    WHERE document_type = %s AND document_id = %s
-                    """,
-                    (content, embedding_str, metadata_str, document_type, document_id)
-                )
-            else:
-                # Insérer
-                cursor.execute(
-                    """
-                    INSERT INTO document_embeddings (document_type, document_id, content, embedding, metadata)
-                    VALUES (%s, %s, %s, %s::vector, %s)
-                    """,
-                    (document_type, document_id, content, embedding_str, metadata_str)
+            return {(document_type, document_id): stored_hash for document_type, document_id, stored_hash in rows}
+        except Exception as e:
+            print(f"❌ Erreur récupération empreintes: {e}")
+            self.db_conn.rollback()
+            return {}
+    
+    def prune_embeddings(self) -> int:
+        """Supprimer les embeddings des procédures supprimées/désactivées et des tips supprimés"""
+        if not self.db_conn:
+            return 0
+        
+        try:
+            cursor = self.db_conn.cursor()
+            cursor.execute(
+                """
+                DELETE FROM document_embeddings de
+                WHERE (
+                    de.document_type = 'procedure'
+                    AND NOT EXISTS (
+                        SELECT 1 FROM procedures p
+                        WHERE p.id = de.document_id AND p.is_active = true
+                    )
+                ) OR (
+                    de.document_type = 'tip'
+                    AND NOT EXISTS (SELECT 1 FROM tips t WHERE t.id = de.document_id)
                 )
-            
+                """
+            )
+            deleted = cursor.rowcount
             self.db_conn.commit()
             cursor.close()
-            return True
+            return deleted
         except Exception as e:
-            print(f"❌ Erreur sauvegarde embedding: {e}")
+            print(f"❌ Erreur suppression embeddings obsolètes: {e}")
             self.db_conn.rollback()
-            return False
+            return 0
+    
+    def filter_changed(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Garder uniquement les documents nouveaux ou dont le contenu a changé"""
+        stored = self.get_stored_hashes()
+        return [
+            doc for doc in documents
+            if stored.get((doc["document_type"], doc["document_id"])) != content_hash(doc["content"])
+        ]
+    
+    @staticmethod
+    def build_documents(procedures: List[Dict[str, Any]], tips: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Construire la liste des documents à encoder (procédures puis tips)"""
+        documents = []
+        
+        for document_type, rows, body_field in (
+            ("procedure", procedures, "description"),
+            ("tip", tips, "content"),
+        ):
+            for row in rows:
+                title = row.get("title", "") or ""
+                body = row.get(body_field, "") or ""
+                content = f"{title}\n\n{body}".strip()
+                if not content:
+                    continue
+                
+                documents.append({
+                    "document_type": document_type,
+                    "document_id": row["id"],
+                    "content": content,
+                    "metadata": {
+                        "title": title,
+                        "category": row.get("category"),
+                        "tags": row.get("tags")
+                    }
+                })
+        
+        return documents
     
-    def generate_all(self, limit: int = None) -> Dict[str, Any]:
-        """Générer les embeddings pour toutes les procédures et tips"""
+    def iter_batches(self, documents: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """Découper les documents en lots bornés en nombre d'entrées et en tokens"""
+        batch = []
+        batch_tokens = 0
+        
+        for doc in documents:
+            tokens = estimate_tokens(doc["content"][:MAX_INPUT_CHARS])
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(doc)
+            batch_tokens += tokens
+        
+        if batch:
+            yield batch
+    
+    def generate_all(self, limit: int = None, incremental: bool = False) -> Dict[str, Any]:
+        """
+        Générer les embeddings pour toutes les procédures et tips
+        
+        Les documents sont envoyés par lots à l'API, plusieurs lots étant en vol
+        simultanément (`concurrency`) sous le budget RPM/TPM. Chaque lot est écrit
+        avec un seul upsert.
+        
+        En mode incrémental, seuls les documents dont l'empreinte du contenu diffère
+        de celle stockée sont ré-encodés, et les embeddings des documents supprimés
+        ou désactivés sont purgés.
+        """
         if not self.openai_client:
             print("❌ Client OpenAI non configuré")
             return {"error": "OpenAI non configuré"}
@@ -199,81 +423,81 @@ class EmbeddingGeneratorDirect:
         
         print("🚀 Génération des embeddings...")
         
-        # Procédures
-        print("📋 Récupération des procédures...")
+        print("📋 Récupération des procédures et tips...")
         procedures = self.get_procedures(limit)
-        print(f"📊 {len(procedures)} procédures trouvées")
+        tips = self.get_tips(limit)
+        print(f"📊 {len(procedures)} procédures et {len(tips)} tips trouvés")
         
-        proc_results = {"processed": 0, "errors": []}
-        for proc in tqdm(procedures, desc="Génération embeddings procédures"):
-            proc_id = proc["id"]
-            title = proc.get("title", "")
-            description = proc.get("description", "") or ""
-            
-            content = f"{title}\n\n{description}".strip()
-            if not content:
-                continue
-            
-            embedding = self.generate_embedding(content)
-            if embedding:
-                metadata = {
-                    "title": title,
-                    "category": proc.get("category"),
-                    "tags": proc.get("tags")
-                }
-                
-                if self.save_embedding("procedure", proc_id, content, embedding, metadata):
-                    proc_results["processed"] += 1
-                else:
-                    proc_results["errors"].append(f"Procédure {proc_id}")
-            else:
-                proc_results["errors"].append(f"Procédure {proc_id}: erreur génération")
-            
-            time.sleep(0.1)  # Respecter les limites de taux
+        documents = self.build_documents(procedures, tips)
         
-        # Tips
-        print("\n📋 Récupération des tips...")
-        tips = self.get_tips(limit)
-        print(f"📊 {len(tips)} tips trouvés")
+        pruned = 0
+        skipped = 0
+        if incremental:
+            pruned = self.prune_embeddings()
+            changed = self.filter_changed(documents)
+            skipped = len(documents) - len(changed)
+            documents = changed
+            print(f"🔁 Mode incrémental: {len(documents)} à encoder, {skipped} inchangés, {pruned} supprimés")
         
-        tip_results = {"processed": 0, "errors": []}
-        for tip in tqdm(tips, desc="Génération embeddings tips"):
-            tip_id = tip["id"]
-            title = tip.get("title", "")
-            content_text = tip.get("content", "") or ""
-            
-            content = f"{title}\n\n{content_text}".strip()
-            if not content:
-                continue
-            
-            embedding = self.generate_embedding(content)
-            if embedding:
-                metadata = {
-                    "title": title,
-                    "category": tip.get("category"),
-                    "tags": tip.get("tags")
-                }
-                
-                if self.save_embedding("tip", tip_id, content, embedding, metadata):
-                    tip_results["processed"] += 1
-                else:
-                    tip_results["errors"].append(f"Tip {tip_id}")
-            else:
-                tip_results["errors"].append(f"Tip {tip_id}: erreur génération")
+        total = self.embed_documents(documents)
+        total["skipped_unchanged"] = skipped
+        total["pruned"] = pruned
+        return total
+    
+    def embed_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Encoder et sauvegarder une liste de documents, avec mesure du débit"""
+        results = {
+            "procedure": {"processed": 0, "errors": []},
+            "tip": {"processed": 0, "errors": []},
+        }
+        batches = list(self.iter_batches(documents))
+        started = time.perf_counter()
+        
+        # Les appels API partent en parallèle, les écritures restent sur le thread
+        # principal (une connexion psycopg2 ne se partage pas entre curseurs concurrents)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {
+                executor.submit(self.generate_embeddings_batch, [doc["content"] for doc in batch]): batch
+                for batch in batches
+            }
             
-            time.sleep(0.1)
+            with tqdm(total=len(documents), desc="Génération embeddings", unit="doc") as progress:
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        embeddings = future.result()
+                        saved = self.save_embeddings_batch(batch, embeddings)
+                        error = None if saved else "erreur sauvegarde"
+                    except Exception as e:
+                        saved = False
+                        error = f"erreur génération ({e})"
+                    
+                    for doc in batch:
+                        doc_results = results[doc["document_type"]]
+                        if saved:
+                            doc_results["processed"] += 1
+                        else:
+                            doc_results["errors"].append(f"{doc['document_type']} {doc['document_id']}: {error}")
+                    progress.update(len(batch))
+        
+        elapsed = time.perf_counter() - started
+        total_processed = results["procedure"]["processed"] + results["tip"]["processed"]
         
         total = {
-            "procedures": proc_results,
-            "tips": tip_results,
-            "total_processed": proc_results["processed"] + tip_results["processed"],
-            "total_errors": len(proc_results["errors"]) + len(tip_results["errors"])
+            "procedures": results["procedure"],
+            "tips": results["tip"],
+            "total_processed": total_processed,
+            "total_errors": len(results["procedure"]["errors"]) + len(results["tip"]["errors"]),
+            "batches": len(batches),
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_second": round(total_processed / elapsed, 2) if elapsed > 0 else 0.0
         }
         
         print(f"\n✅ Génération terminée:")
-        print(f"  - Procédures: {proc_results['processed']}")
-        print(f"  - Tips: {tip_results['processed']}")
-        print(f"  - Total: {total['total_processed']}")
+        print(f"  - Procédures: {results['procedure']['processed']}")
+        print(f"  - Tips: {results['tip']['processed']}")
+        print(f"  - Total: {total['total_processed']} en {total['batches']} lots")
+        print(f"  - Débit: {total['docs_per_second']} docs/s ({total['elapsed_seconds']}s)")
         if total["total_errors"] > 0:
             print(f"  - Erreurs: {total['total_errors']}")
         
@@ -292,17 +516,32 @@ def main():
     parser = argparse.ArgumentParser(description="Générer les embeddings avec connexion directe à Supabase")
     parser.add_argument("--database-url", type=str, help="URL de connexion PostgreSQL (ou utiliser DATABASE_URL)")
     parser.add_argument("--openai-key", type=str, help="Clé API OpenAI (ou utiliser OPENAI_API_KEY)")
+    parser.add_argument("--openai-base-url", type=str, help="URL d'un serveur d'embeddings compatible OpenAI (ex: serveur local de test)")
+    parser.add_argument("--model", type=str, default=EMBEDDING_MODEL, help="Modèle d'embeddings")
     parser.add_argument("--limit", type=int, help="Limiter le nombre de documents")
+    parser.add_argument("--incremental", action="store_true", help="N'encoder que les documents modifiés et purger les supprimés")
+    parser.add_argument("--batch-size", type=int, default=128, help="Nombre de documents par requête d'embeddings")
+    parser.add_argument("--max-batch-tokens", type=int, default=100_000, help="Tokens estimés maximum par requête")
+    parser.add_argument("--concurrency", type=int, default=4, help="Nombre de requêtes simultanées")
+    parser.add_argument("--rpm", type=int, default=3000, help="Budget de requêtes par minute (0 = illimité)")
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="Budget de tokens par minute (0 = illimité)")
     
     args = parser.parse_args()
     
     try:
         generator = EmbeddingGeneratorDirect(
             database_url=args.database_url,
-            openai_api_key=args.openai_key
+            openai_api_key=args.openai_key,
+            openai_base_url=args.openai_base_url,
+            model=args.model,
+            batch_size=args.batch_size,
+            max_batch_tokens=args.max_batch_tokens,
+            concurrency=args.concurrency,
+            rpm=args.rpm or None,
+            tpm=args.tpm or None
         )
         
-        generator.generate_all(args.limit)
+        generator.generate_all(args.limit, incremental=args.incremental)
         generator.close()
     except Exception as e:
         print(f"❌ Erreur: {e}")